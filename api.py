@@ -110,8 +110,8 @@ def source_code_model_go_to_definition_request(handle, filename, contents, line,
 def source_code_model_go_to_include_request(handle, filename, contents, line):
     _source_code_model_request(handle, SourceCodeModelSubServiceId.GO_TO_INCLUDE, filename, contents, line)
 
-def source_code_model_indexer_run_on_single_file_request(handle, filename):
-    _indexer_request(handle, SourceCodeModelIndexerRequestId.RUN_ON_SINGLE_FILE, filename)
+def source_code_model_indexer_run_on_single_file_request(handle, filename, *filenames):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.RUN_ON_SINGLE_FILE, filename, *filenames)
 
 def source_code_model_indexer_run_on_directory_request(handle):
     _indexer_request(handle, SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY)
@@ -122,6 +122,24 @@ def source_code_model_indexer_drop_single_file_request(handle, filename):
 def source_code_model_indexer_drop_all_request(handle, remove_db_from_disk):
     _indexer_request(handle, SourceCodeModelIndexerRequestId.DROP_ALL, remove_db_from_disk)
 
+def source_code_model_indexer_run_on_changed_files_request(handle, *filenames):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.RUN_ON_CHANGED_FILES, *filenames)
+
+def source_code_model_indexer_export_snapshot_request(handle, snapshot_filename):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.EXPORT_SNAPSHOT, snapshot_filename)
+
+def source_code_model_indexer_import_snapshot_request(handle, snapshot_filename):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.IMPORT_SNAPSHOT, snapshot_filename)
+
+def source_code_model_indexer_drop_shard_request(handle, shard):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.DROP_SHARD, shard)
+
+def source_code_model_indexer_run_on_shard_request(handle, shard):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.RUN_ON_SHARD, shard)
+
+def source_code_model_indexer_cancel_request(handle):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.CANCEL)
+
 def source_code_model_indexer_drop_all_and_run_on_directory_request(handle):
     source_code_model_indexer_drop_all_request(handle, True)
     source_code_model_indexer_run_on_directory_request(handle)
@@ -135,6 +153,33 @@ def source_code_model_indexer_fetch_all_diagnostics_request(handle, sorting_stra
 def source_code_model_indexer_fetch_all_definitions_request(handle):
     _indexer_request(handle, SourceCodeModelIndexerRequestId.FETCH_ALL_DEFINITIONS)
 
+def source_code_model_indexer_find_symbols_request(handle, query, limit):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.FIND_SYMBOLS, query, limit)
+
+def source_code_model_indexer_find_incoming_calls_request(handle, filename, line, col):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.FIND_INCOMING_CALLS, filename, line, col)
+
+def source_code_model_indexer_find_outgoing_calls_request(handle, filename, line, col):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.FIND_OUTGOING_CALLS, filename, line, col)
+
+def source_code_model_indexer_find_supertypes_request(handle, filename, line, col):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.FIND_SUPERTYPES, filename, line, col)
+
+def source_code_model_indexer_find_subtypes_request(handle, filename, line, col):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.FIND_SUBTYPES, filename, line, col)
+
+def source_code_model_indexer_find_includers_request(handle, filename):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.FIND_INCLUDERS, filename)
+
+def source_code_model_indexer_find_transitive_includers_request(handle, filename):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.FIND_TRANSITIVE_INCLUDERS, filename)
+
+def source_code_model_indexer_fetch_definitions_request(handle, cursor, page_size, num_of_pages, filename_prefix, kind, name):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.FETCH_DEFINITIONS, cursor, page_size, num_of_pages, filename_prefix, kind, name)
+
+def source_code_model_indexer_fetch_diagnostics_request(handle, cursor, page_size, num_of_pages, filename_prefix, min_severity, description):
+    _indexer_request(handle, SourceCodeModelIndexerRequestId.FETCH_DIAGNOSTICS, cursor, page_size, num_of_pages, filename_prefix, min_severity, description)
+
 #
 # Code-completion service API
 #
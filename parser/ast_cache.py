@@ -0,0 +1,153 @@
+import clang.cindex
+import hashlib
+import json
+import logging
+import os
+import sys
+from cxxd.parser.clang_parser import is_tunit_up_to_date
+
+def fingerprint_to_json(fingerprint):
+    contents_hash, dependencies = fingerprint
+    return [contents_hash, [[filename, list(state) if state is not None else None] for filename, state in dependencies]]
+
+def fingerprint_from_json(data):
+    contents_hash, dependencies = data
+    return (contents_hash, tuple((filename, tuple(state) if state is not None else None) for filename, state in dependencies))
+
+class AstCache():
+    """
+    Translation units saved to the disk so that the files do not have to be parsed from scratch once the server is
+    restarted. There is at most one translation unit saved for each file, the one parsed with the compiler args the
+    file has now, and it comes with the fingerprint of the contents and includes it has been parsed from (see
+    get_tunit_fingerprint()). Translation units which are out-of-date are removed once they are looked up, and the
+    least recently used ones once all of them together take more than max_size bytes.
+
+    Translation units read back from the disk come without the diagnostics, and can neither be re-parsed nor
+    code-completed, hence they are marked with read_from_ast_cache.
+    """
+
+    def __init__(self, root_directory, max_size):
+        self.directory = os.path.join(root_directory, '.cxxd_ast_cache')
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def load(self, index, tunit_filename, build_flags, contents_filename):
+        entry = self.__get_entry(tunit_filename, build_flags)
+        try:
+            with open(entry + '.json') as f:
+                fingerprint = fingerprint_from_json(json.load(f))
+        except (OSError, ValueError, TypeError):
+            self.misses += 1
+            return (None, None,)
+        if not is_tunit_up_to_date(fingerprint, contents_filename):
+            logging.debug("Translation unit of '{0}' saved in the AST cache is out-of-date.".format(tunit_filename))
+            self.__remove(os.path.basename(entry))
+            self.invalidations += 1
+            return (None, None,)
+        try:
+            # libclang refuses to read the translation unit too once any of the files it has been parsed from is modified
+            tunit = index.read(entry + '.ast')
+            os.utime(entry + '.json')
+        except (clang.cindex.TranslationUnitLoadError, OSError):
+            logging.debug("Translation unit of '{0}' saved in the AST cache cannot be read.".format(tunit_filename))
+            self.__remove(os.path.basename(entry))
+            self.invalidations += 1
+            return (None, None,)
+        tunit.read_from_ast_cache = True
+        self.hits += 1
+        return (tunit, fingerprint,)
+
+    def store(self, tunit_filename, build_flags, tunit, fingerprint):
+        entry = self.__get_entry(tunit_filename, build_flags)
+        # Entry is written into the temporary files first so that the other services never read a partially written one
+        ast_tmp, json_tmp = '{0}.ast.{1}.tmp'.format(entry, os.getpid()), '{0}.json.{1}.tmp'.format(entry, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tunit.save(ast_tmp)
+            with open(json_tmp, 'w') as f:
+                json.dump(fingerprint_to_json(fingerprint), f)
+            os.replace(ast_tmp, entry + '.ast')
+            os.replace(json_tmp, entry + '.json')
+        except Exception:
+            logging.error(sys.exc_info())
+            for filename in (ast_tmp, json_tmp):
+                if os.path.exists(filename):
+                    os.remove(filename)
+            return False
+        self.stores += 1
+        # Translation units parsed with the compiler args the file used to have are of no use anymore
+        for name in self.__get_entries():
+            if name.startswith(self.__get_filename_hash(tunit_filename)) and name != os.path.basename(entry):
+                self.__remove(name)
+        self.__evict(os.path.basename(entry))
+        return True
+
+    def drop(self, tunit_filename):
+        for name in self.__get_entries():
+            if name.startswith(self.__get_filename_hash(tunit_filename)):
+                self.__remove(name)
+
+    def get_stats(self):
+        return {
+            'hits'          : self.hits,
+            'misses'        : self.misses,
+            'invalidations' : self.invalidations,
+            'stores'        : self.stores,
+            'evictions'     : self.evictions,
+            'entries'       : len(self.__get_entries()),
+            'size'          : sum(size for size, last_used in self.__get_entries().values()),
+        }
+
+    def __get_filename_hash(self, tunit_filename):
+        return hashlib.sha1(tunit_filename.encode()).hexdigest()
+
+    def __get_entry(self, tunit_filename, build_flags):
+        build_flags_hash = hashlib.sha1('\0'.join(build_flags or []).encode()).hexdigest()
+        return os.path.join(self.directory, self.__get_filename_hash(tunit_filename) + '-' + build_flags_hash)
+
+    def __get_entries(self):
+        # Entry name -> (size of its files, time it has last been used)
+        entries = {}
+        try:
+            filenames = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for filename in filenames:
+            if is_tmp_file(filename):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+            except OSError:
+                continue
+            name = filename.split('.')[0]
+            size, last_used = entries.get(name, (0, 0))
+            entries[name] = (size + stat.st_size, max(last_used, stat.st_mtime))
+        return entries
+
+    def __remove(self, name):
+        for filename in os.listdir(self.directory):
+            if filename.split('.')[0] == name and not is_tmp_file(filename):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+    def __evict(self, keep_name):
+        entries = self.__get_entries()
+        size = sum(entry_size for entry_size, last_used in entries.values())
+        for name in sorted(entries, key=lambda name: entries[name][1]):
+            if size <= self.max_size:
+                break
+            if name != keep_name:
+                logging.debug("Evicting '{0}' ({1} bytes) from the AST cache.".format(name, entries[name][0]))
+                self.__remove(name)
+                size -= entries[name][0]
+                self.evictions += 1
+
+def is_tmp_file(filename):
+    # Entry being written by one of the services (see AstCache.store()), which is not to be counted in nor removed
+    return filename.endswith('.tmp')
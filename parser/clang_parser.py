@@ -1,8 +1,11 @@
 import clang.cindex
+import hashlib
 import logging
 import os
+import statistics
 import sys
 import time
+from collections import deque
 from cxxd.parser.ast_node_identifier import ASTNodeId
 from cxxd.parser.compiler_args import CompilerArgs
 
@@ -75,10 +78,94 @@ clang.cindex.Cursor.get_children = get_children_patched
 
 import glob
 
+def get_contents_hash(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def get_file_state(filename):
+    # Cheap enough to be checked for each of the (hundreds of) files translation unit includes on each request
+    try:
+        stat = os.stat(filename)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def get_tunit_fingerprint(tunit, contents_filename):
+    # Contents of the file being parsed, and the state of each of the files it includes, directly or through the
+    # other headers, as they were when the translation unit was parsed
+    dependencies = set(inclusion.include.name for inclusion in tunit.get_includes())
+    return (get_contents_hash(contents_filename), tuple((filename, get_file_state(filename)) for filename in sorted(dependencies)))
+
+def is_tunit_up_to_date(fingerprint, contents_filename):
+    # Translation unit is out-of-date once the contents of the file (no matter which file they were written into, and
+    # when), or any of the files it includes, change
+    if fingerprint is None:
+        return False
+    contents_hash, dependencies = fingerprint
+    if get_contents_hash(contents_filename) != contents_hash:
+        return False
+    return all(get_file_state(filename) == state for filename, state in dependencies)
+
+def is_read_from_ast_cache(tunit):
+    # See AstCache
+    return getattr(tunit, 'read_from_ast_cache', False)
+
+class ParseTimings():
+    """
+    Keeps the track of how long it takes to re-parse the translation unit of a file in place, and to parse it from
+    scratch, so that the faster of the two can be chosen once the file is modified.
+
+    Re-parse is only faster once the precompiled preamble is built, which happens on the first re-parse of the
+    translation unit, and again each time the includes at the top of the file change, which is why the first re-parse
+    is not taken into account, and why the median of the most recent timings is used rather than their average. Slower
+    of the two is given another chance every once in a while to keep up with the file being edited. Re-parse is not
+    chosen anymore (but every once in a while) after it has failed a couple of times in a row.
+    """
+
+    NUM_OF_SAMPLES = 5
+    RETRY_EVERY = 32
+    MAX_REPARSE_FAILURES = 2
+
+    def __init__(self):
+        self.parse = deque(maxlen=ParseTimings.NUM_OF_SAMPLES)
+        self.reparse = deque(maxlen=ParseTimings.NUM_OF_SAMPLES)
+        self.preamble_built = False
+        self.reparse_failures = 0
+        self.num_of_choices = 0
+
+    def should_reparse(self):
+        self.num_of_choices += 1
+        retry = self.num_of_choices % ParseTimings.RETRY_EVERY == 0
+        if self.reparse_failures >= ParseTimings.MAX_REPARSE_FAILURES:
+            return retry
+        if not self.parse or not self.reparse:
+            return True
+        return (self.get_reparse_duration() <= self.get_parse_duration()) != retry
+
+    def record_parse(self, duration):
+        self.parse.append(duration)
+        self.preamble_built = False
+
+    def record_reparse(self, duration):
+        # First re-parse builds the precompiled preamble so it tells nothing about how long the ones to follow will take
+        self.reparse_failures = 0
+        if self.preamble_built:
+            self.reparse.append(duration)
+        self.preamble_built = True
+
+    def record_reparse_failure(self):
+        self.reparse_failures += 1
+
+    def get_parse_duration(self):
+        return statistics.median(self.parse) if self.parse else None
+
+    def get_reparse_duration(self):
+        return statistics.median(self.reparse) if self.reparse else None
+
 class ClangParser():
     _libclang_configured = False
 
-    def __init__(self, compiler_args_filename, tunit_cache, clang_library_file=None):
+    def __init__(self, compiler_args_filename, tunit_cache, clang_library_file=None, ast_cache=None):
         if clang_library_file is not None:
             if not ClangParser._libclang_configured:
                  clang.cindex.Config.set_library_file(clang_library_file)
@@ -89,6 +176,8 @@ class ClangParser():
         self.index         = clang.cindex.Index.create()
         self.compiler_args = CompilerArgs(compiler_args_filename)
         self.tunit_cache   = tunit_cache
+        self.ast_cache     = ast_cache
+        self.parse_timings = {}
         logging.info("libclang version: '{0}'".format(ClangParser.__get_clang_version()))
 
     @staticmethod
@@ -158,13 +247,22 @@ class ClangParser():
     def get_compiler_args_db(self):
         return self.compiler_args
 
+    def drop_tunit(self, filename):
+        # Cached translation unit is re-parsed anyway once the file, or the headers it includes, are modified but this
+        # releases the memory (and the disk space) it takes right away
+        self.tunit_cache.drop(filename)
+        self.parse_timings.pop(filename, None)
+        if self.ast_cache is not None:
+            self.ast_cache.drop(filename)
+
     def code_complete_cache_warmup(self, filename, line, column, complete_macros=False, complete_lang_constructs=False, opts=None):
         # If TUnit is already cached, then we've already done the cache-warmup ...
         completion_results = None
-        tunit, tunit_build_flags, tunit_timestamp = self.tunit_cache.fetch(filename)
-        if tunit is None:
+        tunit, tunit_build_flags, tunit_fingerprint = self.tunit_cache.fetch(filename)
+        if tunit is None or is_read_from_ast_cache(tunit):
             # But if not, we have to parse it first ...
             build_flags = self.compiler_args.get(filename)
+            t0 = time.time()
             tunit = self.__do_parse(
                 filename,
                 filename,
@@ -173,7 +271,7 @@ class ClangParser():
             )
             if tunit:
                 # Now, trigger the code-complete on given TUnit ...
-                self.tunit_cache.insert(filename, tunit, build_flags, os.path.getmtime(filename))
+                self.tunit_cache.insert(filename, tunit, build_flags, get_tunit_fingerprint(tunit, filename), time.time() - t0)
                 with open(filename) as f:
                     file_content = f.read()
                     unsaved_files = [(filename, file_content),]
@@ -193,8 +291,9 @@ class ClangParser():
 
     def code_complete(self, contents_filename, original_filename, line, column, complete_macros=False, complete_lang_constructs=False, opts=None):
         # Check if TUnit is already cached. If not, we have to parse it first ...
-        tunit, tunit_build_flags, tunit_timestamp = self.tunit_cache.fetch(original_filename)
-        if tunit is None:
+        tunit, tunit_build_flags, tunit_fingerprint = self.tunit_cache.fetch(original_filename)
+        if tunit is None or is_read_from_ast_cache(tunit):
+            # Translation unit read from the AST cache cannot be code-completed so the file has to be parsed once again
             logging.debug("PERF: TUnit cache miss")
             t0 = time.time()
             build_flags = self.compiler_args.get(original_filename)
@@ -204,10 +303,11 @@ class ClangParser():
                 build_flags,
                 opts
             )
-            logging.debug(f"PERF: Parsing took {time.time() - t0:.4f}s")
+            parse_duration = time.time() - t0
+            logging.debug(f"PERF: Parsing took {parse_duration:.4f}s")
 
             if tunit:
-                self.tunit_cache.insert(original_filename, tunit, build_flags, os.path.getmtime(original_filename))
+                self.tunit_cache.insert(original_filename, tunit, build_flags, get_tunit_fingerprint(tunit, contents_filename), parse_duration)
             else:
                 logging.error('Unable to parse TUnit!')
         else:
@@ -237,10 +337,14 @@ class ClangParser():
 
     def parse(self, contents_filename, original_filename, opts=None):
         # Check if we have this tunit already in the cache ...
-        tunit, tunit_build_flags, tunit_timestamp = self.tunit_cache.fetch(original_filename)
+        tunit, tunit_build_flags, tunit_fingerprint = self.tunit_cache.fetch(original_filename)
         if tunit is None:
             logging.debug('TUnit NOT found in cache!')
             build_flags = self.compiler_args.get(original_filename)
+            tunit = self.__load_tunit(contents_filename, original_filename, build_flags, opts)
+            if tunit:
+                return tunit
+            t0 = time.time()
             tunit = self.__do_parse(
                 contents_filename,
                 original_filename,
@@ -248,14 +352,31 @@ class ClangParser():
                 opts
             )
             if tunit:
-                self.tunit_cache.insert(original_filename, tunit, build_flags, os.path.getmtime(original_filename))
+                parse_duration = time.time() - t0
+                fingerprint = get_tunit_fingerprint(tunit, contents_filename)
+                self.parse_timings.setdefault(original_filename, ParseTimings()).record_parse(parse_duration)
+                self.tunit_cache.insert(original_filename, tunit, build_flags, fingerprint, parse_duration)
+                self.__save_tunit(contents_filename, original_filename, build_flags, opts, tunit, fingerprint)
             else:
                 logging.error('Unable to parse TUnit!')
         else:
             logging.debug('TUnit found in cache!')
-            curr_timestamp = os.path.getmtime(contents_filename)
-            if tunit_timestamp != curr_timestamp:      # We still have to make sure that cached tunit is not out-of-date.
-                logging.debug('But it is too old ... reparsing')
+            if not is_tunit_up_to_date(tunit_fingerprint, contents_filename):      # We still have to make sure that cached tunit is not out-of-date.
+                timings = self.parse_timings.setdefault(original_filename, ParseTimings())
+                # Translation unit read from the AST cache cannot be re-parsed
+                if not is_read_from_ast_cache(tunit) and timings.should_reparse():
+                    logging.debug('But it is too old ... reparsing')
+                    t0 = time.time()
+                    if self.__do_reparse(tunit, contents_filename):
+                        reparse_duration = time.time() - t0
+                        timings.record_reparse(reparse_duration)
+                        logging.debug('Reparsing took {0:.3f}s'.format(reparse_duration))
+                        # Evicting the translation unit still costs as much as parsing it from scratch
+                        self.tunit_cache.update(original_filename, tunit, tunit_build_flags, get_tunit_fingerprint(tunit, contents_filename), timings.get_parse_duration() or reparse_duration)
+                        return tunit
+                    timings.record_reparse_failure()
+                logging.debug('But it is too old ... parsing it from scratch')
+                t0 = time.time()
                 tunit = self.__do_parse(
                     contents_filename,
                     original_filename,
@@ -263,12 +384,14 @@ class ClangParser():
                     opts
                 )
                 if tunit:
-                    self.tunit_cache.update(original_filename, tunit, tunit_build_flags, curr_timestamp)
-                    # TODO Reparsing seems to be more unstable (e.g. crashes) and sometimes even slower (?)
-                    # with open(contents_filename) as f:
-                    #    tunit.reparse([(original_filename, f.read()),])
-                    #    self.tunit_cache.update(original_filename, tunit, curr_timestamp)
+                    parse_duration = time.time() - t0
+                    fingerprint = get_tunit_fingerprint(tunit, contents_filename)
+                    timings.record_parse(parse_duration)
+                    self.tunit_cache.update(original_filename, tunit, tunit_build_flags, fingerprint, parse_duration)
+                    self.__save_tunit(contents_filename, original_filename, tunit_build_flags, opts, tunit, fingerprint)
                 else:
+                    # Translation unit which has failed to re-parse cannot be used anymore
+                    self.tunit_cache.drop(original_filename)
                     logging.error('Unable to parse TUnit!')
 
         return tunit
@@ -591,6 +714,54 @@ class ClangParser():
             logging.error(f"Options: {opts}")
             logging.error(f"Exception: {e}")
 
+    def __load_tunit(self, contents_filename, original_filename, build_flags, opts):
+        if self.ast_cache is None or opts is not None:
+            return None
+        t0 = time.time()
+        tunit, fingerprint = self.ast_cache.load(self.index, original_filename, build_flags, contents_filename)
+        if tunit:
+            logging.debug('TUnit read from the AST cache in {0:.3f}s'.format(time.time() - t0))
+            # Evicting the translation unit costs only as much as reading it once again
+            self.tunit_cache.insert(original_filename, tunit, build_flags, fingerprint, time.time() - t0)
+        return tunit
+
+    def __save_tunit(self, contents_filename, original_filename, build_flags, opts, tunit, fingerprint):
+        # Translation units parsed from the temporary files (i.e. contents of the modified buffers) cannot be read back
+        # once these are gone, and the diagnostics are not saved along with the translation unit, hence only the ones
+        # parsed from the file as it is on the disk, without any diagnostics, are saved
+        if self.ast_cache is None or opts is not None or contents_filename != original_filename:
+            return
+        if len(tunit.diagnostics) == 0:
+            t0 = time.time()
+            if self.ast_cache.store(original_filename, build_flags, tunit, fingerprint):
+                logging.debug('TUnit saved to the AST cache in {0:.3f}s'.format(time.time() - t0))
+
+    def __do_reparse(self, tunit, contents_filename):
+        # Translation unit is re-parsed in place, with the contents of the file as they are now, by reusing the
+        # precompiled preamble. clang_reparseTranslationUnit() is called directly since TranslationUnit.reparse()
+        # discards the error code, and with it the news that the translation unit is not usable anymore.
+        try:
+            with open(contents_filename, 'rb') as f:
+                contents = f.read()
+            unsaved_files = (clang.cindex._CXUnsavedFile * 1)()
+            unsaved_files[0].name = tunit.spelling.encode()
+            unsaved_files[0].contents = contents
+            unsaved_files[0].length = len(contents)
+            error = clang.cindex.conf.lib.clang_reparseTranslationUnit(tunit, 1, unsaved_files, 0)
+        except Exception:
+            logging.error(sys.exc_info())
+            return False
+        if error != 0:
+            # See CXErrorCode (e.g. 2 stands for CXError_Crashed)
+            logging.warning("Failed to reparse '{0}' (error code {1}). Falling back to parsing it from scratch.".format(contents_filename, error))
+            return False
+        # Fatal errors (e.g. header not found) are left for the parse from scratch to deal with since it is run with the
+        # include path of the original file, which the temporary one (i.e. contents of the buffer) may be missing
+        if any(diag.severity == clang.cindex.Diagnostic.Fatal for diag in tunit.diagnostics):
+            logging.info("Reparsing '{0}' resulted with fatal errors. Falling back to parsing it from scratch.".format(contents_filename))
+            return False
+        return True
+
     @staticmethod
     def __extract_dependent_type_kind(cursor):
         # For cursors whose CursorKind is MEMBER_REF_EXPR and whose TypeKind is DEPENDENT we don't get much information
@@ -292,7 +292,8 @@ def get_system_includes():
     clang_includes = extract_system_includes_from('clang++')
     gcc_normalized_includes = [os.path.normpath(include) for include in gcc_includes]
     clang_normalized_includes = [os.path.normpath(include) for include in clang_includes]
-    merged_includes = set(gcc_normalized_includes + clang_normalized_includes)
+    # Keep the search order as reported by the compiler (and stable across the processes), just drop the duplicates
+    merged_includes = dict.fromkeys(gcc_normalized_includes + clang_normalized_includes)
     return list(merged_includes)
 
 def extract_system_includes_from(compiler_name, pattern = ["\\n#include <...> search starts here:\\n", "\\nEnd of search list.\\n"]):
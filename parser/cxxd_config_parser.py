@@ -15,6 +15,16 @@ class CxxdConfigParser():
         self.configuration_selected = None
         self.indexer_blacklisted_directories = []
         self.indexer_extra_file_extensions = []
+        self.indexer_backend = 'cursor-visitor'
+        self.indexer_stream_results = False
+        self.indexer_watch_files = False
+        self.indexer_shards = 0
+        self.indexer_file_timeout = 120.0
+        self.indexer_max_workers = 0
+        self.indexer_min_free_memory = 1024
+        self.indexer_max_load = 1.0
+        self.indexer_nice = 10
+        self.indexer_pause_on_interactive = True
         self.clang_tidy_args = []
         self.clang_tidy_binary_path = None
         self.clang_format_args = []
@@ -29,6 +39,9 @@ class CxxdConfigParser():
         self.project_builder_targets = []
         self.project_root_directory = project_root_directory
         self.clang_library_file = None
+        self.clang_tunit_cache_size = 2048
+        self.clang_parse_host = False
+        self.clang_ast_cache_size = 0
         if os.path.exists(cxxd_config_filename):
             with open(cxxd_config_filename) as f:
                 config = json.load(f)
@@ -38,11 +51,24 @@ class CxxdConfigParser():
                     config, os.path.dirname(os.path.realpath(cxxd_config_filename))
                 )
                 self.indexer_extra_file_extensions = self._extract_indexer_extra_file_extensions(config)
+                self.indexer_backend = self._extract_indexer_backend(config)
+                self.indexer_stream_results = self._extract_indexer_stream_results(config)
+                self.indexer_watch_files = self._extract_indexer_watch_files(config)
+                self.indexer_shards = self._extract_indexer_shards(config)
+                self.indexer_file_timeout = self._extract_indexer_file_timeout(config)
+                self.indexer_max_workers = self._extract_indexer_max_workers(config)
+                self.indexer_min_free_memory = self._extract_indexer_min_free_memory(config)
+                self.indexer_max_load = self._extract_indexer_max_load(config)
+                self.indexer_nice = self._extract_indexer_nice(config)
+                self.indexer_pause_on_interactive = self._extract_indexer_pause_on_interactive(config)
                 self.clang_tidy_args = self._extract_clang_tidy_args(config)
                 self.clang_tidy_binary_path = self._extract_clang_tidy_binary_path(config)
                 self.clang_format_args = self._extract_clang_format_args(config)
                 self.clang_format_binary_path = self._extract_clang_format_binary_path(config)
                 self.clang_library_file = self._extract_clang_library_file(config)
+                self.clang_tunit_cache_size = self._extract_clang_tunit_cache_size(config)
+                self.clang_parse_host = self._extract_clang_parse_host(config)
+                self.clang_ast_cache_size = self._extract_clang_ast_cache_size(config)
                 self.disassembly_intermix_with_src_code = self._extract_disassembly_intermix_with_src_code(config)
                 self.disassembly_visualize_jumps = self._extract_disassembly_visualize_jumps(config)
                 self.disassembly_syntax = self._extract_disassembly_syntax(config)
@@ -63,6 +89,16 @@ class CxxdConfigParser():
         logging.info('Configuration: Selected {0}'.format(self.configuration_selected))
         logging.info('Indexer: Blacklisted directories {0}'.format(self.indexer_blacklisted_directories))
         logging.info('Indexer: Extra file extensions {0}'.format(self.indexer_extra_file_extensions))
+        logging.info('Indexer: Backend {0}'.format(self.indexer_backend))
+        logging.info('Indexer: Stream results {0}'.format(self.indexer_stream_results))
+        logging.info('Indexer: Watch files {0}'.format(self.indexer_watch_files))
+        logging.info('Indexer: Shards {0}'.format(self.indexer_shards))
+        logging.info('Indexer: File timeout {0}s'.format(self.indexer_file_timeout))
+        logging.info('Indexer: Max workers {0}'.format(self.indexer_max_workers))
+        logging.info('Indexer: Min free memory {0} MB'.format(self.indexer_min_free_memory))
+        logging.info('Indexer: Max load {0}'.format(self.indexer_max_load))
+        logging.info('Indexer: Nice {0}'.format(self.indexer_nice))
+        logging.info('Indexer: Pause on interactive {0}'.format(self.indexer_pause_on_interactive))
         logging.info('Clang-tidy args {0}'.format(self.clang_tidy_args))
         logging.info('Clang-tidy binary path {0}'.format(self.clang_tidy_binary_path))
         logging.info('Clang-format args {0}'.format(self.clang_format_args))
@@ -74,6 +110,9 @@ class CxxdConfigParser():
         logging.info('Disassembly targets filter {0}'.format(self.disassembly_targets_filter))
         logging.info('nm binary path {0}'.format(self.nm_binary_path))
         logging.info('Clang library-file {0}'.format(self.clang_library_file))
+        logging.info('Clang translation unit cache size {0} MB'.format(self.clang_tunit_cache_size))
+        logging.info('Clang parse host {0}'.format(self.clang_parse_host))
+        logging.info('Clang AST cache size {0} MB'.format(self.clang_ast_cache_size))
         logging.info('Project-builder args {0}'.format(self.project_builder_args))
         logging.info('Project-builder targets {0}'.format(self.project_builder_targets))
 
@@ -89,6 +128,36 @@ class CxxdConfigParser():
     def get_extra_file_extensions(self):
         return self.indexer_extra_file_extensions
 
+    def get_indexer_backend(self):
+        return self.indexer_backend
+
+    def get_indexer_stream_results(self):
+        return self.indexer_stream_results
+
+    def get_indexer_watch_files(self):
+        return self.indexer_watch_files
+
+    def get_indexer_shards(self):
+        return self.indexer_shards
+
+    def get_indexer_file_timeout(self):
+        return self.indexer_file_timeout
+
+    def get_indexer_max_workers(self):
+        return self.indexer_max_workers
+
+    def get_indexer_min_free_memory(self):
+        return self.indexer_min_free_memory
+
+    def get_indexer_max_load(self):
+        return self.indexer_max_load
+
+    def get_indexer_nice(self):
+        return self.indexer_nice
+
+    def get_indexer_pause_on_interactive(self):
+        return self.indexer_pause_on_interactive
+
     def get_clang_tidy_args(self):
         return self.clang_tidy_args
 
@@ -104,6 +173,15 @@ class CxxdConfigParser():
     def get_clang_library_file(self):
         return self.clang_library_file
 
+    def get_clang_tunit_cache_size(self):
+        return self.clang_tunit_cache_size
+
+    def get_clang_parse_host(self):
+        return self.clang_parse_host
+
+    def get_clang_ast_cache_size(self):
+        return self.clang_ast_cache_size
+
     def get_disassembly_intermix_with_src_code(self):
         return self.disassembly_intermix_with_src_code
 
@@ -262,6 +340,88 @@ class CxxdConfigParser():
                 extensions = list(config['indexer']['extra-file-extensions'])
         return extensions
 
+    def _extract_indexer_backend(self, config):
+        backend = 'cursor-visitor'
+        if 'indexer' in config:
+            if 'backend' in config['indexer']:
+                if config['indexer']['backend'] in ['cursor-visitor', 'index-action']:
+                    backend = config['indexer']['backend']
+                else:
+                    logging.error('Invalid indexer backend. Must be one of {cursor-visitor | index-action}. Falling back to cursor-visitor.')
+        return backend
+
+    def _extract_indexer_stream_results(self, config):
+        if 'indexer' in config:
+            if 'stream-results' in config['indexer']:
+                return bool(config['indexer']['stream-results'])
+        return False
+
+    def _extract_indexer_watch_files(self, config):
+        if 'indexer' in config:
+            if 'watch' in config['indexer']:
+                return bool(config['indexer']['watch'])
+        return False
+
+    def _extract_indexer_shards(self, config):
+        if 'indexer' in config:
+            if 'shards' in config['indexer']:
+                shards = config['indexer']['shards']
+                if isinstance(shards, int) and not isinstance(shards, bool) and shards >= 0:
+                    return shards
+                logging.error('Invalid number of indexer shards. Must be a non-negative integer. Falling back to 0 (no sharding).')
+        return 0
+
+    def _extract_indexer_file_timeout(self, config):
+        if 'indexer' in config:
+            if 'file-timeout' in config['indexer']:
+                timeout = config['indexer']['file-timeout']
+                if isinstance(timeout, (int, float)) and not isinstance(timeout, bool) and timeout > 0:
+                    return float(timeout)
+                logging.error('Invalid indexer file timeout. Must be a positive number of seconds. Falling back to 120.')
+        return 120.0
+
+    def _extract_indexer_max_workers(self, config):
+        if 'indexer' in config:
+            if 'max-workers' in config['indexer']:
+                max_workers = config['indexer']['max-workers']
+                if isinstance(max_workers, int) and not isinstance(max_workers, bool) and max_workers >= 0:
+                    return max_workers
+                logging.error('Invalid max number of indexer workers. Must be a non-negative integer. Falling back to 0 (number of cores).')
+        return 0
+
+    def _extract_indexer_min_free_memory(self, config):
+        if 'indexer' in config:
+            if 'min-free-memory' in config['indexer']:
+                min_free_memory = config['indexer']['min-free-memory']
+                if isinstance(min_free_memory, int) and not isinstance(min_free_memory, bool) and min_free_memory >= 0:
+                    return min_free_memory
+                logging.error('Invalid indexer min free memory. Must be a non-negative number of megabytes. Falling back to 1024.')
+        return 1024
+
+    def _extract_indexer_max_load(self, config):
+        if 'indexer' in config:
+            if 'max-load' in config['indexer']:
+                max_load = config['indexer']['max-load']
+                if isinstance(max_load, (int, float)) and not isinstance(max_load, bool) and max_load > 0:
+                    return float(max_load)
+                logging.error('Invalid indexer max load. Must be a positive number (of runnable tasks per core). Falling back to 1.0.')
+        return 1.0
+
+    def _extract_indexer_nice(self, config):
+        if 'indexer' in config:
+            if 'nice' in config['indexer']:
+                nice = config['indexer']['nice']
+                if isinstance(nice, int) and not isinstance(nice, bool) and 0 <= nice <= 19:
+                    return nice
+                logging.error('Invalid indexer nice value. Must be an integer in between 0 and 19. Falling back to 10.')
+        return 10
+
+    def _extract_indexer_pause_on_interactive(self, config):
+        if 'indexer' in config:
+            if 'pause-on-interactive' in config['indexer']:
+                return bool(config['indexer']['pause-on-interactive'])
+        return True
+
     def _extract_clang_tidy_args(self, config):
         args = []
         if 'clang-tidy' in config:
@@ -345,6 +505,30 @@ class CxxdConfigParser():
                 return config['clang']['library-file']
         return None
 
+    def _extract_clang_tunit_cache_size(self, config):
+        if 'clang' in config:
+            if 'tunit-cache-size' in config['clang']:
+                size = config['clang']['tunit-cache-size']
+                if isinstance(size, int) and not isinstance(size, bool) and size >= 0:
+                    return size
+                logging.error('Invalid translation unit cache size. Must be a non-negative number of megabytes. Falling back to 2048.')
+        return 2048
+
+    def _extract_clang_parse_host(self, config):
+        if 'clang' in config:
+            if 'parse-host' in config['clang']:
+                return bool(config['clang']['parse-host'])
+        return False
+
+    def _extract_clang_ast_cache_size(self, config):
+        if 'clang' in config:
+            if 'ast-cache-size' in config['clang']:
+                size = config['clang']['ast-cache-size']
+                if isinstance(size, int) and not isinstance(size, bool) and size >= 0:
+                    return size
+                logging.error('Invalid AST cache size. Must be a non-negative number of megabytes. Falling back to 0 (disabled).')
+        return 0
+
     def _extract_project_builder_targets(self, config):
         targets = {}
         if 'project-builder' in config:
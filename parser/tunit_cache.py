@@ -1,3 +1,6 @@
+import clang.cindex
+import ctypes
+import logging
 import os
 from collections import OrderedDict
 
@@ -66,6 +69,7 @@ class FifoCache():
     def __init__(self, max_capacity):
         self.max_capacity = max_capacity
         self.store = OrderedDict()
+        self.evictions = 0
 
     def iterkeys(self):
         return iter(self.store.keys())
@@ -85,6 +89,7 @@ class FifoCache():
         else:
             if len(self.store) == self.max_capacity:
                 self.store.popitem(last=False) # last=False --> FIFO, last=True --> LIFO
+                self.evictions += 1
         self.store[key] = value
 
     def __delitem__(self, key):
@@ -96,21 +101,112 @@ class FifoCache():
     def __len__(self):
         return len(self.store)
 
+class CostAwareCache():
+    """
+    Cache bounded by the total size of its entries, rather than by their number, which evicts the entries by the
+    GreedyDual-Size-Frequency policy: each entry is given the priority of
+
+        clock + (number of accesses * cost of re-creating the entry) / size of the entry
+
+    and the one with the lowest priority is evicted first. Clock is advanced to the priority of each entry evicted so
+    the entries which have not been accessed for a while age, no matter how often they were accessed before.
+
+    Size and cost of an entry are given by weigh(value), which is called again on each access since the entries (e.g.
+    translation units) may grow while in use. Entry just inserted is never evicted, even if it alone exceeds the size.
+    """
+
+    def __init__(self, max_size, weigh=None):
+        self.max_size = max_size
+        self.weigh = weigh if weigh is not None else weigh_tunit
+        self.store = {}    # key -> [value, size, cost, frequency, priority]
+        self.size = 0
+        self.clock = 0.0
+        self.evictions = 0
+
+    def iterkeys(self):
+        return iter(self.store.keys())
+
+    def itervalues(self):
+        return (entry[0] for entry in self.store.values())
+
+    def iteritems(self):
+        return ((key, entry[0]) for key, entry in self.store.items())
+
+    def __getitem__(self, key):
+        entry = self.store[key]
+        size, cost = self.weigh(entry[0])
+        self.size += max(size, 1) - entry[1]
+        entry[1], entry[2], entry[3] = max(size, 1), cost, entry[3] + 1
+        entry[4] = self.clock + entry[3] * entry[2] / entry[1]
+        self.__evict(key)
+        return entry[0]
+
+    def __setitem__(self, key, value):
+        frequency = 0
+        if key in self.store:
+            frequency = self.store[key][3]
+            del self[key]
+        size, cost = self.weigh(value)
+        size = max(size, 1)
+        self.store[key] = [value, size, cost, frequency + 1, self.clock + (frequency + 1) * cost / size]
+        self.size += size
+        self.__evict(key)
+
+    def __delitem__(self, key):
+        self.size -= self.store.pop(key)[1]
+
+    def __contains__(self, key):
+        return key in self.store
+
+    def __iter__(self):
+        return self.store.__iter__()
+
+    def __len__(self):
+        return len(self.store)
+
+    def __evict(self, keep_key):
+        while self.size > self.max_size and len(self.store) > 1:
+            key = min((key for key in self.store if key != keep_key), key=lambda key: self.store[key][4])
+            self.clock = self.store[key][4]
+            logging.debug("Evicting '{0}' ({1} bytes) from the cache.".format(key, self.store[key][1]))
+            del self[key]
+            self.evictions += 1
+
 class TranslationUnitCache():
     def __init__(self, cache_impl):
         self.tunit = cache_impl
+        self.hits = 0
+        self.misses = 0
 
     def fetch(self, tunit_filename):
         if tunit_filename in self.tunit:
-            return self.tunit[tunit_filename]
+            self.hits += 1
+            tunit, build_flags, fingerprint, parse_duration = self.tunit[tunit_filename]
+            return (tunit, build_flags, fingerprint,)
+        self.misses += 1
         return (None, None, None,)
 
-    def insert(self, tunit_filename, tunit, build_flags, mtime):
-        self.tunit[tunit_filename] = (tunit, build_flags, mtime,)
-
-    def update(self, tunit_filename, tunit, build_flags, mtime):
-        del self.tunit[tunit_filename]
-        self.insert(tunit_filename, tunit, build_flags, mtime)
+    def insert(self, tunit_filename, tunit, build_flags, fingerprint, parse_duration=0.0):
+        # Fingerprint is what tells whether the translation unit is up-to-date, and the time it took to parse it is
+        # what it costs to evict it
+        self.tunit[tunit_filename] = (tunit, build_flags, fingerprint, parse_duration,)
+
+    def update(self, tunit_filename, tunit, build_flags, fingerprint, parse_duration=0.0):
+        # Re-parsed translation unit keeps the number of accesses it has been given so far
+        self.insert(tunit_filename, tunit, build_flags, fingerprint, parse_duration)
+
+    def get_stats(self):
+        return {
+            'hits'      : self.hits,
+            'misses'    : self.misses,
+            'evictions' : getattr(self.tunit, 'evictions', 0),
+            'entries'   : len(self.tunit),
+            'size'      : getattr(self.tunit, 'size', None),
+        }
+
+    def drop(self, tunit_filename):
+        if tunit_filename in self.tunit:
+            del self.tunit[tunit_filename]
 
     def iterkeys(self):
         return iter(self.tunit.keys())
@@ -133,3 +229,43 @@ class TranslationUnitCache():
     def __len__(self):
         return len(self.tunit)
 
+class CXTUResourceUsageEntry(ctypes.Structure):
+    _fields_ = [('kind', ctypes.c_int), ('amount', ctypes.c_ulong)]
+
+class CXTUResourceUsage(ctypes.Structure):
+    _fields_ = [('data', ctypes.c_void_p), ('numEntries', ctypes.c_uint), ('entries', ctypes.POINTER(CXTUResourceUsageEntry))]
+
+# Memory-mapped buffers (see CXTUResourceUsageKind) are backed by the files, and given back by the kernel as needed
+CX_TU_RESOURCE_USAGE_MMAP_KINDS = (8, 10)
+
+# Python bindings do not come with the prototypes of the functions below. They are registered on the first use, once
+# the libclang has been loaded, instead of on each of the calls made whenever the translation unit is (re-)cached.
+_tunit_resource_usage_registered = False
+
+def _register_tunit_resource_usage(libclang):
+    global _tunit_resource_usage_registered
+    libclang.clang_getCXTUResourceUsage.argtypes = [clang.cindex.TranslationUnit]
+    libclang.clang_getCXTUResourceUsage.restype = CXTUResourceUsage
+    libclang.clang_disposeCXTUResourceUsage.argtypes = [CXTUResourceUsage]
+    libclang.clang_disposeCXTUResourceUsage.restype = None
+    _tunit_resource_usage_registered = True
+
+def get_tunit_memory_usage(tunit):
+    # Memory taken by the translation unit (AST, preprocessor, source buffers, etc.), as accounted for by libclang
+    try:
+        libclang = clang.cindex.conf.lib
+        if not _tunit_resource_usage_registered:
+            _register_tunit_resource_usage(libclang)
+        usage = libclang.clang_getCXTUResourceUsage(tunit)
+        memory = sum(
+            usage.entries[i].amount for i in range(usage.numEntries) if usage.entries[i].kind not in CX_TU_RESOURCE_USAGE_MMAP_KINDS
+        )
+        libclang.clang_disposeCXTUResourceUsage(usage)
+        return memory
+    except (AttributeError, ctypes.ArgumentError):
+        return 0
+
+def weigh_tunit(value):
+    # Translation units are weighed by the memory they take, and by the time it took to parse them
+    tunit, build_flags, fingerprint, parse_duration = value
+    return get_tunit_memory_usage(tunit), parse_duration
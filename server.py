@@ -2,13 +2,18 @@ import logging
 import os
 import sys
 from multiprocessing import Process
+from . parser.ast_cache import AstCache
+from . parser.clang_parser import ClangParser
 from . parser.cxxd_config_parser import CxxdConfigParser
+from . parser.tunit_cache import CostAwareCache, TranslationUnitCache
+from . service import ServiceHost
 from . services.clang_format_service import ClangFormat
 from . services.clang_tidy_service import ClangTidy
 from . services.disassembly_service import Disassembly
 from . services.project_builder_service import ProjectBuilder
 from . services.code_completion_service import CodeCompletion
 from . services.source_code_model_service import SourceCodeModel
+from . services.source_code_model.indexer.resource_governor import new_interactive_request_counter
 
 class ServiceId():
     SOURCE_CODE_MODEL     = 0x0
@@ -75,6 +80,45 @@ class Server():
                 self.service.send_set_log_level(payload)
             # No warning here as it's a broadcast
 
+    class ServiceHostHandler(ServiceHandler):
+        # Process of the service host is started along with the first of its services, and stopped along with the last one
+        def __init__(self, service_host):
+            Server.ServiceHandler.__init__(self, service_host)
+            self.num_of_listeners = 0
+
+        def attach(self):
+            if self.num_of_listeners == 0:
+                self.start_listening()
+            self.num_of_listeners += 1
+
+        def detach(self):
+            self.num_of_listeners -= 1
+            if self.num_of_listeners == 0:
+                self.stop_listening()
+
+    class HostedServiceHandler(ServiceHandler):
+        def __init__(self, service, host_handler):
+            Server.ServiceHandler.__init__(self, service)
+            self.host_handler = host_handler
+            self.listening = False
+
+        def start_listening(self):
+            if self.is_started():
+                logging.warning("Service process already started!")
+            else:
+                self.host_handler.attach()
+                self.listening = True
+
+        def stop_listening(self):
+            if self.is_started():
+                self.listening = False
+                self.host_handler.detach()
+            else:
+                logging.warning("Service process already stopped!")
+
+        def is_started(self):
+            return self.listening
+
     def __init__(self, handle, project_root_directory, target, source_code_model_plugin, project_builder_plugin, clang_format_plugin, clang_tidy_plugin, code_completion_plugin, disassembly_plugin):
         self.handle = handle
         self.cxxd_config_filename = '.cxxd_config.json'
@@ -140,14 +184,33 @@ class Server():
                     logging.warning(f"Auto-configure needed but no 'configure' command defined for target '{target}'.")
 
         if self.configuration:
+            parser = None
+            if self.cxxd_config_parser.get_clang_parse_host():
+                # Services which parse the source code share a single parser, and hence the translation units
+                parser = ClangParser(
+                    self.configuration,
+                    TranslationUnitCache(CostAwareCache(self.cxxd_config_parser.get_clang_tunit_cache_size() * 1024 * 1024)),
+                    self.cxxd_config_parser.get_clang_library_file(),
+                    AstCache(project_root_directory, self.cxxd_config_parser.get_clang_ast_cache_size() * 1024 * 1024) if self.cxxd_config_parser.get_clang_ast_cache_size() else None
+                )
+            # Indexer stops handing the work over to its workers while code-completion, run in its own process or not, is in progress
+            interactive_requests = new_interactive_request_counter()
             self.service = {
-                ServiceId.SOURCE_CODE_MODEL : self.ServiceHandler(SourceCodeModel(project_root_directory, self.cxxd_config_parser, target, source_code_model_plugin)),
+                ServiceId.SOURCE_CODE_MODEL : self.ServiceHandler(SourceCodeModel(project_root_directory, self.cxxd_config_parser, target, source_code_model_plugin, parser, interactive_requests)),
                 ServiceId.PROJECT_BUILDER   : self.ServiceHandler(ProjectBuilder(project_root_directory, self.cxxd_config_parser, project_builder_plugin)),
                 ServiceId.CLANG_FORMAT      : self.ServiceHandler(ClangFormat(project_root_directory, self.cxxd_config_parser, clang_format_plugin)),
                 ServiceId.CLANG_TIDY        : self.ServiceHandler(ClangTidy(project_root_directory, self.cxxd_config_parser, target, clang_tidy_plugin)),
-                ServiceId.DISASSEMBLY       : self.ServiceHandler(Disassembly(project_root_directory, self.cxxd_config_parser, target, disassembly_plugin)),
-                ServiceId.CODE_COMPLETION   : self.ServiceHandler(CodeCompletion(project_root_directory, self.cxxd_config_parser, target, code_completion_plugin)),
+                ServiceId.DISASSEMBLY       : self.ServiceHandler(Disassembly(project_root_directory, self.cxxd_config_parser, target, disassembly_plugin, parser)),
+                ServiceId.CODE_COMPLETION   : self.ServiceHandler(CodeCompletion(project_root_directory, self.cxxd_config_parser, target, code_completion_plugin, parser, interactive_requests)),
             }
+            if parser is not None:
+                # Translation units cannot be shared across the processes so the services are run within the same one.
+                # Code-completion is what the user is typing on so it is served ahead of the rest waiting in the queue.
+                host_handler = self.ServiceHostHandler(ServiceHost())
+                for serviceId in [ServiceId.SOURCE_CODE_MODEL, ServiceId.CODE_COMPLETION, ServiceId.DISASSEMBLY]:
+                    host_handler.service.host(serviceId, self.service[serviceId].service, serviceId == ServiceId.CODE_COMPLETION)
+                    self.service[serviceId] = self.HostedServiceHandler(self.service[serviceId].service, host_handler)
+                logging.info("Parse host: {0}".format(host_handler.service.service))
             logging.info("Registered services: {0}".format(self.service))
             logging.info("Actions: {0}".format(self.action))
         else:
@@ -1,9 +1,14 @@
 import logging
+import queue
 import sys
 from multiprocessing import Queue
 
 # TODO Service impl. is where bits from ServiceHandler impl. should really go
 
+# Request handlers which start a long-running background job return this in place of their result.
+# Service plugin is then not invoked on return but by the job itself, once it has completed.
+REQUEST_DEFERRED = object()
+
 class Service():
     def __init__(self, service_plugin):
         self.queue = Queue()
@@ -52,7 +57,8 @@ class Service():
         if self.started_up:
             logging.info("Service request ... Payload = {0}".format(payload))
             success, args = self.__call__(payload)
-            self.service_plugin.__call__(success, payload, args)
+            if args is not REQUEST_DEFERRED:
+                self.service_plugin.__call__(success, payload, args)
         else:
             logging.warning('Service must be started before issuing any other kind of requests!')
         return self.started_up
@@ -71,7 +77,9 @@ class Service():
         return False, None
 
     def process_request(self):
-        payload = self.queue.get()
+        return self.dispatch_request(self.queue.get())
+
+    def dispatch_request(self, payload):
         try:
             still_running = self.action.get(payload[0], self.__unknown_action)(payload[1])
         except:
@@ -94,6 +102,57 @@ class Service():
     def is_started_up(self):
         return self.started_up
 
+class HostedQueue():
+    # Queue of the service run by the service host. Requests are tagged with the id of the service they are sent to.
+    def __init__(self, queue, service_id):
+        self.queue = queue
+        self.service_id = service_id
+
+    def put(self, payload):
+        self.queue.put([self.service_id, payload])
+
+class ServiceHost():
+    """
+    Runs more than one service within a single process so that they can share the resources which cannot be shared
+    across the processes, e.g. the translation units which are parsed once and then used by each of them.
+
+    Requests are served one at a time, in the order they were sent, except for the ones sent to the priority services
+    (e.g. code-completion) which are served ahead of the rest still waiting. Request which is being served is never
+    interrupted though. Host is shut down once none of its services is started up anymore.
+    """
+
+    def __init__(self):
+        self.queue = Queue()
+        self.service = {}
+        self.priority_service_ids = set()
+        self.pending_requests = []
+
+    def host(self, service_id, service, priority=False):
+        service.queue = HostedQueue(self.queue, service_id)
+        self.service[service_id] = service
+        if priority:
+            self.priority_service_ids.add(service_id)
+
+    def process_request(self):
+        service_id, payload = self.__next_request()
+        self.service[service_id].dispatch_request(payload)
+        return any(service.is_started_up() for service in self.service.values())
+
+    def __next_request(self):
+        # Requests sent while the previous one was being served are all taken off the queue so that the ones sent
+        # to the priority services can jump ahead. Requests sent to the same service are kept in order.
+        if not self.pending_requests:
+            self.pending_requests.append(self.queue.get())
+        while True:
+            try:
+                self.pending_requests.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        for index, (service_id, payload) in enumerate(self.pending_requests):
+            if service_id in self.priority_service_ids:
+                return self.pending_requests.pop(index)
+        return self.pending_requests.pop(0)
+
 def service_listener(service):
     keep_listening = True
     while keep_listening:
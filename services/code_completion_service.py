@@ -3,27 +3,33 @@ import logging
 import cxxd.parser.clang_parser
 import cxxd.parser.tunit_cache
 import cxxd.service
+from cxxd.services.source_code_model.indexer.resource_governor import InteractiveRequest
 from cxxd.services.code_completion.code_completion import CodeCompletion as CodeCompletionImpl
 
 class CodeCompletion(cxxd.service.Service):
-    def __init__(self, project_root_directory, cxxd_config_parser, target, service_plugin):
+    def __init__(self, project_root_directory, cxxd_config_parser, target, service_plugin, parser=None, interactive_requests=None):
         cxxd.service.Service.__init__(self, service_plugin)
         self.configuration = cxxd_config_parser.get_configuration_for_target(target)
         self.cxxd_config_parser = cxxd_config_parser
+        self.parser = parser
+        self.interactive_requests = interactive_requests # Shared with the indexer, which gives way while completing
 
     def startup_callback(self, args):
-        self.parser = cxxd.parser.clang_parser.ClangParser(
-            self.configuration,
-            cxxd.parser.tunit_cache.TranslationUnitCache(cxxd.parser.tunit_cache.FifoCache(20)),
-            self.cxxd_config_parser.get_clang_library_file(),
-        )
+        if self.parser is None:
+            self.parser = cxxd.parser.clang_parser.ClangParser(
+                self.configuration,
+                cxxd.parser.tunit_cache.TranslationUnitCache(cxxd.parser.tunit_cache.CostAwareCache(self.cxxd_config_parser.get_clang_tunit_cache_size() * 1024 * 1024)),
+                self.cxxd_config_parser.get_clang_library_file(),
+            )
         self.code_completion = CodeCompletionImpl(self.parser)
         logging.info('Code-completion service started.')
         return True, []
 
     def shutdown_callback(self, args):
+        logging.info('Translation unit cache: {0}'.format(self.parser.tunit_cache.get_stats()))
         logging.info('Code-completion service stopped.')
         return True, []
 
     def __call__(self, args):
-        return self.code_completion(args)
+        with InteractiveRequest(self.interactive_requests):
+            return self.code_completion(args)
@@ -8,6 +8,7 @@ import subprocess
 import tempfile
 import time
 
+import cxxd.parser.ast_cache
 import cxxd.parser.clang_parser
 import cxxd.parser.tunit_cache
 import cxxd.service
@@ -72,14 +73,15 @@ class NmSymbol:
         return NmSymbol(nm[0], nm[1], nm[2], nm[3], location[0], location[1])
 
 class Disassembly(cxxd.service.Service):
-    def __init__(self, project_root_directory, cxxd_config_parser, target, service_plugin):
+    def __init__(self, project_root_directory, cxxd_config_parser, target, service_plugin, parser=None):
         cxxd.service.Service.__init__(self, service_plugin)
         self.project_root_directory = project_root_directory
         self.cxxd_config_parser = cxxd_config_parser
-        self.parser = cxxd.parser.clang_parser.ClangParser(
+        self.parser = parser if parser is not None else cxxd.parser.clang_parser.ClangParser(
             cxxd_config_parser.get_configuration_for_target(target),
-            cxxd.parser.tunit_cache.TranslationUnitCache(cxxd.parser.tunit_cache.FifoCache(20)),
+            cxxd.parser.tunit_cache.TranslationUnitCache(cxxd.parser.tunit_cache.CostAwareCache(cxxd_config_parser.get_clang_tunit_cache_size() * 1024 * 1024)),
             cxxd_config_parser.get_clang_library_file(),
+            cxxd.parser.ast_cache.AstCache(project_root_directory, cxxd_config_parser.get_clang_ast_cache_size() * 1024 * 1024) if cxxd_config_parser.get_clang_ast_cache_size() else None
         )
         self.amd64_asm_json = os.path.join(os.path.abspath(os.path.dirname(__file__)), '../asm/asm-docs-amd64.json')
         self.build_dir = cxxd_config_parser.get_project_builder_build_dir(target)
@@ -109,6 +111,9 @@ class Disassembly(cxxd.service.Service):
         return True, []
 
     def shutdown_callback(self, args):
+        logging.info('Translation unit cache: {0}'.format(self.parser.tunit_cache.get_stats()))
+        if self.parser.ast_cache is not None:
+            logging.info('AST cache: {0}'.format(self.parser.ast_cache.get_stats()))
         logging.info('Disassembly service stopped.')
         return True, []
 
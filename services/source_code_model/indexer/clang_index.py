@@ -1,42 +0,0 @@
-
-import argparse
-import logging
-import os
-import sys
-
-# As this script is executed externally, from multiple processes, we have to make sure
-# we setup a correct PYTHONPATH. It _must_ include parent directory of 'cxxd'.
-sys.path.append(
-    os.path.dirname(                                # <path_to_cxxd>
-        os.path.dirname(                            # <path_to_cxxd>/cxxd
-            os.path.dirname(                        # <path_to_cxxd>/cxxd/services
-                os.path.dirname(                    # <path_to_cxxd>/cxxd/services/source_code_model
-                    os.path.dirname(                # <path_to_cxxd>/cxxd/services/source_code_model/indexer
-                        os.path.realpath(__file__)
-                    )
-                )
-            )
-        )
-    )
-)
-
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='Index given list of files.')
-    parser.add_argument('--project_root_directory', required=True, help='a root directory of project to be indexed')
-    parser.add_argument('--compiler_args_filename', required=True, help='a file containing a list of compiler args to be used while indexing')
-    parser.add_argument('--output_db_filename',     required=True, help='indexing result will be recorded in this file (SQLite db)')
-    parser.add_argument('--log_file',               required=True, help='log file to log indexing actions')
-    parser.add_argument('--worker_id',              required=True, help='ID of the worker process (for logging)')
-
-    args = parser.parse_args()
-
-    FORMAT = '[%(asctime)s.%(msecs)03d] [%(levelname)s] [%(filename)s:%(lineno)s] %(funcName)25s(): %(message)s'
-    logging.basicConfig(filename=args.log_file, filemode='a', format=FORMAT, datefmt='%H:%M:%S', level=logging.INFO)
-
-    from cxxd.services.source_code_model.indexer.clang_indexer import index_interactive
-    index_interactive(
-        args.project_root_directory,
-        args.compiler_args_filename,
-        args.output_db_filename,
-        args.worker_id
-    )
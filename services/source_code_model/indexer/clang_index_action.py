@@ -0,0 +1,347 @@
+import clang.cindex
+import logging
+import os
+import sys
+from ctypes import CFUNCTYPE, POINTER, Structure, byref, c_char_p, c_int, c_uint, c_void_p, sizeof
+from cxxd.parser.clang_parser import ChildVisitResult
+from cxxd.services.source_code_model.indexer.clang_indexer import FUNCTION_CURSOR_KINDS, get_overridden_usrs, remove_root_dir_from_filename
+from cxxd.services.source_code_model.indexer.symbol_database import SymbolReferenceRole
+
+#
+# Python bindings do not expose libclang's indexing API (clang_indexSourceFile) so we have to declare
+# the bits that we need ourselves. See clang-c/Index.h for the reference.
+#
+class CXIdxLoc(Structure):
+    _fields_ = [
+        ('ptr_data', c_void_p * 2),
+        ('int_data', c_uint),
+    ]
+
+class CXIdxEntityInfo(Structure):
+    _fields_ = [
+        ('kind', c_int),
+        ('templateKind', c_int),
+        ('lang', c_int),
+        ('name', c_char_p),
+        ('USR', c_char_p),
+        ('cursor', clang.cindex.Cursor),
+        ('attributes', c_void_p),
+        ('numAttributes', c_uint),
+    ]
+
+class CXIdxContainerInfo(Structure):
+    _fields_ = [
+        ('cursor', clang.cindex.Cursor),
+    ]
+
+class CXIdxDeclInfo(Structure):
+    _fields_ = [
+        ('entityInfo', POINTER(CXIdxEntityInfo)),
+        ('cursor', clang.cindex.Cursor),
+        ('loc', CXIdxLoc),
+        ('semanticContainer', POINTER(CXIdxContainerInfo)),
+        ('lexicalContainer', POINTER(CXIdxContainerInfo)),
+        ('isRedeclaration', c_int),
+        ('isDefinition', c_int),
+        ('isContainer', c_int),
+        ('declAsContainer', POINTER(CXIdxContainerInfo)),
+        ('isImplicit', c_int),
+        ('attributes', c_void_p),
+        ('numAttributes', c_uint),
+        ('flags', c_uint),
+    ]
+
+class CXIdxEntityRefInfo(Structure):
+    _fields_ = [
+        ('kind', c_int),
+        ('cursor', clang.cindex.Cursor),
+        ('loc', CXIdxLoc),
+        ('referencedEntity', POINTER(CXIdxEntityInfo)),
+        ('parentEntity', POINTER(CXIdxEntityInfo)),
+        ('container', POINTER(CXIdxContainerInfo)),
+        ('role', c_int),
+    ]
+
+class CXIdxBaseClassInfo(Structure):
+    _fields_ = [
+        ('base', POINTER(CXIdxEntityInfo)),
+        ('cursor', clang.cindex.Cursor),
+        ('loc', CXIdxLoc),
+    ]
+
+class CXIdxCXXClassDeclInfo(Structure):
+    _fields_ = [
+        ('declInfo', POINTER(CXIdxDeclInfo)),
+        ('bases', POINTER(POINTER(CXIdxBaseClassInfo))),
+        ('numBases', c_uint),
+    ]
+
+abort_query_callback_type       = CFUNCTYPE(c_int, c_void_p, c_void_p)
+diagnostic_callback_type        = CFUNCTYPE(None, c_void_p, c_void_p, c_void_p)
+entered_main_file_callback_type = CFUNCTYPE(c_void_p, c_void_p, c_void_p, c_void_p)
+included_file_callback_type     = CFUNCTYPE(c_void_p, c_void_p, c_void_p)
+imported_ast_file_callback_type = CFUNCTYPE(c_void_p, c_void_p, c_void_p)
+started_tunit_callback_type     = CFUNCTYPE(c_void_p, c_void_p, c_void_p)
+index_declaration_callback_type = CFUNCTYPE(None, c_void_p, POINTER(CXIdxDeclInfo))
+index_reference_callback_type   = CFUNCTYPE(None, c_void_p, POINTER(CXIdxEntityRefInfo))
+
+class IndexerCallbacks(Structure):
+    _fields_ = [
+        ('abortQuery', abort_query_callback_type),
+        ('diagnostic', diagnostic_callback_type),
+        ('enteredMainFile', entered_main_file_callback_type),
+        ('ppIncludedFile', included_file_callback_type),
+        ('importedASTFile', imported_ast_file_callback_type),
+        ('startedTranslationUnit', started_tunit_callback_type),
+        ('indexDeclaration', index_declaration_callback_type),
+        ('indexEntityReference', index_reference_callback_type),
+    ]
+
+class CXIndexOpt():
+    NONE                            = 0x0
+    SUPPRESS_REDUNDANT_REFS         = 0x1
+    INDEX_FUNCTION_LOCAL_SYMBOLS    = 0x2
+    INDEX_IMPLICIT_TEMPLATE_INSTANTIATIONS = 0x4
+    SUPPRESS_WARNINGS               = 0x8
+    SKIP_PARSED_BODIES_IN_SESSION   = 0x10
+
+class CXIdxEntityRefKind():
+    DIRECT   = 0x1
+    IMPLICIT = 0x2
+
+class CXIdxEntityKind():
+    FUNCTION                  = 2
+    CXX_STATIC_METHOD         = 20
+    CXX_INSTANCE_METHOD       = 21
+    CXX_CONSTRUCTOR           = 22
+    CXX_DESTRUCTOR            = 23
+    CXX_CONVERSION_FUNCTION   = 24
+
+class CXSymbolRole():
+    READ  = 0x8
+    WRITE = 0x10
+    CALL  = 0x20
+
+def _get_function(name, argtypes, restype):
+    # Fresh function object on purpose: the ones registered by clang.cindex come with error-checking hooks
+    # which assume Python-side Cursor/TranslationUnit wrappers and break on raw structs coming from callbacks.
+    function = clang.cindex.conf.lib[name]
+    function.argtypes = argtypes
+    function.restype = restype
+    return function
+
+class ClangIndexAction():
+    """
+    Indexing backend built on top of libclang's native indexing API (clang_indexSourceFile). Contrary to the
+    cursor-visitor backend, which walks every single AST node through a Python callback and resolves its USR,
+    kind and location by itself, here libclang hands us declarations and references with everything already
+    resolved. Files included into the main file are handed out as NULL client files so anything which does not
+    belong to the main file is dropped right away.
+    """
+
+    # Non-NULL CXIdxClientFile handed out for the main file. Included files get NULL.
+    MAIN_FILE = 1
+
+    def __init__(self, parser, supported_cursor_kinds):
+        # Action is bound to the index it is created from, and so are the translation units it creates. Parser handed
+        # over on each call is expected to share the index, as the copies of the parser the workers make do.
+        self.index = parser.index
+        self.supported_cursor_kinds = supported_cursor_kinds
+        self.macro_cursor_kinds = set([clang.cindex.CursorKind.MACRO_DEFINITION.value, clang.cindex.CursorKind.MACRO_INSTANTIATION.value])
+        self.class_cursor_kinds = set(kind.value for kind in [
+            clang.cindex.CursorKind.CLASS_DECL, clang.cindex.CursorKind.STRUCT_DECL, clang.cindex.CursorKind.UNION_DECL,
+            clang.cindex.CursorKind.CLASS_TEMPLATE, clang.cindex.CursorKind.CLASS_TEMPLATE_PARTIAL_SPECIALIZATION,
+        ])
+        self.function_entity_kinds = set([
+            CXIdxEntityKind.FUNCTION, CXIdxEntityKind.CXX_STATIC_METHOD, CXIdxEntityKind.CXX_INSTANCE_METHOD,
+            CXIdxEntityKind.CXX_CONSTRUCTOR, CXIdxEntityKind.CXX_DESTRUCTOR, CXIdxEntityKind.CXX_CONVERSION_FUNCTION,
+        ])
+        self.index_source_file = _get_function(
+            'clang_indexSourceFile',
+            [c_void_p, c_void_p, POINTER(IndexerCallbacks), c_uint, c_uint, c_char_p, POINTER(c_char_p), c_int, c_void_p, c_uint, POINTER(clang.cindex.c_object_p), c_uint],
+            c_int
+        )
+        self.get_file_location = _get_function(
+            'clang_indexLoc_getFileLocation',
+            [CXIdxLoc, POINTER(c_void_p), c_void_p, POINTER(c_uint), POINTER(c_uint), c_void_p],
+            None
+        )
+        self.get_cursor_referenced = _get_function('clang_getCursorReferenced', [clang.cindex.Cursor], clang.cindex.Cursor)
+        self.get_cursor_semantic_parent = _get_function('clang_getCursorSemanticParent', [clang.cindex.Cursor], clang.cindex.Cursor)
+        self.get_cursor_spelling = _get_function('clang_getCursorSpelling', [clang.cindex.Cursor], clang.cindex._CXString)
+        self.is_null_cursor = _get_function('clang_Cursor_isNull', [clang.cindex.Cursor], c_int)
+        self.hash_cursor = _get_function('clang_hashCursor', [clang.cindex.Cursor], c_uint)
+        self.get_cxx_class_decl_info = _get_function('clang_index_getCXXClassDeclInfo', [POINTER(CXIdxDeclInfo)], POINTER(CXIdxCXXClassDeclInfo))
+        self.is_virtual_method = _get_function('clang_CXXMethod_isVirtual', [clang.cindex.Cursor], c_uint)
+        self.index_action_dispose = _get_function('clang_IndexAction_dispose', [c_void_p], None)
+        # Parsed bodies are remembered for the lifetime of the action so we keep reusing it across the files
+        self.index_action = _get_function('clang_IndexAction_create', [c_void_p], c_void_p)(self.index.obj)
+        self.callbacks = IndexerCallbacks(
+            abortQuery=abort_query_callback_type(),
+            diagnostic=diagnostic_callback_type(),
+            enteredMainFile=entered_main_file_callback_type(lambda client_data, main_file, reserved: ClangIndexAction.MAIN_FILE),
+            ppIncludedFile=included_file_callback_type(lambda client_data, included_file_info: None),
+            importedASTFile=imported_ast_file_callback_type(),
+            startedTranslationUnit=started_tunit_callback_type(),
+            indexDeclaration=index_declaration_callback_type(self.__index_declaration),
+            indexEntityReference=index_reference_callback_type(self.__index_reference),
+        )
+        self.client_file, self.line, self.column = c_void_p(), c_uint(), c_uint()
+        self.filename, self.symbol_batch, self.symbol_names, self.symbol_references = None, None, None, None
+        self.qualified_names = {} # Containers of the declarations found in the file, by their hash, with their qualified names
+
+    def __del__(self):
+        if self.index_action:
+            self.index_action_dispose(self.index_action)
+            self.index_action = None
+
+    def __call__(self, parser, root_directory, filename):
+        build_flags = parser.get_compiler_args_db().get(filename)
+        args = (c_char_p * len(build_flags))(*[arg.encode('utf-8') for arg in build_flags])
+        tunit_ptr = clang.cindex.c_object_p()
+
+        # Bodies from the headers already seen in this session can be skipped when indexing the source files because
+        # we only record symbols from the main file. Headers themselves are indexed as main files too, so for them we
+        # must not skip anything.
+        index_options = CXIndexOpt.NONE if is_header_file(filename) else CXIndexOpt.SKIP_PARSED_BODIES_IN_SESSION
+
+        self.filename = remove_root_dir_from_filename(root_directory, filename)
+        self.symbol_batch, self.symbol_names, self.symbol_references = [], [], []
+        try:
+            error = self.index_source_file(
+                self.index_action, None, byref(self.callbacks), sizeof(self.callbacks), index_options,
+                filename.encode('utf-8'), args, len(build_flags), None, 0,
+                byref(tunit_ptr), parser.default_parsing_flags()
+            )
+            tunit = clang.cindex.TranslationUnit(tunit_ptr, self.index) if tunit_ptr else None
+            if error or tunit is None:
+                logging.error("Failed to index '{0}': clang_indexSourceFile() returned {1}".format(filename, error))
+                return tunit, [], [], []
+            # Preprocessing entities are not reported through the indexing callbacks. They can only be found on the top-level.
+            parser.traverse(tunit.cursor, [self.filename, filename, self.symbol_batch, self.symbol_names], self.__macro_visitor)
+            return tunit, self.symbol_batch, self.symbol_names, self.symbol_references
+        finally:
+            self.symbol_batch, self.symbol_names, self.symbol_references = None, None, None
+            self.qualified_names.clear()
+
+    def __location_in_main_file(self, loc):
+        self.get_file_location(loc, byref(self.client_file), None, byref(self.line), byref(self.column), None)
+        return self.client_file.value == ClangIndexAction.MAIN_FILE
+
+    def __qualified_name(self, container, name):
+        # Containers are shared among many of the declarations (e.g. members of the same class) so their qualified
+        # names are only put together once
+        key = (self.hash_cursor(container), container._kind_id)
+        prefix = self.qualified_names.get(key)
+        if prefix is None:
+            names, cursor = [], container
+            while not self.is_null_cursor(cursor) and cursor._kind_id != clang.cindex.CursorKind.TRANSLATION_UNIT.value:
+                spelling = clang.cindex._CXString.from_result(self.get_cursor_spelling(cursor))
+                if spelling:
+                    names.append(spelling)
+                cursor = self.get_cursor_semantic_parent(cursor)
+            prefix = self.qualified_names[key] = ''.join(name + '::' for name in reversed(names))
+        return prefix + name
+
+    def __index_declaration(self, client_data, decl_info):
+        try:
+            decl = decl_info.contents
+            kind = decl.cursor._kind_id
+            if kind in self.supported_cursor_kinds and self.__location_in_main_file(decl.loc):
+                line = self.line.value
+                entity = decl.entityInfo.contents
+                usr = entity.USR.decode('utf-8')
+                self.symbol_batch.append((
+                    self.filename,
+                    line,
+                    self.column.value,
+                    usr,
+                    None, # Context is read from the file when asked for
+                    kind,
+                    bool(decl.isDefinition)
+                ))
+                if usr and entity.name:
+                    name = entity.name.decode('utf-8')
+                    self.symbol_names.append((
+                        self.filename,
+                        line,
+                        usr,
+                        name,
+                        self.__qualified_name(decl.semanticContainer.contents.cursor, name) if decl.semanticContainer else name
+                    ))
+                if usr and kind in self.class_cursor_kinds:
+                    self.__index_bases(decl_info, usr)
+                elif usr and kind == clang.cindex.CursorKind.CXX_METHOD.value and self.is_virtual_method(decl.cursor):
+                    for overridden_usr in get_overridden_usrs(decl.cursor):
+                        self.symbol_references.append((self.filename, line, self.column.value, overridden_usr, usr, SymbolReferenceRole.OVERRIDE))
+        except:
+            logging.error(sys.exc_info())
+
+    def __index_bases(self, decl_info, usr):
+        class_decl_info = self.get_cxx_class_decl_info(decl_info)
+        if class_decl_info:
+            class_decl_info = class_decl_info.contents
+            for i in range(class_decl_info.numBases):
+                base = class_decl_info.bases[i].contents
+                if base.base and base.base.contents.USR and self.__location_in_main_file(base.loc):
+                    self.symbol_references.append((
+                        self.filename, self.line.value, self.column.value, base.base.contents.USR.decode('utf-8'), usr, SymbolReferenceRole.BASE_SPECIFIER
+                    ))
+
+    def __index_reference(self, client_data, ref_info):
+        try:
+            ref = ref_info.contents
+            if ref.kind == CXIdxEntityRefKind.DIRECT and self.__location_in_main_file(ref.loc):
+                kind = self.get_cursor_referenced(ref.cursor)._kind_id
+                if kind in self.supported_cursor_kinds:
+                    line = self.line.value
+                    usr = ref.referencedEntity.contents.USR.decode('utf-8')
+                    self.symbol_batch.append((
+                        self.filename,
+                        line,
+                        self.column.value,
+                        usr,
+                        None,
+                        kind,
+                        False
+                    ))
+                    role = self.__reference_role(ref, kind)
+                    if role:
+                        self.symbol_references.append((
+                            self.filename, line, self.column.value, usr, ref.parentEntity.contents.USR.decode('utf-8'), role
+                        ))
+        except:
+            logging.error(sys.exc_info())
+
+    def __reference_role(self, ref, kind):
+        # Only the references made from the function bodies, as it is with the cursor-visitor backend
+        if not ref.parentEntity or ref.parentEntity.contents.kind not in self.function_entity_kinds or not ref.parentEntity.contents.USR:
+            return 0
+        if ref.role & CXSymbolRole.CALL and kind in FUNCTION_CURSOR_KINDS:
+            return SymbolReferenceRole.CALL
+        if kind == clang.cindex.CursorKind.FIELD_DECL.value:
+            return (SymbolReferenceRole.READ if ref.role & CXSymbolRole.READ else 0) | (SymbolReferenceRole.WRITE if ref.role & CXSymbolRole.WRITE else 0)
+        return 0
+
+    def __macro_visitor(self, ast_node, ast_parent_node, args):
+        relative_filename, filename, symbol_batch, symbol_names = args
+        if ast_node._kind_id in self.macro_cursor_kinds:
+            location = ast_node.location
+            if location.file and location.file.name == filename:
+                referenced = ast_node.referenced
+                usr = referenced.get_usr() if referenced else ast_node.get_usr()
+                symbol_batch.append((
+                    relative_filename,
+                    location.line,
+                    location.column,
+                    usr,
+                    None,
+                    referenced._kind_id if referenced else ast_node._kind_id,
+                    ast_node.is_definition()
+                ))
+                if usr and ast_node._kind_id == clang.cindex.CursorKind.MACRO_DEFINITION.value:
+                    symbol_names.append((relative_filename, location.line, usr, ast_node.spelling, ast_node.spelling))
+        return ChildVisitResult.CONTINUE.value
+
+def is_header_file(filename):
+    return os.path.splitext(filename)[1] in ['.h', '.hh', '.hpp', '.hxx', '.tpp']
@@ -1,20 +1,36 @@
-import linecache
+import collections
+import copy
+import ctypes
+import gc
+import glob
+import hashlib
+import heapq
+import json
 import logging
 import math
 import multiprocessing
 import os
-import select
+import queue
 import shlex
-import subprocess
 import sys
+import threading
 import time
 import tempfile
+import clang.cindex
+import cxxd.service
+from ctypes import POINTER, byref, c_uint
 from cxxd.parser.cxxd_config_parser import CxxdConfigParser
 from cxxd.parser.clang_parser import ClangParser
 from cxxd.parser.tunit_cache import TranslationUnitCache, NoCache
 from cxxd.parser.ast_node_identifier import ASTNodeId
 from cxxd.parser.clang_parser import ChildVisitResult
-from cxxd.services.source_code_model.indexer.symbol_database import SymbolDatabase
+from cxxd.services.source_code_model.indexer.symbol_database import SymbolDatabase, ShardedSymbolDatabase, SymbolReferenceRole, get_shard_index, get_shard_filename
+from cxxd.services.source_code_model.indexer.worker_pool import WorkerPool, wait_for_any, report_progress
+from cxxd.services.source_code_model.indexer.resource_governor import ResourceGovernor, lower_process_priority
+from cxxd.services.source_code_model.indexer.file_watcher import FileWatcher
+from cxxd.services.source_code_model.indexer.git_repository import GitRepository
+from cxxd.services.source_code_model.indexer.index_snapshot import export_snapshot, import_snapshot, read_snapshot_header
+from cxxd.services.source_code_model.indexer.source_context import get_line_offsets, encode_line_offsets, decode_line_offsets, read_source_lines
 
 # TODO move this to utils
 import itertools
@@ -26,9 +42,46 @@ class SourceCodeModelIndexerRequestId():
     RUN_ON_DIRECTORY          = 0x1
     DROP_SINGLE_FILE          = 0x2
     DROP_ALL                  = 0x3
+    CANCEL                    = 0x4
+    RUN_ON_CHANGED_FILES      = 0x5
+    EXPORT_SNAPSHOT           = 0x6
+    IMPORT_SNAPSHOT           = 0x7
+    DROP_SHARD                = 0x8
+    RUN_ON_SHARD              = 0x9
+    REPORT_JOB_COMPLETED      = 0xA
     FIND_ALL_REFERENCES       = 0x10
     FETCH_ALL_DIAGNOSTICS     = 0x11
     FETCH_ALL_DEFINITIONS     = 0x12
+    FIND_SYMBOLS              = 0x13
+    FETCH_DEFINITIONS         = 0x14
+    FETCH_DIAGNOSTICS         = 0x15
+    FIND_INCOMING_CALLS       = 0x16
+    FIND_OUTGOING_CALLS       = 0x17
+    FIND_SUPERTYPES           = 0x18
+    FIND_SUBTYPES             = 0x19
+    FIND_INCLUDERS            = 0x1A
+    FIND_TRANSITIVE_INCLUDERS = 0x1B
+
+class IndexerWorkerRequestId():
+    OPEN_SYMBOL_DB            = 0x0
+    INDEX_FILE                = 0x1
+    CLOSE_SYMBOL_DB           = 0x2
+    STREAM_FILE               = 0x3
+    INDEX_SHARD               = 0x4
+
+# Cursors declaring the symbols, as opposed to the ones referring to them. Names of the symbols are recorded from these.
+DECLARATION_CURSOR_KINDS = set(
+    kind.value for kind in clang.cindex.CursorKind.get_all_kinds() if kind.is_declaration()
+) | set([clang.cindex.CursorKind.MACRO_DEFINITION.value])
+
+# Functions whose bodies the calls and the other references with the roles are made from
+FUNCTION_CURSOR_KINDS = set(kind.value for kind in [
+    clang.cindex.CursorKind.FUNCTION_DECL, clang.cindex.CursorKind.FUNCTION_TEMPLATE, clang.cindex.CursorKind.CXX_METHOD,
+    clang.cindex.CursorKind.CONSTRUCTOR,   clang.cindex.CursorKind.DESTRUCTOR,        clang.cindex.CursorKind.CONVERSION_FUNCTION,
+])
+
+# CXUnaryOperatorKind of the operator taking the address of its operand (see clang-c/Index.h)
+CX_UNARY_OPERATOR_ADDR_OF = 5
 
 class ClangIndexer():
     supported_ast_node_ids = [
@@ -39,29 +92,96 @@ class ClangIndexer():
         ASTNodeId.getMacroDefinitionId(), ASTNodeId.getMacroInstantiationId()                                                                # handle macros
     ]
 
-    def __init__(self, parser, root_directory, cxxd_config_parser):
+    def __init__(self, parser, root_directory, cxxd_config_parser, indexer_job_callback=None, schedule_request=None, interactive_requests=None):
         self.cxxd_config_parser     = cxxd_config_parser
         self.root_directory         = root_directory
         self.symbol_db_name         = '.cxxd_index.db'
         self.symbol_db_path         = os.path.join(self.root_directory, self.symbol_db_name)
-        self.symbol_db              = SymbolDatabase(self.symbol_db_path) if self.symbol_db_exists() else SymbolDatabase()
+        self.num_of_shards          = cxxd_config_parser.get_indexer_shards()
+        self.symbol_db              = self.__create_symbol_db(self.symbol_db_path if self.symbol_db_exists() else None)
         self.parser                 = parser
+        self.indexer_job            = None
+        self.indexer_job_cancelled  = threading.Event()
+        self.indexer_job_completed  = threading.Event()    # Set before the completion is reported, while the job thread may still be around
+        self.indexer_job_callback   = indexer_job_callback # Invoked as (request_id, success, args) once the background job completes, or the page of results is fetched
+        self.schedule_request       = schedule_request     # Invoked as (args) to have the request processed by the service, e.g. [RUN_ON_CHANGED_FILES]
+        self.changed_files          = set()
+        self.outdated_files         = set()                # Files to be re-indexed because the headers they include have changed
+        self.changed_files_lock     = threading.Lock()
+        self.indexing_cost_history  = {}                   # Cost history of the symbol db dropped the last time, for the full index to be scheduled by
         self.op = {
             SourceCodeModelIndexerRequestId.RUN_ON_SINGLE_FILE    : self.__run_on_single_file,
             SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY      : self.__run_on_directory,
             SourceCodeModelIndexerRequestId.DROP_SINGLE_FILE      : self.__drop_single_file,
             SourceCodeModelIndexerRequestId.DROP_ALL              : self.__drop_all,
+            SourceCodeModelIndexerRequestId.CANCEL                : self.__cancel,
+            SourceCodeModelIndexerRequestId.RUN_ON_CHANGED_FILES  : self.__run_on_changed_files,
+            SourceCodeModelIndexerRequestId.EXPORT_SNAPSHOT       : self.__export_snapshot,
+            SourceCodeModelIndexerRequestId.IMPORT_SNAPSHOT       : self.__import_snapshot,
+            SourceCodeModelIndexerRequestId.DROP_SHARD            : self.__drop_shard,
+            SourceCodeModelIndexerRequestId.RUN_ON_SHARD          : self.__run_on_shard,
+            SourceCodeModelIndexerRequestId.REPORT_JOB_COMPLETED  : self.__report_job_completed,
             SourceCodeModelIndexerRequestId.FIND_ALL_REFERENCES   : self.__find_all_references,
             SourceCodeModelIndexerRequestId.FETCH_ALL_DIAGNOSTICS : self.__fetch_all_diagnostics,
             SourceCodeModelIndexerRequestId.FETCH_ALL_DEFINITIONS : self.__fetch_all_definitions,
+            SourceCodeModelIndexerRequestId.FIND_SYMBOLS          : self.__find_symbols,
+            SourceCodeModelIndexerRequestId.FETCH_DEFINITIONS     : self.__fetch_definitions,
+            SourceCodeModelIndexerRequestId.FETCH_DIAGNOSTICS     : self.__fetch_diagnostics,
+            SourceCodeModelIndexerRequestId.FIND_INCOMING_CALLS   : self.__find_incoming_calls,
+            SourceCodeModelIndexerRequestId.FIND_OUTGOING_CALLS   : self.__find_outgoing_calls,
+            SourceCodeModelIndexerRequestId.FIND_SUPERTYPES       : self.__find_supertypes,
+            SourceCodeModelIndexerRequestId.FIND_SUBTYPES         : self.__find_subtypes,
+            SourceCodeModelIndexerRequestId.FIND_INCLUDERS        : self.__find_includers,
+            SourceCodeModelIndexerRequestId.FIND_TRANSITIVE_INCLUDERS : self.__find_transitive_includers,
         }
+        # Queries the user is waiting on, as opposed to (re-)indexing which may itself be dispatching the work
+        self.interactive_ops = set([
+            SourceCodeModelIndexerRequestId.FIND_ALL_REFERENCES,   SourceCodeModelIndexerRequestId.FIND_SYMBOLS,
+            SourceCodeModelIndexerRequestId.FETCH_DEFINITIONS,     SourceCodeModelIndexerRequestId.FETCH_DIAGNOSTICS,
+            SourceCodeModelIndexerRequestId.FIND_INCOMING_CALLS,   SourceCodeModelIndexerRequestId.FIND_OUTGOING_CALLS,
+            SourceCodeModelIndexerRequestId.FIND_SUPERTYPES,       SourceCodeModelIndexerRequestId.FIND_SUBTYPES,
+            SourceCodeModelIndexerRequestId.FIND_INCLUDERS,        SourceCodeModelIndexerRequestId.FIND_TRANSITIVE_INCLUDERS,
+        ])
         self.recognized_file_extensions = ['.cpp', '.cc', '.cxx', '.c', '.h', '.hh', '.hpp', 'hxx']
         self.extra_file_extensions = self.cxxd_config_parser.get_extra_file_extensions()
         self.blacklisted_directories = self.cxxd_config_parser.get_blacklisted_directories()
+        self.index_file = get_single_file_indexer(self.parser, self.cxxd_config_parser.get_indexer_backend())
+        self.stream_results = self.cxxd_config_parser.get_indexer_stream_results()
+        self.file_timeout = self.cxxd_config_parser.get_indexer_file_timeout()
+        self.resource_governor = ResourceGovernor(
+            self.cxxd_config_parser.get_indexer_max_workers(),
+            self.cxxd_config_parser.get_indexer_min_free_memory(),
+            self.cxxd_config_parser.get_indexer_max_load(),
+            self.cxxd_config_parser.get_indexer_pause_on_interactive(),
+            interactive_requests
+        )
+        # Spare workers take over from the ones which crash (or hang) on a file while indexing is in progress
+        self.worker_pool = WorkerPool(
+            self.resource_governor.max_workers,
+            lambda: IndexerWorker(self.parser, self.root_directory, self.cxxd_config_parser.get_indexer_backend(), self.cxxd_config_parser.get_indexer_nice()),
+            max(2, multiprocessing.cpu_count() // 4)
+        )
+        self.file_watcher = FileWatcher(self.root_directory, self.__is_file_watched, self.__on_files_changed)
+        self.watch_files = self.cxxd_config_parser.get_indexer_watch_files()
+        self.git_repository = GitRepository(self.root_directory)
 
     def symbol_db_exists(self):
         return os.path.exists(self.symbol_db_path)
 
+    def __create_symbol_db(self, filename=None):
+        if self.num_of_shards:
+            return ShardedSymbolDatabase(filename, self.num_of_shards)
+        return SymbolDatabase(filename)
+
+    def symbol_db_layout_changed(self):
+        # Only the main symbol db is looked into, shards are not to be created by merely checking for them
+        if self.symbol_db_exists():
+            symbol_db = SymbolDatabase(self.symbol_db_path)
+            num_of_shards = symbol_db.fetch_metadata('shards')
+            symbol_db.close()
+            return int(num_of_shards or 0) != self.num_of_shards
+        return False
+
     def get_symbol_db(self):
         return self.symbol_db
 
@@ -74,8 +194,19 @@ class ClangIndexer():
         return False
 
     def __call__(self, args):
+        if int(args[0]) in self.interactive_ops:
+            with self.interactive_request():
+                return self.op.get(int(args[0]), self.__unknown_op)(int(args[0]), args[1:len(args)])
         return self.op.get(int(args[0]), self.__unknown_op)(int(args[0]), args[1:len(args)])
 
+    def interactive_request(self):
+        # Indexing in progress stops handing the files over to the workers while the user is waiting on the request
+        return self.resource_governor.interactive_request()
+
+    def __start_worker_pool(self):
+        # Pool is re-sized by the memory available by the time it is started
+        self.worker_pool.start(self.resource_governor.get_num_of_workers())
+
     def __unknown_op(self, id, args):
         logging.error("Unknown operation with ID={0} triggered! Valid operations are: {1}".format(id, self.op))
         return False, None
@@ -83,188 +214,760 @@ class ClangIndexer():
     def __run_on_single_file(self, id, args):
         success = False
         if self.symbol_db_exists():
-            filename = str(args[0])
-            if not CxxdConfigParser.is_file_blacklisted(self.blacklisted_directories, filename):
+            filenames = []
+            for filename in [str(arg) for arg in args]:
+                if not CxxdConfigParser.is_file_blacklisted(self.blacklisted_directories, filename):
+                    filenames.append(filename)
+                else:
+                    logging.warning('Indexing will not take place on existing files whose contents were modified but not saved.')
+            if filenames:
                 self.symbol_db.open(self.symbol_db_path)
-                self.symbol_db.delete_entry(remove_root_dir_from_filename(self.root_directory, filename))
-                success = index_single_file(
-                    self.parser,
-                    self.root_directory,
-                    filename,
-                    self.symbol_db
-                )
+                # Files including the headers are affected by their modifications as well. There may be plenty of them
+                # so they are re-indexed in the background, instead of keeping the other requests waiting.
+                dependent_files = [filename for filename in self.__get_dependent_files(self.symbol_db, filenames) if filename not in filenames]
+                self.__drop_stale_tunits(dependent_files)
+                filenames = self.__skip_quarantined_files(self.symbol_db, filenames)
+                indexing_cost = get_indexing_cost(self.symbol_db, self.symbol_db.fetch_all_files()) if len(filenames) > 1 else {}
+                for filename in filenames:
+                    self.symbol_db.delete_entry(remove_root_dir_from_filename(self.root_directory, filename))
+                if len(filenames) > 1 and not self.indexer_job_in_progress():
+                    # Batch of files is spread across the worker pool. Workers write into their own databases
+                    # and the results are merged through a separate connection so let go of the write-lock first.
+                    self.symbol_db.flush()
+                    self.__start_worker_pool()
+                    success = self.__index_file_list(filenames, threading.Event(), indexing_cost=indexing_cost)
+                else:
+                    success = True
+                    for filename in filenames:
+                        success = index_single_file(
+                            self.parser,
+                            self.root_directory,
+                            filename,
+                            self.symbol_db.get_shard(remove_root_dir_from_filename(self.root_directory, filename)),
+                            self.index_file
+                        ) and success
                     # TODO what if index_single_file() fails? we should revert the symbol_db.delete_entry() back
-            else:
-                logging.warning('Indexing will not take place on existing files whose contents were modified but not saved.')
+                self.symbol_db.flush()
+                self.__reindex_outdated_files(dependent_files)
         else:
             logging.error('Action cannot be run if symbol database does not exist yet!')
         return success, None
 
     def __run_on_directory(self, id, args):
-        if self.symbol_db_schema_changed():
-            logging.warning('Detected symbol database schema change! About to drop the current one and re-create a new one ...')
+        if self.indexer_job_in_progress():
+            logging.warning("Indexing of directory '{0}' is already in progress ...".format(self.root_directory))
+            return False, None
+
+        # Shards of the other layout are not there to be migrated so the layout is checked for first
+        if self.symbol_db_layout_changed():
+            logging.warning('Number of symbol database shards has changed! About to drop the current one and re-create a new one ...')
             self.__drop_all(0, (True,))
 
+        if self.symbol_db_schema_changed():
+            logging.warning('Detected symbol database schema change! Trying to migrate the current one ...')
+            if self.symbol_db.migrate_data_model():
+                logging.info('Symbol database migrated to {0}.{1}.'.format(self.symbol_db.VERSION_MAJOR, self.symbol_db.VERSION_MINOR))
+            else:
+                logging.warning('Symbol database cannot be migrated! About to drop the current one and re-create a new one ...')
+                self.__drop_all(0, (True,))
+
+        # Workers are forked here, from the service thread, while no other thread is using libclang
+        self.__start_worker_pool()
+
+        # Modifications made from now on, by the editor or by any other tool, are picked up by the watcher
+        if self.watch_files and self.schedule_request is not None:
+            self.file_watcher.start()
+
         if not self.symbol_db_exists():
             logging.info("Starting to index whole directory '{0}' ... ".format(self.root_directory))
 
             # Establish the connection first and create an empty symbol database
             self.symbol_db.open(self.symbol_db_path)
 
-            # When creating the symbol db for the first time we need to create a data model for it
+            # When creating the symbol db for the first time we need to create a data model for it. Commit it
+            # right away so that we do not hold the write-lock while the background job is writing into it.
             self.symbol_db.create_data_model()
+            self.symbol_db.flush()
+
+            # Indexing the whole directory takes a long time so we run it in the background. Meanwhile, we
+            # keep on serving the other requests from the (partial) symbol database.
+            indexing_cost = self.indexing_cost_history
+            return self.__start_indexer_job(id, lambda cancelled: self.__index_directory(cancelled, indexing_cost))
+        else:
+            # Symbol database already exists so we only need to catch up with the changes made in the meantime
+            logging.info("Directory '{0}' already indexed. Starting to re-index the files which have changed ... ".format(self.root_directory))
+            return self.__start_indexer_job(id, self.__reindex_directory)
+
+    def __run_on_changed_files(self, id, args):
+        if not self.symbol_db_exists():
+            logging.error('Action cannot be run if symbol database does not exist yet!')
+            return False, None
+
+        with self.changed_files_lock:
+            paths, self.changed_files = self.changed_files.union(str(arg) for arg in args), set()
+            outdated_files, self.outdated_files = self.outdated_files, set()
+        if paths:
+            # Cached translation units are dropped right away, even if re-indexing has to be postponed
+            self.symbol_db.open(self.symbol_db_path)
+            self.__drop_stale_tunits(self.__get_dependent_files(self.symbol_db, [path for path in paths if not path.endswith(os.sep)]))
+        if self.indexer_job_in_progress():
+            with self.changed_files_lock:
+                # Picked up once the indexing in progress has finished (see __start_indexer_job())
+                self.outdated_files.update(outdated_files)
+            # Postponed work is reported by the request which eventually picks it up
+            if not paths:
+                return True, cxxd.service.REQUEST_DEFERRED
+            if self.file_watcher.is_running():
+                # Watcher will keep on reporting them back until the indexing in progress has finished
+                self.file_watcher.add(paths)
+                logging.info("Indexing of '{0}' is in progress. Re-indexing of {1} changed path(s) is postponed.".format(self.root_directory, len(paths)))
+                return True, cxxd.service.REQUEST_DEFERRED
+            logging.warning("Indexing of '{0}' is already in progress ...".format(self.root_directory))
+            return False, None
+        if not paths and not outdated_files:
+            return True, None
 
-            # Build-up a list of source code files from given project directory
+        self.__start_worker_pool()
+        return self.__start_indexer_job(id, lambda cancelled: self.__reindex_changed_files(cancelled, paths | outdated_files, outdated_files))
+
+    def __export_snapshot(self, id, args):
+        if not self.symbol_db_exists():
+            logging.error('Action cannot be run if symbol database does not exist yet!')
+            return False, None
+        if self.indexer_job_in_progress():
+            logging.warning("Indexing of '{0}' is in progress. Snapshot can be exported once it completes.".format(self.root_directory))
+            return False, None
+        self.symbol_db.open(self.symbol_db_path)
+        header = {
+            'schema_version'     : list(self.symbol_db.fetch_schema_version()),
+            'git_commit'         : self.symbol_db.fetch_metadata('git_commit'),
+            'configuration_hash' : self.symbol_db.fetch_metadata('configuration_hash'),
+        }
+        return export_snapshot(self.symbol_db, str(args[0]), header), None
+
+    def __import_snapshot(self, id, args):
+        snapshot_filename = str(args[0])
+        if self.indexer_job_in_progress():
+            logging.warning("Indexing of '{0}' is in progress. Snapshot cannot be imported at the moment.".format(self.root_directory))
+            return False, None
+        if self.num_of_shards:
+            logging.error('Snapshots can only be imported into the symbol database which is not sharded.')
+            return False, None
+        header = read_snapshot_header(snapshot_filename)
+        if header is None:
+            return False, None
+        if tuple(header.get('schema_version', ())) != (self.symbol_db.VERSION_MAJOR, self.symbol_db.VERSION_MINOR):
+            logging.error("Snapshot '{0}' has schema version {1} but {2}.{3} is required.".format(
+                snapshot_filename, header.get('schema_version'), self.symbol_db.VERSION_MAJOR, self.symbol_db.VERSION_MINOR)
+            )
+            return False, None
+        if header.get('configuration_hash') != self.__get_configuration_hash():
+            logging.warning('Snapshot was made with different compiler args or indexer configuration. All of the files will have to be looked into.')
+
+        # Nobody else is using the symbol database while no indexing is in progress
+        self.symbol_db.close()
+        if not import_snapshot(snapshot_filename, self.symbol_db_path):
+            return False, None
+        self.symbol_db.open(self.symbol_db_path)
+        self.symbol_db.enable_write_ahead_logging()
+        logging.info("Snapshot '{0}' of commit {1} imported. Catching up with the local changes ...".format(snapshot_filename, header.get('git_commit')))
+
+        # Snapshot is only a starting point. Whatever is different in this checkout gets re-indexed.
+        return self.__run_on_directory(id, args)
+
+    def __drop_shard(self, id, args):
+        shard_index = self.__get_shard_index_arg(args)
+        if shard_index is None:
+            return False, None
+        if self.indexer_job_in_progress():
+            logging.warning("Indexing of '{0}' is in progress. Shard cannot be dropped at the moment.".format(self.root_directory))
+            return False, None
+        self.__drop_shard_from_symbol_db(shard_index)
+        return True, None
+
+    def __run_on_shard(self, id, args):
+        shard_index = self.__get_shard_index_arg(args)
+        if shard_index is None:
+            return False, None
+        if self.indexer_job_in_progress():
+            logging.warning("Indexing of '{0}' is already in progress ...".format(self.root_directory))
+            return False, None
+        git_commit = self.__drop_shard_from_symbol_db(shard_index)
+        self.__start_worker_pool()
+        return self.__start_indexer_job(id, lambda cancelled: self.__index_shard(cancelled, shard_index, git_commit))
+
+    def __drop_shard_from_symbol_db(self, shard_index):
+        self.symbol_db.open(self.symbol_db_path)
+        self.symbol_db.drop_shard(shard_index)
+        # Git does not know the files from the shard are gone so the next run has to look into all of the files
+        git_commit = self.symbol_db.fetch_metadata('git_commit')
+        self.symbol_db.delete_metadata_entry('git_commit')
+        self.symbol_db.flush()
+        logging.info('Shard {0} dropped.'.format(shard_index))
+        return git_commit
+
+    def __get_shard_index_arg(self, args):
+        if not self.symbol_db_exists():
+            logging.error('Action cannot be run if symbol database does not exist yet!')
+            return None
+        if not self.num_of_shards:
+            logging.error('Action cannot be run if symbol database is not sharded!')
+            return None
+        shard_index = int(args[0])
+        if shard_index < 0 or shard_index >= self.num_of_shards:
+            logging.error('Invalid shard {0}. Symbol database has {1} shards.'.format(shard_index, self.num_of_shards))
+            return None
+        return shard_index
+
+    def __is_file_watched(self, path, is_directory):
+        if CxxdConfigParser.is_file_blacklisted(self.blacklisted_directories, path):
+            return False
+        return is_directory or os.path.splitext(path)[1] in self.recognized_file_extensions + self.extra_file_extensions
+
+    def __on_files_changed(self, paths):
+        # Invoked from the watcher thread. Indexing itself must be started from the service thread.
+        if self.indexer_job_in_progress():
+            return False
+        with self.changed_files_lock:
+            request_pending = len(self.changed_files) > 0
+            self.changed_files.update(paths)
+        if not request_pending:
+            self.schedule_request([SourceCodeModelIndexerRequestId.RUN_ON_CHANGED_FILES])
+        return True
+
+    def __reindex_outdated_files(self, filenames):
+        if not filenames:
+            return
+        with self.changed_files_lock:
+            self.outdated_files.update(filenames)
+        if self.schedule_request is None:
+            # Nobody to process the request later on, so there is no background to run the job in either
+            self.__run_on_changed_files(SourceCodeModelIndexerRequestId.RUN_ON_CHANGED_FILES, [])
+        else:
+            self.schedule_request([SourceCodeModelIndexerRequestId.RUN_ON_CHANGED_FILES])
+
+    def __get_dependent_files(self, symbol_db, filenames):
+        # Files including any of the given ones, directly or through the other headers, which are still there to be
+        # indexed. Symbols they refer to, and their diagnostics, may have changed together with the included files.
+        dependent_files = []
+        for filename in symbol_db.fetch_transitive_includers([remove_root_dir_from_filename(self.root_directory, filename) for filename in filenames]):
+            path = os.path.join(self.root_directory, filename)
+            if os.path.isfile(path) and self.__is_file_watched(path, False):
+                dependent_files.append(path)
+        return dependent_files
+
+    def __drop_stale_tunits(self, filenames):
+        # So that they are parsed once again, together with the modified headers, on the next request
+        for filename in filenames:
+            self.parser.drop_tunit(filename)
+
+    def __cancel(self, id, args):
+        # Files which did not make it into the symbol database have no fingerprint recorded so the next run
+        # on the directory will simply pick them up from where we have stopped.
+        cancelled = self.cancel_indexer_job()
+        if not cancelled:
+            logging.warning('There is no indexing in progress to be cancelled.')
+        return cancelled, None
+
+    def shutdown(self):
+        self.file_watcher.stop()
+        self.cancel_indexer_job()
+        self.worker_pool.shutdown()
+
+    def indexer_job_in_progress(self):
+        return self.indexer_job is not None and self.indexer_job.is_alive() and not self.indexer_job_completed.is_set()
+
+    def cancel_indexer_job(self):
+        if self.indexer_job_in_progress():
+            logging.info('Cancelling the indexing in progress ...')
+            self.indexer_job_cancelled.set()
+            self.indexer_job.join()
+            self.indexer_job = None
+            return True
+        return False
+
+    def __start_indexer_job(self, id, job):
+        # Without anyone to report the result to, there is no point in running the job in the background
+        if self.indexer_job_callback is None:
+            return job(self.indexer_job_cancelled), None
+
+        def run():
+            success = False
+            try:
+                success = job(self.indexer_job_cancelled)
+            except:
+                logging.error(sys.exc_info())
+            self.indexer_job_completed.set()
+            if self.schedule_request is None:
+                self.indexer_job_callback(id, success, None)
+            else:
+                # Result is reported from the service thread, which is where the plugin is meant to be run from
+                self.schedule_request([SourceCodeModelIndexerRequestId.REPORT_JOB_COMPLETED, id, success])
+            with self.changed_files_lock:
+                outdated_files_pending = len(self.outdated_files) > 0
+            if outdated_files_pending and self.schedule_request is not None:
+                self.schedule_request([SourceCodeModelIndexerRequestId.RUN_ON_CHANGED_FILES])
+
+        self.indexer_job_cancelled.clear()
+        self.indexer_job_completed.clear()
+        self.indexer_job = threading.Thread(target=run, name='cxxd-indexer-job', daemon=True)
+        self.indexer_job.start()
+        return True, cxxd.service.REQUEST_DEFERRED
+
+    def __report_job_completed(self, id, args):
+        # Scheduled by the background job once it has completed (see __start_indexer_job()), args being [request_id, success]
+        self.indexer_job_callback(int(args[0]), bool(args[1]), None)
+        return True, cxxd.service.REQUEST_DEFERRED
+
+    def __index_directory(self, cancelled, indexing_cost=None):
+        project_state = self.__get_project_state()
+
+        # Build-up a list of source code files from given project directory
+        cpp_file_list = get_cpp_file_list(self.root_directory, self.blacklisted_directories, self.recognized_file_extensions + self.extra_file_extensions)
+        success = self.__index_file_list(cpp_file_list, cancelled, rebuild_indexes=True, indexing_cost=indexing_cost)
+        if success:
+            self.__store_project_state(project_state)
+            self.indexing_cost_history = {} # Symbol db has the cost history of its own from now on
+        return success
+
+    def __reindex_directory(self, cancelled):
+        project_state = self.__get_project_state()
+        symbol_db = self.__create_symbol_db(self.symbol_db_path)
+        changed_files = self.__get_files_changed_since_last_indexing(symbol_db, project_state)
+        if changed_files is not None:
+            # Only the files git knows have changed need to be looked into, no matter how big the repository is
+            symbol_db.close()
+            success = self.__reindex_changed_files(cancelled, changed_files)
+        else:
+            # Rediscover the source code files and compare them against the fingerprints recorded in symbol database
             cpp_file_list = get_cpp_file_list(self.root_directory, self.blacklisted_directories, self.recognized_file_extensions + self.extra_file_extensions)
+            indexed_files = {symbol_db.get_file_filename(row) : row for row in symbol_db.fetch_all_files()}
+            success = self.__reindex_file_list(cpp_file_list, indexed_files, symbol_db, cancelled)
+        if success:
+            self.__store_project_state(project_state)
+        return success
+
+    def __get_project_state(self):
+        # Taken before indexing starts, so anything modified in the meantime is seen as changed on the next run
+        commit = self.git_repository.get_head()
+        dirty_files = self.git_repository.get_dirty_files() if commit else None
+        if commit is None or dirty_files is None:
+            return None
+        return {
+            'git_commit'         : commit,
+            'git_dirty_files'    : [remove_root_dir_from_filename(self.root_directory, filename) for filename in dirty_files if self.__is_file_watched(filename, False)],
+            'configuration_hash' : self.__get_configuration_hash(),
+        }
+
+    def __store_project_state(self, project_state):
+        symbol_db = SymbolDatabase(self.symbol_db_path)
+        if project_state is not None:
+            symbol_db.insert_metadata_entry('git_commit', project_state['git_commit'])
+            symbol_db.insert_metadata_entry('git_dirty_files', json.dumps(project_state['git_dirty_files']))
+            symbol_db.insert_metadata_entry('configuration_hash', project_state['configuration_hash'])
+        else:
+            symbol_db.delete_metadata_entry('git_commit') # Index is not in sync with any of the commits anymore
+        symbol_db.flush()
+        symbol_db.close()
+
+    def __get_files_changed_since_last_indexing(self, symbol_db, project_state):
+        # Files changed in between the indexed commit and the HEAD, the ones which are dirty now and the ones which
+        # were dirty at the time of indexing (their changes may have been reverted since). None if git cannot tell.
+        if project_state is None:
+            logging.info("'{0}' is not a git repository. Changes are found by looking into each of the files.".format(self.root_directory))
+            return None
+        indexed_commit = symbol_db.fetch_metadata('git_commit')
+        if indexed_commit is None:
+            return None
+        if symbol_db.fetch_metadata('configuration_hash') != project_state['configuration_hash']:
+            logging.info('Compiler args or indexer configuration have changed since the last indexing. All of the files have to be looked into.')
+            return None
+        changed_files = self.git_repository.get_changed_files(indexed_commit)
+        if changed_files is None:
+            return None
+        indexed_dirty_files = json.loads(symbol_db.fetch_metadata('git_dirty_files') or '[]')
+        changed_files = set(changed_files)
+        changed_files.update(os.path.join(self.root_directory, filename) for filename in project_state['git_dirty_files'] + indexed_dirty_files)
+        logging.info("{0} file(s) changed since commit {1} was indexed.".format(len(changed_files), indexed_commit))
+        return sorted(changed_files)
+
+    def __get_configuration_hash(self):
+        # Whatever may change the outcome of indexing across all of the files without git knowing anything about it
+        configuration = [
+            ' '.join(self.recognized_file_extensions + self.extra_file_extensions),
+            ' '.join(self.blacklisted_directories),
+            self.cxxd_config_parser.get_indexer_backend(),
+        ]
+        compiler_args_filename = self.parser.get_compiler_args_db().filename()
+        if compiler_args_filename and os.path.isfile(compiler_args_filename):
+            configuration.append(get_file_content_hash(compiler_args_filename))
+        return hashlib.sha1('\0'.join(configuration).encode('utf-8')).hexdigest()
+
+    def __index_shard(self, cancelled, shard_index, git_commit):
+        cpp_file_list = [
+            filename for filename in get_cpp_file_list(self.root_directory, self.blacklisted_directories, self.recognized_file_extensions + self.extra_file_extensions)
+                if get_shard_index(remove_root_dir_from_filename(self.root_directory, filename), self.num_of_shards) == shard_index
+        ]
+        logging.info("Starting to index {0} files of shard {1} ...".format(len(cpp_file_list), shard_index))
+        success = self.__index_file_list(cpp_file_list, cancelled)
+        if success and git_commit is not None:
+            # Shard is in sync with the files on the disk again so the git can be trusted with the rest of them as before
+            symbol_db = SymbolDatabase(self.symbol_db_path)
+            symbol_db.insert_metadata_entry('git_commit', git_commit)
+            symbol_db.flush()
+            symbol_db.close()
+        return success
+
+    def __reindex_changed_files(self, cancelled, paths, outdated_files=()):
+        # Same as re-indexing the directory but limited to the given paths. Directories (given with the trailing
+        # separator) may have been moved or removed as a whole, so everything below them is to be looked into.
+        # Outdated files are re-indexed even if they did not change themselves.
+        cpp_file_list, filenames, directories = [], set(), []
+        for path in paths:
+            if path.endswith(os.sep):
+                if os.path.isdir(path) and not CxxdConfigParser.is_file_blacklisted(self.blacklisted_directories, path):
+                    cpp_file_list.extend(get_cpp_file_list(path.rstrip(os.sep), self.blacklisted_directories, self.recognized_file_extensions + self.extra_file_extensions))
+                directories.append(remove_root_dir_from_filename(self.root_directory, path))
+            else:
+                if os.path.isfile(path) and self.__is_file_watched(path, False):
+                    cpp_file_list.append(path)
+                filenames.add(remove_root_dir_from_filename(self.root_directory, path))
+        cpp_file_list = list(dict.fromkeys(cpp_file_list))
+        symbol_db = self.__create_symbol_db(self.symbol_db_path)
+        directories = tuple(directories)
+        indexed_files = {
+            symbol_db.get_file_filename(row) : row for row in symbol_db.fetch_all_files()
+                if symbol_db.get_file_filename(row) in filenames or (directories and symbol_db.get_file_filename(row).startswith(directories))
+        }
+        return self.__reindex_file_list(cpp_file_list, indexed_files, symbol_db, cancelled, outdated_files)
+
+    def __reindex_file_list(self, cpp_file_list, indexed_files, symbol_db, cancelled, outdated_files=()):
+        # Cost history of changed files is needed for scheduling but it goes away together with their stale entries
+        indexing_cost = get_indexing_cost(symbol_db, indexed_files.values())
+        added, changed, touched, outdated = [], [], [], []
+        for filename in cpp_file_list:
+            if cancelled.is_set():
+                break
+            row = indexed_files.pop(remove_root_dir_from_filename(self.root_directory, filename), None)
+            if row is None:
+                added.append(filename)
+                continue
+            if filename in outdated_files:
+                # Headers it includes have already been re-indexed on their own (see __run_on_single_file())
+                outdated.append(filename)
+                continue
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue # File is gone in the meantime so it will be handled on the next run
+            compiler_args_hash = get_compiler_args_hash(self.parser.get_compiler_args_db().get(filename), self.root_directory)
+            if compiler_args_hash != symbol_db.get_file_compiler_args_hash(row):
+                changed.append(filename)
+            elif stat.st_mtime != symbol_db.get_file_mtime(row) or stat.st_size != symbol_db.get_file_size(row):
+                # Timestamp is not reliable enough (e.g. checkout of another branch and back), so look into the contents
+                content_hash = get_file_content_hash(filename)
+                if content_hash != symbol_db.get_file_hash(row):
+                    changed.append(filename)
+                else:
+                    touched.append((filename, stat, content_hash, compiler_args_hash, row,))
+        removed = list(indexed_files.keys())
+        if cancelled.is_set():
+            symbol_db.close()
+            return False
+
+        # Files including the changed (or removed) headers are indexed once again as well, even though they did not change
+        reindexed = set(added + changed + outdated)
+        dependent = outdated + [
+            filename for filename in self.__get_dependent_files(symbol_db, added + changed + [os.path.join(self.root_directory, filename) for filename in removed])
+                if filename not in reindexed
+        ]
+        changed.extend(dependent)
+
+        logging.info("Re-indexing {0}: {1} added, {2} changed ({3} of which only include the changed ones), {4} removed file(s).".format(
+            self.root_directory, len(added), len(changed), len(dependent), len(removed))
+        )
+
+        # Drop the stale entries. Fingerprints go away together with them so an interrupted re-index is continued on the next run.
+        for filename in removed:
+            symbol_db.delete_entry(filename)
+        for filename in changed:
+            symbol_db.delete_entry(remove_root_dir_from_filename(self.root_directory, filename))
+        if removed or changed:
+            symbol_db.delete_orphaned_entries()
+        for filename, stat, content_hash, compiler_args_hash, row in touched:
+            symbol_db.insert_file_entry(
+                remove_root_dir_from_filename(self.root_directory, filename),
+                stat.st_mtime, stat.st_size, content_hash, compiler_args_hash,
+                symbol_db.get_file_duration(row), symbol_db.get_file_symbol_count(row)
+            )
+        symbol_db.flush()
+        symbol_db.close()
+
+        if not added and not changed:
+            logging.info("Re-indexing {0} is completed. Nothing to be done.".format(self.root_directory))
+            return True
+        return self.__index_file_list(added + changed, cancelled, indexing_cost=indexing_cost)
 
-            # Load Balancing: Dynamic Work Stealing Scheduler
-            num_cores = multiprocessing.cpu_count()
-            logging.info(f"Starting Dynamic Load Balancing with {num_cores} workers for {len(cpp_file_list)} files.")
+    def __index_file_list(self, cpp_file_list, cancelled, rebuild_indexes=False, indexing_cost=None):
+        # We are running in the background so we cannot share the connection with the rest of the service. Use a dedicated one.
+        symbol_db = SymbolDatabase(self.symbol_db_path)
+        cpp_file_list = self.__skip_quarantined_files(symbol_db, cpp_file_list)
+        symbol_db.close()
 
-            # Start N interactive workers
-            workers = []
-            symbol_db_list = []
+        # Load Balancing: Dynamic Work Stealing Scheduler
+        workers = self.worker_pool.get_workers()
+        logging.info(f"Starting Dynamic Load Balancing with {len(workers)} workers for {len(cpp_file_list)} files.")
 
-            for worker_id in range(num_cores):
-                # Create per-worker DB
-                symbol_db_handle, symbol_db = create_empty_symbol_db(self.root_directory, self.symbol_db_name)
-                os.close(symbol_db_handle)
+        symbol_db_list, shard_files = [], {}
+        def open_symbol_db(worker):
+            symbol_db_handle, symbol_db = create_empty_symbol_db(self.root_directory, self.symbol_db_name)
+            os.close(symbol_db_handle)
+            if worker.request((IndexerWorkerRequestId.OPEN_SYMBOL_DB, symbol_db)):
                 symbol_db_list.append(symbol_db)
+                return True
+            os.remove(symbol_db)
+            return False
 
-                # Start worker
-                proc = start_indexing_subprocess(
-                    self.root_directory,
-                    self.parser.get_compiler_args_db().filename(),
-                    symbol_db,
-                    logging.getLoggerClass().root.handlers[0].baseFilename,
-                    worker_id + 1
-                )
-                workers.append(proc)
+        if self.num_of_shards:
+            # Each worker writes straight into the shard it has been handed over, together with all of the files which
+            # belong to it. No two workers ever write into the same shard so there is nothing to be merged at the end.
+            for filename in cpp_file_list:
+                shard_index = get_shard_index(remove_root_dir_from_filename(self.root_directory, filename), self.num_of_shards)
+                shard_files.setdefault(shard_index, []).append(filename)
+            index_file_request_id = IndexerWorkerRequestId.INDEX_SHARD
+        elif self.stream_results:
+            # Workers send their results back as they go and a single writer stores them into the symbol db
+            writer = IndexerResultsWriter(self.symbol_db_path)
+            writer.start()
+            index_file_request_id = IndexerWorkerRequestId.STREAM_FILE
+        else:
+            # Each worker records its results into its own temporary symbol db. They're merged together at the end.
+            for worker in list(workers):
+                if not open_symbol_db(worker):
+                    workers.remove(worker)
+            index_file_request_id = IndexerWorkerRequestId.INDEX_FILE
 
-            # Scheduler State
-            # Optimization: Sort files by size (descending) so largest files are processed first.
-            logging.info("Sorting files by size to optimize schedule...")
-            cpp_file_list.sort(key=lambda f: os.path.getsize(f) if os.path.exists(f) else 0, reverse=True)
+        # Scheduler State
+        # Optimization: Longest-processing-time-first. Files are ordered by their estimated indexing cost (descending)
+        # so that the most expensive ones are started first and the cheap ones fill the gaps towards the end.
+        estimated_cost, estimated_files = estimate_indexing_cost(cpp_file_list, self.root_directory, indexing_cost or {})
+        if shard_files:
+            # Shards are scheduled as a whole, by the cost of all of their files
+            estimated_cost = {shard_index : sum(estimated_cost[f] for f in files) for shard_index, files in shard_files.items()}
+            work_items = list(shard_files.keys())
+        else:
+            work_items = cpp_file_list
+        work_items.sort(key=lambda f: estimated_cost[f], reverse=True)
+        if estimated_files:
+            predicted_makespan = predict_makespan([estimated_cost[f] for f in work_items], len(workers))
+            logging.info(f"Scheduling by the cost history of {estimated_files} out of {len(cpp_file_list)} files. Predicted makespan: {predicted_makespan:.2f}s.")
+        else:
+            predicted_makespan = None
+            logging.info("No cost history available. Scheduling by file size.")
+        indexing_start = time.time()
 
-            pending_files = list(cpp_file_list) # Copy list
-            active_workers = list(workers)      # Workers currently running
-            idle_workers = list(workers)        # Workers ready for work
+        pending_files = list(work_items)    # Copy list
+        active_workers = list(workers)      # Workers currently running
+        idle_workers = list(workers)        # Workers ready for work
 
-            # Debug: Track what each worker is doing
-            worker_state = {} # worker_proc -> {'file': str, 'start_time': float}
-            completed_files = 0
-            total_files = len(cpp_file_list)
+        # Debug: Track what each worker is doing
+        worker_state = {} # worker -> {'file': str, 'start_time': float}
+        completed_files = 0
+        total_files = len(cpp_file_list)
 
-            # Helper to send work
-            def send_work(worker, filename):
-                try:
-                    # Write bytes to unbuffered stdin
-                    # Protocol: filename|completed_count|total_count
-                    msg = f"{filename}|{completed_files + 1}|{total_files}\n"
-                    worker.stdin.write(msg.encode('utf-8'))
-                    worker.stdin.flush()
-                    worker_state[worker] = {'file': filename, 'start_time': time.time()}
-                    logging.debug(f"Master: Sent {filename} to Worker {worker.args}")
-                    return True
-                except (BrokenPipeError, IOError):
-                    logging.error(f"Worker {worker.args} died unexpectedly.")
-                    if worker in worker_state:
-                         del worker_state[worker]
-                    return False
-
-            # Initial Fill: Give one file to each worker
-            while idle_workers and pending_files:
+        # Files which crashed (or hung) the worker are retried once, by another worker, and quarantined the second time
+        failures = collections.Counter()
+        quarantine = {} # filename -> reason
+
+        # Helper to send work
+        def send_work(worker, filename):
+            if shard_files:
+                progress = (completed_files + len(shard_files[filename])) / total_files * 100
+                logging.info(f"[Worker {worker.id}] Indexing: shard {filename} with {len(shard_files[filename])} files (Progress: {progress:.1f}%)")
+                request = (index_file_request_id, (get_shard_filename(self.symbol_db_path, filename), shard_files[filename]))
+            else:
+                progress = (completed_files + len(worker_state) + 1) / total_files * 100
+                logging.info(f"[Worker {worker.id}] Indexing: {filename} (Progress: {completed_files + len(worker_state) + 1}/{total_files} - {progress:.1f}%)")
+                request = (index_file_request_id, filename)
+            if worker.send(request):
+                worker_state[worker] = {'file': filename, 'start_time': time.time()}
+                return True
+            return False
+
+        # Helper to hand the pending work over to the idle workers, as many of them as the resources allow for
+        def dispatch():
+            worker_limit = self.resource_governor.get_worker_limit([worker.process.pid for worker in worker_state])
+            while idle_workers and pending_files and len(worker_state) < worker_limit:
                 worker = idle_workers.pop(0)
-                file_to_process = pending_files.pop(0)
-                if not send_work(worker, file_to_process):
+                work_item = pending_files.pop(0)
+                if not send_work(worker, work_item):
+                    pending_files.insert(0, work_item)
                     active_workers.remove(worker)
 
-            # Event Loop
-            # We monitor stdout of all active workers to see who finishes
-            logging.info("Master: Starting scheduler event loop")
-            while active_workers and (pending_files or len(idle_workers) < len(active_workers) or worker_state):
-                # Wait for any worker to say "DONE"
-                readable_pipes = [w.stdout for w in active_workers if w.stdout]
-                if not readable_pipes:
-                    break
-
-                # Timeout of 10s to log status if stuck
-                ready, _, _ = select.select(readable_pipes, [], [], 10.0)
-
-                if not ready:
-                    # Timeout! Log potentially stuck workers
-                    logging.warning(f"Master: Watchdog - Waiting for {len(active_workers)} workers. Pending files: {len(pending_files)}")
-                    now = time.time()
-                    for w, state in worker_state.items():
-                        elapsed = now - state['start_time']
-                        if elapsed > 30.0:
-                            logging.warning(f"  STUCK? Worker {w.args} parsing {state['file']} for {elapsed:.1f}s")
-                    continue
+        # Helper to replace the worker which crashed (or hung). Worker reports each of the files of the shard it has
+        # completed so the file it has failed on is the first one it has not.
+        def on_worker_failure(worker, reason):
+            nonlocal completed_files
+            work_item = worker_state.pop(worker)['file']
+            files = shard_files[work_item] if shard_files else [work_item]
+            completed, _ = worker.get_progress()
+            completed_files += min(completed, len(files))
+            if completed < len(files):
+                failed_file, remaining_files = files[completed], files[completed + 1:]
+                failures[failed_file] += 1
+                if failures[failed_file] == 1:
+                    logging.warning(f"Master: Worker {worker.id} {reason} while indexing {failed_file}. Retrying it.")
+                    remaining_files.insert(0, failed_file)
+                else:
+                    logging.error(f"Master: Worker {worker.id} {reason} while indexing {failed_file} again. File is quarantined.")
+                    quarantine[failed_file] = reason
+                    completed_files += 1
+                if remaining_files:
+                    if shard_files:
+                        shard_files[work_item] = remaining_files
+                    pending_files.insert(0, work_item)
+            active_workers.remove(worker)
+            workers.remove(worker)
+            replacement = self.worker_pool.replace(worker)
+            if replacement is None:
+                logging.error(f"Master: Worker {worker.id} could not be replaced. No spare workers left.")
+            elif index_file_request_id != IndexerWorkerRequestId.INDEX_FILE or open_symbol_db(replacement):
+                # Temporary symbol db of the failed worker holds all of the files it has completed so it is merged as well
+                logging.info(f"Master: Worker {worker.id} is replaced with worker {replacement.id}.")
+                workers.append(replacement)
+                active_workers.append(replacement)
+                idle_workers.append(replacement)
 
-                for stdout in ready:
-                    # Find which worker this is
-                    # (Slow linear search but N is small, <64 typically)
-                    worker = next((w for w in active_workers if w.stdout == stdout), None)
-                    if not worker:
-                        continue
-
-                    # Read the "DONE" message (binary)
-                    line = worker.stdout.readline()
-                    if not line: # EOF means worker died
-                        logging.warning(f"Master: Worker {worker.args} disconnected (EOF).")
-                        active_workers.remove(worker)
-                        if worker in worker_state:
-                             del worker_state[worker]
-                        continue
-
-                    # Worker finished a file
-                    if worker in worker_state:
-                        # elapsed = time.time() - worker_state[worker]['start_time']
-                        # logging.debug(f"Worker {worker.args} finished {worker_state[worker]['file']} in {elapsed:.2f}s")
-                        del worker_state[worker]
+        # Initial Fill: Give one file to each worker
+        dispatch()
 
-                    completed_files += 1
+        # Event Loop
+        # We monitor the connections of all active workers to see who finishes
+        logging.info("Master: Starting scheduler event loop")
+        last_activity = time.time()
+        while active_workers and (worker_state or pending_files):
+            if cancelled.is_set():
+                break
 
-                    # assign next or mark idle
-                    if pending_files:
-                        next_file = pending_files.pop(0)
-                        if not send_work(worker, next_file):
-                            active_workers.remove(worker)
-                    else:
-                        # No more work, remove from active set
-                        active_workers.remove(worker)
-                        # Close stdin to signal worker to exit gracefully
-                        try:
-                            worker.stdin.close()
-                        except:
-                            pass
-                        pass
-
-            # Work is done, shutdown all workers
-            for w in workers:
+            # Short timeout so that we can react to cancellation requests (and hung workers) in a timely manner. Even
+            # shorter one while the work is held back by the governor, to resume as soon as the resources allow for.
+            ready = wait_for_any(list(worker_state.keys()), 0.1 if idle_workers and pending_files else 1.0)
+
+            for worker in ready:
+                # Worker finished a file (or a shard)
                 try:
-                    if w.stdin:
-                        w.stdin.close() # Sends EOF, worker loop breaks
-                except:
-                    pass
-                w.wait() # Wait for clean exit
+                    response = worker.recv()
+                except (EOFError, OSError): # EOF means worker died
+                    on_worker_failure(worker, "crashed")
+                    continue
+                work_item = worker_state.pop(worker)['file']
+                if index_file_request_id == IndexerWorkerRequestId.STREAM_FILE and response:
+                    writer.write(response)
+
+                completed_files += len(shard_files[work_item]) if shard_files else 1
+                idle_workers.append(worker)
+
+            # Workers which are stuck on a single file for too long are considered to be hung
+            now = time.time()
+            for worker in list(worker_state.keys()):
+                _, started = worker.get_progress()
+                if now - started > self.file_timeout:
+                    on_worker_failure(worker, f"timed out after {self.file_timeout:g}s")
+
+            # assign next or mark idle
+            dispatch()
 
-            logging.info("Indexing completed.")
-            # Merge the results of indexing operations into the single symbol database
-            self.symbol_db.copy_all_entries_from(symbol_db_list)
+            if ready:
+                last_activity = now
+            elif now - last_activity >= 10.0:
+                logging.warning(f"Master: Watchdog - Waiting for {len(worker_state)} workers. Pending files: {len(pending_files)}")
+                last_activity = now
 
-            # Get rid of temporary symbol db's
-            for symbol_db in symbol_db_list:
+        unindexed_files = [f for work_item in pending_files for f in (shard_files[work_item] if shard_files else [work_item])]
+        if unindexed_files and not cancelled.is_set():
+            logging.error(f"Master: No workers left. {len(unindexed_files)} files are not indexed: {unindexed_files}")
+
+        # Work is done (or cancelled). Workers stay around for the next run, only the ones still busy with indexing
+        # get killed because there is no point in waiting for them. Pool will replace them on its next start.
+        for worker in workers:
+            if worker in worker_state:
+                worker.kill()
+            elif worker in active_workers and symbol_db_list:
+                worker.request((IndexerWorkerRequestId.CLOSE_SYMBOL_DB, None))
+
+        if index_file_request_id == IndexerWorkerRequestId.STREAM_FILE:
+            # Whatever has been indexed is kept, even on cancellation. Files which haven't made it have no
+            # fingerprint recorded so the next run on the directory picks them up.
+            writer.stop()
+
+        if not cancelled.is_set():
+            actual_makespan = time.time() - indexing_start
+            if predicted_makespan is not None:
+                logging.info(f"Indexing completed. Makespan: predicted {predicted_makespan:.2f}s, actual {actual_makespan:.2f}s.")
+            else:
+                logging.info(f"Indexing completed. Makespan: {actual_makespan:.2f}s.")
+            if symbol_db_list:
+                # Merge the results of indexing operations into the single symbol database. We are running in the
+                # background so we cannot share the connection with the rest of the service. Use a dedicated one.
+                symbol_db = SymbolDatabase(self.symbol_db_path)
+                symbol_db.copy_all_entries_from(symbol_db_list, rebuild_indexes)
+                symbol_db.close()
+
+        if quarantine:
+            # Quarantined files are skipped by the next runs, until either their contents or their compiler args change
+            symbol_db = SymbolDatabase(self.symbol_db_path)
+            for filename, reason in quarantine.items():
+                symbol_db.insert_quarantine_entry(remove_root_dir_from_filename(self.root_directory, filename), *self.__get_quarantine_fingerprint(filename), reason)
+            symbol_db.flush()
+            symbol_db.close()
+
+        # Get rid of temporary symbol db's
+        for symbol_db in symbol_db_list:
+            for filename in [symbol_db, symbol_db + '-wal', symbol_db + '-shm']:
                 try:
-                    os.remove(symbol_db)
+                    os.remove(filename)
                 except OSError:
                     pass
 
-            # TODO how to count total CPU time, for all sub-processes?
-            logging.info("Indexing {0} is completed.".format(self.root_directory))
-        else:
-            logging.info("Directory '{0}' already indexed ... ".format(self.root_directory))
-        return True, None
+        if cancelled.is_set():
+            logging.info("Indexing {0} is cancelled after {1}/{2} files.".format(self.root_directory, completed_files, total_files))
+            return False
+
+        if unindexed_files:
+            # Not recorded as completed so that the files left out are picked up again by the next run
+            logging.error("Indexing {0} is not completed. {1}/{2} files are indexed.".format(self.root_directory, completed_files, total_files))
+            return False
+
+        # TODO how to count total CPU time, for all sub-processes?
+        logging.info("Indexing {0} is completed.".format(self.root_directory))
+        return True
+
+    def __skip_quarantined_files(self, symbol_db, filenames):
+        # Files which crashed (or hung) the indexer are left out for as long as they are not modified. Otherwise they
+        # are taken out of the quarantine and given another chance.
+        quarantine = {symbol_db.get_quarantine_filename(row) : row for row in symbol_db.fetch_all_quarantined_files()}
+        if not quarantine:
+            return filenames
+        skipped_files = set()
+        for filename in filenames:
+            row = quarantine.get(remove_root_dir_from_filename(self.root_directory, filename))
+            if row is None:
+                continue
+            if self.__get_quarantine_fingerprint(filename) == (symbol_db.get_quarantine_hash(row), symbol_db.get_quarantine_compiler_args_hash(row)):
+                skipped_files.add(filename)
+            else:
+                symbol_db.delete_quarantine_entry(symbol_db.get_quarantine_filename(row))
+        symbol_db.flush()
+        if skipped_files:
+            logging.warning("Skipping {0} quarantined files which crashed (or hung) the indexer: {1}".format(len(skipped_files), sorted(skipped_files)))
+        return [filename for filename in filenames if filename not in skipped_files]
+
+    def __get_quarantine_fingerprint(self, filename):
+        try:
+            content_hash = get_file_content_hash(filename)
+        except OSError:
+            content_hash = None
+        return content_hash, get_compiler_args_hash(self.parser.get_compiler_args_db().get(filename), self.root_directory)
 
     def __drop_single_file(self, id, args):
         symbol_db_exists = self.symbol_db_exists()
@@ -273,25 +976,51 @@ class ClangIndexer():
             if not CxxdConfigParser.is_file_blacklisted(self.blacklisted_directories, filename):
                 self.symbol_db.open(self.symbol_db_path)
                 self.symbol_db.delete_entry(remove_root_dir_from_filename(self.root_directory, filename))
+                self.symbol_db.delete_quarantine_entry(remove_root_dir_from_filename(self.root_directory, filename))
+                # Git may not see it as changed so it has to be remembered to be picked up again on the next run
+                dirty_files = self.symbol_db.fetch_metadata('git_dirty_files')
+                if dirty_files is not None:
+                    self.symbol_db.insert_metadata_entry('git_dirty_files', json.dumps(json.loads(dirty_files) + [remove_root_dir_from_filename(self.root_directory, filename)]))
+                self.symbol_db.flush()
         else:
             logging.error('Action cannot be run if symbol database does not exist yet!')
         return symbol_db_exists, None
 
     def __drop_all(self, id, args):
+        if self.cancel_indexer_job():
+            logging.warning('Indexing in progress got cancelled because symbol database is about to be dropped.')
         symbol_db_exists = self.symbol_db_exists()
         if symbol_db_exists:
+            # Cost history goes away together with the entries, though the files are most likely to be indexed again
+            self.indexing_cost_history = self.__read_indexing_cost()
             delete_file_from_disk = bool(args[0])
             if delete_file_from_disk:
+                self.file_watcher.stop() # Nothing to keep up to date anymore until the directory is indexed again
                 self.symbol_db.close()
-                os.remove(self.symbol_db.filename)
+                remove_symbol_db_from_disk(self.symbol_db_path)
             else:
                 self.symbol_db.open(self.symbol_db_path)
                 self.symbol_db.delete_all_entries()
+                self.symbol_db.flush()
             logging.info('Indexer DB dropped.')
         else:
             logging.error('Action cannot be run if symbol database does not exist yet!')
         return symbol_db_exists, None
 
+    def __read_indexing_cost(self):
+        # Symbol db is read with the layout it has been created with, which is not the configured one once it changed
+        symbol_db = SymbolDatabase(self.symbol_db_path)
+        num_of_shards = int(symbol_db.fetch_metadata('shards') or 0)
+        if num_of_shards:
+            symbol_db.close()
+            symbol_db = ShardedSymbolDatabase(self.symbol_db_path, num_of_shards)
+        try:
+            return get_indexing_cost(symbol_db, symbol_db.fetch_all_files())
+        except IndexError:
+            return {} # Files recorded by the schema which cannot be migrated may come without the cost
+        finally:
+            symbol_db.close()
+
     def __find_all_references(self, id, args):
         tunit, cursor, references = None, None, []
         if self.symbol_db_exists():
@@ -305,12 +1034,13 @@ class ClangIndexer():
                 #      contrast contains an original filename).
                 usr = cursor.referenced.get_usr() if cursor.referenced else cursor.get_usr()
                 self.symbol_db.open(self.symbol_db_path)
-                for ref in self.symbol_db.fetch_symbols_by_usr(usr):
+                refs = self.symbol_db.fetch_symbols_by_usr(usr)
+                for ref, context in zip(refs, self.__read_contexts(refs)):
                     references.append([
                         os.path.join(self.root_directory, self.symbol_db.get_symbol_filename(ref)),
                         self.symbol_db.get_symbol_line(ref),
                         self.symbol_db.get_symbol_column(ref),
-                        self.symbol_db.get_symbol_context(ref)
+                        context
                     ])
                 logging.info("Find-all-references operation completed for '{0}', [{1}, {2}], '{3}'".format(
                     cursor.displayname, cursor.location.line, cursor.location.column, tunit.spelling)
@@ -320,32 +1050,122 @@ class ClangIndexer():
             logging.error('Action cannot be run if symbol database does not exist yet!')
         return tunit is not None and cursor is not None, references
 
+    def __read_contexts(self, rows):
+        # Source code lines the symbols are found at, in the order of the symbol rows. Each of the files is read only
+        # once, going straight to the lines by the offsets recorded at indexing time unless the file changed since.
+        lines = collections.OrderedDict()
+        for row in rows:
+            lines.setdefault(self.symbol_db.get_symbol_filename(row), set()).add(self.symbol_db.get_symbol_line(row))
+        line_offsets = {
+            self.symbol_db.get_file_filename(row): row for row in self.symbol_db.fetch_line_offsets(list(lines.keys()))
+        }
+        contexts = {}
+        for filename, file_lines in lines.items():
+            abs_filename, offsets = os.path.join(self.root_directory, filename), None
+            if filename in line_offsets:
+                try:
+                    stat, row = os.stat(abs_filename), line_offsets[filename]
+                    if stat.st_mtime == self.symbol_db.get_file_mtime(row) and stat.st_size == self.symbol_db.get_file_size(row):
+                        offsets = decode_line_offsets(self.symbol_db.get_file_line_offsets(row))
+                except OSError:
+                    pass # File is gone, which is reported once it is read
+            for line, context in read_source_lines(abs_filename, file_lines, offsets).items():
+                contexts[(filename, line)] = context
+        return [contexts.get((self.symbol_db.get_symbol_filename(row), self.symbol_db.get_symbol_line(row)), '') for row in rows]
+
     def __fetch_all_diagnostics(self, id, args):
         diagnostics = []
         db_exists = self.symbol_db_exists()
         if db_exists:
             self.symbol_db.open(self.symbol_db_path)
-            for diag in self.symbol_db.fetch_all_diagnostics(int(args[0])):
-                diagnostics.append([
-                    os.path.join(self.root_directory, self.symbol_db.get_diagnostics_filename(diag)),
-                    self.symbol_db.get_diagnostics_line(diag),
-                    self.symbol_db.get_diagnostics_column(diag),
-                    self.symbol_db.get_diagnostics_description(diag),
-                    self.symbol_db.get_diagnostics_severity(diag)
-                ])
-                for detail in self.symbol_db.fetch_diagnostics_details(self.symbol_db.get_diagnostics_id(diag)):
-                    diagnostics.append([
-                        os.path.join(self.root_directory, self.symbol_db.get_diagnostics_details_filename(detail)),
-                        self.symbol_db.get_diagnostics_details_line(detail),
-                        self.symbol_db.get_diagnostics_details_column(detail),
-                        self.symbol_db.get_diagnostics_details_description(detail),
-                        self.symbol_db.get_diagnostics_details_severity(detail)
-                    ])
+            for diag, details in self.symbol_db.fetch_all_diagnostics_with_details(int(args[0])):
+                diagnostics.append(self.__to_diagnostics_result(diag))
+                diagnostics.extend(self.__to_diagnostics_details_result(detail) for detail in details)
             logging.debug("\n{0}".format('\n'.join(str(diag) for diag in diagnostics)))
         else:
             logging.error('Action cannot be run if symbol database does not exist yet!')
         return db_exists, diagnostics
 
+    def __fetch_diagnostics(self, id, args):
+        cursor, page_size, num_of_pages, filename_prefix, min_severity, description = args
+        return self.__fetch_pages(
+            id, str(cursor), int(page_size), int(num_of_pages),
+            lambda cursor, page_size: self.symbol_db.fetch_diagnostics_page(
+                cursor, page_size, self.__to_relative_filename_prefix(str(filename_prefix)), int(min_severity), str(description)
+            ),
+            lambda diagnostics: self.__to_diagnostics_result(diagnostics[0]) + [
+                [self.__to_diagnostics_details_result(detail) for detail in diagnostics[1]]
+            ]
+        )
+
+    def __to_diagnostics_result(self, diag):
+        return [
+            os.path.join(self.root_directory, self.symbol_db.get_diagnostics_filename(diag)),
+            self.symbol_db.get_diagnostics_line(diag),
+            self.symbol_db.get_diagnostics_column(diag),
+            self.symbol_db.get_diagnostics_description(diag),
+            self.symbol_db.get_diagnostics_severity(diag)
+        ]
+
+    def __to_diagnostics_details_result(self, detail):
+        return [
+            os.path.join(self.root_directory, self.symbol_db.get_diagnostics_details_filename(detail)),
+            self.symbol_db.get_diagnostics_details_line(detail),
+            self.symbol_db.get_diagnostics_details_column(detail),
+            self.symbol_db.get_diagnostics_details_description(detail),
+            self.symbol_db.get_diagnostics_details_severity(detail)
+        ]
+
+    def __fetch_definitions(self, id, args):
+        cursor, page_size, num_of_pages, filename_prefix, kind, name = args
+        kinds = [
+            cursor_kind.value for cursor_kind in clang.cindex.CursorKind.get_all_kinds() if ClangParser.to_ast_node_id(cursor_kind) == str(kind)
+        ] if kind else None
+        return self.__fetch_pages(
+            id, str(cursor), int(page_size), int(num_of_pages),
+            lambda cursor, page_size: self.__with_contexts(self.symbol_db.fetch_definitions_page(
+                cursor, page_size, self.__to_relative_filename_prefix(str(filename_prefix)), kinds, str(name)
+            )),
+            lambda definition: [
+                os.path.join(self.root_directory, self.symbol_db.get_symbol_filename(definition[0])),
+                self.symbol_db.get_symbol_line(definition[0]),
+                self.symbol_db.get_symbol_column(definition[0]),
+                definition[1],
+                self.symbol_db.get_symbol_name(definition[0]),
+                ClangParser.to_ast_node_id(clang.cindex.CursorKind.from_id(self.symbol_db.get_symbol_kind(definition[0])))
+            ]
+        )
+
+    def __with_contexts(self, page):
+        rows, next_cursor = page
+        return list(zip(rows, self.__read_contexts(rows))), next_cursor
+
+    def __fetch_pages(self, id, cursor, page_size, num_of_pages, fetch_page, to_result):
+        # Pages come as [results, next_cursor], next_cursor being None after the last page. Each but the last page
+        # fetched is reported through the plugin right away so that the frontend does not have to wait for the whole
+        # project to be fetched. Last page is the result of the request. Zero num_of_pages fetches all of them.
+        if not self.symbol_db_exists():
+            logging.error('Action cannot be run if symbol database does not exist yet!')
+            return False, None
+        if page_size < 1:
+            logging.error('Invalid page size {0}.'.format(page_size))
+            return False, None
+        self.symbol_db.open(self.symbol_db_path)
+        num_of_pages_fetched = 0
+        while True:
+            rows, cursor = fetch_page(cursor, page_size)
+            page = [[to_result(row) for row in rows], cursor]
+            num_of_pages_fetched += 1
+            if cursor is None or num_of_pages_fetched == num_of_pages or self.indexer_job_callback is None:
+                logging.info("Fetched {0} page(s) of results. Next cursor: '{1}'.".format(num_of_pages_fetched, cursor))
+                return True, page
+            self.indexer_job_callback(id, True, page)
+
+    def __to_relative_filename_prefix(self, filename_prefix):
+        if os.path.isabs(filename_prefix):
+            return remove_root_dir_from_filename(self.root_directory, filename_prefix)
+        return filename_prefix
+
     def __fetch_all_definitions(self, id, args):
         # Determine output file path
         if args and len(args) > 0:
@@ -361,12 +1181,15 @@ class ClangIndexer():
                 count = 0
                 # 128KB - buffer writes to minimize syscalls - nr. of symbols will be potentially large
                 with open(output_file_path, 'w', buffering=128*1024) as f:
-                    for relative_filename, line, column, context in self.symbol_db.fetch_all_definitions_raw():
+                    # Definitions come grouped by the file so that contexts are read from one file at a time
+                    for relative_filename, definitions in itertools.groupby(self.symbol_db.fetch_all_definitions_raw(), key=lambda row: row[0]):
                         # In the DB, 'filename' is relative. Construct absolute.
                         abs_filename = os.path.join(self.root_directory, relative_filename)
-                        text = context.strip() if context else ''
-                        f.write(f"{text}\t{abs_filename}:{line}:{column}\n")
-                        count += 1
+                        definitions = list(definitions)
+                        for (_, line, column, _), context in zip(definitions, self.__read_contexts(definitions)):
+                            text = context.strip() if context else ''
+                            f.write(f"{text}\t{abs_filename}:{line}:{column}\n")
+                            count += 1
                 logging.info(f"__fetch_all_definitions streamed {count} definitions to {output_file_path}")
                 return True, [output_file_path] 
             except Exception as e:
@@ -376,49 +1199,256 @@ class ClangIndexer():
             logging.error('Action cannot be run if symbol database does not exist yet!')
         return db_exists, None
 
-def index_interactive(root_directory, compiler_args_filename, output_db_filename, worker_id):
-    symbol_db = SymbolDatabase(output_db_filename)
-    symbol_db.create_data_model()
-    cxxd_config_parser = CxxdConfigParser(os.path.join(root_directory, '.cxxd_config.json'), root_directory)
-    parser = ClangParser(compiler_args_filename, TranslationUnitCache(NoCache()), cxxd_config_parser.get_clang_library_file())
+    def __find_symbols(self, id, args):
+        symbols = []
+        query, limit = str(args[0]).strip(), int(args[1])
+        db_exists = self.symbol_db_exists()
+        if db_exists and query:
+            self.symbol_db.open(self.symbol_db_path)
+            start = time.time()
+            for symbol in self.symbol_db.fetch_symbols_by_name(query, limit):
+                symbols.append([
+                    self.symbol_db.get_symbol_name(symbol),
+                    self.symbol_db.get_symbol_qualified_name(symbol),
+                    ClangParser.to_ast_node_id(clang.cindex.CursorKind.from_id(self.symbol_db.get_symbol_kind(symbol))),
+                    os.path.join(self.root_directory, self.symbol_db.get_symbol_filename(symbol)),
+                    self.symbol_db.get_symbol_line(symbol),
+                    self.symbol_db.get_symbol_column(symbol)
+                ])
+            logging.info("Found {0} symbol(s) matching '{1}' in {2:.1f} ms.".format(len(symbols), query, (time.time() - start) * 1000))
+            logging.debug("\n{0}".format('\n'.join(str(symbol) for symbol in symbols)))
+        elif not db_exists:
+            logging.error('Action cannot be run if symbol database does not exist yet!')
+        return db_exists and bool(query), symbols
+
+    def __find_incoming_calls(self, id, args):
+        return self.__find_related_symbols(
+            args, 'Find-incoming-calls',
+            lambda usr: self.symbol_db.fetch_symbol_references(usr, SymbolReferenceRole.CALL),
+            self.symbol_db.get_symbol_reference_container_usr
+        )
 
-    worker_prefix = f"[Worker {worker_id}] " if worker_id else ""
-    logging.info(f"{worker_prefix}Interactive worker started.")
-    while True:
-        try:
-            line = sys.stdin.readline()
-            if not line:
+    def __find_outgoing_calls(self, id, args):
+        return self.__find_related_symbols(
+            args, 'Find-outgoing-calls',
+            lambda usr: self.symbol_db.fetch_symbol_references_by_container(usr, SymbolReferenceRole.CALL),
+            self.symbol_db.get_symbol_usr
+        )
+
+    def __find_supertypes(self, id, args):
+        return self.__find_related_symbols(
+            args, 'Find-supertypes',
+            lambda usr: self.symbol_db.fetch_symbol_references_by_container(usr, SymbolReferenceRole.BASE_SPECIFIER | SymbolReferenceRole.OVERRIDE),
+            self.symbol_db.get_symbol_usr
+        )
+
+    def __find_subtypes(self, id, args):
+        return self.__find_related_symbols(
+            args, 'Find-subtypes',
+            lambda usr: self.symbol_db.fetch_symbol_references(usr, SymbolReferenceRole.BASE_SPECIFIER | SymbolReferenceRole.OVERRIDE),
+            self.symbol_db.get_symbol_reference_container_usr
+        )
+
+    def __find_related_symbols(self, args, operation, fetch_references, get_related_usr):
+        # Symbols related to the one under the cursor (e.g. its callers), each one together with the list of references
+        # the relation comes from (e.g. the call sites). Everything is read from the symbol database, including the
+        # declarations of the related symbols, which are looked up all at once.
+        tunit, cursor, symbols = None, None, []
+        if self.symbol_db_exists():
+            tunit = self.parser.parse(str(args[0]), str(args[0]))
+            cursor = self.parser.get_cursor(tunit, int(args[1]), int(args[2]))
+            if cursor:
+                usr = cursor.referenced.get_usr() if cursor.referenced else cursor.get_usr()
+                self.symbol_db.open(self.symbol_db_path)
+                start = time.time()
+                references, refs = collections.OrderedDict(), fetch_references(usr)
+                for ref, context in zip(refs, self.__read_contexts(refs)):
+                    references.setdefault(get_related_usr(ref), []).append([
+                        os.path.join(self.root_directory, self.symbol_db.get_symbol_filename(ref)),
+                        self.symbol_db.get_symbol_line(ref),
+                        self.symbol_db.get_symbol_column(ref),
+                        context
+                    ])
+                declarations = {
+                    self.symbol_db.get_symbol_usr(declaration): declaration
+                        for declaration in self.symbol_db.fetch_symbol_declarations(list(references.keys()))
+                }
+                for related_usr, related_references in references.items():
+                    declaration = declarations.get(related_usr)
+                    symbols.append([
+                        self.symbol_db.get_symbol_name(declaration) or '',
+                        self.symbol_db.get_symbol_qualified_name(declaration) or '',
+                        ClangParser.to_ast_node_id(clang.cindex.CursorKind.from_id(self.symbol_db.get_symbol_kind(declaration))),
+                        os.path.join(self.root_directory, self.symbol_db.get_symbol_filename(declaration)),
+                        self.symbol_db.get_symbol_line(declaration),
+                        self.symbol_db.get_symbol_column(declaration),
+                        related_usr,
+                        related_references
+                    ] if declaration else [
+                        '', '', ASTNodeId.getUnsupportedId(), '', 0, 0, related_usr, related_references
+                    ])
+                logging.info("{0} operation completed for '{1}', [{2}, {3}], '{4}' in {5:.1f} ms. Found {6} symbol(s).".format(
+                    operation, cursor.displayname, cursor.location.line, cursor.location.column, tunit.spelling,
+                    (time.time() - start) * 1000, len(symbols))
+                )
+            logging.debug("\n{0}".format('\n'.join(str(symbol) for symbol in symbols)))
+        else:
+            logging.error('Action cannot be run if symbol database does not exist yet!')
+        return tunit is not None and cursor is not None, symbols
+
+    def __find_includers(self, id, args):
+        includers = []
+        db_exists = self.symbol_db_exists()
+        if db_exists:
+            filename = str(args[0])
+            self.symbol_db.open(self.symbol_db_path)
+            for include in self.symbol_db.fetch_includers(remove_root_dir_from_filename(self.root_directory, filename)):
+                includers.append([
+                    os.path.join(self.root_directory, self.symbol_db.get_include_filename(include)),
+                    self.symbol_db.get_include_line(include)
+                ])
+            logging.info("Found {0} file(s) including '{1}'.".format(len(includers), filename))
+            logging.debug("\n{0}".format('\n'.join(str(includer) for includer in includers)))
+        else:
+            logging.error('Action cannot be run if symbol database does not exist yet!')
+        return db_exists, includers
+
+    def __find_transitive_includers(self, id, args):
+        includers = []
+        db_exists = self.symbol_db_exists()
+        if db_exists:
+            filename = str(args[0])
+            self.symbol_db.open(self.symbol_db_path)
+            start = time.time()
+            for includer in self.symbol_db.fetch_transitive_includers([remove_root_dir_from_filename(self.root_directory, filename)]):
+                includers.append(os.path.join(self.root_directory, includer))
+            logging.info("Found {0} file(s) including '{1}', directly or not, in {2:.1f} ms.".format(len(includers), filename, (time.time() - start) * 1000))
+            logging.debug("\n{0}".format('\n'.join(includers)))
+        else:
+            logging.error('Action cannot be run if symbol database does not exist yet!')
+        return db_exists, includers
+
+class IndexerResultsWriter():
+    """
+    Stores the results streamed by the indexer workers into the symbol database, from a single thread and through its
+    own connection. Results are committed in large transactions, as they arrive, so that whatever has been indexed so
+    far can already be queried while the indexing is still in progress.
+    """
+
+    def __init__(self, symbol_db_filename, max_files_per_transaction=500, max_seconds_per_transaction=1.0):
+        self.symbol_db_filename = symbol_db_filename
+        self.max_files_per_transaction = max_files_per_transaction
+        self.max_seconds_per_transaction = max_seconds_per_transaction
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.__run, name='cxxd-indexer-writer', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def write(self, results):
+        self.queue.put(results)
+
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def __run(self):
+        symbol_db = SymbolDatabase(self.symbol_db_filename)
+        files_in_transaction, transaction_start = 0, time.time()
+        while True:
+            try:
+                results = self.queue.get(timeout=self.max_seconds_per_transaction)
+            except queue.Empty:
+                results = False
+            if results is None:
                 break
+            if results:
+                try:
+                    store_single_file(symbol_db, results)
+                except:
+                    logging.error(sys.exc_info())
+                files_in_transaction += 1
+            if files_in_transaction and (files_in_transaction >= self.max_files_per_transaction or
+                    time.time() - transaction_start >= self.max_seconds_per_transaction):
+                symbol_db.flush()
+                files_in_transaction, transaction_start = 0, time.time()
+            elif not files_in_transaction:
+                transaction_start = time.time()
+        symbol_db.flush()
+        symbol_db.close()
 
-            # Protocol: filename|completed_count|total_count
-            parts = line.strip().split('|')
-            filename = parts[0]
-            completed = int(parts[1])
-            total = int(parts[2])
-            pct = (completed / total * 100) if total > 0 else 0.0
-            logging.info(f"{worker_prefix}Indexing: {filename} (Progress: {completed}/{total} - {pct:.1f}%)")
+class IndexerWorker():
+    """
+    Request handler running inside of the indexer worker process. Worker records the results into the symbol database
+    it has been handed over, one per indexing run, so that the workers do not compete with each other for the write-lock.
+    """
 
-            if not filename:
-                continue
+    def __init__(self, parser, root_directory, indexer_backend, niceness=0):
+        # Indexing gives way to the editor, and to the rest of the system
+        lower_process_priority(niceness)
+        # Parser and its compiler args are inherited from the service. Translation units cached by the service are of no
+        # use to the worker, and neither is caching them for the worker itself since each file is parsed only once.
+        # Nor is it worth saving the translation unit of each file in the project into the AST cache.
+        self.parser = copy.copy(parser)
+        self.parser.tunit_cache = TranslationUnitCache(NoCache())
+        self.parser.ast_cache = None
+        self.root_directory = root_directory
+        self.index_file = get_single_file_indexer(self.parser, indexer_backend)
+        self.symbol_db = None
+        self.op = {
+            IndexerWorkerRequestId.OPEN_SYMBOL_DB  : self.__open_symbol_db,
+            IndexerWorkerRequestId.INDEX_FILE      : self.__index_file,
+            IndexerWorkerRequestId.CLOSE_SYMBOL_DB : self.__close_symbol_db,
+            IndexerWorkerRequestId.STREAM_FILE     : self.__stream_file,
+            IndexerWorkerRequestId.INDEX_SHARD     : self.__index_shard,
+        }
 
-            index_single_file(parser, root_directory, filename, symbol_db)
+    def __call__(self, request):
+        id, args = request
+        return self.op[id](args)
 
-            # Signal completion to master
-            print("DONE", flush=True)
+    def __open_symbol_db(self, filename):
+        self.__close_symbol_db(None)
+        self.symbol_db = SymbolDatabase(filename)
+        self.symbol_db.create_data_model()
+        return True
 
-        except Exception as e:
-            logging.error(f"{worker_prefix}Error in interactive loop: {e}")
-            # Even on error, signal done so master doesn't hang (maybe with error code?)
-            # For now, just DONE to keep going.
-            print("DONE", flush=True)
-    symbol_db.close()
-    logging.info(f"{worker_prefix}Interactive worker finished.")
+    def __index_file(self, filename):
+        try:
+            return index_single_file(self.parser, self.root_directory, filename, self.symbol_db, self.index_file)
+        finally:
+            release_memory()
 
-def indexer_visitor(ast_node, ast_parent_node, args):
-    def extract_cursor_context(filename, line):
-        return linecache.getline(filename, line)
+    def __stream_file(self, filename):
+        try:
+            return extract_single_file(self.parser, self.root_directory, filename, self.index_file)
+        finally:
+            release_memory()
 
-    parser, symbol_db, root_directory, symbol_batch = args
+    def __index_shard(self, args):
+        # Shard is committed every once in a while so that its contents can already be used while it is being indexed
+        shard_filename, filenames = args
+        symbol_db = SymbolDatabase(shard_filename)
+        last_flush = time.time()
+        for filename in filenames:
+            index_single_file(self.parser, self.root_directory, filename, symbol_db, self.index_file)
+            release_memory()
+            report_progress()
+            if time.time() - last_flush >= 1.0:
+                symbol_db.flush()
+                last_flush = time.time()
+        symbol_db.flush()
+        symbol_db.close()
+        return len(filenames)
+
+    def __close_symbol_db(self, args):
+        if self.symbol_db:
+            self.symbol_db.close()
+            self.symbol_db = None
+        return True
+
+def indexer_visitor(ast_node, ast_parent_node, args):
+    parser, symbol_db, root_directory, symbol_batch, symbol_names, symbol_references, reference_context = args
     ast_node_location = ast_node.location
     ast_node_tunit_spelling = ast_node.translation_unit.spelling
     ast_node_referenced = ast_node.referenced
@@ -428,67 +1458,322 @@ def indexer_visitor(ast_node, ast_parent_node, args):
         line = int(parser.get_ast_node_line(ast_node))
         column = int(parser.get_ast_node_column(ast_node))
         if id in ClangIndexer.supported_ast_node_ids:
+            filename = remove_root_dir_from_filename(root_directory, ast_node_tunit_spelling)
             symbol_batch.append((
-                remove_root_dir_from_filename(root_directory, ast_node_tunit_spelling),
+                filename,
                 line,
                 column,
                 usr,
-                extract_cursor_context(ast_node_tunit_spelling, line),
+                None, # Context is read from the file when asked for
                 ast_node_referenced._kind_id if ast_node_referenced else ast_node._kind_id,
                 ast_node.is_definition()
             ))
+            if usr and ast_node._kind_id in DECLARATION_CURSOR_KINDS:
+                symbol_names.append((filename, line, usr, ast_node.spelling, get_qualified_name(ast_node)))
+            if usr:
+                reference_context.visit(ast_node, ast_parent_node, ast_node_referenced, filename, line, column, usr, symbol_references)
         return ChildVisitResult.RECURSE.value  # If we are positioned in TU of interest, then we'll traverse through all descendants
     return ChildVisitResult.CONTINUE.value  # Otherwise, we'll skip to the next sibling
 
-def index_single_file(parser, root_directory, filename, symbol_db):
-    logging.debug("Indexing a file '{0}' ... ".format(filename))
+class ReferenceContext():
+    """
+    Works out the roles of the references (see SymbolReferenceRole) while the indexer_visitor() walks the translation
+    unit. Function definitions are entered and left in the order of their location, which is all it takes to tell the
+    function (i.e. the caller) the reference is made from. Callee of the call expression is its first child, possibly
+    wrapped into the implicit conversions, so it is always the next one to be visited. Constructor calls come without
+    the callee and are recorded at the call expression itself, unless the constructor is an implicit one.
+    """
+
+    def __init__(self):
+        self.functions = [] # (usr, end of the body) of the function definitions we are in, the innermost one last
+        self.call = None    # (callee usr, cursor) of the call expression whose callee is yet to be visited
+
+    def visit(self, ast_node, ast_parent_node, ast_node_referenced, filename, line, column, usr, symbol_references):
+        kind = ast_node._kind_id
+        while self.functions and (line, column) > self.functions[-1][1]:
+            self.functions.pop()
+        caller = self.functions[-1][0] if self.functions else None
+        call, self.call = self.call, None
+        if kind == clang.cindex.CursorKind.CALL_EXPR.value:
+            if ast_node_referenced and ast_node_referenced._kind_id == clang.cindex.CursorKind.CONSTRUCTOR.value:
+                if caller and ast_node_referenced.location != ast_node_referenced.semantic_parent.location:
+                    symbol_references.append((filename, line, column, usr, caller, SymbolReferenceRole.CALL))
+            elif ast_node_referenced and ast_node_referenced._kind_id in FUNCTION_CURSOR_KINDS:
+                self.call = (usr, ast_node)
+        elif call and ast_parent_node == call[1]:
+            if kind == clang.cindex.CursorKind.UNEXPOSED_EXPR.value:
+                self.call = (call[0], ast_node)
+            elif caller and usr == call[0] and kind in (clang.cindex.CursorKind.DECL_REF_EXPR.value, clang.cindex.CursorKind.MEMBER_REF_EXPR.value):
+                symbol_references.append((filename, line, column, usr, caller, SymbolReferenceRole.CALL))
+        if kind == clang.cindex.CursorKind.MEMBER_REF_EXPR.value:
+            if caller and ast_node_referenced and ast_node_referenced._kind_id == clang.cindex.CursorKind.FIELD_DECL.value:
+                role = get_member_access_role(ast_parent_node)
+                if role:
+                    symbol_references.append((filename, line, column, usr, caller, role))
+        elif kind == clang.cindex.CursorKind.MEMBER_REF.value:
+            if caller and ast_node_referenced and ast_node_referenced._kind_id == clang.cindex.CursorKind.FIELD_DECL.value:
+                symbol_references.append((filename, line, column, usr, caller, SymbolReferenceRole.WRITE)) # member initializer
+        elif kind == clang.cindex.CursorKind.CXX_BASE_SPECIFIER.value:
+            symbol_references.append((filename, line, column, usr, ast_parent_node.get_usr(), SymbolReferenceRole.BASE_SPECIFIER))
+        elif kind in FUNCTION_CURSOR_KINDS:
+            if kind == clang.cindex.CursorKind.CXX_METHOD.value and ast_node.is_virtual_method():
+                for overridden_usr in get_overridden_usrs(ast_node):
+                    symbol_references.append((filename, line, column, overridden_usr, usr, SymbolReferenceRole.OVERRIDE))
+            if ast_node.is_definition():
+                end = ast_node.extent.end
+                self.functions.append((usr, (end.line, end.column)))
+
+def get_member_access_role(ast_parent_node):
+    # Operand which is read from is always converted from the lvalue to the rvalue first, i.e. wrapped into the
+    # implicit cast expression. Left-hand side of the assignment and the operand of the increment, the decrement and
+    # the address-of operators are not.
+    parent_kind = ast_parent_node._kind_id
+    if parent_kind == clang.cindex.CursorKind.BINARY_OPERATOR.value:
+        return SymbolReferenceRole.WRITE
+    if parent_kind == clang.cindex.CursorKind.COMPOUND_ASSIGNMENT_OPERATOR.value:
+        return SymbolReferenceRole.READ | SymbolReferenceRole.WRITE
+    if parent_kind == clang.cindex.CursorKind.UNARY_OPERATOR.value:
+        if get_unary_operator_kind(ast_parent_node) == CX_UNARY_OPERATOR_ADDR_OF:
+            return 0
+        return SymbolReferenceRole.READ | SymbolReferenceRole.WRITE
+    return SymbolReferenceRole.READ
+
+def get_unary_operator_kind(cursor):
+    # TODO Shall be removed once 'cindex.py' exposes it in its interface. Only available from libclang 17 onwards.
+    if hasattr(clang.cindex.conf.lib, 'clang_getCursorUnaryOperatorKind'):
+        return clang.cindex.conf.lib.clang_getCursorUnaryOperatorKind(cursor)
+    return None
+
+def get_overridden_usrs(cursor):
+    # USRs of the methods the given one directly overrides
+    # TODO Shall be removed once 'cindex.py' exposes it in its interface.
+    overridden, num_overridden = POINTER(clang.cindex.Cursor)(), c_uint()
+    clang.cindex.conf.lib.clang_getOverriddenCursors(cursor, byref(overridden), byref(num_overridden))
+    if not overridden:
+        return []
+    try:
+        return [clang.cindex.conf.lib.clang_getCursorUSR(overridden[i]) for i in range(num_overridden.value)]
+    finally:
+        clang.cindex.conf.lib.clang_disposeOverriddenCursors(overridden)
+
+def get_qualified_name(cursor):
+    # Spelling of the cursor prefixed with the spellings of the namespaces and the classes it is nested in. Anonymous
+    # ones are left out.
+    names = []
+    while cursor is not None and cursor._kind_id != clang.cindex.CursorKind.TRANSLATION_UNIT.value:
+        spelling = cursor.spelling
+        if spelling:
+            names.append(spelling)
+        cursor = cursor.semantic_parent
+    return '::'.join(reversed(names))
+
+def visit_single_file(parser, root_directory, filename):
+    symbol_batch, symbol_names, symbol_references = [], [], []
     tunit = parser.parse(filename, filename)
     if tunit:
-        symbol_batch = []
-        parser.traverse(tunit.cursor, [parser, symbol_db, root_directory, symbol_batch], indexer_visitor)
-        if symbol_batch:
-            symbol_db.insert_symbol_entries_batch(symbol_batch)
-        store_tunit_diagnostics(tunit.diagnostics, symbol_db, root_directory)
+        parser.traverse(
+            tunit.cursor, [parser, None, root_directory, symbol_batch, symbol_names, symbol_references, ReferenceContext()], indexer_visitor
+        )
+    return tunit, symbol_batch, symbol_names, symbol_references
+
+def get_single_file_indexer(parser, backend):
+    # Returns a callable with the signature of visit_single_file() implementing the given indexer backend
+    if backend == 'index-action':
+        from cxxd.services.source_code_model.indexer.clang_index_action import ClangIndexAction
+        supported_cursor_kinds = set(
+            kind.value for kind in clang.cindex.CursorKind.get_all_kinds()
+                if ClangParser.to_ast_node_id(kind) in ClangIndexer.supported_ast_node_ids
+        )
+        return ClangIndexAction(parser, supported_cursor_kinds)
+    return visit_single_file
+
+def extract_single_file(parser, root_directory, filename, index_file=visit_single_file):
+    # Returns everything there is to be stored about the file into the symbol db, as plain tuples so that it can be
+    # sent over from the worker: (filename, symbols, symbol names, symbol references, includes, diagnostics, file entry).
+    # None if file could not be indexed. Symbols, their names and references, and the includes come without the filename
+    # (of the translation unit) since they all belong to the same one.
+    # Fingerprint is taken before parsing so that modifications made during the parse are caught on the next run
+    try:
+        stat = os.stat(filename)
+        with open(filename, 'rb') as f:
+            content = f.read()
+    except OSError:
+        logging.error("Unable to read '{0}': {1}".format(filename, sys.exc_info()))
+        return None
+    content_hash, line_offsets = hashlib.sha1(content).hexdigest(), encode_line_offsets(get_line_offsets(content))
+    del content
+    start = time.time()
+    tunit, symbol_batch, symbol_names, symbol_references = index_file(parser, root_directory, filename)
+    duration = time.time() - start
+    if not tunit:
+        return None
+    return (
+        remove_root_dir_from_filename(root_directory, filename),
+        [symbol[1:] for symbol in symbol_batch],
+        [symbol_name[1:] for symbol_name in symbol_names],
+        [symbol_reference[1:] for symbol_reference in symbol_references],
+        collect_tunit_includes(parser, tunit, root_directory),
+        collect_tunit_diagnostics(tunit.diagnostics, root_directory),
+        (
+            stat.st_mtime,
+            stat.st_size,
+            content_hash,
+            get_compiler_args_hash(parser.get_compiler_args_db().get(filename), root_directory),
+            duration,
+            len(symbol_batch),
+            line_offsets,
+        )
+    )
+
+def store_single_file(symbol_db, results):
+    filename, symbols, symbol_names, symbol_references, includes, diagnostics, file_entry = results
+    if symbols:
+        symbol_db.insert_symbol_entries_batch([(filename,) + symbol for symbol in symbols])
+    if symbol_names:
+        symbol_db.insert_symbol_names_batch([(filename,) + symbol_name for symbol_name in symbol_names])
+    if symbol_references:
+        symbol_db.insert_symbol_references_batch([(filename,) + symbol_reference for symbol_reference in symbol_references])
+    if includes:
+        symbol_db.insert_file_includes_batch([(filename,) + include for include in includes])
+    store_diagnostics(diagnostics, symbol_db)
+    symbol_db.insert_file_entry(filename, *file_entry)
+
+def index_single_file(parser, root_directory, filename, symbol_db, index_file=visit_single_file):
+    logging.debug("Indexing a file '{0}' ... ".format(filename))
+    results = extract_single_file(parser, root_directory, filename, index_file)
+    if results:
+        store_single_file(symbol_db, results)
         symbol_db.flush()
     logging.debug("Indexing of {0} completed.".format(filename))
-    return tunit is not None
+    return results is not None
 
-def store_tunit_diagnostics(diagnostics, symbol_db, root_directory):
+def collect_tunit_includes(parser, tunit, root_directory):
+    # Include directives found while parsing the translation unit, its own ones as well as the ones from the headers,
+    # as (filename, line, included filename). Files from outside of the project directory (e.g. system headers) are
+    # left out since they are neither indexed nor expected to change.
+    def to_project_filename(filename):
+        filename = os.path.normpath(parser.resolve_bazel_symlinks(parser.resolve_bazel_relative_filenames(tunit.spelling, filename)))
+        if filename.startswith(os.path.join(root_directory, '')):
+            return remove_root_dir_from_filename(root_directory, filename)
+        return None
+
+    includes, project_filenames = set(), {}
+    for include in tunit.get_includes():
+        if include.source and include.include:
+            for included_file in (include.source, include.include):
+                if included_file.name not in project_filenames:
+                    project_filenames[included_file.name] = to_project_filename(included_file.name)
+            filename, included_filename = project_filenames[include.source.name], project_filenames[include.include.name]
+            if filename and included_filename:
+                includes.add((filename, include.location.line, included_filename))
+    return sorted(includes)
+
+def collect_tunit_diagnostics(diagnostics, root_directory):
+    collected = []
     for diag in diagnostics:
-        diagnostics_id = None
         diag_location = diag.location
         if diag_location:
             diag_location_file = diag_location.file
             if diag_location_file:
-                diagnostics_id = symbol_db.insert_diagnostics_entry(
+                # Now do the same for children ...
+                details = []
+                for child_diagnostics in diag.children:
+                    child_location = child_diagnostics.location
+                    if child_location:
+                        child_location_file = child_location.file
+                        if child_location_file:
+                            details.append((
+                                remove_root_dir_from_filename(root_directory, child_location_file.name),
+                                child_location.line,
+                                child_location.column,
+                                child_diagnostics.spelling,
+                                child_diagnostics.severity
+                            ))
+                collected.append((
                     remove_root_dir_from_filename(root_directory, diag_location_file.name),
                     diag_location.line,
                     diag_location.column,
                     diag.spelling,
-                    diag.severity
+                    diag.severity,
+                    details
+                ))
+    return collected
+
+def store_diagnostics(diagnostics, symbol_db):
+    for filename, line, column, description, severity, details in diagnostics:
+        diagnostics_id = symbol_db.insert_diagnostics_entry(filename, line, column, description, severity)
+        if diagnostics_id is not None:
+            for details_filename, details_line, details_column, details_description, details_severity in details:
+                symbol_db.insert_diagnostics_details_entry(
+                    diagnostics_id, details_filename, details_line, details_column, details_description, details_severity
                 )
-                if diagnostics_id is not None:
-                    # Now do the same for children ...
-                    for child_diagnostics in diag.children:
-                        diag_location = child_diagnostics.location
-                        if diag_location:
-                            diag_location_file = diag_location.file
-                            if diag_location_file:
-                                symbol_db.insert_diagnostics_details_entry(
-                                    diagnostics_id,
-                                    remove_root_dir_from_filename(root_directory, diag_location_file.name),
-                                    diag_location.line,
-                                    diag_location.column,
-                                    child_diagnostics.spelling,
-                                    child_diagnostics.severity
-                                )
+
+def store_tunit_diagnostics(diagnostics, symbol_db, root_directory):
+    store_diagnostics(collect_tunit_diagnostics(diagnostics, root_directory), symbol_db)
 
 def remove_root_dir_from_filename(root_dir, full_path):
     return full_path[len(root_dir):].lstrip(os.sep)
 
-def get_clang_index_path():
-    this_script_directory = os.path.dirname(os.path.realpath(__file__))
-    return os.path.join(this_script_directory, 'clang_index.py')
+def get_file_content_hash(filename):
+    content_hash = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024*1024), b''):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+def release_memory():
+    # Worker goes through many files, each one leaving a heap full of the freed AST and symbol data behind. Memory is
+    # given back to the OS in between the files so that the workers do not keep the peak of the largest one forever.
+    gc.collect()
+    try:
+        ctypes.CDLL(None).malloc_trim(0) # Only glibc comes with it
+    except (OSError, AttributeError):
+        pass
+
+def get_compiler_args_hash(compiler_args, root_directory):
+    # Project directory is left out so that the hash stays the same when the symbol db is used from another checkout
+    return hashlib.sha1('\0'.join(arg.replace(root_directory, '') for arg in compiler_args).encode('utf-8')).hexdigest()
+
+def get_indexing_cost(symbol_db, file_rows):
+    return {
+        symbol_db.get_file_filename(row) : symbol_db.get_file_duration(row)
+            for row in file_rows if symbol_db.get_file_duration(row) is not None
+    }
+
+def estimate_indexing_cost(cpp_file_list, root_directory, indexing_cost):
+    # Files which were indexed before are estimated by how long it took the last time. Size is the best guess we have
+    # for the rest of them and it is converted into seconds by the rate observed on the files with history. Returns
+    # the estimates together with the number of files which had the history.
+    size = {}
+    for filename in cpp_file_list:
+        try:
+            size[filename] = os.stat(filename).st_size
+        except OSError:
+            size[filename] = 0
+    history = {
+        filename : indexing_cost[remove_root_dir_from_filename(root_directory, filename)]
+            for filename in cpp_file_list if remove_root_dir_from_filename(root_directory, filename) in indexing_cost
+    }
+    history_size = sum(size[filename] for filename in history)
+    seconds_per_byte = sum(history.values()) / history_size if history_size else None
+    estimated_cost = {}
+    for filename in cpp_file_list:
+        if filename in history:
+            estimated_cost[filename] = history[filename]
+        elif seconds_per_byte is not None:
+            estimated_cost[filename] = size[filename] * seconds_per_byte
+        else:
+            estimated_cost[filename] = size[filename]
+    return estimated_cost, len(history)
+
+def predict_makespan(cost_list, num_workers):
+    # Simulates the dynamic scheduler: each next item in the list goes to the worker which gets free first
+    if num_workers <= 0:
+        return 0.0
+    workers = [0.0] * num_workers
+    for cost in cost_list:
+        heapq.heappush(workers, heapq.heappop(workers) + cost)
+    return max(workers)
 
 def get_cpp_file_list(root_directory, blacklisted_directories, recognized_file_extensions):
     cpp_file_list = []
@@ -503,24 +1788,12 @@ def get_cpp_file_list(root_directory, blacklisted_directories, recognized_file_e
                     cpp_file_list.append(full_path)
     return cpp_file_list
 
-def create_indexer_input_list_file(directory, with_prefix, cpp_file_list_chunk):
-    chunk_with_no_none_items = '\n'.join(item for item in cpp_file_list_chunk if item)
-    cpp_file_list_handle, cpp_file_list = tempfile.mkstemp(prefix=with_prefix, dir=directory)
-    os.write(cpp_file_list_handle, chunk_with_no_none_items.encode("utf-8"))
-    return cpp_file_list_handle, cpp_file_list
+def remove_symbol_db_from_disk(symbol_db_filename):
+    # Together with the write-ahead log and the shards, if there are any
+    for filename in [symbol_db_filename, symbol_db_filename + '-wal', symbol_db_filename + '-shm'] + glob.glob(get_shard_filename(symbol_db_filename, '*')):
+        if os.path.exists(filename):
+            os.remove(filename)
 
 def create_empty_symbol_db(directory, with_prefix):
     symbol_db_handle, symbol_db = tempfile.mkstemp(prefix=with_prefix, dir=directory)
     return symbol_db_handle, symbol_db
-
-def start_indexing_subprocess(root_directory, compiler_args_filename, output_db_filename, log_filename, worker_id):
-    cmd_args = [
-        "python3", get_clang_index_path(),
-        "--project_root_directory", root_directory,
-        "--compiler_args_filename", compiler_args_filename,
-        "--output_db_filename", output_db_filename,
-        "--log_file", log_filename,
-        "--worker_id", str(worker_id)
-    ]
-    # Use unbuffered binary mode to avoid select() deadlock with TextIOWrapper buffers
-    return subprocess.Popen(cmd_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)
@@ -0,0 +1,98 @@
+import logging
+import os
+import sys
+import threading
+import time
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+class FileWatcher(FileSystemEventHandler):
+    """
+    Watches the directory tree for modifications and reports the modified paths in batches. Bursts of events, such as
+    the ones coming from switching a branch or running a code generator, are coalesced into a single batch which is
+    reported once there were no more events for the debounce period, or max_delay after the first one at the latest.
+
+    Directories are reported with a trailing path separator. Batch is handed over to callback(paths) which returns
+    False if it cannot take it at the moment, in which case the paths are kept and reported again later on.
+    """
+
+    def __init__(self, root_directory, path_filter, callback, debounce=1.0, max_delay=10.0):
+        self.root_directory = root_directory
+        self.path_filter = path_filter # Invoked as (path, is_directory)
+        self.callback = callback
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.pending = set()
+        self.first_event_time = None
+        self.last_event_time = None
+        self.condition = threading.Condition()
+        self.running = False
+        self.observer = None
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.observer = Observer()
+        self.observer.daemon = True
+        self.observer.schedule(self, self.root_directory, recursive=True)
+        self.observer.start()
+        self.thread = threading.Thread(target=self.__run, name='cxxd-file-watcher', daemon=True)
+        self.thread.start()
+        logging.info("Watching '{0}' for modifications.".format(self.root_directory))
+
+    def stop(self):
+        if not self.running:
+            return
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.observer.stop()
+        self.observer.join()
+        self.thread.join()
+
+    def is_running(self):
+        return self.running
+
+    def on_any_event(self, event):
+        if event.event_type not in ('created', 'deleted', 'modified', 'moved'):
+            return # Opening and closing the files does not change anything
+        if event.is_directory and event.event_type == 'modified':
+            return # Directory is 'modified' whenever its contents change. Contents are reported on their own.
+        paths = [event.src_path, event.dest_path] if event.event_type == 'moved' else [event.src_path]
+        paths = [os.fsdecode(path) for path in paths]
+        paths = [path.rstrip(os.sep) + os.sep if event.is_directory else path for path in paths if self.path_filter(path, event.is_directory)]
+        if paths:
+            self.add(paths)
+
+    def add(self, paths):
+        with self.condition:
+            now = time.time()
+            if not self.pending:
+                self.first_event_time = now
+            self.last_event_time = now
+            self.pending.update(paths)
+            self.condition.notify()
+
+    def __run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    break
+                now = time.time()
+                deadline = min(self.last_event_time + self.debounce, self.first_event_time + self.max_delay)
+                if now < deadline:
+                    self.condition.wait(deadline - now)
+                    continue
+                paths, self.pending = self.pending, set()
+            try:
+                accepted = self.callback(sorted(paths))
+            except:
+                logging.error(sys.exc_info())
+                accepted = True
+            if not accepted:
+                # Try again once the debounce period elapses, together with whatever comes in the meantime
+                self.add(paths)
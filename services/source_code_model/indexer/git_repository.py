@@ -0,0 +1,74 @@
+import logging
+import os
+import subprocess
+import sys
+
+class GitRepository():
+    """
+    Answers which files have changed in the directory by asking git instead of looking into each and every file.
+
+    Directory does not have to be the top-level directory of the working tree. Paths are reported as absolute paths
+    and only the ones found underneath the directory are reported. None is returned whenever git cannot answer the
+    question (directory is not a git repository, git is not installed, commit is not known anymore, etc.).
+    """
+
+    def __init__(self, root_directory):
+        self.root_directory = root_directory
+
+    def get_head(self):
+        output = self.__git('rev-parse', '--verify', '--quiet', 'HEAD')
+        return output.strip() if output else None
+
+    def get_changed_files(self, since_commit):
+        # Added, modified, deleted, renamed or copied files in between the given commit and the HEAD
+        output = self.__git('diff', '--name-status', '-z', since_commit, 'HEAD', '--')
+        if output is None:
+            return None
+        changed_files, fields = [], output.split('\0')
+        i = 0
+        while i < len(fields) and fields[i]:
+            status = fields[i]
+            num_of_paths = 2 if status[0] in ('R', 'C') else 1 # Renamed and copied ones come as (old, new)
+            changed_files.extend(fields[i+1:i+1+num_of_paths])
+            i += 1 + num_of_paths
+        return self.__to_absolute_paths(changed_files)
+
+    def get_dirty_files(self):
+        # Files with changes not committed yet, staged or not, and the untracked ones
+        output = self.__git('status', '--porcelain', '-z', '--untracked-files=all', '--', '.')
+        if output is None:
+            return None
+        dirty_files, fields = [], output.split('\0')
+        i = 0
+        while i < len(fields) and fields[i]:
+            status, path = fields[i][0:2], fields[i][3:]
+            dirty_files.append(path)
+            if 'R' in status or 'C' in status:
+                i += 1
+                dirty_files.append(fields[i]) # Original path of the renamed or copied file follows
+            i += 1
+        return self.__to_absolute_paths(dirty_files)
+
+    def __to_absolute_paths(self, paths):
+        # git reports the paths relative to the top-level directory of the working tree
+        prefix = self.__git('rev-parse', '--show-prefix')
+        if prefix is None:
+            return None
+        prefix = prefix.strip()
+        return sorted(set(
+            os.path.join(self.root_directory, path[len(prefix):]) for path in paths if path.startswith(prefix)
+        ))
+
+    def __git(self, *args):
+        try:
+            result = subprocess.run(
+                ['git', '-C', self.root_directory] + list(args),
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL
+            )
+        except OSError:
+            logging.error(sys.exc_info())
+            return None
+        if result.returncode != 0:
+            logging.info("git {0} failed in '{1}': {2}".format(' '.join(args), self.root_directory, result.stderr.decode('utf-8', 'replace').strip()))
+            return None
+        return os.fsdecode(result.stdout)
@@ -0,0 +1,74 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+SNAPSHOT_FORMAT = 1
+
+# Snapshot is a single line of JSON, the header, followed by the gzip-compressed symbol database. Header can be read
+# and checked without decompressing anything.
+
+def export_snapshot(symbol_db, snapshot_filename, header):
+    directory = os.path.dirname(os.path.abspath(snapshot_filename))
+    symbol_db_handle, symbol_db_copy = tempfile.mkstemp(prefix='cxxd_snapshot_', dir=directory)
+    snapshot_handle, snapshot_tmp = tempfile.mkstemp(prefix='cxxd_snapshot_', dir=directory)
+    os.close(symbol_db_handle)
+    os.close(snapshot_handle)
+    try:
+        os.remove(symbol_db_copy) # VACUUM INTO refuses to overwrite the existing file
+        if not symbol_db.copy_into(symbol_db_copy):
+            return False
+        header = dict(header, format=SNAPSHOT_FORMAT, created=time.time())
+        with open(snapshot_tmp, 'wb') as snapshot:
+            snapshot.write(json.dumps(header).encode('utf-8') + b'\n')
+            with gzip.GzipFile(fileobj=snapshot, mode='wb', compresslevel=6) as compressed, open(symbol_db_copy, 'rb') as f:
+                shutil.copyfileobj(f, compressed, 1024*1024)
+        os.replace(snapshot_tmp, snapshot_filename)
+        logging.info("Snapshot exported to '{0}' ({1} -> {2} bytes). Header: {3}".format(
+            snapshot_filename, os.path.getsize(symbol_db_copy), os.path.getsize(snapshot_filename), header)
+        )
+        return True
+    except:
+        logging.error(sys.exc_info())
+        return False
+    finally:
+        for filename in (symbol_db_copy, snapshot_tmp):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+def read_snapshot_header(snapshot_filename):
+    try:
+        with open(snapshot_filename, 'rb') as snapshot:
+            header = json.loads(snapshot.readline().decode('utf-8'))
+    except:
+        logging.error("'{0}' is not a valid snapshot: {1}".format(snapshot_filename, sys.exc_info()))
+        return None
+    if not isinstance(header, dict) or header.get('format') != SNAPSHOT_FORMAT:
+        logging.error("'{0}' is not a valid snapshot or its format is not supported.".format(snapshot_filename))
+        return None
+    return header
+
+def import_snapshot(snapshot_filename, symbol_db_filename):
+    # Decompressed next to the symbol db and only then moved over it, so that the symbol db is never left half-written
+    symbol_db_handle, symbol_db_tmp = tempfile.mkstemp(prefix='cxxd_snapshot_', dir=os.path.dirname(symbol_db_filename))
+    os.close(symbol_db_handle)
+    try:
+        with open(snapshot_filename, 'rb') as snapshot:
+            snapshot.readline() # header
+            with gzip.GzipFile(fileobj=snapshot, mode='rb') as compressed, open(symbol_db_tmp, 'wb') as f:
+                shutil.copyfileobj(compressed, f, 1024*1024)
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(symbol_db_filename + suffix):
+                os.remove(symbol_db_filename + suffix)
+        os.replace(symbol_db_tmp, symbol_db_filename)
+        return True
+    except:
+        logging.error(sys.exc_info())
+        return False
+    finally:
+        if os.path.exists(symbol_db_tmp):
+            os.remove(symbol_db_tmp)
@@ -0,0 +1,156 @@
+import ctypes
+import logging
+import multiprocessing
+import os
+import platform
+import sys
+
+# Memory a worker is assumed to take until it is seen taking more (or less), e.g. on the very first run
+DEFAULT_WORKER_MEMORY = 512 * 1024 * 1024
+
+# Number of the ioprio_set() system call, which the Python does not come with, by the architecture
+IOPRIO_SET_SYSCALL = {
+    'x86_64'  : 251,
+    'i386'    : 289,
+    'i686'    : 289,
+    'aarch64' : 30,
+    'riscv64' : 30,
+    'armv7l'  : 314,
+}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_BE    = 2
+IOPRIO_CLASS_SHIFT = 13
+
+class ResourceGovernor():
+    """
+    Decides how many of the indexer workers are to be run, and how many of them may be busy with indexing at a time,
+    so that indexing does not get the machine into swapping nor takes the cores away from the rest of the system.
+
+    Pool is sized by the number of cores, and the memory available for the workers by the time they are forked. While
+    indexing is in progress, workers are handed over another file only if there is enough memory left for them to
+    take as much as the most memory hungry one has taken so far, and if the cores are not busy with the other work.
+    While the interactive requests (e.g. semantic syntax highlighting) are being served, no new work is handed over.
+    Requests served by the other services, e.g. code-completion, are counted in too if they share the counter with us.
+    """
+
+    def __init__(self, max_workers=0, min_free_memory=1024, max_load=1.0, pause_on_interactive=True, interactive_requests=None):
+        self.num_of_cores = multiprocessing.cpu_count()
+        self.max_workers = max_workers or self.num_of_cores
+        self.min_free_memory = min_free_memory * 1024 * 1024
+        self.max_load = max_load
+        self.pause_on_interactive = pause_on_interactive
+        self.worker_memory = DEFAULT_WORKER_MEMORY
+        self.other_load = 0.0
+        self.worker_limit = None
+        self.interactive_requests = interactive_requests if interactive_requests is not None else new_interactive_request_counter()
+
+    def get_num_of_workers(self):
+        # Workers are forked only once in a while so they are sized for the peak, as if no other work was going on
+        num_of_workers = max(1, min(self.max_workers, self.__get_memory_limit([])))
+        logging.info("Governor: {0} workers ({1} cores, {2} MB per worker).".format(num_of_workers, self.num_of_cores, self.worker_memory // (1024 * 1024)))
+        return num_of_workers
+
+    def get_worker_limit(self, busy_worker_pids):
+        # Number of workers which may be busy with indexing right now. Always at least one (unless the interactive
+        # requests are in progress) so that indexing keeps on going no matter how short on the resources we are.
+        if self.is_paused():
+            return 0
+        busy_worker_memory = [get_process_memory(pid) for pid in busy_worker_pids]
+        self.worker_memory = max([self.worker_memory] + [memory for memory in busy_worker_memory if memory is not None])
+        worker_limit = max(1, min(self.max_workers, self.__get_memory_limit(busy_worker_memory), self.__get_load_limit(len(busy_worker_pids))))
+        if worker_limit != self.worker_limit:
+            logging.info("Governor: {0} workers may be busy ({1} MB per worker, load of the other work {2:.1f}).".format(worker_limit, self.worker_memory // (1024 * 1024), self.other_load))
+            self.worker_limit = worker_limit
+        return worker_limit
+
+    def interactive_request(self):
+        # To be used in the with-statement around serving the interactive request
+        return InteractiveRequest(self.interactive_requests)
+
+    def is_paused(self):
+        return self.pause_on_interactive and self.interactive_requests.value > 0
+
+    def __get_memory_limit(self, busy_worker_memory):
+        # Busy workers may still grow up to the worker memory so that much is kept aside for each of them
+        available_memory = get_available_memory()
+        if available_memory is None:
+            return self.max_workers
+        free_memory = available_memory - self.min_free_memory - sum(
+            max(0, self.worker_memory - memory) for memory in busy_worker_memory if memory is not None
+        )
+        return len(busy_worker_memory) + max(0, free_memory // self.worker_memory)
+
+    def __get_load_limit(self, num_of_busy_workers):
+        # Load is the number of runnable tasks, the ones of the busy workers (and of our own) aside. It is smoothed
+        # over the samples since it is just a snapshot.
+        runnable_tasks = get_runnable_tasks()
+        if runnable_tasks is None:
+            return self.max_workers
+        self.other_load = 0.5 * self.other_load + 0.5 * max(0, runnable_tasks - num_of_busy_workers - 1)
+        return int(self.num_of_cores * self.max_load - self.other_load)
+
+class InteractiveRequest():
+    # Counts the request in for as long as it is being served. Counter may be shared by the services run in the
+    # other processes (see new_interactive_request_counter()), or left None when there is no indexer to give way to.
+    def __init__(self, interactive_requests):
+        self.interactive_requests = interactive_requests
+
+    def __enter__(self):
+        if self.interactive_requests is not None:
+            with self.interactive_requests.get_lock():
+                self.interactive_requests.value += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.interactive_requests is not None:
+            with self.interactive_requests.get_lock():
+                self.interactive_requests.value -= 1
+        return False
+
+def new_interactive_request_counter():
+    # Shared memory so that it can be handed over to the services before their processes are started
+    return multiprocessing.Value('i', 0)
+
+def get_available_memory():
+    # Memory which can be taken without swapping, as estimated by the kernel. None if unknown (e.g. not a Linux).
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def get_process_memory(pid):
+    # Memory taken by the process, the pages it shares with the others (e.g. libclang) aside. None if unknown.
+    try:
+        with open('/proc/{0}/statm'.format(pid)) as statm:
+            fields = statm.read().split()
+        return (int(fields[1]) - int(fields[2])) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def get_runnable_tasks():
+    # Number of the tasks running, or ready to be run, right now. None if unknown.
+    try:
+        with open('/proc/loadavg') as loadavg:
+            return int(loadavg.read().split()[3].split('/')[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+def lower_process_priority(niceness):
+    # Called from within the worker process. Both the CPU and the I/O priority are lowered so that indexing gives way
+    # to the editor, and to the rest of the system. 0 leaves the priority as it is.
+    if niceness <= 0:
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, max(niceness, os.getpriority(os.PRIO_PROCESS, 0)))
+    except (AttributeError, OSError):
+        logging.warning("Unable to lower the CPU priority: {0}".format(sys.exc_info()))
+    ioprio_set = IOPRIO_SET_SYSCALL.get(platform.machine())
+    if ioprio_set is not None:
+        # Lowest priority of the best-effort class. Idle class is not used since it may starve indexing altogether.
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.syscall(ioprio_set, IOPRIO_WHO_PROCESS, 0, (IOPRIO_CLASS_BE << IOPRIO_CLASS_SHIFT) | 7) != 0:
+            logging.warning("Unable to lower the I/O priority: {0}".format(os.strerror(ctypes.get_errno())))
@@ -0,0 +1,57 @@
+import array
+import itertools
+import logging
+import mmap
+import os
+import sys
+import zlib
+
+def get_line_offsets(content):
+    # Offsets at which each of the lines, but the first one which is always at 0, begins in the file content (bytes)
+    line_offsets, pos = array.array('I'), content.find(b'\n')
+    while pos != -1:
+        line_offsets.append(pos + 1)
+        pos = content.find(b'\n', pos + 1)
+    return line_offsets
+
+def encode_line_offsets(line_offsets):
+    # Lines are mostly short so the differences in between the offsets compress really well
+    deltas = array.array('I', (offset - previous for previous, offset in zip(itertools.chain((0,), line_offsets), line_offsets)))
+    return zlib.compress(deltas.tobytes())
+
+def decode_line_offsets(blob):
+    deltas = array.array('I')
+    deltas.frombytes(zlib.decompress(blob))
+    return array.array('I', itertools.accumulate(deltas))
+
+def read_source_lines(filename, lines, line_offsets=None):
+    # Returns the source code lines, together with the line ending, by their number (starting at 1). File is memory-mapped
+    # so that only the pages holding the lines are read in. Offsets of the lines (see get_line_offsets()) spare looking
+    # for the line endings, which otherwise takes going through the file up to the last of the lines. Lines beyond the
+    # end of the file are left out.
+    source_lines = {}
+    try:
+        with open(filename, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return source_lines
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                line, start = 1, 0
+                for requested_line in sorted(set(lines)):
+                    if requested_line < 1:
+                        continue
+                    if line_offsets is not None:
+                        start = 0 if requested_line == 1 else line_offsets[requested_line - 2] if requested_line - 2 < len(line_offsets) else -1
+                    else:
+                        while line < requested_line and start != -1:
+                            start = content.find(b'\n', start)
+                            start, line = (start + 1 if start != -1 else -1), line + 1
+                    if start == -1 or start >= len(content):
+                        continue
+                    end = content.find(b'\n', start)
+                    text = content[start:end + 1 if end != -1 else len(content)]
+                    if text.endswith(b'\r\n'):
+                        text = text[:-2] + b'\n'
+                    source_lines[requested_line] = text.decode('utf-8', errors='replace')
+    except (OSError, ValueError):
+        logging.error("Unable to read the lines of '{0}': {1}".format(filename, sys.exc_info()))
+    return source_lines
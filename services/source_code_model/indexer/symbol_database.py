@@ -1,6 +1,11 @@
+import hashlib
+import heapq
 import logging
+import multiprocessing
+import os
 import sqlite3
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 class DiagnosticsSortingStrategyId():
     BY_NONE          = 0x0
@@ -8,15 +13,23 @@ class DiagnosticsSortingStrategyId():
     BY_SEVERITY_DESC = 0x2
     BY_FILENAME      = 0x3
 
+class SymbolReferenceRole():
+    CALL             = 0x1
+    READ             = 0x2
+    WRITE            = 0x4
+    BASE_SPECIFIER   = 0x8
+    OVERRIDE         = 0x10
+
 class SymbolDatabase():
-    VERSION_MAJOR = 0
-    VERSION_MINOR = 3
+    VERSION_MAJOR = 1
+    VERSION_MINOR = 8
 
-    def __init__(self, db_filename = None):
+    def __init__(self, db_filename = None, check_same_thread = True):
         self.filename = db_filename
+        self.check_same_thread = check_same_thread
         if db_filename:
             try:
-                self.db_connection = sqlite3.connect(db_filename)
+                self.db_connection = sqlite3.connect(db_filename, check_same_thread=check_same_thread)
             except:
                 logging.error(sys.exc_info())
         else:
@@ -32,7 +45,7 @@ class SymbolDatabase():
     def open(self, db_filename):
         if not self.db_connection:
             try:
-                self.db_connection = sqlite3.connect(db_filename)
+                self.db_connection = sqlite3.connect(db_filename, check_same_thread=self.check_same_thread)
                 self.filename = db_filename
             except:
                 logging.error(sys.exc_info())
@@ -48,6 +61,9 @@ class SymbolDatabase():
     def is_open(self):
         return self.db_connection is not None
 
+    def get_shard(self, filename):
+        return self # Entries of all the files are stored in one and the same database
+
     def get_symbol_filename(self, row):
         return row[0]
 
@@ -69,6 +85,24 @@ class SymbolDatabase():
     def get_symbol_is_definition(self, row):
         return row[6]
 
+    def get_symbol_name(self, row):
+        return row[7]
+
+    def get_symbol_qualified_name(self, row):
+        return row[8]
+
+    def get_symbol_reference_container_usr(self, row):
+        return row[5]
+
+    def get_symbol_reference_role(self, row):
+        return row[6]
+
+    def get_include_filename(self, row):
+        return row[0]
+
+    def get_include_line(self, row):
+        return row[1]
+
     def get_diagnostics_id(self, row):
         return row[0]
 
@@ -105,11 +139,47 @@ class SymbolDatabase():
     def get_diagnostics_details_severity(self, row):
         return row[5]
 
+    def get_file_filename(self, row):
+        return row[0]
+
+    def get_file_mtime(self, row):
+        return row[1]
+
+    def get_file_size(self, row):
+        return row[2]
+
+    def get_file_hash(self, row):
+        return row[3]
+
+    def get_file_compiler_args_hash(self, row):
+        return row[4]
+
+    def get_file_duration(self, row):
+        return row[5]
+
+    def get_file_symbol_count(self, row):
+        return row[6]
+
+    def get_file_line_offsets(self, row):
+        return row[3] # Only in the rows from fetch_line_offsets()
+
+    def get_quarantine_filename(self, row):
+        return row[0]
+
+    def get_quarantine_hash(self, row):
+        return row[1]
+
+    def get_quarantine_compiler_args_hash(self, row):
+        return row[2]
+
+    def get_quarantine_reason(self, row):
+        return row[3]
+
     def fetch_all_symbols(self):
         rows = []
         try:
             # TODO Use generators
-            rows = self.db_connection.cursor().execute('SELECT * FROM symbol').fetchall()
+            rows = self.db_connection.cursor().execute('SELECT * FROM symbol_view').fetchall()
         except:
             logging.error(sys.exc_info())
         return rows
@@ -117,7 +187,7 @@ class SymbolDatabase():
     def fetch_symbols_by_usr(self, usr):
         rows = []
         try:
-            rows = self.db_connection.cursor().execute('SELECT * FROM symbol WHERE usr=?', (usr,)).fetchall()
+            rows = self.db_connection.cursor().execute('SELECT * FROM symbol_view WHERE usr=?', (usr,)).fetchall()
         except:
             logging.error(sys.exc_info())
         return rows
@@ -125,17 +195,249 @@ class SymbolDatabase():
     def fetch_symbol_definition_by_usr(self, usr):
         rows = []
         try:
-            rows = self.db_connection.cursor().execute('SELECT * FROM symbol WHERE usr=? AND is_definition=1',(usr,)).fetchall()
+            rows = self.db_connection.cursor().execute('SELECT * FROM symbol_view WHERE usr=? AND is_definition=1',(usr,)).fetchall()
         except:
             logging.error(sys.exc_info())
         return rows
 
+    def fetch_symbol_references(self, usr, roles):
+        # References to the symbol made with any of the roles, e.g. the calls of the function, as rows of
+        # (filename, line, column, usr, context, container_usr, role). Container is the function (or the class, for
+        # the base specifiers) the reference is made from, e.g. the caller.
+        return self.__fetch_symbol_references('ref.usr_id', 'ref.container_usr_id', usr, roles)
+
+    def fetch_symbol_references_by_container(self, container_usr, roles):
+        # References made from within the container with any of the roles, e.g. the calls the function makes, in the
+        # same shape as fetch_symbol_references()
+        return self.__fetch_symbol_references('ref.container_usr_id', 'ref.usr_id', container_usr, roles)
+
+    def __fetch_symbol_references(self, column, group_by_column, usr, roles):
+        rows = []
+        try:
+            rows = self.db_connection.cursor().execute(
+                'SELECT file.filename, ref.line, ref.column, usr.usr, NULL AS context, container.usr, ref.role \
+                 FROM symbol_reference AS ref \
+                 JOIN symbol_filename AS file ON file.id = ref.filename_id \
+                 JOIN symbol_usr AS usr ON usr.id = ref.usr_id \
+                 JOIN symbol_usr AS container ON container.id = ref.container_usr_id \
+                 WHERE {0} = (SELECT id FROM symbol_usr WHERE usr = ?) AND ref.role & ? != 0 \
+                 ORDER BY {1}, ref.filename_id, ref.line, ref.column'.format(column, group_by_column),
+                (usr, roles,)
+            ).fetchall()
+        except:
+            logging.error(sys.exc_info())
+        return rows
+
+    def fetch_symbol_declarations(self, usrs):
+        # One row for each of the symbols found, in the shape of the symbol_view rows extended with (name, qualified_name):
+        # the definition if there is one, otherwise the declaration its name was recorded from, otherwise any of the
+        # references (e.g. to the functions from the system headers). Name is None if no declaration was indexed.
+        rows = {}
+        try:
+            select = 'SELECT file.filename, sym.line, sym.column, usr.usr, NULL AS context, sym.kind, sym.is_definition, name.name, name.qualified_name \
+                      FROM symbol_usr AS usr \
+                      LEFT JOIN symbol_name AS name ON name.usr_id = usr.id \
+                      JOIN symbol AS sym ON {0} \
+                      JOIN symbol_filename AS file ON file.id = sym.filename_id \
+                      WHERE usr.usr IN ({1})'
+            for join in (
+                'sym.usr_id = usr.id AND sym.is_definition = 1',
+                'sym.filename_id = name.filename_id AND sym.usr_id = name.usr_id AND sym.line = name.line',
+            ):
+                for i in range(0, len(usrs), 500):
+                    chunk = [usr for usr in usrs[i:i+500] if usr not in rows]
+                    if chunk:
+                        for row in self.db_connection.cursor().execute(select.format(join, ', '.join('?' * len(chunk))), chunk):
+                            rows.setdefault(row[3], row)
+            for usr in usrs:
+                if usr not in rows:
+                    row = self.db_connection.cursor().execute(
+                        select.format('sym.usr_id = usr.id', '?') + ' LIMIT 1', (usr,)
+                    ).fetchone()
+                    if row:
+                        rows[usr] = row
+        except:
+            logging.error(sys.exc_info())
+        return list(rows.values())
+
+    def fetch_includers(self, filename):
+        # Files including the given one directly, as rows of (filename, line of the include directive)
+        rows = []
+        try:
+            rows = self.db_connection.cursor().execute(
+                'SELECT DISTINCT file.filename, inc.line \
+                 FROM file_include AS inc \
+                 JOIN symbol_filename AS file ON file.id = inc.filename_id \
+                 WHERE inc.included_filename_id = (SELECT id FROM symbol_filename WHERE filename = ?) \
+                 ORDER BY file.filename, inc.line',
+                (filename,)
+            ).fetchall()
+        except:
+            logging.error(sys.exc_info())
+        return rows
+
+    def fetch_transitive_includers(self, filenames):
+        # Sorted list of the files including any of the given ones, directly or through the other headers. Include
+        # cycles are not followed twice since the UNION keeps each of the files only once.
+        includers = []
+        try:
+            for i in range(0, len(filenames), 500):
+                chunk = filenames[i:i+500]
+                includers.extend(row[0] for row in self.db_connection.cursor().execute(
+                    'WITH RECURSIVE includer(id) AS ( \
+                        SELECT id FROM symbol_filename WHERE filename IN ({0}) \
+                        UNION \
+                        SELECT inc.filename_id FROM file_include AS inc JOIN includer ON inc.included_filename_id = includer.id \
+                     ) \
+                     SELECT file.filename FROM includer JOIN symbol_filename AS file ON file.id = includer.id'.format(', '.join('?' * len(chunk))),
+                    chunk
+                ))
+        except:
+            logging.error(sys.exc_info())
+        return sorted(set(includers).difference(filenames))
+
     def fetch_all_definitions_raw(self):
         try:
-            # yield raw tuples: (filename, line, column, usr, context, kind, is_definition)
-            yield from self.db_connection.cursor().execute('SELECT filename, line, column, context FROM symbol WHERE is_definition=1')
+            # yield raw tuples: (filename, line, column, context), ordered by the file. Context is always None.
+            yield from self.db_connection.cursor().execute(
+                'SELECT file.filename, sym.line, sym.column, NULL AS context \
+                 FROM symbol AS sym \
+                 JOIN symbol_filename AS file ON file.id = sym.filename_id \
+                 WHERE sym.is_definition = 1 \
+                 ORDER BY sym.filename_id, sym.line'
+            )
+        except:
+            logging.error(sys.exc_info())
+
+    def fetch_definitions_page(self, cursor, page_size, filename_prefix='', kinds=None, name=''):
+        # Returns (rows, next_cursor): up to page_size definitions following the cursor, in the shape of the symbol_view
+        # rows extended with (name, qualified_name), and the cursor to fetch the next page from (None after the last
+        # one). Cursor is an opaque string, empty for the first page. Filters are applied by SQLite: filename prefix,
+        # the list of symbol kinds and a substring of the symbol name.
+        rows = []
+        try:
+            filename_id, line, usr_id = (int(value) for value in cursor.split(':')) if cursor else (0, 0, 0)
+            conditions, args = ['sym.is_definition = 1', '(sym.filename_id, sym.line, sym.usr_id) > (?, ?, ?)'], [filename_id, line, usr_id]
+            if filename_prefix:
+                conditions.append('file.filename LIKE ? ESCAPE \'\\\'')
+                args.append(escape_like_pattern(filename_prefix) + '%')
+            if kinds:
+                conditions.append('sym.kind IN ({0})'.format(', '.join('?' * len(kinds))))
+                args.extend(kinds)
+            if name:
+                if len(name) >= 3 and self.__symbol_name_index_exists():
+                    conditions.append('sym.usr_id IN (SELECT rowid FROM symbol_name_fts WHERE symbol_name_fts MATCH ?)')
+                    args.append('name : {0}'.format(quote_fts_string(name)))
+                else:
+                    conditions.append('name.name LIKE ? ESCAPE \'\\\'')
+                    args.append('%' + escape_like_pattern(name) + '%')
+            rows = self.db_connection.cursor().execute(
+                'SELECT file.filename, sym.line, sym.column, usr.usr, NULL AS context, sym.kind, sym.is_definition, name.name, name.qualified_name, \
+                        sym.filename_id, sym.usr_id \
+                 FROM symbol AS sym \
+                 JOIN symbol_filename AS file ON file.id = sym.filename_id \
+                 JOIN symbol_usr AS usr ON usr.id = sym.usr_id \
+                 LEFT JOIN symbol_name AS name ON name.usr_id = sym.usr_id \
+                 WHERE {0} \
+                 ORDER BY sym.filename_id, sym.line, sym.usr_id LIMIT ?'.format(' AND '.join(conditions)),
+                args + [page_size + 1] # one more to tell if there is a next page
+            ).fetchall()
+        except:
+            logging.error(sys.exc_info())
+            return [], None
+        rows, has_next_page = rows[0:page_size], len(rows) > page_size
+        next_cursor = '{0}:{1}:{2}'.format(rows[-1][9], rows[-1][1], rows[-1][10]) if has_next_page else None
+        return [row[0:9] for row in rows], next_cursor
+
+    def fetch_symbols_by_name(self, query, limit):
+        # Returns up to the limit of symbols whose name matches the query the best, in the shape of the symbol_view
+        # rows extended with (name, qualified_name). Definition of the symbol is preferred over its declaration.
+        # Query containing '::' is matched against the qualified names.
+        rows = []
+        try:
+            get_rank = get_symbol_name_match_rank(query)
+            candidates = sorted(
+                (rank, usr_id, name, qualified_name, filename_id, line)
+                    for usr_id, name, qualified_name, filename_id, line in self.__fetch_symbol_name_candidates(query, limit)
+                        for rank in (get_rank(name, qualified_name),) if rank is not None
+            )
+            for rank, usr_id, name, qualified_name, filename_id, line in candidates:
+                symbol = self.__fetch_symbol_location(usr_id, filename_id, line)
+                if symbol:
+                    rows.append(symbol + (name, qualified_name,))
+                    if len(rows) == limit:
+                        break
         except:
             logging.error(sys.exc_info())
+        return rows
+
+    def __fetch_symbol_name_candidates(self, query, limit):
+        # Names which could possibly match the query. Each of the lookups is bounded, and none of them is ranked by
+        # SQLite, so that the cost of the query does not grow with the number of symbols in the database:
+        #   * names starting with the query (or its first trigram, which catches most of the abbreviations)
+        #   * names containing the query, through the trigram index (needs at least 3 characters to be of any use)
+        #   * names sharing at least a half of the trigrams with the query, which catches the typos
+        num_of_candidates = max(limit * 20, 100)
+        column = 'qualified_name' if '::' in query else 'name'
+        candidates = {}
+        def lookup(sql, args):
+            for row in self.db_connection.cursor().execute(sql, args):
+                candidates.setdefault(row[0], row)
+        if column == 'name':
+            for prefix in dict.fromkeys([query, query[0:3]]):
+                lookup(
+                    'SELECT usr_id, name, qualified_name, filename_id, line FROM symbol_name WHERE name LIKE ? ESCAPE \'\\\' LIMIT ?',
+                    (escape_like_pattern(prefix) + '%', num_of_candidates,)
+                )
+        if not self.__symbol_name_index_exists():
+            lookup(
+                'SELECT usr_id, name, qualified_name, filename_id, line FROM symbol_name WHERE {0} LIKE ? ESCAPE \'\\\' LIMIT ?'.format(column),
+                ('%' + escape_like_pattern(query) + '%', num_of_candidates,)
+            )
+            return candidates.values()
+        trigrams = get_trigrams(query)
+        if not trigrams:
+            return candidates.values()
+        sql = 'SELECT sym.usr_id, sym.name, sym.qualified_name, sym.filename_id, sym.line FROM symbol_name_fts \
+               JOIN symbol_name AS sym ON sym.usr_id = symbol_name_fts.rowid \
+               WHERE symbol_name_fts MATCH ? LIMIT ?'
+        lookup(sql, ('{0} : {1}'.format(column, quote_fts_string(query)), num_of_candidates,))
+        if len(trigrams) > 1:
+            # Name sharing at least a half of the trigrams with the query must contain at least one of the rarest
+            # len(trigrams) - ceil(len(trigrams)/2) + 1 ones. These are looked for, the rest is left to the ranking.
+            frequency = dict(self.db_connection.cursor().execute(
+                'SELECT term, doc FROM symbol_name_fts_vocabulary WHERE col = ? AND term IN ({0})'.format(', '.join('?' * len(trigrams))),
+                [column] + list(trigrams)
+            ).fetchall())
+            rarest = sorted((trigram for trigram in trigrams if trigram in frequency), key=lambda trigram: frequency[trigram])
+            rarest = rarest[0:len(trigrams) - (len(trigrams) + 1) // 2 + 1]
+            if rarest:
+                lookup(sql, ('{0} : ({1})'.format(column, ' OR '.join(quote_fts_string(trigram) for trigram in rarest)), num_of_candidates * 2,))
+        return candidates.values()
+
+    def __fetch_symbol_location(self, usr_id, filename_id, line):
+        # Definition if there is one. Otherwise the declaration the name was recorded from, or if that one is gone
+        # (e.g. file was re-indexed in the meantime) any other symbol, as long as there is one.
+        for sql, args in (
+            ('sym.usr_id = ? AND sym.is_definition = 1', (usr_id,)),
+            ('sym.filename_id = ? AND sym.usr_id = ? AND sym.line = ?', (filename_id, usr_id, line,)),
+            ('sym.usr_id = ?', (usr_id,)),
+        ):
+            rows = self.db_connection.cursor().execute(
+                'SELECT file.filename, sym.line, sym.column, usr.usr, NULL AS context, sym.kind, sym.is_definition \
+                 FROM symbol AS sym \
+                 JOIN symbol_filename AS file ON file.id = sym.filename_id \
+                 JOIN symbol_usr AS usr ON usr.id = sym.usr_id \
+                 WHERE {0} LIMIT 1'.format(sql), args
+            ).fetchall()
+            if rows:
+                return rows[0]
+        return None
+
+    def __symbol_name_index_exists(self):
+        return self.db_connection.cursor().execute(
+            'SELECT 1 FROM sqlite_master WHERE type=\'table\' AND name=\'symbol_name_fts\''
+        ).fetchone() is not None
 
     def fetch_all_diagnostics(self, sorting_strategy):
         rows = []
@@ -155,6 +457,56 @@ class SymbolDatabase():
             logging.error(sys.exc_info())
         return rows
 
+    def fetch_all_diagnostics_with_details(self, sorting_strategy):
+        # Diagnostics together with their details, from a single query, as a list of (diagnostics, [details])
+        order_by = {
+            DiagnosticsSortingStrategyId.BY_NONE          : 'diag.id',
+            DiagnosticsSortingStrategyId.BY_SEVERITY_ASC  : 'diag.severity ASC, diag.id',
+            DiagnosticsSortingStrategyId.BY_SEVERITY_DESC : 'diag.severity DESC, diag.id',
+            DiagnosticsSortingStrategyId.BY_FILENAME      : 'diag.filename ASC, diag.id',
+        }.get(sorting_strategy)
+        if order_by is None:
+            logging.error('Inexisting diagnostics sorting strategy chosen!')
+            return []
+        try:
+            return group_diagnostics_details(self.db_connection.cursor().execute(
+                'SELECT diag.*, details.* FROM diagnostics AS diag \
+                 LEFT JOIN diagnostics_details AS details ON details.diagnostics_id = diag.id \
+                 ORDER BY {0}, details.rowid'.format(order_by)
+            ))
+        except:
+            logging.error(sys.exc_info())
+        return []
+
+    def fetch_diagnostics_page(self, cursor, page_size, filename_prefix='', min_severity=0, description=''):
+        # Returns (diagnostics, next_cursor): up to page_size of (diagnostics, [details]) following the cursor, and the
+        # cursor to fetch the next page from (None after the last one). Cursor is an opaque string, empty for the first
+        # page. Filters are applied by SQLite: filename prefix, minimal severity and a substring of the description.
+        diagnostics = []
+        try:
+            conditions, args = ['id > ?'], [int(cursor) if cursor else 0]
+            if filename_prefix:
+                conditions.append('filename LIKE ? ESCAPE \'\\\'')
+                args.append(escape_like_pattern(filename_prefix) + '%')
+            if min_severity:
+                conditions.append('severity >= ?')
+                args.append(min_severity)
+            if description:
+                conditions.append('description LIKE ? ESCAPE \'\\\'')
+                args.append('%' + escape_like_pattern(description) + '%')
+            diagnostics = group_diagnostics_details(self.db_connection.cursor().execute(
+                'SELECT diag.*, details.* FROM (SELECT * FROM diagnostics WHERE {0} ORDER BY id LIMIT ?) AS diag \
+                 LEFT JOIN diagnostics_details AS details ON details.diagnostics_id = diag.id \
+                 ORDER BY diag.id, details.rowid'.format(' AND '.join(conditions)),
+                args + [page_size + 1] # one more to tell if there is a next page
+            ))
+        except:
+            logging.error(sys.exc_info())
+            return [], None
+        diagnostics, has_next_page = diagnostics[0:page_size], len(diagnostics) > page_size
+        next_cursor = str(self.get_diagnostics_id(diagnostics[-1][0])) if has_next_page else None
+        return diagnostics, next_cursor
+
     def fetch_diagnostics_details(self, diagnostics_id):
         rows = []
         try:
@@ -173,6 +525,47 @@ class SymbolDatabase():
             logging.error(sys.exc_info())
         return rows
 
+    def fetch_all_files(self):
+        rows = []
+        try:
+            rows = self.db_connection.cursor().execute('SELECT * FROM files').fetchall()
+        except:
+            logging.error(sys.exc_info())
+        return rows
+
+    def fetch_line_offsets(self, filenames):
+        # (filename, mtime, size, line offsets) of the given files, as of the time they were indexed. Files indexed
+        # before the line offsets were recorded are left out.
+        rows = []
+        try:
+            for i in range(0, len(filenames), 500):
+                chunk = filenames[i:i+500]
+                rows.extend(self.db_connection.cursor().execute(
+                    'SELECT files.filename, files.mtime, files.size, offsets.offsets \
+                     FROM files \
+                     JOIN file_line_offsets AS offsets ON offsets.filename = files.filename \
+                     WHERE files.filename IN ({0})'.format(', '.join('?' * len(chunk))), chunk
+                ).fetchall())
+        except:
+            logging.error(sys.exc_info())
+        return rows
+
+    def fetch_metadata(self, key):
+        rows = []
+        try:
+            rows = self.db_connection.cursor().execute('SELECT value FROM metadata WHERE key=?', (key,)).fetchall()
+        except:
+            logging.error(sys.exc_info())
+        return rows[0][0] if rows else None
+
+    def fetch_all_quarantined_files(self):
+        rows = []
+        try:
+            rows = self.db_connection.cursor().execute('SELECT * FROM quarantine').fetchall()
+        except:
+            logging.error(sys.exc_info())
+        return rows
+
     def fetch_schema_version(self):
         rows = []
         try:
@@ -184,7 +577,7 @@ class SymbolDatabase():
     def insert_symbol_entry(self, filename, line, column, unique_id, context, symbol_kind, is_definition):
         try:
             if unique_id != '':
-                self.db_connection.cursor().execute('INSERT INTO symbol VALUES (?, ?, ?, ?, ?, ?, ?)',
+                self.db_connection.cursor().execute('INSERT INTO symbol_view VALUES (?, ?, ?, ?, ?, ?, ?)',
                     (
                         filename,
                         line,
@@ -210,12 +603,63 @@ class SymbolDatabase():
         # entries is a list of tuples: (filename, line, column, unique_id, context, symbol_kind, is_definition)
         try:
             # Use INSERT OR IGNORE to handle duplicates without failing the entire batch
-            self.db_connection.cursor().executemany('INSERT OR IGNORE INTO symbol VALUES (?, ?, ?, ?, ?, ?, ?)', entries)
+            self.db_connection.cursor().executemany('INSERT OR IGNORE INTO symbol_view VALUES (?, ?, ?, ?, ?, ?, ?)', entries)
         except sqlite3.ProgrammingError as e:
             logging.error(f"Failed to batch insert symbols: {e}")
         except:
             logging.error('Unexpected exception {0}'.format(sys.exc_info()))
 
+    def insert_symbol_names_batch(self, entries):
+        # entries is a list of tuples: (filename, line, unique_id, name, qualified_name), one for each of the declarations
+        # found. Symbols have to be inserted first since the filename and the USR are referenced by their ids.
+        try:
+            self.db_connection.cursor().executemany(
+                'INSERT INTO symbol_name(usr_id, name, qualified_name, filename_id, line) \
+                    SELECT usr.id, ?4, ?5, file.id, ?2 FROM symbol_usr AS usr, symbol_filename AS file \
+                    WHERE usr.usr = ?3 AND file.filename = ?1 \
+                 ON CONFLICT(usr_id) DO UPDATE SET filename_id = excluded.filename_id, line = excluded.line',
+                entries
+            )
+        except:
+            logging.error('Unexpected exception {0}'.format(sys.exc_info()))
+
+    def insert_symbol_references_batch(self, entries):
+        # entries is a list of tuples: (filename, line, column, unique_id, container_unique_id, role). Referenced
+        # symbols may as well come from the files which are not indexed (e.g. the overridden methods) so their USRs
+        # are recorded here.
+        try:
+            self.db_connection.cursor().executemany(
+                'INSERT OR IGNORE INTO symbol_filename(filename) VALUES (?)', set((entry[0],) for entry in entries)
+            )
+            self.db_connection.cursor().executemany(
+                'INSERT OR IGNORE INTO symbol_usr(usr) VALUES (?)', set((usr,) for entry in entries for usr in entry[3:5])
+            )
+            self.db_connection.cursor().executemany(
+                'INSERT INTO symbol_reference(filename_id, line, column, usr_id, container_usr_id, role) \
+                    SELECT file.id, ?2, ?3, usr.id, container.id, ?6 FROM symbol_filename AS file, symbol_usr AS usr, symbol_usr AS container \
+                    WHERE file.filename = ?1 AND usr.usr = ?4 AND container.usr = ?5 \
+                 ON CONFLICT DO UPDATE SET role = role | excluded.role',
+                entries
+            )
+        except:
+            logging.error('Unexpected exception {0}'.format(sys.exc_info()))
+
+    def insert_file_includes_batch(self, entries):
+        # entries is a list of tuples: (tunit_filename, filename, line, included_filename), one for each of the include
+        # directives found while parsing the translation unit, including the ones from the headers
+        try:
+            self.db_connection.cursor().executemany(
+                'INSERT OR IGNORE INTO symbol_filename(filename) VALUES (?)', set((filename,) for entry in entries for filename in (entry[0], entry[1], entry[3]))
+            )
+            self.db_connection.cursor().executemany(
+                'INSERT OR IGNORE INTO file_include(tunit_filename_id, filename_id, line, included_filename_id) \
+                    SELECT tunit.id, file.id, ?3, included.id FROM symbol_filename AS tunit, symbol_filename AS file, symbol_filename AS included \
+                    WHERE tunit.filename = ?1 AND file.filename = ?2 AND included.filename = ?4',
+                entries
+            )
+        except:
+            logging.error('Unexpected exception {0}'.format(sys.exc_info()))
+
     def insert_diagnostics_entry(self, filename, line, column, description, severity):
         diagnostics_id = None
         try:
@@ -265,44 +709,164 @@ class SymbolDatabase():
         except:
             logging.error('Unexpected exception {0}'.format(sys.exc_info()))
 
-    def copy_all_entries_from(self, symbol_db_filename_list):
-        for db in symbol_db_filename_list:
-            symbol_db = SymbolDatabase(db)
-            rows = symbol_db.fetch_all_symbols()
-            if rows:
-                for row in rows:
-                    self.insert_symbol_entry(
-                        symbol_db.get_symbol_filename(row),
-                        symbol_db.get_symbol_line(row),
-                        symbol_db.get_symbol_column(row),
-                        symbol_db.get_symbol_usr(row),
-                        symbol_db.get_symbol_context(row),
-                        symbol_db.get_symbol_kind(row),
-                        symbol_db.get_symbol_is_definition(row)
-                    )
-            rows = symbol_db.fetch_all_diagnostics(DiagnosticsSortingStrategyId.BY_NONE)
-            if rows:
-                for row in rows:
-                    self.insert_diagnostics_entry(
-                        symbol_db.get_diagnostics_filename(row),
-                        symbol_db.get_diagnostics_line(row),
-                        symbol_db.get_diagnostics_column(row),
-                        symbol_db.get_diagnostics_description(row),
-                        symbol_db.get_diagnostics_severity(row)
-                    )
-            rows = symbol_db.fetch_all_diagnostics_details()
-            if rows:
-                for row in rows:
-                    self.insert_diagnostics_details_entry(
-                        symbol_db.get_diagnostics_details_id(row),
-                        symbol_db.get_diagnostics_details_filename(row),
-                        symbol_db.get_diagnostics_details_line(row),
-                        symbol_db.get_diagnostics_details_column(row),
-                        symbol_db.get_diagnostics_details_description(row),
-                        symbol_db.get_diagnostics_details_severity(row)
-                    )
-            symbol_db.close()
-        self.flush()
+    def insert_file_entry(self, filename, mtime, size, content_hash, compiler_args_hash, duration=None, symbol_count=None, line_offsets=None):
+        # Line offsets (see source_context.encode_line_offsets()) are left as they are unless given
+        try:
+            self.db_connection.cursor().execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    filename,
+                    mtime,
+                    size,
+                    content_hash,
+                    compiler_args_hash,
+                    duration,
+                    symbol_count,
+                )
+            )
+            if line_offsets is not None:
+                self.db_connection.cursor().execute('INSERT OR REPLACE INTO file_line_offsets VALUES (?, ?)', (filename, line_offsets,))
+        except sqlite3.ProgrammingError as e:
+            logging.error(
+                'Failed to insert \'[{0}, {1}, {2}, {3}, {4}, {5}, {6}]\' into the database. Exception details: \'{7}\''.format(
+                    filename, mtime, size, content_hash, compiler_args_hash, duration, symbol_count, e
+                )
+            )
+        except:
+            logging.error('Unexpected exception {0}'.format(sys.exc_info()))
+
+    def insert_metadata_entry(self, key, value):
+        try:
+            self.db_connection.cursor().execute('INSERT OR REPLACE INTO metadata VALUES (?, ?)', (key, value,))
+        except:
+            logging.error('Unexpected exception {0}'.format(sys.exc_info()))
+
+    def insert_quarantine_entry(self, filename, content_hash, compiler_args_hash, reason):
+        try:
+            self.db_connection.cursor().execute(
+                'INSERT OR REPLACE INTO quarantine VALUES (?, ?, ?, ?)', (filename, content_hash, compiler_args_hash, reason,)
+            )
+        except:
+            logging.error('Unexpected exception {0}'.format(sys.exc_info()))
+
+    def copy_all_entries_from(self, symbol_db_filename_list, rebuild_indexes=False):
+        # Merging is done entirely by SQLite: other databases are ATTACH-ed and their contents moved with set-based
+        # INSERT ... SELECT statements, as many of them at once as SQLite allows, in a single transaction.
+        # With rebuild_indexes set, secondary indexes are dropped for the duration of the merge and built only once
+        # at the end, which is considerably cheaper than maintaining them row by row when merging into an empty db.
+        self.flush() # ATTACH cannot be run from within the transaction
+        if rebuild_indexes:
+            self.drop_indexes()
+        max_attached = self.db_connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        for i in range(0, len(symbol_db_filename_list), max_attached):
+            attached = []
+            try:
+                for db in symbol_db_filename_list[i:i+max_attached]:
+                    schema_name = 'db{0}'.format(len(attached))
+                    self.db_connection.cursor().execute('ATTACH DATABASE ? AS {0}'.format(schema_name), (db,))
+                    attached.append(schema_name)
+                for schema_name in attached:
+                    self.__copy_all_entries_from_attached(schema_name)
+                self.flush()
+            except:
+                logging.error('Failed to merge the contents of {0}: {1}'.format(symbol_db_filename_list[i:i+max_attached], sys.exc_info()))
+                self.db_connection.rollback()
+            finally:
+                for schema_name in attached:
+                    try:
+                        self.db_connection.cursor().execute('DETACH DATABASE {0}'.format(schema_name))
+                    except:
+                        logging.error(sys.exc_info())
+        if rebuild_indexes:
+            self.create_indexes()
+            self.flush()
+
+    def __copy_all_entries_from_attached(self, schema_name):
+        tables = [row[0] for row in self.db_connection.cursor().execute(
+            'SELECT name FROM {0}.sqlite_master WHERE type=\'table\''.format(schema_name)
+        )]
+        if 'symbol' not in tables:
+            return # Worker did not even manage to set up its database. Nothing to be merged.
+        # Filenames and USRs are interned into the lookup tables of each database so their ids must be translated
+        self.db_connection.cursor().execute(
+            'INSERT OR IGNORE INTO main.symbol_filename(filename) SELECT filename FROM {0}.symbol_filename'.format(schema_name)
+        )
+        self.db_connection.cursor().execute(
+            'INSERT OR IGNORE INTO main.symbol_usr(usr) SELECT usr FROM {0}.symbol_usr'.format(schema_name)
+        )
+        self.db_connection.cursor().execute(
+            'INSERT OR IGNORE INTO main.symbol \
+                SELECT main_file.id, sym.line, sym.column, main_usr.id, sym.kind, sym.is_definition \
+                FROM {0}.symbol AS sym \
+                JOIN {0}.symbol_filename AS file ON file.id = sym.filename_id \
+                JOIN main.symbol_filename AS main_file ON main_file.filename = file.filename \
+                JOIN {0}.symbol_usr AS usr ON usr.id = sym.usr_id \
+                JOIN main.symbol_usr AS main_usr ON main_usr.usr = usr.usr'.format(schema_name)
+        )
+        self.db_connection.cursor().execute(
+            'INSERT INTO main.symbol_name(usr_id, name, qualified_name, filename_id, line) \
+                SELECT main_usr.id, name.name, name.qualified_name, main_file.id, name.line \
+                FROM {0}.symbol_name AS name \
+                JOIN {0}.symbol_filename AS file ON file.id = name.filename_id \
+                JOIN main.symbol_filename AS main_file ON main_file.filename = file.filename \
+                JOIN {0}.symbol_usr AS usr ON usr.id = name.usr_id \
+                JOIN main.symbol_usr AS main_usr ON main_usr.usr = usr.usr \
+                WHERE true \
+             ON CONFLICT(usr_id) DO UPDATE SET filename_id = excluded.filename_id, line = excluded.line'.format(schema_name)
+        )
+        self.db_connection.cursor().execute(
+            'INSERT INTO main.symbol_reference \
+                SELECT main_file.id, ref.line, ref.column, main_usr.id, main_container.id, ref.role \
+                FROM {0}.symbol_reference AS ref \
+                JOIN {0}.symbol_filename AS file ON file.id = ref.filename_id \
+                JOIN main.symbol_filename AS main_file ON main_file.filename = file.filename \
+                JOIN {0}.symbol_usr AS usr ON usr.id = ref.usr_id \
+                JOIN main.symbol_usr AS main_usr ON main_usr.usr = usr.usr \
+                JOIN {0}.symbol_usr AS container ON container.id = ref.container_usr_id \
+                JOIN main.symbol_usr AS main_container ON main_container.usr = container.usr \
+                WHERE true \
+             ON CONFLICT DO UPDATE SET role = role | excluded.role'.format(schema_name)
+        )
+        self.db_connection.cursor().execute(
+            'INSERT OR IGNORE INTO main.file_include \
+                SELECT main_tunit.id, main_file.id, inc.line, main_included.id \
+                FROM {0}.file_include AS inc \
+                JOIN {0}.symbol_filename AS tunit ON tunit.id = inc.tunit_filename_id \
+                JOIN main.symbol_filename AS main_tunit ON main_tunit.filename = tunit.filename \
+                JOIN {0}.symbol_filename AS file ON file.id = inc.filename_id \
+                JOIN main.symbol_filename AS main_file ON main_file.filename = file.filename \
+                JOIN {0}.symbol_filename AS included ON included.id = inc.included_filename_id \
+                JOIN main.symbol_filename AS main_included ON main_included.filename = included.filename'.format(schema_name)
+        )
+        # Diagnostics get a new id once inserted so the details are re-linked by the diagnostics they belong to
+        self.db_connection.cursor().execute(
+            'INSERT OR IGNORE INTO main.diagnostics(filename, line, column, description, severity) \
+                SELECT filename, line, column, description, severity FROM {0}.diagnostics'.format(schema_name)
+        )
+        self.db_connection.cursor().execute(
+            'INSERT OR IGNORE INTO main.diagnostics_details \
+                SELECT main_diag.id, details.filename, details.line, details.column, details.description, details.severity \
+                FROM {0}.diagnostics_details AS details \
+                JOIN {0}.diagnostics AS diag ON details.diagnostics_id = diag.id \
+                JOIN main.diagnostics AS main_diag ON main_diag.filename = diag.filename AND main_diag.line = diag.line \
+                    AND main_diag.column = diag.column AND main_diag.description = diag.description'.format(schema_name)
+        )
+        self.db_connection.cursor().execute(
+            'INSERT OR REPLACE INTO main.files SELECT * FROM {0}.files'.format(schema_name)
+        )
+        if 'file_line_offsets' in tables:
+            self.db_connection.cursor().execute(
+                'INSERT OR REPLACE INTO main.file_line_offsets SELECT * FROM {0}.file_line_offsets'.format(schema_name)
+            )
+
+    def copy_into(self, db_filename):
+        # Consistent and compacted copy of the whole database, taken while the others may keep on writing to it
+        try:
+            self.flush() # VACUUM cannot be run from within the transaction
+            self.db_connection.cursor().execute('VACUUM INTO ?', (db_filename,))
+        except:
+            logging.error(sys.exc_info())
+            return False
+        return True
 
     def flush(self):
         try:
@@ -313,43 +877,138 @@ class SymbolDatabase():
     def delete_entry(self, filename):
         self.delete_symbol_entry(filename);
         self.delete_diagnostics_entry(filename)
+        self.delete_file_entry(filename)
 
     def delete_symbol_entry(self, filename):
         try:
-            self.db_connection.cursor().execute('DELETE FROM symbol WHERE filename=?', (filename,))
+            self.db_connection.cursor().execute(
+                'DELETE FROM symbol WHERE filename_id IN (SELECT id FROM symbol_filename WHERE filename=?)', (filename,)
+            )
+            self.db_connection.cursor().execute(
+                'DELETE FROM symbol_reference WHERE filename_id IN (SELECT id FROM symbol_filename WHERE filename=?)', (filename,)
+            )
+            self.db_connection.cursor().execute(
+                'DELETE FROM file_include WHERE tunit_filename_id IN (SELECT id FROM symbol_filename WHERE filename=?)', (filename,)
+            )
+        except:
+            logging.error(sys.exc_info())
+
+    def delete_orphaned_entries(self):
+        # Filenames and USRs no longer referenced by any symbol (e.g. after re-indexing) are just taking up space. Those
+        # which only take part in the symbol references (e.g. USRs of the overridden methods), or in the include graph,
+        # are kept as long as the references are. File including the other one within the translation unit is either
+        # the translation unit itself or the file included by some other one, so these two are enough to look into.
+        try:
+            self.db_connection.cursor().execute(
+                'DELETE FROM symbol_name WHERE NOT EXISTS (SELECT 1 FROM symbol WHERE symbol.usr_id = symbol_name.usr_id)'
+            )
+            self.db_connection.cursor().execute(
+                'DELETE FROM symbol_filename WHERE NOT EXISTS (SELECT 1 FROM symbol WHERE symbol.filename_id = symbol_filename.id) \
+                    AND NOT EXISTS (SELECT 1 FROM symbol_reference WHERE symbol_reference.filename_id = symbol_filename.id) \
+                    AND NOT EXISTS (SELECT 1 FROM file_include WHERE file_include.tunit_filename_id = symbol_filename.id) \
+                    AND NOT EXISTS (SELECT 1 FROM file_include WHERE file_include.included_filename_id = symbol_filename.id)'
+            )
+            self.db_connection.cursor().execute(
+                'DELETE FROM symbol_usr WHERE NOT EXISTS (SELECT 1 FROM symbol WHERE symbol.usr_id = symbol_usr.id) \
+                    AND NOT EXISTS (SELECT 1 FROM symbol_reference WHERE symbol_reference.usr_id = symbol_usr.id) \
+                    AND NOT EXISTS (SELECT 1 FROM symbol_reference WHERE symbol_reference.container_usr_id = symbol_usr.id)'
+            )
         except:
             logging.error(sys.exc_info())
 
     def delete_diagnostics_entry(self, filename):
         try:
+            self.db_connection.cursor().execute(
+                'DELETE FROM diagnostics_details WHERE diagnostics_id IN (SELECT id FROM diagnostics WHERE filename=?)', (filename,)
+            )
             self.db_connection.cursor().execute('DELETE FROM diagnostics WHERE filename=?', (filename,))
         except:
             logging.error(sys.exc_info())
 
+    def delete_file_entry(self, filename):
+        try:
+            self.db_connection.cursor().execute('DELETE FROM files WHERE filename=?', (filename,))
+            self.db_connection.cursor().execute('DELETE FROM file_line_offsets WHERE filename=?', (filename,))
+        except:
+            logging.error(sys.exc_info())
+
+    def delete_metadata_entry(self, key):
+        try:
+            self.db_connection.cursor().execute('DELETE FROM metadata WHERE key=?', (key,))
+        except:
+            logging.error(sys.exc_info())
+
+    def delete_quarantine_entry(self, filename):
+        try:
+            self.db_connection.cursor().execute('DELETE FROM quarantine WHERE filename=?', (filename,))
+        except:
+            logging.error(sys.exc_info())
+
     def delete_all_entries(self):
         try:
             self.db_connection.cursor().execute('DELETE FROM symbol')
+            self.db_connection.cursor().execute('DELETE FROM symbol_name')
+            self.db_connection.cursor().execute('DELETE FROM symbol_reference')
+            self.db_connection.cursor().execute('DELETE FROM file_include')
+            self.db_connection.cursor().execute('DELETE FROM symbol_usr')
+            self.db_connection.cursor().execute('DELETE FROM symbol_filename')
             self.db_connection.cursor().execute('DELETE FROM diagnostics')
+            self.db_connection.cursor().execute('DELETE FROM diagnostics_details')
+            self.db_connection.cursor().execute('DELETE FROM files')
+            self.db_connection.cursor().execute('DELETE FROM file_line_offsets')
+            self.db_connection.cursor().execute('DELETE FROM metadata')
+            self.db_connection.cursor().execute('DELETE FROM quarantine')
         except:
             logging.error(sys.exc_info())
 
     def create_data_model(self):
+        self.enable_write_ahead_logging()
+        self.__create_tables()
+        self.create_indexes()
+
+    def enable_write_ahead_logging(self):
+        try:
+            # Write-ahead logging lets readers proceed while indexing is writing to the database in the background
+            self.db_connection.cursor().execute('PRAGMA journal_mode=WAL')
+        except:
+            logging.error(sys.exc_info())
+
+    def __create_tables(self):
         try:
+            # Filenames and USRs are repeated over and over again across the symbols so they're interned into the
+            # lookup tables and referenced by integer ids.
             self.db_connection.cursor().execute(
-                'CREATE TABLE IF NOT EXISTS symbol ( \
+                'CREATE TABLE IF NOT EXISTS symbol_filename ( \
+                    id              integer,         \
                     filename        text,            \
-                    line            integer,         \
-                    column          integer,         \
+                    PRIMARY KEY(id),                 \
+                    UNIQUE(filename)                 \
+                 )'
+            )
+            self.db_connection.cursor().execute(
+                'CREATE TABLE IF NOT EXISTS symbol_usr ( \
+                    id              integer,         \
                     usr             text,            \
-                    context         text,            \
-                    kind            integer,         \
-                    is_definition   boolean,         \
-                    PRIMARY KEY(filename, usr, line) \
+                    PRIMARY KEY(id),                 \
+                    UNIQUE(usr)                      \
                  )'
             )
             self.db_connection.cursor().execute(
-                'CREATE INDEX IF NOT EXISTS idx_symbol_definitions ON symbol (is_definition, filename, line, column, context)'
+                'CREATE TABLE IF NOT EXISTS symbol ( \
+                    filename_id     integer,         \
+                    line            integer,         \
+                    column          integer,         \
+                    usr_id          integer,         \
+                    kind            integer,         \
+                    is_definition   integer,         \
+                    PRIMARY KEY(filename_id, usr_id, line) \
+                 ) WITHOUT ROWID'
             )
+            self.__create_symbol_view()
+            self.__create_symbol_name_tables()
+            self.__create_symbol_reference_table()
+            self.__create_file_include_table()
+            self.__create_file_line_offsets_table()
             self.db_connection.cursor().execute(
                 'CREATE TABLE IF NOT EXISTS diagnostics ( \
                     id              integer,         \
@@ -374,6 +1033,20 @@ class SymbolDatabase():
                     FOREIGN KEY(diagnostics_id) REFERENCES diagnostics(id) ON DELETE CASCADE \
                  )'
             )
+            self.db_connection.cursor().execute(
+                'CREATE TABLE IF NOT EXISTS files (  \
+                    filename           text,      \
+                    mtime              real,      \
+                    size               integer,   \
+                    hash               text,      \
+                    compiler_args_hash text,      \
+                    duration           real,      \
+                    symbol_count       integer,   \
+                    PRIMARY KEY(filename)         \
+                 )'
+            )
+            self.__create_metadata_table()
+            self.__create_quarantine_table()
             self.db_connection.cursor().execute(
                 'CREATE TABLE IF NOT EXISTS version ( \
                     major integer,            \
@@ -381,8 +1054,566 @@ class SymbolDatabase():
                     PRIMARY KEY(major, minor) \
                  )'
             )
+            self.db_connection.cursor().execute('DELETE FROM version')
             self.db_connection.cursor().execute(
                 'INSERT INTO version VALUES (?, ?)', (SymbolDatabase.VERSION_MAJOR, SymbolDatabase.VERSION_MINOR,)
             )
         except:
             logging.error(sys.exc_info())
+
+    def __create_symbol_view(self):
+        # Symbols are read and written through the view, in the same shape they always had:
+        #   (filename, line, column, usr, context, kind, is_definition)
+        # Context, being the source code line symbol is found at, is not stored. It is read from the file when asked
+        # for (see source_context.py) so the column is always NULL.
+        self.db_connection.cursor().execute(
+            'CREATE VIEW IF NOT EXISTS symbol_view AS \
+                SELECT file.filename, sym.line, sym.column, usr.usr, NULL AS context, sym.kind, sym.is_definition \
+                FROM symbol AS sym \
+                JOIN symbol_filename AS file ON file.id = sym.filename_id \
+                JOIN symbol_usr AS usr ON usr.id = sym.usr_id'
+        )
+        self.db_connection.cursor().execute(
+            'CREATE TRIGGER IF NOT EXISTS symbol_view_insert INSTEAD OF INSERT ON symbol_view WHEN NEW.usr != \'\' \
+             BEGIN \
+                INSERT OR IGNORE INTO symbol_filename(filename) VALUES (NEW.filename); \
+                INSERT OR IGNORE INTO symbol_usr(usr) VALUES (NEW.usr); \
+                INSERT OR IGNORE INTO symbol VALUES ( \
+                    (SELECT id FROM symbol_filename WHERE filename = NEW.filename), NEW.line, NEW.column, \
+                    (SELECT id FROM symbol_usr WHERE usr = NEW.usr), NEW.kind, NEW.is_definition \
+                ); \
+             END'
+        )
+
+    def __create_symbol_name_tables(self):
+        # Name and qualified name of each of the declared symbols, together with the location of the declaration it
+        # was recorded from, for the workspace-symbol search.
+        self.db_connection.cursor().execute(
+            'CREATE TABLE IF NOT EXISTS symbol_name ( \
+                usr_id          integer,         \
+                name            text,            \
+                qualified_name  text,            \
+                filename_id     integer,         \
+                line            integer,         \
+                PRIMARY KEY(usr_id)              \
+             )'
+        )
+        self.db_connection.cursor().execute(
+            'CREATE INDEX IF NOT EXISTS idx_symbol_name ON symbol_name (name COLLATE NOCASE)'
+        )
+        # Trigram index makes it possible to look the names up by any part of them. It is kept in sync with the names
+        # by the triggers. Search falls back to the (much slower) table scan if SQLite comes without the support for it.
+        try:
+            self.db_connection.cursor().execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS symbol_name_fts USING fts5( \
+                    name, qualified_name, content=\'symbol_name\', content_rowid=\'usr_id\', tokenize=\'trigram\' \
+                 )'
+            )
+        except sqlite3.OperationalError:
+            logging.warning('SQLite does not support FTS5 trigram indexes: {0}'.format(sys.exc_info()))
+            return
+        self.db_connection.cursor().execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS symbol_name_fts_vocabulary USING fts5vocab(symbol_name_fts, \'col\')'
+        )
+        self.db_connection.cursor().execute(
+            'CREATE TRIGGER IF NOT EXISTS symbol_name_insert AFTER INSERT ON symbol_name \
+             BEGIN \
+                INSERT INTO symbol_name_fts(rowid, name, qualified_name) VALUES (NEW.usr_id, NEW.name, NEW.qualified_name); \
+             END'
+        )
+        self.db_connection.cursor().execute(
+            'CREATE TRIGGER IF NOT EXISTS symbol_name_delete AFTER DELETE ON symbol_name \
+             BEGIN \
+                INSERT INTO symbol_name_fts(symbol_name_fts, rowid, name, qualified_name) VALUES (\'delete\', OLD.usr_id, OLD.name, OLD.qualified_name); \
+             END'
+        )
+
+    def __create_symbol_reference_table(self):
+        # Roles of the references (see SymbolReferenceRole) which make up the call and the type hierarchies, together
+        # with the function (or the class) the reference is made from. Only the references having any of the roles are here.
+        self.db_connection.cursor().execute(
+            'CREATE TABLE IF NOT EXISTS symbol_reference ( \
+                filename_id      integer,        \
+                line             integer,        \
+                column           integer,        \
+                usr_id           integer,        \
+                container_usr_id integer,        \
+                role             integer,        \
+                PRIMARY KEY(filename_id, line, column, usr_id) \
+             ) WITHOUT ROWID'
+        )
+
+    def __create_file_include_table(self):
+        # Include graph as seen by each of the translation units, from the directives of the translation unit itself
+        # and of the headers it includes. Transitive includers of a header are found without parsing anything.
+        self.db_connection.cursor().execute(
+            'CREATE TABLE IF NOT EXISTS file_include ( \
+                tunit_filename_id    integer,    \
+                filename_id          integer,    \
+                line                 integer,    \
+                included_filename_id integer,    \
+                PRIMARY KEY(tunit_filename_id, filename_id, line) \
+             ) WITHOUT ROWID'
+        )
+
+    def __create_file_line_offsets_table(self):
+        # Offsets at which the lines of the indexed file begin, as of the time it was indexed (see source_context.py),
+        # so that the source code lines of the symbols can be read without going through the whole file.
+        self.db_connection.cursor().execute(
+            'CREATE TABLE IF NOT EXISTS file_line_offsets ( \
+                filename        text,            \
+                offsets         blob,            \
+                PRIMARY KEY(filename)            \
+             )'
+        )
+
+    def __create_metadata_table(self):
+        # Key-value pairs describing the state of the project the index was built from (e.g. the git commit)
+        self.db_connection.cursor().execute(
+            'CREATE TABLE IF NOT EXISTS metadata ( \
+                key             text,            \
+                value           text,            \
+                PRIMARY KEY(key)                 \
+             )'
+        )
+
+    def __create_quarantine_table(self):
+        # Files which keep on crashing (or hanging) the indexer, together with the fingerprint they were found with.
+        # They are not indexed again as long as the fingerprint stays the same.
+        self.db_connection.cursor().execute(
+            'CREATE TABLE IF NOT EXISTS quarantine ( \
+                filename           text,      \
+                hash               text,      \
+                compiler_args_hash text,      \
+                reason             text,      \
+                PRIMARY KEY(filename)         \
+             )'
+        )
+
+    def create_indexes(self):
+        try:
+            # Find-all-references and go-to-definition look the symbols up by their USR. Index is deliberately kept
+            # narrow: with is_definition in it, it would cover the definitions query and get picked over the index below.
+            self.db_connection.cursor().execute(
+                'CREATE INDEX IF NOT EXISTS idx_symbol_usr ON symbol (usr_id)'
+            )
+            self.db_connection.cursor().execute(
+                'CREATE INDEX IF NOT EXISTS idx_symbol_definitions ON symbol (filename_id, line) WHERE is_definition = 1'
+            )
+            # Definition is looked up by its USR without going through all of the references to the symbol
+            self.db_connection.cursor().execute(
+                'CREATE INDEX IF NOT EXISTS idx_symbol_usr_definitions ON symbol (usr_id) WHERE is_definition = 1'
+            )
+            # Hierarchies are walked in both directions: from the referenced symbol to the containers and the other way
+            # around. Indexes cover the queries up to the lookup of the filename.
+            self.db_connection.cursor().execute(
+                'CREATE INDEX IF NOT EXISTS idx_symbol_reference_usr ON symbol_reference (usr_id, container_usr_id, role)'
+            )
+            self.db_connection.cursor().execute(
+                'CREATE INDEX IF NOT EXISTS idx_symbol_reference_container ON symbol_reference (container_usr_id, usr_id, role)'
+            )
+            # Include graph is walked from the included file up to the files including it
+            self.db_connection.cursor().execute(
+                'CREATE INDEX IF NOT EXISTS idx_file_include_included ON file_include (included_filename_id, filename_id)'
+            )
+            # Details are fetched together with the diagnostics they belong to
+            self.db_connection.cursor().execute(
+                'CREATE INDEX IF NOT EXISTS idx_diagnostics_details ON diagnostics_details (diagnostics_id)'
+            )
+        except:
+            logging.error(sys.exc_info())
+
+    def drop_indexes(self):
+        try:
+            self.db_connection.cursor().execute('DROP INDEX IF EXISTS idx_diagnostics_details')
+            self.db_connection.cursor().execute('DROP INDEX IF EXISTS idx_file_include_included')
+            self.db_connection.cursor().execute('DROP INDEX IF EXISTS idx_symbol_reference_container')
+            self.db_connection.cursor().execute('DROP INDEX IF EXISTS idx_symbol_reference_usr')
+            self.db_connection.cursor().execute('DROP INDEX IF EXISTS idx_symbol_usr_definitions')
+            self.db_connection.cursor().execute('DROP INDEX IF EXISTS idx_symbol_definitions')
+            self.db_connection.cursor().execute('DROP INDEX IF EXISTS idx_symbol_usr')
+        except:
+            logging.error(sys.exc_info())
+
+    def migrate_data_model(self):
+        # Symbol databases from 0.4 onwards carry the same information, just not normalized, so they can be converted
+        # in-place. Older ones lack the file fingerprints which are needed for incremental re-indexing to work.
+        major, minor = self.fetch_schema_version()
+        if (major, minor) not in ((0, 4), (0, 5), (1, 0), (1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (1, 6), (1, 7)):
+            return False
+        try:
+            self.flush()
+            self.db_connection.cursor().execute('BEGIN')
+            if (major, minor) < (1, 0):
+                self.__migrate_to_normalized_data_model()
+            # 1.1 records how long it took to index each of the files and how many symbols were found
+            columns = [row[1] for row in self.db_connection.cursor().execute('PRAGMA table_info(files)').fetchall()]
+            if 'duration' not in columns:
+                self.db_connection.cursor().execute('ALTER TABLE files ADD COLUMN duration real')
+            if 'symbol_count' not in columns:
+                self.db_connection.cursor().execute('ALTER TABLE files ADD COLUMN symbol_count integer')
+            # 1.2 records the state of the project the index was built from
+            self.__create_metadata_table()
+            # 1.3 records the names of the symbols, 1.5 the roles of the references and 1.6 the include graph. They
+            # can only be found by indexing the files once again so the fingerprints are invalidated, and the indexed
+            # commit forgotten, for each of the files to be seen as changed.
+            if (major, minor) < (1, 3):
+                self.__create_symbol_name_tables()
+            if (major, minor) < (1, 5):
+                self.__create_symbol_reference_table()
+            if (major, minor) < (1, 6):
+                self.__create_file_include_table()
+                self.db_connection.cursor().execute('UPDATE files SET compiler_args_hash = NULL')
+                self.db_connection.cursor().execute('DELETE FROM metadata WHERE key=\'git_commit\'')
+            # 1.7 no longer stores the source code lines of the symbols but the line offsets of the files, which are
+            # recorded the next time the files are indexed. Lines are read from the files until then.
+            if (major, minor) < (1, 7):
+                self.db_connection.cursor().execute('DROP TRIGGER IF EXISTS symbol_view_insert')
+                self.db_connection.cursor().execute('DROP VIEW IF EXISTS symbol_view')
+                self.db_connection.cursor().execute('DROP TABLE IF EXISTS symbol_context')
+                self.__create_symbol_view()
+                self.__create_file_line_offsets_table()
+            # 1.8 records the files which could not be indexed because they crashed (or hung) the indexer
+            self.__create_quarantine_table()
+            # 1.4 looks the diagnostics details up by the diagnostics they belong to, 1.5 the definitions by their USR
+            # and the references by the symbols taking part in them, and 1.6 the includers by the included file
+            self.create_indexes()
+            self.db_connection.cursor().execute('DELETE FROM version')
+            self.db_connection.cursor().execute(
+                'INSERT INTO version VALUES (?, ?)', (SymbolDatabase.VERSION_MAJOR, SymbolDatabase.VERSION_MINOR,)
+            )
+            self.db_connection.commit()
+            if (major, minor) < (1, 7):
+                self.db_connection.cursor().execute('VACUUM') # Space taken by the source code lines is given back
+        except:
+            logging.error('Failed to migrate the symbol database from version {0}.{1}: {2}'.format(major, minor, sys.exc_info()))
+            self.db_connection.rollback()
+            return False
+        return True
+
+    def __migrate_to_normalized_data_model(self):
+        self.db_connection.cursor().execute('DROP INDEX IF EXISTS idx_symbol_definitions')
+        self.db_connection.cursor().execute('DROP INDEX IF EXISTS idx_symbol_usr')
+        self.db_connection.cursor().execute('ALTER TABLE symbol RENAME TO symbol_v0')
+        self.__create_tables()
+        self.db_connection.cursor().execute(
+            'INSERT OR IGNORE INTO symbol_filename(filename) SELECT DISTINCT filename FROM symbol_v0'
+        )
+        self.db_connection.cursor().execute(
+            'INSERT OR IGNORE INTO symbol_usr(usr) SELECT DISTINCT usr FROM symbol_v0 WHERE usr != \'\''
+        )
+        self.db_connection.cursor().execute(
+            'INSERT OR IGNORE INTO symbol \
+                SELECT file.id, old.line, old.column, usr.id, old.kind, old.is_definition FROM symbol_v0 AS old \
+                JOIN symbol_filename AS file ON file.filename = old.filename \
+                JOIN symbol_usr AS usr ON usr.usr = old.usr'
+        )
+        self.db_connection.cursor().execute('DROP TABLE symbol_v0')
+        self.create_indexes()
+
+class ShardedSymbolDatabase(SymbolDatabase):
+    """
+    Symbol database partitioned into a number of shards by the hash of the filename. Each of the shards is a symbol
+    database of its own, stored next to the main one, which only keeps the schema version and the metadata.
+
+    Entries of a file are written into get_shard(filename) so that different shards can be written into at the same
+    time, e.g. by the indexer workers. Queries are run against all of the shards in parallel and the results merged.
+    Diagnostics ids are made unique across the shards by encoding the shard index into them.
+    """
+
+    def __init__(self, db_filename, num_of_shards):
+        self.num_of_shards = num_of_shards
+        # Shards are queried from the executor threads, one thread per shard at a time
+        self.shards = [SymbolDatabase(None, check_same_thread=False) for shard in range(num_of_shards)]
+        self.executor = ThreadPoolExecutor(max_workers=min(num_of_shards, multiprocessing.cpu_count()), thread_name_prefix='cxxd-symbol-db')
+        super(ShardedSymbolDatabase, self).__init__(db_filename)
+        if db_filename:
+            self.__open_shards(db_filename)
+
+    def open(self, db_filename):
+        super(ShardedSymbolDatabase, self).open(db_filename)
+        self.__open_shards(db_filename)
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        super(ShardedSymbolDatabase, self).close()
+
+    def get_shard(self, filename):
+        return self.shards[get_shard_index(filename, self.num_of_shards)]
+
+    def get_shard_filename(self, shard_index):
+        return get_shard_filename(self.filename, shard_index)
+
+    def fetch_all_symbols(self):
+        return self.__fan_out_and_concat(lambda shard: shard.fetch_all_symbols())
+
+    def fetch_symbols_by_usr(self, usr):
+        return self.__fan_out_and_concat(lambda shard: shard.fetch_symbols_by_usr(usr))
+
+    def fetch_symbol_definition_by_usr(self, usr):
+        return self.__fan_out_and_concat(lambda shard: shard.fetch_symbol_definition_by_usr(usr))
+
+    def fetch_symbol_references(self, usr, roles):
+        return self.__fan_out_and_concat(lambda shard: shard.fetch_symbol_references(usr, roles))
+
+    def fetch_symbol_references_by_container(self, container_usr, roles):
+        return self.__fan_out_and_concat(lambda shard: shard.fetch_symbol_references_by_container(container_usr, roles))
+
+    def fetch_includers(self, filename):
+        # Same include directive is seen by the translation units from the different shards
+        return sorted(set(self.__fan_out_and_concat(lambda shard: shard.fetch_includers(filename))))
+
+    def fetch_transitive_includers(self, filenames):
+        # Include graph of each of the translation units is stored as a whole in its shard so the includers found in
+        # one shard are never missing the edges from the other ones
+        return sorted(set(self.__fan_out_and_concat(lambda shard: shard.fetch_transitive_includers(filenames))))
+
+    def fetch_symbol_declarations(self, usrs):
+        # Definition may be found in one shard and the declarations (or just the references) in the others
+        rows = {}
+        for row in self.__fan_out_and_concat(lambda shard: shard.fetch_symbol_declarations(usrs)):
+            usr = self.get_symbol_usr(row)
+            rank = (self.get_symbol_is_definition(row), self.get_symbol_name(row) is not None)
+            if usr not in rows or rank > rows[usr][0]:
+                rows[usr] = (rank, row)
+        return [row for rank, row in rows.values()]
+
+    def fetch_all_definitions_raw(self):
+        for rows in self.__fan_out(lambda shard: list(shard.fetch_all_definitions_raw())):
+            yield from rows
+
+    def fetch_symbols_by_name(self, query, limit):
+        # Declaration and definition of the same symbol may be found in the different shards
+        get_rank, rows = get_symbol_name_match_rank(query), {}
+        for row in self.__fan_out_and_concat(lambda shard: shard.fetch_symbols_by_name(query, limit)):
+            usr = self.get_symbol_usr(row)
+            if usr not in rows or (self.get_symbol_is_definition(row) and not self.get_symbol_is_definition(rows[usr])):
+                rows[usr] = row
+        return heapq.nsmallest(
+            limit, rows.values(), key=lambda row: get_rank(self.get_symbol_name(row), self.get_symbol_qualified_name(row))
+        )
+
+    def fetch_all_diagnostics(self, sorting_strategy):
+        rows = [
+            [self.__to_global_diagnostics_id(row, shard_index) for row in shard_rows]
+                for shard_index, shard_rows in enumerate(self.__fan_out(lambda shard: shard.fetch_all_diagnostics(sorting_strategy)))
+        ]
+        # Each of the shards has already sorted its own diagnostics so it only takes to merge them
+        if sorting_strategy == DiagnosticsSortingStrategyId.BY_SEVERITY_ASC:
+            return list(heapq.merge(*rows, key=lambda row: self.get_diagnostics_severity(row)))
+        elif sorting_strategy == DiagnosticsSortingStrategyId.BY_SEVERITY_DESC:
+            return list(heapq.merge(*rows, key=lambda row: self.get_diagnostics_severity(row), reverse=True))
+        elif sorting_strategy == DiagnosticsSortingStrategyId.BY_FILENAME:
+            return list(heapq.merge(*rows, key=lambda row: self.get_diagnostics_filename(row)))
+        return [row for shard_rows in rows for row in shard_rows]
+
+    def fetch_all_diagnostics_with_details(self, sorting_strategy):
+        diagnostics = [
+            [
+                (self.__to_global_diagnostics_id(diag, shard_index), [self.__to_global_diagnostics_id(detail, shard_index) for detail in details])
+                    for diag, details in shard_diagnostics
+            ]
+            for shard_index, shard_diagnostics in enumerate(self.__fan_out(lambda shard: shard.fetch_all_diagnostics_with_details(sorting_strategy)))
+        ]
+        if sorting_strategy == DiagnosticsSortingStrategyId.BY_SEVERITY_ASC:
+            return list(heapq.merge(*diagnostics, key=lambda item: self.get_diagnostics_severity(item[0])))
+        elif sorting_strategy == DiagnosticsSortingStrategyId.BY_SEVERITY_DESC:
+            return list(heapq.merge(*diagnostics, key=lambda item: self.get_diagnostics_severity(item[0]), reverse=True))
+        elif sorting_strategy == DiagnosticsSortingStrategyId.BY_FILENAME:
+            return list(heapq.merge(*diagnostics, key=lambda item: self.get_diagnostics_filename(item[0])))
+        return [item for shard_diagnostics in diagnostics for item in shard_diagnostics]
+
+    def fetch_definitions_page(self, cursor, page_size, filename_prefix='', kinds=None, name=''):
+        return self.__fetch_page(cursor, page_size, lambda shard_index, shard_cursor, page_size: self.shards[shard_index].fetch_definitions_page(
+            shard_cursor, page_size, filename_prefix, kinds, name
+        ))
+
+    def fetch_diagnostics_page(self, cursor, page_size, filename_prefix='', min_severity=0, description=''):
+        def fetch(shard_index, shard_cursor, page_size):
+            diagnostics, next_cursor = self.shards[shard_index].fetch_diagnostics_page(shard_cursor, page_size, filename_prefix, min_severity, description)
+            return [
+                (self.__to_global_diagnostics_id(diag, shard_index), [self.__to_global_diagnostics_id(detail, shard_index) for detail in details])
+                    for diag, details in diagnostics
+            ], next_cursor
+        return self.__fetch_page(cursor, page_size, fetch)
+
+    def fetch_diagnostics_details(self, diagnostics_id):
+        shard_index, diagnostics_id = diagnostics_id % self.num_of_shards, diagnostics_id // self.num_of_shards
+        return [
+            self.__to_global_diagnostics_id(row, shard_index) for row in self.shards[shard_index].fetch_diagnostics_details(diagnostics_id)
+        ]
+
+    def fetch_all_diagnostics_details(self):
+        return [
+            self.__to_global_diagnostics_id(row, shard_index)
+                for shard_index, shard_rows in enumerate(self.__fan_out(lambda shard: shard.fetch_all_diagnostics_details()))
+                    for row in shard_rows
+        ]
+
+    def fetch_all_files(self):
+        return self.__fan_out_and_concat(lambda shard: shard.fetch_all_files())
+
+    def fetch_line_offsets(self, filenames):
+        return self.__fan_out_and_concat(
+            lambda shard: shard.fetch_line_offsets([filename for filename in filenames if self.get_shard(filename) is shard])
+        )
+
+    def copy_into(self, db_filename):
+        # Copy is an ordinary symbol database, with the contents of all the shards merged into it
+        if not super(ShardedSymbolDatabase, self).copy_into(db_filename):
+            return False
+        for shard in self.shards:
+            shard.flush()
+        symbol_db = SymbolDatabase(db_filename)
+        symbol_db.copy_all_entries_from([self.get_shard_filename(shard_index) for shard_index in range(self.num_of_shards)])
+        symbol_db.delete_metadata_entry('shards')
+        symbol_db.flush()
+        symbol_db.close()
+        return True
+
+    def flush(self):
+        super(ShardedSymbolDatabase, self).flush()
+        for shard in self.shards:
+            shard.flush()
+
+    def delete_entry(self, filename):
+        self.delete_symbol_entry(filename)
+        self.delete_diagnostics_entry(filename)
+        self.delete_file_entry(filename)
+
+    def delete_symbol_entry(self, filename):
+        self.get_shard(filename).delete_symbol_entry(filename)
+
+    def delete_orphaned_entries(self):
+        for shard in self.shards:
+            shard.delete_orphaned_entries()
+
+    def delete_diagnostics_entry(self, filename):
+        # Diagnostics are stored into the shard of the file being indexed but they may as well refer to the other files
+        for shard in self.shards:
+            shard.delete_diagnostics_entry(filename)
+
+    def delete_file_entry(self, filename):
+        self.get_shard(filename).delete_file_entry(filename)
+
+    def delete_all_entries(self):
+        super(ShardedSymbolDatabase, self).delete_all_entries()
+        for shard in self.shards:
+            shard.delete_all_entries()
+        self.insert_metadata_entry('shards', str(self.num_of_shards))
+
+    def drop_shard(self, shard_index):
+        # Shard is re-created from scratch, which also gives the space it took back to the file-system
+        shard = self.shards[shard_index]
+        shard.close()
+        for filename in [self.get_shard_filename(shard_index) + suffix for suffix in ('', '-wal', '-shm')]:
+            if os.path.exists(filename):
+                os.remove(filename)
+        shard.open(self.get_shard_filename(shard_index))
+        shard.create_data_model()
+        shard.flush()
+
+    def create_data_model(self):
+        super(ShardedSymbolDatabase, self).create_data_model()
+        self.insert_metadata_entry('shards', str(self.num_of_shards))
+        for shard in self.shards:
+            shard.create_data_model()
+
+    def migrate_data_model(self):
+        return all([super(ShardedSymbolDatabase, self).migrate_data_model()] + [shard.migrate_data_model() for shard in self.shards])
+
+    def __open_shards(self, db_filename):
+        for shard_index, shard in enumerate(self.shards):
+            shard.open(get_shard_filename(db_filename, shard_index))
+
+    def __fetch_page(self, cursor, page_size, fetch):
+        # Pages are filled from one shard after the other. Cursor tells the shard and the cursor within that shard.
+        shard_index, shard_cursor = cursor.split('/', 1) if cursor else (0, '')
+        shard_index, page = int(shard_index), []
+        while shard_index < self.num_of_shards:
+            rows, shard_cursor = fetch(shard_index, shard_cursor, page_size - len(page))
+            page.extend(rows)
+            if shard_cursor is None:
+                shard_index, shard_cursor = shard_index + 1, ''
+            if len(page) == page_size:
+                break
+        while shard_index < self.num_of_shards and not shard_cursor and not fetch(shard_index, '', 1)[0]:
+            shard_index += 1 # so that the page is not followed by an empty one
+        return page, '{0}/{1}'.format(shard_index, shard_cursor) if shard_index < self.num_of_shards else None
+
+    def __fan_out(self, fetch):
+        # SQLite lets go of the GIL while executing the query so the shards are really queried in parallel
+        return self.executor.map(fetch, self.shards)
+
+    def __fan_out_and_concat(self, fetch):
+        return [row for rows in self.__fan_out(fetch) for row in rows]
+
+    def __to_global_diagnostics_id(self, row, shard_index):
+        return (row[0] * self.num_of_shards + shard_index,) + tuple(row[1:])
+
+def group_diagnostics_details(rows):
+    # Diagnostics joined with their details come as (diagnostics..., details...) rows, one for each of the details
+    grouped = []
+    for row in rows:
+        diagnostics, details = row[0:6], row[6:12]
+        if not grouped or grouped[-1][0][0] != diagnostics[0]:
+            grouped.append((diagnostics, []))
+        if details[0] is not None:
+            grouped[-1][1].append(details)
+    return grouped
+
+def get_shard_index(filename, num_of_shards):
+    # Has to give the same result across the processes and the machines, so no built-in hash(). CRC is no good either
+    # since, being linear, it puts the similarly named files (e.g. file1.cpp, file2.cpp, ...) into the same shard.
+    return int.from_bytes(hashlib.sha1(filename.encode('utf-8')).digest()[0:8], 'little') % num_of_shards
+
+def get_shard_filename(db_filename, shard_index):
+    return '{0}.shard-{1}'.format(db_filename, shard_index)
+
+def get_symbol_name_match_rank(query):
+    # Returns a function giving the sort key which tells how well the name matches the query, the lower the better,
+    # or None if it does not match at all. Categories, from the best one:
+    #   exact match, exact match ignoring the case, prefix, substring at the word boundary, substring, subsequence
+    #   (e.g. 'gfn' for 'get_file_name'), and the ones sharing at least a half of the trigrams with the query.
+    # Within the same category shorter names go first.
+    qualified = '::' in query
+    lower_query = query.lower()
+    trigrams = get_trigrams(lower_query)
+    def rank(name, qualified_name):
+        if qualified:
+            name = qualified_name
+        lower_name = name.lower()
+        if name == query:
+            category, similarity = 0, 0
+        elif lower_name == lower_query:
+            category, similarity = 1, 0
+        elif lower_name.startswith(lower_query):
+            category, similarity = 2, 0
+        elif lower_query in lower_name:
+            position = lower_name.find(lower_query)
+            at_word_boundary = not name[position-1].isalnum() or (name[position].isupper() and name[position-1].islower())
+            category, similarity = 3 if at_word_boundary else 4, 0
+        elif is_subsequence(lower_query, lower_name):
+            category, similarity = 5, 0
+        else:
+            similarity = len(trigrams & get_trigrams(lower_name)) / len(trigrams) if trigrams else 0
+            if similarity < 0.5:
+                return None
+            category = 6
+        return (category, -similarity, len(name), name)
+    return rank
+
+def is_subsequence(query, name):
+    characters = iter(name)
+    return all(character in characters for character in query)
+
+def get_trigrams(text):
+    text = text.lower()
+    return {text[i:i+3] for i in range(0, len(text) - 2)}
+
+def quote_fts_string(text):
+    return '"{0}"'.format(text.replace('"', '""'))
+
+def escape_like_pattern(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
@@ -0,0 +1,192 @@
+import logging
+import multiprocessing
+import multiprocessing.connection
+import sys
+import time
+
+class WorkerProgress():
+    """
+    Progress of the request the worker is busy with, shared between the worker and the pool: number of parts of the
+    request (e.g. files) completed so far, and the time the worker started with the current one. Pool tells the hung
+    workers apart by it, and the part of the request the worker has died on.
+    """
+
+    def __init__(self, context):
+        self.completed = context.Value('i', 0, lock=False)
+        self.started = context.Value('d', 0.0, lock=False)
+
+    def reset(self):
+        self.completed.value, self.started.value = 0, time.time()
+
+    def advance(self):
+        self.completed.value, self.started.value = self.completed.value + 1, time.time()
+
+    def get(self):
+        return self.completed.value, self.started.value
+
+class Worker():
+    def __init__(self, context, worker_id, handler_factory, inherited_connections):
+        self.id = worker_id
+        self.connection, child_connection = context.Pipe()
+        self.progress = WorkerProgress(context)
+        self.process = context.Process(
+            target=run_worker,
+            args=(worker_id, child_connection, handler_factory, inherited_connections + [self.connection], self.progress),
+            name='cxxd-indexer-worker-{0}'.format(worker_id),
+            daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+
+    def send(self, request):
+        try:
+            self.progress.reset()
+            self.connection.send(request)
+            return True
+        except (BrokenPipeError, EOFError, OSError):
+            logging.error("Worker {0} died unexpectedly.".format(self.id))
+            return False
+
+    def recv(self):
+        # Raises EOFError if worker has died in the meantime
+        return self.connection.recv()
+
+    def request(self, request):
+        if self.send(request):
+            try:
+                return self.recv()
+            except (EOFError, OSError):
+                logging.error("Worker {0} died unexpectedly.".format(self.id))
+        return None
+
+    def get_progress(self):
+        # (number of parts of the request completed, time the current one was started at), see report_progress()
+        return self.progress.get()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+
+    def close(self):
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, EOFError, OSError):
+            pass
+        self.process.join(timeout=5.0)
+        if self.process.is_alive():
+            self.kill()
+        self.connection.close()
+
+class WorkerPool():
+    """
+    Pool of long-lived worker processes which are forked from the service process. By the time workers are
+    forked, service has already loaded the libclang and resolved the compiler arguments (system include paths
+    included) so there is nothing left for the workers to initialize. Pool is kept around for the lifetime of
+    the service and reused by every indexing run.
+
+    Each worker serves the requests sent over its own connection by calling the handler constructed with
+    handler_factory() on the worker side, and sends back whatever it returns.
+
+    Spare workers are forked together with the others, and kept idle, to take over from the workers which die (or
+    get killed) while the pool is in use, since forking is only safe while no other thread is using libclang.
+    """
+
+    def __init__(self, num_workers, handler_factory, num_spare_workers=0):
+        self.num_workers = num_workers
+        self.num_spare_workers = num_spare_workers
+        self.handler_factory = handler_factory
+        self.workers = []
+        self.spare_workers = []
+        self.next_worker_id = 1
+
+    def start(self, num_workers=None):
+        # Workers which have died (or have been killed on cancellation) are replaced with the spare ones, and the spare
+        # ones with the new ones. Only the calling thread is replicated by fork() so this must not be called while other
+        # thread is using libclang.
+        if num_workers is not None:
+            self.num_workers = num_workers
+        context = multiprocessing.get_context('fork')
+        for workers in (self.workers, self.spare_workers):
+            for worker in [worker for worker in workers if not worker.is_alive()]:
+                worker.connection.close()
+                workers.remove(worker)
+        while len(self.workers) < self.num_workers and self.spare_workers:
+            self.workers.append(self.spare_workers.pop(0))
+        # Pool may have been resized in the meantime. Workers which are no longer needed give the memory back.
+        for worker in self.workers[self.num_workers:]:
+            worker.close()
+        del self.workers[self.num_workers:]
+        for workers, num_workers in ((self.workers, self.num_workers), (self.spare_workers, self.num_spare_workers)):
+            while len(workers) < num_workers:
+                worker = Worker(
+                    context,
+                    self.next_worker_id,
+                    self.handler_factory,
+                    [worker.connection for worker in self.workers + self.spare_workers]
+                )
+                logging.info("Started indexer worker {0} (pid={1}).".format(worker.id, worker.process.pid))
+                workers.append(worker)
+                self.next_worker_id += 1
+        return self.workers
+
+    def replace(self, worker):
+        # Worker is killed and replaced with one of the spare workers. None if there are no spare workers left, in
+        # which case the pool runs with one worker less until it is started again.
+        worker.kill()
+        worker.connection.close()
+        self.workers.remove(worker)
+        while self.spare_workers:
+            spare_worker = self.spare_workers.pop(0)
+            if spare_worker.is_alive():
+                self.workers.append(spare_worker)
+                return spare_worker
+            spare_worker.connection.close()
+        return None
+
+    def get_workers(self):
+        return [worker for worker in self.workers if worker.is_alive()]
+
+    def shutdown(self):
+        for worker in self.workers + self.spare_workers:
+            worker.close()
+        self.workers, self.spare_workers = [], []
+
+def wait_for_any(workers, timeout):
+    ready = multiprocessing.connection.wait([worker.connection for worker in workers], timeout)
+    return [worker for worker in workers if worker.connection in ready]
+
+worker_progress = None # Progress of the worker process itself. None outside of the worker processes.
+
+def report_progress():
+    # Called by the handler, on the worker side, each time it completes a part of the request (e.g. each of the files)
+    if worker_progress is not None:
+        worker_progress.advance()
+
+def run_worker(worker_id, connection, handler_factory, inherited_connections, progress):
+    # Connections to the other workers got inherited through fork(). Close them so that the other workers get
+    # to see EOF once the service closes its end.
+    for inherited_connection in inherited_connections:
+        inherited_connection.close()
+
+    global worker_progress
+    worker_progress = progress
+
+    logging.info("[Worker {0}] Started.".format(worker_id))
+    handler = handler_factory()
+    while True:
+        try:
+            request = connection.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        try:
+            response = handler(request)
+        except:
+            logging.error("[Worker {0}] {1}".format(worker_id, sys.exc_info()))
+            response = False
+        connection.send(response)
+    logging.info("[Worker {0}] Finished.".format(worker_id))
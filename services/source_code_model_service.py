@@ -1,6 +1,7 @@
 import json
 import logging
 import os
+import cxxd.parser.ast_cache
 import cxxd.parser.clang_parser
 import cxxd.parser.tunit_cache
 import cxxd.service
@@ -20,16 +21,24 @@ class SourceCodeModelSubServiceId():
     GO_TO_INCLUDE             = 0x5
 
 class SourceCodeModel(cxxd.service.Service):
-    def __init__(self, project_root_directory, cxxd_config_parser, target, service_plugin):
+    def __init__(self, project_root_directory, cxxd_config_parser, target, service_plugin, parser=None, interactive_requests=None):
         cxxd.service.Service.__init__(self, service_plugin)
         self.project_root_directory = project_root_directory
         self.cxxd_config_parser = cxxd_config_parser
-        self.parser = cxxd.parser.clang_parser.ClangParser(
+        self.parser = parser if parser is not None else cxxd.parser.clang_parser.ClangParser(
             cxxd_config_parser.get_configuration_for_target(target),
-            cxxd.parser.tunit_cache.TranslationUnitCache(cxxd.parser.tunit_cache.FifoCache(20)),
-            cxxd_config_parser.get_clang_library_file()
+            cxxd.parser.tunit_cache.TranslationUnitCache(cxxd.parser.tunit_cache.CostAwareCache(cxxd_config_parser.get_clang_tunit_cache_size() * 1024 * 1024)),
+            cxxd_config_parser.get_clang_library_file(),
+            cxxd.parser.ast_cache.AstCache(project_root_directory, cxxd_config_parser.get_clang_ast_cache_size() * 1024 * 1024) if cxxd_config_parser.get_clang_ast_cache_size() else None
+        )
+        self.clang_indexer = ClangIndexer(
+            self.parser,
+            self.project_root_directory,
+            self.cxxd_config_parser,
+            self.__indexer_job_completed,
+            lambda indexer_args: self.send_request([SourceCodeModelSubServiceId.INDEXER] + indexer_args),
+            interactive_requests
         )
-        self.clang_indexer = ClangIndexer(self.parser, self.project_root_directory, self.cxxd_config_parser)
         self.service = {
             SourceCodeModelSubServiceId.INDEXER                   : self.clang_indexer,
             SourceCodeModelSubServiceId.SEMANTIC_SYNTAX_HIGHLIGHT : SemanticSyntaxHighlight(self.parser),
@@ -39,6 +48,10 @@ class SourceCodeModel(cxxd.service.Service):
             SourceCodeModelSubServiceId.GO_TO_INCLUDE             : GoToInclude(self.parser)
         }
 
+    def __indexer_job_completed(self, indexer_request_id, success, args):
+        # Background indexing jobs report their result through the plugin once they're done
+        self.service_plugin.__call__(success, [SourceCodeModelSubServiceId.INDEXER, indexer_request_id], args)
+
     def __unknown_service(self, args):
         logging.error("Unknown service triggered! Valid services are: {0}".format(self.service))
         return False, None
@@ -48,8 +61,16 @@ class SourceCodeModel(cxxd.service.Service):
         return True, []
 
     def shutdown_callback(self, args):
+        self.clang_indexer.shutdown()
+        logging.info('Translation unit cache: {0}'.format(self.parser.tunit_cache.get_stats()))
+        if self.parser.ast_cache is not None:
+            logging.info('AST cache: {0}'.format(self.parser.ast_cache.get_stats()))
         logging.info('source-code-model service stopped.')
         return True, []
 
     def __call__(self, args):
-        return self.service.get(int(args[0]), self.__unknown_service)(args[1:len(args)])
+        if int(args[0]) == SourceCodeModelSubServiceId.INDEXER:
+            return self.clang_indexer(args[1:len(args)])
+        # Indexing in progress gives way to the requests the user is waiting on
+        with self.clang_indexer.interactive_request():
+            return self.service.get(int(args[0]), self.__unknown_service)(args[1:len(args)])
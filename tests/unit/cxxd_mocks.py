@@ -22,10 +22,10 @@ class ServiceMock():
         pass
 
 class ServicePluginMock():
-    def startup_callback(self, success, payload):
+    def startup_callback(self, success, payload, startup_payload):
         pass
 
-    def shutdown_callback(self, success, payload):
+    def shutdown_callback(self, success, payload, shutdown_payload):
         pass
 
     def __call__(self, success, payload, args):
@@ -41,13 +41,13 @@ class SourceLocationMock():
             return self.filename
 
     def __init__(self, filename, line, column):
-        self.file = self.File(filename)
+        self._file = self.File(filename)
         self.line = line
         self.column = column
 
     @property
     def file(self):
-        return self.file
+        return self._file
 
 class DiagnosticMock():
     def __init__(self, location, spelling, severity, children):
@@ -93,3 +93,41 @@ class CxxdConfigParserMock():
         return []
     def get_extra_file_extensions(self):
         return []
+    def get_indexer_backend(self):
+        return 'cursor-visitor'
+
+    def get_indexer_stream_results(self):
+        return False
+
+    def get_indexer_watch_files(self):
+        return False
+
+    def get_indexer_shards(self):
+        return 0
+
+    def get_indexer_file_timeout(self):
+        return 120.0
+
+    def get_indexer_max_workers(self):
+        return 0
+
+    def get_indexer_min_free_memory(self):
+        return 1024
+
+    def get_indexer_max_load(self):
+        return 1.0
+
+    def get_indexer_nice(self):
+        return 10
+
+    def get_indexer_pause_on_interactive(self):
+        return True
+
+    def get_clang_tunit_cache_size(self):
+        return 2048
+
+    def get_clang_parse_host(self):
+        return False
+
+    def get_clang_ast_cache_size(self):
+        return 0
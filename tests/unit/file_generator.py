@@ -106,6 +106,32 @@ int fun() {                 \n\
             ')
         return fd
 
+    @staticmethod
+    def gen_cpp_file_with_class_hierarchy():
+        fd = tempfile.NamedTemporaryFile(suffix='.cpp', mode='w')
+        fd.write('\
+struct Base {                                   \n\
+    virtual int get() const { return 0; }       \n\
+};                                              \n\
+                                                \n\
+struct Derived : Base {                         \n\
+    int get() const override { return value; }  \n\
+    int value;                                  \n\
+};                                              \n\
+                                                \n\
+int twice(int x) {                              \n\
+    return 2 * x;                               \n\
+}                                               \n\
+                                                \n\
+int main() {                                    \n\
+    Derived d;                                  \n\
+    d.value = twice(d.get());                   \n\
+    return d.value;                             \n\
+}                                               \n\
+        ')
+        fd.flush()
+        return fd
+
     @staticmethod
     def gen_txt_compilation_database():
         txt_compile_flags = [
@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import parser.ast_cache
+import parser.clang_parser
+import parser.tunit_cache
+from file_generator import FileGenerator
+
+class AstCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.txt_compilation_database = FileGenerator.gen_txt_compilation_database()
+
+    @classmethod
+    def tearDownClass(cls):
+        FileGenerator.close_gen_file(cls.txt_compilation_database)
+
+    def setUp(self):
+        self.root_directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.root_directory, 'main.cpp')
+        self.write(self.filename, 'int main() { return 0; }\n')
+        self.parser = self.start_parser()
+
+    def tearDown(self):
+        shutil.rmtree(self.root_directory)
+
+    def start_parser(self, max_size=1024*1024*1024):
+        return parser.clang_parser.ClangParser(
+            self.txt_compilation_database.name,
+            parser.tunit_cache.TranslationUnitCache(parser.tunit_cache.UnlimitedCache()),
+            None,
+            parser.ast_cache.AstCache(self.root_directory, max_size)
+        )
+
+    def write(self, filename, contents, timestamp=1000):
+        with open(filename, 'w') as f:
+            f.write(contents)
+        os.utime(filename, (timestamp, timestamp))
+
+    def test_if_tunit_is_read_back_once_the_parser_is_restarted(self):
+        self.parser.parse(self.filename, self.filename)
+        self.assertEqual(self.parser.ast_cache.get_stats()['stores'], 1)
+        restarted_parser = self.start_parser()
+        tunit = restarted_parser.parse(self.filename, self.filename)
+        self.assertEqual(parser.clang_parser.is_read_from_ast_cache(tunit), True)
+        self.assertEqual([cursor.spelling for cursor in tunit.cursor.get_children() if cursor.location.file], ['main'])
+        self.assertEqual(restarted_parser.ast_cache.get_stats()['hits'], 1)
+
+    def test_if_tunit_read_back_is_up_to_date_when_unmodified_contents_are_written_into_another_file(self):
+        self.parser.parse(self.filename, self.filename)
+        with tempfile.NamedTemporaryFile(suffix='.cpp', mode='w') as edited_file:
+            edited_file.write('int main() { return 0; }\n')
+            edited_file.flush()
+            tunit = self.start_parser().parse(edited_file.name, self.filename)
+        self.assertEqual(parser.clang_parser.is_read_from_ast_cache(tunit), True)
+
+    def test_if_tunit_is_parsed_from_scratch_once_the_file_is_modified(self):
+        self.parser.parse(self.filename, self.filename)
+        self.write(self.filename, 'int main() { return 1; }\n', 2000)
+        restarted_parser = self.start_parser()
+        tunit = restarted_parser.parse(self.filename, self.filename)
+        self.assertEqual(parser.clang_parser.is_read_from_ast_cache(tunit), False)
+        self.assertEqual(restarted_parser.ast_cache.get_stats()['invalidations'], 1)
+        self.assertEqual(restarted_parser.ast_cache.get_stats()['stores'], 1)
+
+    def test_if_tunit_is_parsed_from_scratch_once_included_header_is_modified(self):
+        header = os.path.join(self.root_directory, 'main.h')
+        self.write(header, 'int declared;\n')
+        self.write(self.filename, '#include "{0}"\nint main() {{ return declared; }}\n'.format(header))
+        self.parser.parse(self.filename, self.filename)
+        self.write(header, 'int renamed;\n', 2000)
+        tunit = self.start_parser().parse(self.filename, self.filename)
+        self.assertEqual(parser.clang_parser.is_read_from_ast_cache(tunit), False)
+        self.assertEqual(len(tunit.diagnostics), 1)
+
+    def test_if_tunit_with_diagnostics_is_not_saved(self):
+        self.write(self.filename, 'int main() { return undeclared; }\n')
+        self.parser.parse(self.filename, self.filename)
+        self.assertEqual(self.parser.ast_cache.get_stats()['entries'], 0)
+
+    def test_if_tunit_of_modified_buffer_is_not_saved(self):
+        with tempfile.NamedTemporaryFile(suffix='.cpp', mode='w') as edited_file:
+            edited_file.write('int main() { return 1; }\n')
+            edited_file.flush()
+            self.parser.parse(edited_file.name, self.filename)
+        self.assertEqual(self.parser.ast_cache.get_stats()['entries'], 0)
+
+    def test_if_tunit_read_back_is_parsed_from_scratch_for_code_completion(self):
+        self.write(self.filename, 'struct S { int member; };\nint main() { S s; return s.member; }\n')
+        self.parser.parse(self.filename, self.filename)
+        restarted_parser = self.start_parser()
+        tunit = restarted_parser.parse(self.filename, self.filename)
+        results = restarted_parser.code_complete(self.filename, self.filename, 2, len('int main() { S s; return s.'))
+        self.assertIn('member', [chunk.spelling for result in results.results for chunk in result.string if chunk.isKindTypedText()])
+        self.assertIsNot(restarted_parser.tunit_cache.fetch(self.filename)[0], tunit)
+
+    def test_if_tunit_read_back_is_parsed_from_scratch_once_it_is_out_of_date(self):
+        self.parser.parse(self.filename, self.filename)
+        restarted_parser = self.start_parser()
+        tunit = restarted_parser.parse(self.filename, self.filename)
+        self.write(self.filename, 'int main() { return undeclared; }\n', 2000)
+        parsed_tunit = restarted_parser.parse(self.filename, self.filename)
+        self.assertIsNot(parsed_tunit, tunit)
+        self.assertEqual(len(parsed_tunit.diagnostics), 1)
+        self.assertEqual(restarted_parser.parse_timings[self.filename].reparse_failures, 0)
+
+    def test_if_tunit_parsed_with_different_compiler_args_is_not_read_back(self):
+        tunit = self.parser.parse(self.filename, self.filename)
+        fingerprint = parser.clang_parser.get_tunit_fingerprint(tunit, self.filename)
+        ast_cache = self.parser.ast_cache
+        self.assertEqual(ast_cache.load(self.parser.index, self.filename, ['-DFOO'], self.filename), (None, None,))
+        ast_cache.store(self.filename, ['-DFOO'], tunit, fingerprint)
+        self.assertEqual(ast_cache.get_stats()['entries'], 1)
+        self.assertIsNotNone(ast_cache.load(self.parser.index, self.filename, ['-DFOO'], self.filename)[0])
+
+    def test_if_least_recently_used_tunits_are_evicted(self):
+        filenames = [os.path.join(self.root_directory, name) for name in ['a.cpp', 'b.cpp', 'c.cpp']]
+        for filename in filenames:
+            self.write(filename, 'int main() { return 0; }\n')
+        self.parser.parse(filenames[0], filenames[0])
+        entry_size = self.parser.ast_cache.get_stats()['size']
+        self.parser = self.start_parser(2 * entry_size)
+        self.parser.parse(filenames[1], filenames[1])
+        self.parser.parse(filenames[2], filenames[2])
+        self.assertEqual(self.parser.ast_cache.get_stats()['entries'], 2)
+        self.assertEqual(self.parser.ast_cache.get_stats()['evictions'], 1)
+        restarted_parser = self.start_parser()
+        self.assertEqual(parser.clang_parser.is_read_from_ast_cache(restarted_parser.parse(filenames[0], filenames[0])), False)
+        self.assertEqual(parser.clang_parser.is_read_from_ast_cache(restarted_parser.parse(filenames[2], filenames[2])), True)
+
+    def test_if_saved_tunit_is_dropped_along_with_the_tunit(self):
+        self.parser.parse(self.filename, self.filename)
+        self.parser.drop_tunit(self.filename)
+        self.assertEqual(self.parser.ast_cache.get_stats()['entries'], 0)
+
+    def test_if_entries_being_written_by_the_other_services_are_neither_counted_in_nor_removed(self):
+        self.parser.parse(self.filename, self.filename)
+        stats = self.parser.ast_cache.get_stats()
+        entry = os.path.join(self.parser.ast_cache.directory, os.listdir(self.parser.ast_cache.directory)[0].split('.')[0])
+        tmp_filename = entry + '.ast.{0}.tmp'.format(os.getpid() + 1)
+        self.write(tmp_filename, 'x' * 1024)
+        self.assertEqual(self.parser.ast_cache.get_stats()['size'], stats['size'])
+        self.parser.drop_tunit(self.filename)
+        self.assertEqual(self.parser.ast_cache.get_stats()['entries'], 0)
+        self.assertTrue(os.path.exists(tmp_filename))
+
+if __name__ == '__main__':
+    unittest.main()
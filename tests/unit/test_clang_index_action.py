@@ -0,0 +1,105 @@
+import clang.cindex
+import os
+import unittest
+
+import parser.clang_parser
+import parser.tunit_cache
+from file_generator import FileGenerator
+from services.source_code_model.indexer.clang_indexer import get_single_file_indexer
+from services.source_code_model.indexer.symbol_database import SymbolReferenceRole
+
+class ClangIndexActionTest(unittest.TestCase):
+    """
+    Indexes the same translation unit with both of the indexer backends, cursor-visitor and index-action, and compares
+    what each of them extracts from it.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.test_file                = FileGenerator.gen_cpp_file_with_class_hierarchy()
+        cls.txt_compilation_database = FileGenerator.gen_txt_compilation_database()
+
+        cls.parser = parser.clang_parser.ClangParser(
+            cls.txt_compilation_database.name,
+            parser.tunit_cache.TranslationUnitCache(parser.tunit_cache.NoCache())
+        )
+        cls.root_directory = os.path.dirname(cls.test_file.name)
+        cls.filename = os.path.basename(cls.test_file.name)
+
+        cls.results = {}
+        for backend in ['cursor-visitor', 'index-action']:
+            index_file = get_single_file_indexer(cls.parser, backend)
+            tunit, symbols, symbol_names, symbol_references = index_file(cls.parser, cls.root_directory, cls.test_file.name)
+            cls.results[backend] = (tunit, symbols, symbol_names, symbol_references)
+
+    @classmethod
+    def tearDownClass(cls):
+        FileGenerator.close_gen_file(cls.test_file)
+        FileGenerator.close_gen_file(cls.txt_compilation_database)
+
+    def get_symbols(self, backend):
+        # (line, column, usr, kind, is_definition), filename and (empty) context aside
+        tunit, symbols, symbol_names, symbol_references = self.results[backend]
+        return [(symbol[1], symbol[2], symbol[3], clang.cindex.CursorKind.from_id(symbol[5]), symbol[6]) for symbol in symbols]
+
+    def test_if_both_backends_index_the_translation_unit(self):
+        for backend in ['cursor-visitor', 'index-action']:
+            tunit, symbols, symbol_names, symbol_references = self.results[backend]
+            self.assertNotEqual(tunit, None)
+            self.assertTrue(all(symbol[0] == self.filename for symbol in symbols))
+
+    def test_if_both_backends_record_the_same_definitions(self):
+        definitions = [
+            (1,  8, 'c:@S@Base',             clang.cindex.CursorKind.STRUCT_DECL,   True),
+            (2, 17, 'c:@S@Base@F@get#1',     clang.cindex.CursorKind.CXX_METHOD,    True),
+            (5,  8, 'c:@S@Derived',          clang.cindex.CursorKind.STRUCT_DECL,   True),
+            (6,  9, 'c:@S@Derived@F@get#1',  clang.cindex.CursorKind.CXX_METHOD,    True),
+            (7,  9, 'c:@S@Derived@FI@value', clang.cindex.CursorKind.FIELD_DECL,    True),
+            (10, 5, 'c:@F@twice#I#',         clang.cindex.CursorKind.FUNCTION_DECL, True),
+            (14, 5, 'c:@F@main#',            clang.cindex.CursorKind.FUNCTION_DECL, True),
+        ]
+        for backend in ['cursor-visitor', 'index-action']:
+            self.assertEqual(sorted(symbol for symbol in self.get_symbols(backend) if symbol[4]), definitions)
+
+    def test_if_both_backends_record_the_same_symbol_names(self):
+        symbol_names = [
+            (self.filename, 1,  'c:@S@Base',             'Base',    'Base'),
+            (self.filename, 2,  'c:@S@Base@F@get#1',     'get',     'Base::get'),
+            (self.filename, 5,  'c:@S@Derived',          'Derived', 'Derived'),
+            (self.filename, 6,  'c:@S@Derived@F@get#1',  'get',     'Derived::get'),
+            (self.filename, 7,  'c:@S@Derived@FI@value', 'value',   'Derived::value'),
+            (self.filename, 10, 'c:@F@twice#I#',         'twice',   'twice'),
+            (self.filename, 14, 'c:@F@main#',            'main',    'main'),
+        ]
+        for backend in ['cursor-visitor', 'index-action']:
+            self.assertEqual(sorted(self.results[backend][2]), symbol_names)
+
+    def test_if_both_backends_record_the_same_symbol_references_with_their_roles(self):
+        symbol_references = [
+            (self.filename, 5,  18, 'c:@S@Base',             'c:@S@Derived',         SymbolReferenceRole.BASE_SPECIFIER),
+            (self.filename, 6,  9,  'c:@S@Base@F@get#1',     'c:@S@Derived@F@get#1', SymbolReferenceRole.OVERRIDE),
+            (self.filename, 6,  39, 'c:@S@Derived@FI@value', 'c:@S@Derived@F@get#1', SymbolReferenceRole.READ),
+            (self.filename, 16, 7,  'c:@S@Derived@FI@value', 'c:@F@main#',           SymbolReferenceRole.WRITE),
+            (self.filename, 16, 15, 'c:@F@twice#I#',         'c:@F@main#',           SymbolReferenceRole.CALL),
+            (self.filename, 16, 23, 'c:@S@Derived@F@get#1',  'c:@F@main#',           SymbolReferenceRole.CALL),
+            (self.filename, 17, 14, 'c:@S@Derived@FI@value', 'c:@F@main#',           SymbolReferenceRole.READ),
+        ]
+        for backend in ['cursor-visitor', 'index-action']:
+            self.assertEqual(sorted(self.results[backend][3]), symbol_references)
+
+    def test_if_index_action_backend_does_not_record_the_references_to_implicit_constructors(self):
+        implicit_constructor = (15, 13, 'c:@S@Derived@F@Derived#', clang.cindex.CursorKind.CONSTRUCTOR, False)
+        self.assertIn(implicit_constructor, self.get_symbols('cursor-visitor'))
+        self.assertNotIn(implicit_constructor, self.get_symbols('index-action'))
+
+    def test_if_index_action_backend_does_not_record_the_same_reference_more_than_once(self):
+        # Cursor-visitor records a reference once per each of the nested expressions it is found in, e.g. the call
+        cursor_visitor_symbols, index_action_symbols = self.get_symbols('cursor-visitor'), self.get_symbols('index-action')
+        self.assertEqual(cursor_visitor_symbols.count((16, 15, 'c:@F@twice#I#', clang.cindex.CursorKind.FUNCTION_DECL, False)), 3)
+        self.assertEqual(index_action_symbols.count((16, 15, 'c:@F@twice#I#', clang.cindex.CursorKind.FUNCTION_DECL, False)), 1)
+        self.assertEqual(len(set(index_action_symbols)), len(index_action_symbols))
+        self.assertTrue(set(index_action_symbols).issubset(set(cursor_visitor_symbols)))
+
+
+if __name__ == '__main__':
+    unittest.main()
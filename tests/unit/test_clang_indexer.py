@@ -1,7 +1,11 @@
 import clang.cindex
+import cxxd.service
 import math
 import mock
 import os
+import shutil
+import tempfile
+import threading
 import unittest
 
 from . import cxxd_mocks
@@ -11,17 +15,21 @@ import parser.tunit_cache
 from file_generator import FileGenerator
 from services.source_code_model.indexer.clang_indexer import SourceCodeModelIndexerRequestId
 from services.source_code_model.indexer.clang_indexer import ClangIndexer
+from services.source_code_model.indexer.clang_indexer import IndexerResultsWriter
+from services.source_code_model.indexer.clang_indexer import ReferenceContext
 from services.source_code_model.indexer.clang_indexer import create_empty_symbol_db
-from services.source_code_model.indexer.clang_indexer import create_indexer_input_list_file
-from services.source_code_model.indexer.clang_indexer import get_clang_index_path
+from services.source_code_model.indexer.clang_indexer import estimate_indexing_cost
+from services.source_code_model.indexer.clang_indexer import get_compiler_args_hash
 from services.source_code_model.indexer.clang_indexer import get_cpp_file_list
-from services.source_code_model.indexer.clang_indexer import index_file_list
+from services.source_code_model.indexer.clang_indexer import get_file_content_hash
 from services.source_code_model.indexer.clang_indexer import index_single_file
 from services.source_code_model.indexer.clang_indexer import indexer_visitor
+from services.source_code_model.indexer.clang_indexer import predict_makespan
 from services.source_code_model.indexer.clang_indexer import store_tunit_diagnostics
 from services.source_code_model.indexer.clang_indexer import remove_root_dir_from_filename
-from services.source_code_model.indexer.clang_indexer import start_indexing_subprocess
+from services.source_code_model.indexer.source_context import encode_line_offsets
 from services.source_code_model.indexer.symbol_database import SymbolDatabase
+from services.source_code_model.indexer.symbol_database import SymbolReferenceRole
 
 class ClangIndexerTest(unittest.TestCase):
     @classmethod
@@ -100,8 +108,10 @@ class ClangIndexerTest(unittest.TestCase):
         with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
             with mock.patch.object(self.service.symbol_db, 'open') as mock_symbol_db_open:
                 with mock.patch.object(self.service.symbol_db, 'delete_entry') as mock_symbol_db_delete_entry:
-                    with mock.patch('services.source_code_model.indexer.clang_indexer.remove_root_dir_from_filename', return_value=os.path.basename(self.test_file.name)) as mock_remove_root_dir_from_filename:
-                        with mock.patch('services.source_code_model.indexer.clang_indexer.index_single_file', return_value=True) as mock_index_single_file:
+                    with mock.patch.object(self.service, '_ClangIndexer__get_dependent_files', return_value=[]), \
+                         mock.patch.object(self.service, '_ClangIndexer__skip_quarantined_files', side_effect=lambda symbol_db, filenames: filenames):
+                        with mock.patch('services.source_code_model.indexer.clang_indexer.remove_root_dir_from_filename', return_value=os.path.basename(self.test_file.name)) as mock_remove_root_dir_from_filename, \
+                             mock.patch('services.source_code_model.indexer.clang_indexer.index_single_file', return_value=True) as mock_index_single_file:
                             manager.attach_mock(mock_symbol_db_open, 'mock_symbol_db_open')
                             manager.attach_mock(mock_symbol_db_delete_entry, 'mock_symbol_db_delete_entry')
                             manager.attach_mock(mock_remove_root_dir_from_filename, 'mock_remove_root_dir_from_filename')
@@ -112,7 +122,8 @@ class ClangIndexerTest(unittest.TestCase):
                 mock.call.mock_symbol_db_open(self.service.symbol_db_path),
                 mock.call.mock_remove_root_dir_from_filename(self.root_directory, self.test_file.name),
                 mock.call.mock_symbol_db_delete_entry(mock_remove_root_dir_from_filename.return_value),
-                mock.call.mock_index_single_file(self.service.parser, self.service.root_directory, self.test_file.name, self.service.symbol_db)
+                mock.call.mock_remove_root_dir_from_filename(self.root_directory, self.test_file.name),
+                mock.call.mock_index_single_file(self.service.parser, self.service.root_directory, self.test_file.name, self.service.symbol_db, self.service.index_file)
             ]
         )
         self.assertEqual(success, True)
@@ -123,8 +134,10 @@ class ClangIndexerTest(unittest.TestCase):
         with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
             with mock.patch.object(self.service.symbol_db, 'open') as mock_symbol_db_open:
                 with mock.patch.object(self.service.symbol_db, 'delete_entry') as mock_symbol_db_delete_entry:
-                    with mock.patch('services.source_code_model.indexer.clang_indexer.remove_root_dir_from_filename', return_value=os.path.basename(self.test_file.name)) as mock_remove_root_dir_from_filename:
-                        with mock.patch('services.source_code_model.indexer.clang_indexer.index_single_file', return_value=False) as mock_index_single_file:
+                    with mock.patch.object(self.service, '_ClangIndexer__get_dependent_files', return_value=[]), \
+                         mock.patch.object(self.service, '_ClangIndexer__skip_quarantined_files', side_effect=lambda symbol_db, filenames: filenames):
+                        with mock.patch('services.source_code_model.indexer.clang_indexer.remove_root_dir_from_filename', return_value=os.path.basename(self.test_file.name)) as mock_remove_root_dir_from_filename, \
+                             mock.patch('services.source_code_model.indexer.clang_indexer.index_single_file', return_value=False) as mock_index_single_file:
                             manager.attach_mock(mock_symbol_db_open, 'mock_symbol_db_open')
                             manager.attach_mock(mock_symbol_db_delete_entry, 'mock_symbol_db_delete_entry')
                             manager.attach_mock(mock_remove_root_dir_from_filename, 'mock_remove_root_dir_from_filename')
@@ -135,41 +148,170 @@ class ClangIndexerTest(unittest.TestCase):
                     mock.call.mock_symbol_db_open(self.service.symbol_db_path),
                     mock.call.mock_remove_root_dir_from_filename(self.root_directory, self.test_file.name),
                     mock.call.mock_symbol_db_delete_entry(mock_remove_root_dir_from_filename.return_value),
-                    mock.call.mock_index_single_file(self.service.parser, self.service.root_directory, self.test_file.name, self.service.symbol_db)
+                    mock.call.mock_remove_root_dir_from_filename(self.root_directory, self.test_file.name),
+                    mock.call.mock_index_single_file(self.service.parser, self.service.root_directory, self.test_file.name, self.service.symbol_db, self.service.index_file)
                 ]
             )
         self.assertEqual(success, False)
         self.assertEqual(args, None)
 
+    def test_if_run_on_single_file_indexes_only_the_file_itself_and_leaves_the_files_including_it_to_the_background_job(self):
+        dependent_file = self.test_file_edited.name
+        schedule_request = mock.MagicMock()
+        self.service.schedule_request = schedule_request
+        with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
+            with mock.patch.object(self.service.symbol_db, 'open'), mock.patch.object(self.service.symbol_db, 'delete_entry'):
+                with mock.patch.object(self.service, '_ClangIndexer__get_dependent_files', return_value=[dependent_file]), \
+                     mock.patch.object(self.service, '_ClangIndexer__skip_quarantined_files', side_effect=lambda symbol_db, filenames: filenames):
+                    with mock.patch.object(self.service.parser, 'drop_tunit') as mock_parser_drop_tunit, \
+                         mock.patch('services.source_code_model.indexer.clang_indexer.index_single_file', return_value=True) as mock_index_single_file:
+                        success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_SINGLE_FILE, self.test_file.name])
+        mock_index_single_file.assert_called_once_with(self.service.parser, self.root_directory, self.test_file.name, mock.ANY, self.service.index_file)
+        mock_parser_drop_tunit.assert_called_once_with(dependent_file)
+        schedule_request.assert_called_once_with([SourceCodeModelIndexerRequestId.RUN_ON_CHANGED_FILES])
+        self.assertEqual(self.service.outdated_files, set([dependent_file]))
+        self.assertEqual(success, True)
+        self.assertEqual(args, None)
+
+    def test_if_run_on_changed_files_reindexes_the_outdated_files_in_the_background(self):
+        dependent_file = self.test_file_edited.name
+        self.service.outdated_files.add(dependent_file)
+        with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
+            with mock.patch.object(self.service, '_ClangIndexer__start_worker_pool'):
+                with mock.patch.object(self.service, '_ClangIndexer__reindex_changed_files', return_value=True) as mock_reindex_changed_files:
+                    success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_CHANGED_FILES])
+        mock_reindex_changed_files.assert_called_once_with(mock.ANY, set([dependent_file]), set([dependent_file]))
+        self.assertEqual(self.service.outdated_files, set())
+        self.assertEqual(success, True)
+
+    def test_if_run_on_changed_files_keeps_the_outdated_files_until_the_indexing_job_in_progress_has_finished(self):
+        dependent_file = self.test_file_edited.name
+        self.service.outdated_files.add(dependent_file)
+        with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
+            with mock.patch.object(self.service, 'indexer_job_in_progress', return_value=True):
+                with mock.patch.object(self.service, '_ClangIndexer__reindex_changed_files') as mock_reindex_changed_files:
+                    success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_CHANGED_FILES])
+        mock_reindex_changed_files.assert_not_called()
+        self.assertEqual(self.service.outdated_files, set([dependent_file]))
+        self.assertEqual(success, True)
+        self.assertIs(args, cxxd.service.REQUEST_DEFERRED)
+
+    def test_if_run_on_changed_files_hands_the_changed_files_back_to_the_watcher_while_indexing_job_is_in_progress(self):
+        with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
+            with mock.patch.object(self.service.symbol_db, 'open'), mock.patch.object(self.service, '_ClangIndexer__get_dependent_files', return_value=[]):
+                with mock.patch.object(self.service, 'indexer_job_in_progress', return_value=True), \
+                     mock.patch.object(self.service.file_watcher, 'is_running', return_value=True), \
+                     mock.patch.object(self.service.file_watcher, 'add') as mock_file_watcher_add:
+                    with mock.patch.object(self.service, '_ClangIndexer__reindex_changed_files') as mock_reindex_changed_files:
+                        success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_CHANGED_FILES, self.test_file.name])
+        mock_reindex_changed_files.assert_not_called()
+        mock_file_watcher_add.assert_called_once_with(set([self.test_file.name]))
+        self.assertEqual(success, True)
+        self.assertIs(args, cxxd.service.REQUEST_DEFERRED)
+
+    def test_if_outdated_files_are_reindexed_even_though_they_did_not_change_themselves(self):
+        root_directory = tempfile.mkdtemp()
+        filename = os.path.join(root_directory, 'main.cpp')
+        with open(filename, 'w') as f:
+            f.write('#include "main.h"\n')
+        stat = os.stat(filename)
+        service = ClangIndexer(self.parser, root_directory, cxxd_mocks.CxxdConfigParserMock())
+        symbol_db = SymbolDatabase(service.symbol_db_path)
+        symbol_db.create_data_model()
+        symbol_db.insert_file_entry(
+            'main.cpp', stat.st_mtime, stat.st_size, get_file_content_hash(filename),
+            get_compiler_args_hash(self.parser.get_compiler_args_db().get(filename), root_directory)
+        )
+        symbol_db.flush()
+        symbol_db.close()
+        with mock.patch.object(service, '_ClangIndexer__index_file_list', return_value=True) as mock_index_file_list:
+            service._ClangIndexer__reindex_changed_files(threading.Event(), set([filename]))
+            mock_index_file_list.assert_not_called()
+            service._ClangIndexer__reindex_changed_files(threading.Event(), set([filename]), set([filename]))
+            mock_index_file_list.assert_called_once_with([filename], mock.ANY, indexing_cost={})
+        service.shutdown()
+        shutil.rmtree(root_directory)
+
     def test_if_run_on_directory_checks_for_symbol_db_schema_change(self):
         with mock.patch.object(self.service, 'symbol_db_schema_changed', return_value=False) as mock_symbol_db_schema_changed:
-            with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
-                success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY])
+            with mock.patch.object(self.service, 'symbol_db_layout_changed', return_value=False):
+                with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
+                    with mock.patch.object(self.service, '_ClangIndexer__start_worker_pool'):
+                        with mock.patch.object(self.service, '_ClangIndexer__start_indexer_job', return_value=(True, None)):
+                            success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY])
         mock_symbol_db_schema_changed.assert_called_once()
         self.assertEqual(success, True)
         self.assertEqual(args, None)
 
-    def test_if_run_on_directory_drops_the_db_when_symbol_db_schema_gets_changed(self):
+    def test_if_run_on_directory_drops_the_db_when_symbol_db_schema_gets_changed_and_cannot_be_migrated(self):
         with mock.patch.object(self.service, 'symbol_db_schema_changed', return_value=True) as mock_symbol_db_schema_changed:
-            with mock.patch.object(self.service, '_ClangIndexer__drop_all') as mock_drop_all:
-                with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
-                    success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY])
+            with mock.patch.object(self.service, 'symbol_db_layout_changed', return_value=False):
+                with mock.patch.object(self.service.symbol_db, 'migrate_data_model', return_value=False) as mock_symbol_db_migrate_data_model:
+                    with mock.patch.object(self.service, '_ClangIndexer__drop_all') as mock_drop_all:
+                        with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
+                            with mock.patch.object(self.service, '_ClangIndexer__start_worker_pool'):
+                                with mock.patch.object(self.service, '_ClangIndexer__start_indexer_job', return_value=(True, None)):
+                                    success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY])
         mock_symbol_db_schema_changed.assert_called_once()
+        mock_symbol_db_migrate_data_model.assert_called_once()
         mock_drop_all.assert_called_once()
         self.assertEqual(success, True)
         self.assertEqual(args, None)
 
     def test_if_run_on_directory_skips_indexing_if_symbol_db_already_exists_in_root_directory(self):
         with mock.patch.object(self.service, 'symbol_db_schema_changed', return_value=False) as mock_symbol_db_schema_changed:
-            with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
-                with mock.patch.object(self.service.symbol_db, 'open') as mock_symbol_db_open:
-                    with mock.patch.object(self.service.symbol_db, 'create_data_model') as mock_symbol_db_create_data_model:
-                        success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY])
+            with mock.patch.object(self.service, 'symbol_db_layout_changed', return_value=False):
+                with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
+                    with mock.patch.object(self.service.symbol_db, 'open') as mock_symbol_db_open:
+                        with mock.patch.object(self.service.symbol_db, 'create_data_model') as mock_symbol_db_create_data_model:
+                            with mock.patch.object(self.service, '_ClangIndexer__start_worker_pool'):
+                                with mock.patch.object(self.service, '_ClangIndexer__start_indexer_job', return_value=(True, None)) as mock_start_indexer_job:
+                                    success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY])
         mock_symbol_db_open.assert_not_called()
         mock_symbol_db_create_data_model.assert_not_called()
+        mock_start_indexer_job.assert_called_once_with(SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY, self.service._ClangIndexer__reindex_directory)
         self.assertEqual(success, True)
         self.assertEqual(args, None)
 
+    def test_if_run_on_directory_starts_the_worker_pool_before_starting_the_indexing_job(self):
+        # Workers killed by the cancellation of the previous job are replaced by the time the next one starts
+        manager = mock.MagicMock()
+        with mock.patch.object(self.service, 'symbol_db_schema_changed', return_value=False):
+            with mock.patch.object(self.service, 'symbol_db_layout_changed', return_value=False):
+                with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
+                    with mock.patch.object(self.service.worker_pool, 'start') as mock_worker_pool_start:
+                        with mock.patch.object(self.service, '_ClangIndexer__start_indexer_job', return_value=(True, None)) as mock_start_indexer_job:
+                            manager.attach_mock(mock_worker_pool_start, 'mock_worker_pool_start')
+                            manager.attach_mock(mock_start_indexer_job, 'mock_start_indexer_job')
+                            self.service([SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY])
+        manager.assert_has_calls(
+            [
+                mock.call.mock_worker_pool_start(mock.ANY),
+                mock.call.mock_start_indexer_job(SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY, mock.ANY)
+            ]
+        )
+
+    def test_if_indexing_job_schedules_the_report_of_its_completion_instead_of_reporting_it_from_the_job_thread(self):
+        indexer_job_callback, schedule_request = mock.MagicMock(), mock.MagicMock()
+        self.service.indexer_job_callback = indexer_job_callback
+        self.service.schedule_request = schedule_request
+        self.service.outdated_files.add(self.test_file_edited.name)
+        with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
+            with mock.patch.object(self.service, '_ClangIndexer__start_worker_pool'):
+                with mock.patch.object(self.service, '_ClangIndexer__reindex_changed_files', return_value=True):
+                    success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_CHANGED_FILES])
+                    self.service.indexer_job.join()
+        indexer_job_callback.assert_not_called()
+        schedule_request.assert_called_once_with([SourceCodeModelIndexerRequestId.REPORT_JOB_COMPLETED, SourceCodeModelIndexerRequestId.RUN_ON_CHANGED_FILES, True])
+        self.assertEqual(success, True)
+
+    def test_if_report_job_completed_reports_the_result_of_the_indexing_job(self):
+        indexer_job_callback = mock.MagicMock()
+        self.service.indexer_job_callback = indexer_job_callback
+        success, args = self.service([SourceCodeModelIndexerRequestId.REPORT_JOB_COMPLETED, SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY, False])
+        indexer_job_callback.assert_called_once_with(SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY, False, None)
+        self.assertEqual(success, True)
+
     def test_if_run_on_directory_creates_a_list_of_cpp_files_wrt_blacklisted_directories(self):
         with mock.patch.object(self.service, 'symbol_db_exists', return_value=False):
             with mock.patch.object(self.service.symbol_db, 'open') as mock_symbol_db_open:
@@ -194,37 +336,36 @@ class ClangIndexerTest(unittest.TestCase):
         self.assertEqual(success, True)
         self.assertEqual(args, None)
 
-    def test_if_run_on_directory_handles_when_cpp_file_chunk_list_contains_none_items(self):
-        import multiprocessing, logging, subprocess
-        logging.getLoggerClass().root.handlers[0].baseFilename = 'log_file'
-        dummy_cmd = 'cd'
-        cpp_file_list = ['/tmp/a.cpp', '/tmp/b.cpp', '/tmp/c.cpp', '/tmp/d.cpp', '/tmp/e.cpp', '/tmp/f.cpp', '/tmp/g.cpp']
-        cpp_file_list_chunks = [[cpp_file_list[0], cpp_file_list[1]], [cpp_file_list[2], cpp_file_list[3]], [cpp_file_list[4], cpp_file_list[5]], [cpp_file_list[6], None]]
-        with mock.patch.object(self.service, 'symbol_db_exists', return_value=False):
-            with mock.patch.object(self.service.symbol_db, 'open') as mock_symbol_db_open:
-                with mock.patch.object(self.service.symbol_db, 'create_data_model') as mock_symbol_db_create_data_model:
-                    with mock.patch('services.source_code_model.indexer.clang_indexer.get_cpp_file_list', return_value=cpp_file_list) as mock_get_cpp_file_list:
-                        with mock.patch('services.source_code_model.indexer.clang_indexer.slice_it', return_value=cpp_file_list_chunks) as mock_slice_it, \
-                            mock.patch('services.source_code_model.indexer.clang_indexer.create_indexer_input_list_file', return_value=(None, 'indexer_input_list_file',)) as mock_create_indexer_input_list_file, \
-                            mock.patch('services.source_code_model.indexer.clang_indexer.create_empty_symbol_db', return_value=(None, 'empty_symbol_db_filename',)) as mock_create_empty_symbol_db, \
-                            mock.patch('services.source_code_model.indexer.clang_indexer.start_indexing_subprocess', return_value=subprocess.Popen(dummy_cmd)) as mock_start_indexing_subprocess, \
-                            mock.patch('subprocess.Popen.wait') as mock_subprocess_wait, \
-                            mock.patch('services.source_code_model.indexer.clang_indexer.SymbolDatabase.copy_all_entries_from') as mock_symbol_db_copy_all_entries_from, \
-                            mock.patch('os.remove') as mock_os_remove:
-                            success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY])
-        mock_symbol_db_open.assert_called_once_with(self.service.symbol_db_path)
-        mock_symbol_db_create_data_model.assert_called_once()
-        mock_get_cpp_file_list.assert_called_once_with(self.service.root_directory, self.service.blacklisted_directories, self.service.recognized_file_extensions + self.service.extra_file_extensions)
-        mock_slice_it.assert_called_once_with(cpp_file_list, math.ceil(len(cpp_file_list) / multiprocessing.cpu_count()))
-        mock_create_indexer_input_list_file.assert_called_with(self.service.root_directory, mock.ANY, mock_slice_it.return_value[len(cpp_file_list_chunks)-1])
-        mock_create_empty_symbol_db.assert_called_with(self.service.root_directory, self.service.symbol_db_name)
-        mock_start_indexing_subprocess.assert_called_with(self.service.root_directory, self.txt_compilation_database.name, mock_create_indexer_input_list_file.return_value[1], mock_create_empty_symbol_db.return_value[1], mock.ANY)
-        mock_symbol_db_copy_all_entries_from.assert_called_once()
-        self.assertEqual(mock_create_indexer_input_list_file.call_count, len(cpp_file_list_chunks))
-        self.assertEqual(mock_create_empty_symbol_db.call_count, len(cpp_file_list_chunks))
-        self.assertEqual(mock_start_indexing_subprocess.call_count, len(cpp_file_list_chunks))
-        self.assertEqual(mock_os_remove.call_count, 2*len(cpp_file_list_chunks))
-        self.assertEqual(mock_subprocess_wait.call_count, len(cpp_file_list_chunks))
+    def test_if_run_on_single_file_spreads_a_batch_of_files_across_the_worker_pool(self):
+        filenames = [self.test_file.name, self.test_file_edited.name]
+        with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
+            with mock.patch.object(self.service.symbol_db, 'open'), mock.patch.object(self.service.symbol_db, 'delete_entry'), \
+                 mock.patch.object(self.service.symbol_db, 'fetch_all_files', return_value=[]):
+                with mock.patch.object(self.service, '_ClangIndexer__get_dependent_files', return_value=[]), \
+                     mock.patch.object(self.service, '_ClangIndexer__skip_quarantined_files', side_effect=lambda symbol_db, filenames: filenames):
+                    with mock.patch.object(self.service.worker_pool, 'start') as mock_worker_pool_start, \
+                         mock.patch.object(self.service, '_ClangIndexer__index_file_list', return_value=True) as mock_index_file_list, \
+                         mock.patch('services.source_code_model.indexer.clang_indexer.index_single_file') as mock_index_single_file:
+                        success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_SINGLE_FILE] + filenames)
+        mock_worker_pool_start.assert_called_once()
+        mock_index_file_list.assert_called_once_with(filenames, mock.ANY, indexing_cost={})
+        mock_index_single_file.assert_not_called()
+        self.assertEqual(success, True)
+        self.assertEqual(args, None)
+
+    def test_if_run_on_single_file_indexes_a_batch_of_files_in_process_while_indexing_job_is_in_progress(self):
+        filenames = [self.test_file.name, self.test_file_edited.name]
+        with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
+            with mock.patch.object(self.service.symbol_db, 'open'), mock.patch.object(self.service.symbol_db, 'delete_entry'), \
+                 mock.patch.object(self.service.symbol_db, 'fetch_all_files', return_value=[]):
+                with mock.patch.object(self.service, '_ClangIndexer__get_dependent_files', return_value=[]), \
+                     mock.patch.object(self.service, '_ClangIndexer__skip_quarantined_files', side_effect=lambda symbol_db, filenames: filenames):
+                    with mock.patch.object(self.service, 'indexer_job_in_progress', return_value=True), \
+                         mock.patch.object(self.service, '_ClangIndexer__index_file_list') as mock_index_file_list, \
+                         mock.patch('services.source_code_model.indexer.clang_indexer.index_single_file', return_value=True) as mock_index_single_file:
+                        success, args = self.service([SourceCodeModelIndexerRequestId.RUN_ON_SINGLE_FILE] + filenames)
+        mock_index_file_list.assert_not_called()
+        self.assertEqual(mock_index_single_file.call_count, len(filenames))
         self.assertEqual(success, True)
         self.assertEqual(args, None)
 
@@ -256,11 +397,13 @@ class ClangIndexerTest(unittest.TestCase):
         with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
             with mock.patch.object(self.service.symbol_db, 'open') as mock_symbol_db_open:
                 with mock.patch.object(self.service.symbol_db, 'delete_entry') as mock_symbol_db_delete_entry:
-                    with mock.patch('services.source_code_model.indexer.clang_indexer.remove_root_dir_from_filename', return_value=os.path.basename(self.test_file.name)) as mock_remove_root_dir_from_filename:
-                        success, args = self.service([SourceCodeModelIndexerRequestId.DROP_SINGLE_FILE, self.test_file.name])
+                    with mock.patch.object(self.service.symbol_db, 'delete_quarantine_entry') as mock_symbol_db_delete_quarantine_entry:
+                        with mock.patch('services.source_code_model.indexer.clang_indexer.remove_root_dir_from_filename', return_value=os.path.basename(self.test_file.name)) as mock_remove_root_dir_from_filename:
+                            success, args = self.service([SourceCodeModelIndexerRequestId.DROP_SINGLE_FILE, self.test_file.name])
         mock_symbol_db_open.assert_called_with(self.service.symbol_db_path)
         mock_symbol_db_delete_entry.assert_called_once_with(mock_remove_root_dir_from_filename.return_value)
-        mock_remove_root_dir_from_filename.assert_called_once_with(self.root_directory, self.test_file.name)
+        mock_symbol_db_delete_quarantine_entry.assert_called_once_with(mock_remove_root_dir_from_filename.return_value)
+        mock_remove_root_dir_from_filename.assert_called_with(self.root_directory, self.test_file.name)
         self.assertEqual(success, True)
         self.assertEqual(args, None)
 
@@ -296,15 +439,37 @@ class ClangIndexerTest(unittest.TestCase):
             with mock.patch.object(self.service.symbol_db, 'open') as mock_symbol_db_open:
                 with mock.patch.object(self.service.symbol_db, 'delete_all_entries') as mock_symbol_db_delete_all_entries:
                     with mock.patch.object(self.service.symbol_db, 'close') as mock_symbol_db_close:
-                        with mock.patch('os.remove') as mock_os_remove:
+                        with mock.patch('services.source_code_model.indexer.clang_indexer.remove_symbol_db_from_disk') as mock_remove_symbol_db_from_disk:
                             success, args = self.service([SourceCodeModelIndexerRequestId.DROP_ALL, delete_from_disk])
         mock_symbol_db_open.assert_not_called()
         mock_symbol_db_delete_all_entries.assert_not_called()
         mock_symbol_db_close.assert_called_once()
-        mock_os_remove.assert_called_once_with(self.service.symbol_db.filename)
+        mock_remove_symbol_db_from_disk.assert_called_once_with(self.service.symbol_db_path)
         self.assertEqual(success, True)
         self.assertEqual(args, None)
 
+    def test_if_drop_all_keeps_the_cost_history_for_the_whole_directory_to_be_indexed_by(self):
+        root_directory = tempfile.mkdtemp()
+        service = ClangIndexer(self.parser, root_directory, cxxd_mocks.CxxdConfigParserMock())
+        symbol_db = SymbolDatabase(service.symbol_db_path)
+        symbol_db.create_data_model()
+        symbol_db.insert_file_entry('a.cpp', 1.0, 100, 'content_hash', 'compiler_args_hash', 2.5, 10)
+        symbol_db.insert_file_entry('b.cpp', 1.0, 100, 'content_hash', 'compiler_args_hash', None, None)
+        symbol_db.flush()
+        symbol_db.close()
+        success, args = service([SourceCodeModelIndexerRequestId.DROP_ALL, True])
+        self.assertEqual(success, True)
+        self.assertEqual(service.symbol_db_exists(), False)
+        with mock.patch('services.source_code_model.indexer.clang_indexer.get_cpp_file_list', return_value=[os.path.join(root_directory, 'a.cpp')]):
+            with mock.patch.object(service, '_ClangIndexer__start_worker_pool'):
+                with mock.patch.object(service, '_ClangIndexer__index_file_list', return_value=True) as mock_index_file_list:
+                    success, args = service([SourceCodeModelIndexerRequestId.RUN_ON_DIRECTORY])
+        mock_index_file_list.assert_called_once_with([os.path.join(root_directory, 'a.cpp')], mock.ANY, rebuild_indexes=True, indexing_cost={'a.cpp': 2.5})
+        self.assertEqual(success, True)
+        self.assertEqual(service.indexing_cost_history, {})
+        service.shutdown()
+        shutil.rmtree(root_directory)
+
     def test_if_find_all_references_returns_false_and_empty_references_list_on_inexisting_symbol_db(self):
         line, column = 1, 1
         with mock.patch.object(self.service, 'symbol_db_exists', return_value=False):
@@ -393,124 +558,69 @@ class ClangIndexerTest(unittest.TestCase):
         self.assertEqual(success, False)
         self.assertEqual(len(diagnostics), 0)
 
-    def test_if_fetch_all_diagnostics_returns_true_and_empty_diagnostics_list_when_no_diagnostics_are_available_and_does_not_fetch_additional_diagnostics_details(self):
+    def test_if_fetch_all_diagnostics_returns_true_and_empty_diagnostics_list_when_no_diagnostics_are_available(self):
         sorting_strategy = 0 # No sorting
         with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
             with mock.patch.object(self.service.symbol_db, 'open') as mock_symbol_db_open:
-                with mock.patch.object(self.service.symbol_db, 'fetch_all_diagnostics', return_value=[]) as mock_symbol_db_fetch_all_diagnostics:
-                    with mock.patch.object(self.service.symbol_db, 'fetch_diagnostics_details', return_value=[]) as mock_symbol_db_fetch_all_diagnostics_details:
-                        success, diagnostics = self.service([SourceCodeModelIndexerRequestId.FETCH_ALL_DIAGNOSTICS, sorting_strategy])
+                with mock.patch.object(self.service.symbol_db, 'fetch_all_diagnostics_with_details', return_value=[]) as mock_symbol_db_fetch_all_diagnostics_with_details:
+                    success, diagnostics = self.service([SourceCodeModelIndexerRequestId.FETCH_ALL_DIAGNOSTICS, sorting_strategy])
         mock_symbol_db_open.assert_called_once()
-        mock_symbol_db_fetch_all_diagnostics.assert_called_once()
-        mock_symbol_db_fetch_all_diagnostics_details.assert_not_called()
+        mock_symbol_db_fetch_all_diagnostics_with_details.assert_called_once_with(sorting_strategy)
         self.assertEqual(success, True)
         self.assertEqual(len(diagnostics), 0)
 
-    def test_if_fetch_all_diagnostics_returns_true_and_non_empty_diagnostics_list_and_does_not_fetch_additional_diagnostics_details_because_there_are_no_any(self):
+    def test_if_fetch_all_diagnostics_returns_true_and_non_empty_diagnostics_list_when_there_are_no_diagnostics_details(self):
         sorting_strategy = 0 # No sorting
         diagnostics_from_db = [
-            [1, 'filename1', 1, 1, 'diag description 1', 1],
-            [2, 'filename2', 2, 2, 'diag description 2', 2],
-            [3, 'filename3', 3, 3, 'diag description 3', 2],
-            [4, 'filename4', 4, 4, 'diag description 4', 3],
-            [5, 'filename5', 5, 5, 'diag description 5', 3],
-            [6, 'filename6', 6, 6, 'diag description 6', 4],
+            ([1, 'filename1', 1, 1, 'diag description 1', 1], []),
+            ([2, 'filename2', 2, 2, 'diag description 2', 2], []),
+            ([3, 'filename3', 3, 3, 'diag description 3', 2], []),
         ]
         with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
             with mock.patch.object(self.service.symbol_db, 'open') as mock_symbol_db_open:
-                with mock.patch.object(self.service.symbol_db, 'fetch_all_diagnostics', return_value=diagnostics_from_db) as mock_symbol_db_fetch_all_diagnostics:
-                    with mock.patch.object(self.service.symbol_db, 'fetch_diagnostics_details', return_value=[]) as mock_symbol_db_fetch_all_diagnostics_details:
-                        success, diagnostics = self.service([SourceCodeModelIndexerRequestId.FETCH_ALL_DIAGNOSTICS, sorting_strategy])
+                with mock.patch.object(self.service.symbol_db, 'fetch_all_diagnostics_with_details', return_value=diagnostics_from_db) as mock_symbol_db_fetch_all_diagnostics_with_details:
+                    success, diagnostics = self.service([SourceCodeModelIndexerRequestId.FETCH_ALL_DIAGNOSTICS, sorting_strategy])
         mock_symbol_db_open.assert_called_once()
-        mock_symbol_db_fetch_all_diagnostics.assert_called_once()
-        mock_symbol_db_fetch_all_diagnostics_details.assert_not_called()
+        mock_symbol_db_fetch_all_diagnostics_with_details.assert_called_once_with(sorting_strategy)
         self.assertEqual(success, True)
-        self.assertEqual(len(diagnostics), len(diagnostics_from_db))
+        self.assertEqual(diagnostics, [
+            [os.path.join(self.root_directory, 'filename1'), 1, 1, 'diag description 1', 1],
+            [os.path.join(self.root_directory, 'filename2'), 2, 2, 'diag description 2', 2],
+            [os.path.join(self.root_directory, 'filename3'), 3, 3, 'diag description 3', 2],
+        ])
 
-    def test_if_fetch_all_diagnostics_returns_true_and_non_empty_diagnostics_list_and_does_not_fetch_additional_diagnostics_details_because_there_are_no_any(self):
+    def test_if_fetch_all_diagnostics_returns_true_and_non_empty_diagnostics_list_with_diagnostics_details_following_their_diagnostics(self):
         sorting_strategy = 0 # No sorting
         diagnostics_from_db = [
-            [1, 'filename1', 1, 1, 'diag description 1', 1],
-            [2, 'filename2', 2, 2, 'diag description 2', 2],
-            [3, 'filename3', 3, 3, 'diag description 3', 2],
-            [4, 'filename4', 4, 4, 'diag description 4', 3],
-            [5, 'filename5', 5, 5, 'diag description 5', 3],
-            [6, 'filename6', 6, 6, 'diag description 6', 4],
+            ([1, 'filename1', 1, 1, 'diag description 1', 1], [[1, 'filename4', 4, 4, 'details description 4', 1], [1, 'filename5', 5, 5, 'details description 5', 1]]),
+            ([2, 'filename2', 2, 2, 'diag description 2', 2], []),
+            ([3, 'filename3', 3, 3, 'diag description 3', 2], [[3, 'filename6', 6, 6, 'details description 6', 2]]),
         ]
         with mock.patch.object(self.service, 'symbol_db_exists', return_value=True):
             with mock.patch.object(self.service.symbol_db, 'open') as mock_symbol_db_open:
-                with mock.patch.object(self.service.symbol_db, 'fetch_all_diagnostics', return_value=diagnostics_from_db) as mock_symbol_db_fetch_all_diagnostics:
-                    with mock.patch.object(self.service.symbol_db, 'fetch_diagnostics_details', return_value=diagnostics_from_db) as mock_symbol_db_fetch_all_diagnostics_details:
-                        success, diagnostics = self.service([SourceCodeModelIndexerRequestId.FETCH_ALL_DIAGNOSTICS, sorting_strategy])
+                with mock.patch.object(self.service.symbol_db, 'fetch_all_diagnostics_with_details', return_value=diagnostics_from_db) as mock_symbol_db_fetch_all_diagnostics_with_details:
+                    success, diagnostics = self.service([SourceCodeModelIndexerRequestId.FETCH_ALL_DIAGNOSTICS, sorting_strategy])
         mock_symbol_db_open.assert_called_once()
-        mock_symbol_db_fetch_all_diagnostics.assert_called_once()
-        mock_symbol_db_fetch_all_diagnostics_details.assert_called()
-        self.assertEqual(mock_symbol_db_fetch_all_diagnostics_details.call_count, len(diagnostics_from_db))
+        mock_symbol_db_fetch_all_diagnostics_with_details.assert_called_once_with(sorting_strategy)
         self.assertEqual(success, True)
-        self.assertEqual(len(diagnostics), len(diagnostics_from_db) + len(diagnostics_from_db)**2)
-
-    def test_if_index_file_list_runs_indexing_for_each_of_the_files_given(self):
-        input_filename_list = ['/tmp/a.cpp', '/tmp/b.cpp', '/tmp/c.cpp', '/tmp/d.cpp', '/tmp/e.cpp', '/tmp/f.cpp', '/tmp/g.cpp']
-        output_db_filename = 'out.db'
-        manager = mock.MagicMock()
-        with mock.patch('services.source_code_model.indexer.clang_indexer.SymbolDatabase.create_data_model') as mock_symbol_db_create_data_model, \
-            mock.patch('services.source_code_model.indexer.clang_indexer.ClangParser.__init__', return_value=None) as mock_clang_parser_creation, \
-            mock.patch('services.source_code_model.indexer.clang_indexer.TranslationUnitCache') as mock_translation_unit_cache, \
-            mock.patch('services.source_code_model.indexer.clang_indexer.NoCache') as mock_translation_unit_no_cache_strategy, \
-            mock.patch('services.source_code_model.indexer.clang_indexer.index_single_file') as mock_index_single_file, \
-            mock.patch('__builtin__.open', mock.mock_open(read_data='\n'.join(input_filename_list)), create=True), \
-            mock.patch('services.source_code_model.indexer.clang_indexer.SymbolDatabase.close') as mock_symbol_db_close:
-                manager.attach_mock(mock_index_single_file, 'mock_index_single_file')
-                index_file_list(self.root_directory, 'file_containing_list_of_files_to_be_indexed', self.txt_compilation_database.name, output_db_filename)
-        mock_symbol_db_create_data_model.assert_called_once()
-        mock_clang_parser_creation.assert_called_once_with(self.txt_compilation_database.name, mock.ANY) # TODO how to test/mock against NoCache() temp object
-        mock_translation_unit_cache.assert_called_once()
-        mock_translation_unit_no_cache_strategy.assert_called_once()
-        self.assertEqual(mock_index_single_file.call_count, len(input_filename_list))
-        manager.assert_has_calls(
-            [
-                mock.call.mock_index_single_file(
-                    mock.ANY, self.root_directory,
-                    input_filename_list[0], mock.ANY
-                ),
-                mock.call.mock_index_single_file(
-                    mock.ANY, self.root_directory,
-                    input_filename_list[1], mock.ANY
-                ),
-                mock.call.mock_index_single_file(
-                    mock.ANY, self.root_directory,
-                    input_filename_list[2], mock.ANY
-                ),
-                mock.call.mock_index_single_file(
-                    mock.ANY, self.root_directory,
-                    input_filename_list[3], mock.ANY
-                ),
-                mock.call.mock_index_single_file(
-                    mock.ANY, self.root_directory,
-                    input_filename_list[4], mock.ANY
-                ),
-                mock.call.mock_index_single_file(
-                    mock.ANY, self.root_directory,
-                    input_filename_list[5], mock.ANY
-                ),
-                mock.call.mock_index_single_file(
-                    mock.ANY, self.root_directory,
-                    input_filename_list[6], mock.ANY
-                )
-            ]
+        self.assertEqual(
+            [diag[0] for diag in diagnostics],
+            [os.path.join(self.root_directory, filename) for filename in ['filename1', 'filename4', 'filename5', 'filename2', 'filename3', 'filename6']]
         )
-        mock_symbol_db_close.assert_called_once()
 
-    def test_if_index_single_file_returns_true_traverses_the_ast_tree_stores_tunit_diagnostics_and_flushes_the_symbol_db(self):
+    def test_if_index_single_file_returns_true_traverses_the_ast_tree_stores_the_results_and_flushes_the_symbol_db(self):
         symbol_db = SymbolDatabase('tmp.db')
         with mock.patch.object(self.parser, 'parse') as mock_parser_parse:
             with mock.patch.object(self.parser, 'traverse') as mock_parser_traverse:
-                with mock.patch('services.source_code_model.indexer.clang_indexer.store_tunit_diagnostics') as mock_store_tunit_diagnostics:
-                    with mock.patch('services.source_code_model.indexer.clang_indexer.SymbolDatabase.flush') as mock_symbol_db_flush:
-                        ret = index_single_file(self.parser, os.path.dirname(self.test_file.name), self.test_file.name, symbol_db)
+                with mock.patch('services.source_code_model.indexer.clang_indexer.collect_tunit_includes', return_value=[]), \
+                     mock.patch('services.source_code_model.indexer.clang_indexer.collect_tunit_diagnostics', return_value=[]) as mock_collect_tunit_diagnostics:
+                    with mock.patch('services.source_code_model.indexer.clang_indexer.store_single_file') as mock_store_single_file:
+                        with mock.patch.object(symbol_db, 'flush') as mock_symbol_db_flush:
+                            ret = index_single_file(self.parser, os.path.dirname(self.test_file.name), self.test_file.name, symbol_db)
         mock_parser_parse.assert_called_once_with(self.test_file.name, self.test_file.name)
-        mock_parser_traverse.assert_called_once_with(mock_parser_parse.return_value.cursor, [self.parser, symbol_db, self.root_directory], indexer_visitor)
-        mock_store_tunit_diagnostics.assert_called_once_with(mock_parser_parse.return_value.diagnostics, symbol_db, self.root_directory)
+        mock_parser_traverse.assert_called_once_with(mock_parser_parse.return_value.cursor, [self.parser, None, self.root_directory, [], [], [], mock.ANY], indexer_visitor)
+        mock_collect_tunit_diagnostics.assert_called_once_with(mock_parser_parse.return_value.diagnostics, self.root_directory)
+        mock_store_single_file.assert_called_once_with(symbol_db, (os.path.basename(self.test_file.name), [], [], [], [], [], mock.ANY))
         mock_symbol_db_flush.assert_called_once()
         self.assertEqual(ret, True)
 
@@ -518,17 +628,16 @@ class ClangIndexerTest(unittest.TestCase):
         symbol_db = SymbolDatabase('tmp.db')
         with mock.patch.object(self.parser, 'parse', return_value=None) as mock_parser_parse:
             with mock.patch.object(self.parser, 'traverse') as mock_parser_traverse:
-                with mock.patch('services.source_code_model.indexer.clang_indexer.store_tunit_diagnostics') as mock_store_tunit_diagnostics:
-                    with mock.patch('services.source_code_model.indexer.clang_indexer.SymbolDatabase.flush') as mock_symbol_db_flush:
+                with mock.patch('services.source_code_model.indexer.clang_indexer.store_single_file') as mock_store_single_file:
+                    with mock.patch.object(symbol_db, 'flush') as mock_symbol_db_flush:
                         ret = index_single_file(self.parser, os.path.dirname(self.test_file.name), self.test_file.name, symbol_db)
         mock_parser_parse.assert_called_once_with(self.test_file.name, self.test_file.name)
         mock_parser_traverse.assert_not_called()
-        mock_store_tunit_diagnostics.assert_not_called()
+        mock_store_single_file.assert_not_called()
         mock_symbol_db_flush.assert_not_called()
         self.assertEqual(ret, False)
 
-    def test_if_indexer_visitor_inserts_a_single_entry_to_symbol_db_for_ast_node_from_tunit_under_test_and_recurses_further(self):
-        import linecache
+    def test_if_indexer_visitor_collects_a_single_symbol_for_ast_node_from_tunit_under_test_and_recurses_further(self):
         line, column = 10, 15
         location_mock = mock.PropertyMock(return_value=cxxd_mocks.SourceLocationMock(self.test_file.name, line, column))
         translation_unit_mock = cxxd_mocks.TranslationUnitMock(self.test_file.name)
@@ -536,55 +645,61 @@ class ClangIndexerTest(unittest.TestCase):
         type(ast_node).location = location_mock
         type(ast_node).translation_unit = translation_unit_mock
         type(ast_node).referenced = None
-        ast_node._kind_id = clang.cindex.CursorKind.CLASS_DECL
-        symbol_db = SymbolDatabase('tmp.db')
-        args = [self.parser, symbol_db, self.root_directory]
+        type(ast_node).spelling = 'foobar'
+        type(ast_node).semantic_parent = None
+        ast_node._kind_id = clang.cindex.CursorKind.CLASS_DECL.value
+        symbol_batch, symbol_names, symbol_references = [], [], []
+        args = [self.parser, None, self.root_directory, symbol_batch, symbol_names, symbol_references, ReferenceContext()]
         with mock.patch.object(self.parser, 'get_ast_node_id', return_value=ClangIndexer.supported_ast_node_ids[0]):
-            with mock.patch.object(symbol_db, 'insert_symbol_entry') as mock_symbol_db_insert_symbol_entry:
+            with mock.patch.object(self.parser, 'get_ast_node_line', return_value=line), mock.patch.object(self.parser, 'get_ast_node_column', return_value=column):
                 with mock.patch.object(ast_node, 'get_usr', return_value='#usr#of#some#symbol') as mock_clang_cursor_get_usr:
                     with mock.patch.object(ast_node, 'is_definition', return_value=True) as mock_clang_cursor_is_definition:
                         with mock.patch('services.source_code_model.indexer.clang_indexer.remove_root_dir_from_filename', return_value=os.path.basename(self.test_file.name)) as mock_remove_root_dir_from_filename:
                             ret = indexer_visitor(ast_node, None, args)
         self.assertEqual(ret, parser.clang_parser.ChildVisitResult.RECURSE.value)
         mock_remove_root_dir_from_filename.assert_called_once_with(self.root_directory, translation_unit_mock.spelling)
-        mock_symbol_db_insert_symbol_entry.assert_called_once_with(
+        self.assertEqual(symbol_batch, [(
             mock_remove_root_dir_from_filename.return_value,
             line, column,
             mock_clang_cursor_get_usr.return_value,
-            linecache.getline(self.test_file.name, line),
+            None,
             ast_node._kind_id,
             mock_clang_cursor_is_definition.return_value
-        )
+        )])
+        self.assertEqual(symbol_names, [(mock_remove_root_dir_from_filename.return_value, line, mock_clang_cursor_get_usr.return_value, 'foobar', 'foobar')])
+        self.assertEqual(symbol_references, [])
 
-    def test_if_indexer_visitor_does_not_insert_an_entry_to_symbol_db_for_unsupported_ast_node_and_recurses_further(self):
+    def test_if_indexer_visitor_does_not_collect_a_symbol_for_unsupported_ast_node_and_recurses_further(self):
         line, column = 10, 15
         location_mock = mock.PropertyMock(return_value=cxxd_mocks.SourceLocationMock(self.test_file.name, line, column))
         translation_unit_mock = cxxd_mocks.TranslationUnitMock(self.test_file.name)
         ast_node = mock.MagicMock(clang.cindex.Cursor)
         type(ast_node).location = location_mock
         type(ast_node).translation_unit = translation_unit_mock
-        symbol_db = SymbolDatabase('tmp.db')
-        args = [self.parser, symbol_db, self.root_directory]
+        symbol_batch, symbol_names, symbol_references = [], [], []
+        args = [self.parser, None, self.root_directory, symbol_batch, symbol_names, symbol_references, ReferenceContext()]
         with mock.patch.object(self.parser, 'get_ast_node_id', return_value=self.unsupported_ast_node_ids[0]) as mock_get_ast_node_id:
-            with mock.patch.object(symbol_db, 'insert_symbol_entry') as mock_symbol_db_insert_symbol_entry:
+            with mock.patch.object(self.parser, 'get_ast_node_line', return_value=line), mock.patch.object(self.parser, 'get_ast_node_column', return_value=column):
                 ret = indexer_visitor(ast_node, None, args)
         self.assertEqual(ret, parser.clang_parser.ChildVisitResult.RECURSE.value)
         mock_get_ast_node_id.assert_called_once()
-        mock_symbol_db_insert_symbol_entry.assert_not_called()
+        self.assertEqual(symbol_batch, [])
+        self.assertEqual(symbol_names, [])
 
-    def test_if_indexer_visitor_does_not_insert_an_entry_to_symbol_db_for_ast_node_from_another_tunit_and_does_not_recurse_further(self):
+    def test_if_indexer_visitor_does_not_collect_a_symbol_for_ast_node_from_another_tunit_and_does_not_recurse_further(self):
         line, column = 10, 15
         location_mock = mock.PropertyMock(return_value=cxxd_mocks.SourceLocationMock(self.test_file.name, line, column))
         translation_unit_mock = cxxd_mocks.TranslationUnitMock('some_other_tunit')
         ast_node = mock.MagicMock(clang.cindex.Cursor)
         type(ast_node).location = location_mock
         type(ast_node).translation_unit = translation_unit_mock
-        symbol_db = SymbolDatabase('tmp.db')
-        args = [self.parser, symbol_db, self.root_directory]
-        with mock.patch.object(symbol_db, 'insert_symbol_entry') as mock_symbol_db_insert_symbol_entry:
+        symbol_batch, symbol_names, symbol_references = [], [], []
+        args = [self.parser, None, self.root_directory, symbol_batch, symbol_names, symbol_references, ReferenceContext()]
+        with mock.patch.object(self.parser, 'get_ast_node_id') as mock_get_ast_node_id:
             ret = indexer_visitor(ast_node, None, args)
         self.assertEqual(ret, parser.clang_parser.ChildVisitResult.CONTINUE.value)
-        mock_symbol_db_insert_symbol_entry.assert_not_called()
+        mock_get_ast_node_id.assert_not_called()
+        self.assertEqual(symbol_batch, [])
 
     def test_if_store_tunit_diagnostics_creates_diagnostics_entry_and_no_diagnostics_details_entry_in_symbol_db(self):
         symbol_db = SymbolDatabase('tmp.db')
@@ -600,8 +715,8 @@ class ClangIndexerTest(unittest.TestCase):
             ),
         ]
         translation_unit_mock = cxxd_mocks.TranslationUnitMock('some_tunit_with_diagnostics', diagnostics)
-        with mock.patch('services.source_code_model.indexer.clang_indexer.SymbolDatabase.insert_diagnostics_entry') as mock_symbol_db_insert_diagnostics_entry:
-            with mock.patch('services.source_code_model.indexer.clang_indexer.SymbolDatabase.insert_diagnostics_details_entry') as mock_symbol_db_insert_diagnostics_details_entry:
+        with mock.patch.object(symbol_db, 'insert_diagnostics_entry') as mock_symbol_db_insert_diagnostics_entry:
+            with mock.patch.object(symbol_db, 'insert_diagnostics_details_entry') as mock_symbol_db_insert_diagnostics_details_entry:
                 ret = store_tunit_diagnostics(translation_unit_mock.diagnostics, symbol_db, self.root_directory)
         mock_symbol_db_insert_diagnostics_entry.assert_called()
         self.assertEqual(mock_symbol_db_insert_diagnostics_entry.call_count, len(diagnostics))
@@ -633,23 +748,73 @@ class ClangIndexerTest(unittest.TestCase):
             ),
         ]
         translation_unit_mock = cxxd_mocks.TranslationUnitMock('some_tunit_with_diagnostics', diagnostics)
-        with mock.patch('services.source_code_model.indexer.clang_indexer.SymbolDatabase.insert_diagnostics_entry') as mock_symbol_db_insert_diagnostics_entry:
-            with mock.patch('services.source_code_model.indexer.clang_indexer.SymbolDatabase.insert_diagnostics_details_entry') as mock_symbol_db_insert_diagnostics_details_entry:
+        with mock.patch.object(symbol_db, 'insert_diagnostics_entry') as mock_symbol_db_insert_diagnostics_entry:
+            with mock.patch.object(symbol_db, 'insert_diagnostics_details_entry') as mock_symbol_db_insert_diagnostics_details_entry:
                 ret = store_tunit_diagnostics(translation_unit_mock.diagnostics, symbol_db, self.root_directory)
         mock_symbol_db_insert_diagnostics_entry.assert_called()
         self.assertEqual(mock_symbol_db_insert_diagnostics_entry.call_count, len(diagnostics))
         mock_symbol_db_insert_diagnostics_details_entry.assert_called()
         self.assertEqual(mock_symbol_db_insert_diagnostics_details_entry.call_count, len(diagnostics[0].children + diagnostics[1].children + diagnostics[2].children))
 
+    def test_if_estimate_indexing_cost_uses_cost_history_and_converts_size_of_unseen_files_into_seconds(self):
+        root_directory = '/home/user/project_root_dir'
+        cpp_file_list = [root_directory + '/a.cpp', root_directory + '/b.cpp']
+        with mock.patch('os.stat', side_effect=lambda filename: mock.Mock(st_size={cpp_file_list[0]: 100, cpp_file_list[1]: 300}[filename])):
+            estimated_cost, estimated_files = estimate_indexing_cost(cpp_file_list, root_directory, {'a.cpp': 2.0, 'gone.cpp': 1.0})
+        self.assertEqual(estimated_files, 1)
+        self.assertEqual(estimated_cost[cpp_file_list[0]], 2.0)
+        self.assertAlmostEqual(estimated_cost[cpp_file_list[1]], 6.0)
+
+    def test_if_estimate_indexing_cost_falls_back_to_size_when_there_is_no_cost_history(self):
+        root_directory = '/home/user/project_root_dir'
+        cpp_file_list = [root_directory + '/a.cpp', root_directory + '/b.cpp']
+        with mock.patch('os.stat', side_effect=[mock.Mock(st_size=100), OSError()]):
+            estimated_cost, estimated_files = estimate_indexing_cost(cpp_file_list, root_directory, {})
+        self.assertEqual(estimated_files, 0)
+        self.assertEqual(estimated_cost, {cpp_file_list[0]: 100, cpp_file_list[1]: 0})
+
+    def test_if_predict_makespan_assigns_each_item_to_the_worker_which_gets_free_first(self):
+        self.assertEqual(predict_makespan([5.0, 4.0, 3.0, 3.0, 2.0], 2), 9.0)
+        self.assertEqual(predict_makespan([5.0, 4.0, 3.0], 1), 12.0)
+        self.assertEqual(predict_makespan([], 4), 0.0)
+
+    def test_if_indexer_results_writer_stores_streamed_results_into_symbol_db(self):
+        symbol_db_handle, symbol_db_filename = create_empty_symbol_db(self.root_directory, 'tmp_symbol_db')
+        os.close(symbol_db_handle)
+        symbol_db = SymbolDatabase(symbol_db_filename)
+        symbol_db.create_data_model()
+        symbol_db.flush()
+        writer = IndexerResultsWriter(symbol_db_filename)
+        writer.start()
+        writer.write((
+            'src/main.cpp',
+            [(2, 5, 'c:@F@main#', None, 8, True), (2, 14, 'c:@F@foo#', None, 8, False)],
+            [(2, 'c:@F@main#', 'main', 'main')],
+            [(2, 14, 'c:@F@foo#', 'c:@F@main#', SymbolReferenceRole.CALL)],
+            [('src/main.cpp', 1, 'src/foo.h')],
+            [('src/main.cpp', 2, 14, 'some error', 3, [('src/foo.h', 2, 1, 'some note', 1)])],
+            (1.5, 100, 'content_hash', 'compiler_args_hash', 0.25, 2, encode_line_offsets([0, 22]))
+        ))
+        writer.stop()
+        self.assertEqual(len(symbol_db.fetch_all_symbols()), 2)
+        self.assertEqual(len(symbol_db.fetch_symbols_by_name('main', 10)), 1)
+        self.assertEqual(len(symbol_db.fetch_symbol_references('c:@F@foo#', SymbolReferenceRole.CALL)), 1)
+        self.assertEqual(symbol_db.fetch_includers('src/foo.h'), [('src/main.cpp', 1)])
+        self.assertEqual(len(symbol_db.fetch_all_diagnostics(0)), 1)
+        self.assertEqual(len(symbol_db.fetch_all_diagnostics_details()), 1)
+        self.assertEqual(symbol_db.fetch_all_files(), [('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash', 0.25, 2)])
+        self.assertEqual(len(symbol_db.fetch_line_offsets(['src/main.cpp'])), 1)
+        symbol_db.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(symbol_db_filename + suffix):
+                os.remove(symbol_db_filename + suffix)
+
     def test_if_remove_root_dir_from_filename_returns_basename_without_root_dir_and_without_path_separator(self):
         self.assertEqual(remove_root_dir_from_filename('/home/user/project_root_dir/', '/home/user/project_root_dir/lib/impl.cpp'), 'lib/impl.cpp')
 
-    def test_if_get_clang_index_path_returns_a_valid_path(self):
-        self.assertTrue(os.path.exists(get_clang_index_path()))
-
     def test_if_get_cpp_file_list_returns_cpp_files_only(self):
         blacklisted_directories = []
-        os_walk_dir_list = (self.root_directory)
+        os_walk_dir_list = []
         os_walk_file_list = ('/tmp/a.cpp', '/tmp/b.cc', '/tmp/c.cxx', '/tmp/d.c', '/tmp/e.h', '/tmp/f.hh', '/tmp/g.hpp')
         with mock.patch('os.walk', return_value=[(self.root_directory, os_walk_dir_list, os_walk_file_list),]) as mock_os_walk:
             cpp_list = get_cpp_file_list(self.root_directory, blacklisted_directories, self.service.recognized_file_extensions + self.service.extra_file_extensions)
@@ -658,7 +823,7 @@ class ClangIndexerTest(unittest.TestCase):
 
     def test_if_get_cpp_file_list_does_not_include_non_cpp_files(self):
         blacklisted_directories = []
-        os_walk_dir_list = (self.root_directory)
+        os_walk_dir_list = []
         os_walk_file_list = ('/tmp/a.md', '/tmp/b.txt', '/tmp/c.json')
         with mock.patch('os.walk', return_value=[(self.root_directory, os_walk_dir_list, os_walk_file_list),]) as mock_os_walk:
             cpp_list = get_cpp_file_list(self.root_directory, blacklisted_directories, self.service.recognized_file_extensions + self.service.extra_file_extensions)
@@ -667,7 +832,7 @@ class ClangIndexerTest(unittest.TestCase):
 
     def test_if_get_cpp_file_list_returns_empty_list_for_no_files_found(self):
         blacklisted_directories = []
-        os_walk_dir_list = (self.root_directory)
+        os_walk_dir_list = []
         os_walk_file_list = ()
         with mock.patch('os.walk', return_value=[(self.root_directory, os_walk_dir_list, os_walk_file_list),]) as mock_os_walk:
             cpp_list = get_cpp_file_list(self.root_directory, blacklisted_directories, self.service.recognized_file_extensions + self.service.extra_file_extensions)
@@ -676,7 +841,7 @@ class ClangIndexerTest(unittest.TestCase):
 
     def test_if_get_cpp_file_list_only_returns_cpp_files_which_are_not_in_blacklisted_directories(self):
         blacklisted_directories = ['/tmp']
-        os_walk_dir_list = (self.root_directory)
+        os_walk_dir_list = []
         os_walk_file_list = ('/home/1.cpp', '/home/2.cpp', '/home/3.cpp', '/tmp/4.cpp')
         with mock.patch('os.walk', return_value=[(self.root_directory, os_walk_dir_list, os_walk_file_list),]) as mock_os_walk:
             cpp_list = get_cpp_file_list(self.root_directory, blacklisted_directories, self.service.recognized_file_extensions + self.service.extra_file_extensions)
@@ -686,54 +851,17 @@ class ClangIndexerTest(unittest.TestCase):
     def test_if_get_cpp_file_list_returns_files_with_non_standard_extension(self):
         blacklisted_directories = []
         extra_file_extensions = ['.ic', '.i', '.tcc', '.txx']
-        os_walk_dir_list = (self.root_directory)
+        os_walk_dir_list = []
         os_walk_file_list = ('/tmp/a.cpp', '/tmp/b.ic', '/tmp/c.i', '/tmp/d.tcc', '/tmp/e.txx')
         with mock.patch('os.walk', return_value=[(self.root_directory, os_walk_dir_list, os_walk_file_list),]) as mock_os_walk:
             cpp_list = get_cpp_file_list(self.root_directory, blacklisted_directories, self.service.recognized_file_extensions + extra_file_extensions)
         mock_os_walk.assert_called_once_with(self.root_directory)
         self.assertEqual(len(os_walk_file_list), len(cpp_list))
 
-    def test_if_create_indexer_input_list_file_creates_a_file_containing_newline_separated_list_of_files_with_given_prefix_in_given_directory(self):
-        input_list_prefix = 'input_list_0'
-        cpp_file_list = ['/tmp/a.cpp', '/tmp/b.cpp', '/tmp/c.cpp', '/tmp/d.cpp', '/tmp/e.cpp', '/tmp/f.cpp', '/tmp/g.cpp']
-        cpp_files_newline_separated = '/tmp/a.cpp\n/tmp/b.cpp\n/tmp/c.cpp\n/tmp/d.cpp\n/tmp/e.cpp\n/tmp/f.cpp\n/tmp/g.cpp'
-        with mock.patch('tempfile.mkstemp', return_value=(None, None)) as mock_mkstemp:
-            with mock.patch('os.write') as mock_os_write:
-                create_indexer_input_list_file(self.root_directory, input_list_prefix, cpp_file_list)
-        mock_mkstemp.assert_called_once_with(prefix=input_list_prefix, dir=self.root_directory)
-        mock_os_write.assert_called_once_with(mock.ANY, cpp_files_newline_separated)
-
-    def test_if_create_indexer_input_list_file_creates_a_file_containing_newline_separated_list_of_files_with_given_prefix_in_given_directory_and_can_handle_none_items_in_the_list(self):
-        input_list_prefix = 'input_list_0'
-        cpp_file_list = ['/tmp/a.cpp', '/tmp/b.cpp', '/tmp/c.cpp', '/tmp/d.cpp', '/tmp/e.cpp', '/tmp/f.cpp', '/tmp/g.cpp', None]
-        cpp_files_newline_separated = '/tmp/a.cpp\n/tmp/b.cpp\n/tmp/c.cpp\n/tmp/d.cpp\n/tmp/e.cpp\n/tmp/f.cpp\n/tmp/g.cpp'
-        with mock.patch('tempfile.mkstemp', return_value=(None, None)) as mock_mkstemp:
-            with mock.patch('os.write') as mock_os_write:
-                create_indexer_input_list_file(self.root_directory, input_list_prefix, cpp_file_list)
-        mock_mkstemp.assert_called_once_with(prefix=input_list_prefix, dir=self.root_directory)
-        mock_os_write.assert_called_once_with(mock.ANY, cpp_files_newline_separated)
-
     def test_if_create_empty_symbol_db_creates_an_empty_file_with_given_prefix_in_given_directory(self):
         symbol_db_prefix = 'tmp_symbol_db'
         with mock.patch('tempfile.mkstemp', return_value=(None, None)) as mock_mkstemp:
             create_empty_symbol_db(self.root_directory, symbol_db_prefix)
         mock_mkstemp.assert_called_once_with(prefix=symbol_db_prefix, dir=self.root_directory)
 
-    def test_if_start_indexing_subprocess_invokes_correctly_clang_index_script(self):
-        indexer_input_filename = 'input0'
-        output_db_filename = 'output0.db'
-        log_filename = 'log.txt'
-        expected_cmd = 'python2 ' + \
-            get_clang_index_path() + \
-            ' --project_root_directory=\'' + self.root_directory + \
-            '\' --compiler_args_filename=\'' + self.txt_compilation_database.name + \
-            '\' --input_list=\'' + indexer_input_filename + \
-            '\' --output_db_filename=\'' + output_db_filename + \
-            '\' --log_file=\'' + log_filename + '\''
-        with mock.patch('shlex.split') as mock_shlex_split:
-            with mock.patch('subprocess.Popen') as mock_subprocess_popen:
-                start_indexing_subprocess(self.root_directory, self.txt_compilation_database.name, indexer_input_filename, output_db_filename, log_filename)
-        mock_shlex_split.assert_called_once_with(expected_cmd)
-        mock_subprocess_popen.assert_called_once()
-
 # TODO fuzz the ClangIndexer interface ...
@@ -0,0 +1,188 @@
+import os
+import tempfile
+import unittest
+
+import parser.clang_parser
+import parser.tunit_cache
+from parser.clang_parser import ParseTimings
+from file_generator import FileGenerator
+
+class ParseTimingsTest(unittest.TestCase):
+    def setUp(self):
+        self.timings = ParseTimings()
+
+    def test_if_reparse_is_chosen_until_there_is_enough_timings_to_compare(self):
+        self.assertEqual(self.timings.should_reparse(), True)
+        self.timings.record_parse(1.0)
+        self.assertEqual(self.timings.should_reparse(), True)
+
+    def test_if_first_reparse_is_not_taken_into_account(self):
+        self.timings.record_parse(1.0)
+        self.timings.record_reparse(2.0)
+        self.assertEqual(self.timings.get_reparse_duration(), None)
+        self.timings.record_reparse(0.1)
+        self.assertEqual(self.timings.get_reparse_duration(), 0.1)
+
+    def test_if_first_reparse_after_parse_is_not_taken_into_account(self):
+        self.timings.record_parse(1.0)
+        self.timings.record_reparse(2.0)
+        self.timings.record_reparse(0.1)
+        self.timings.record_parse(1.0)
+        self.timings.record_reparse(2.0)
+        self.assertEqual(self.timings.get_reparse_duration(), 0.1)
+
+    def test_if_faster_one_is_chosen(self):
+        self.timings.record_parse(1.0)
+        self.timings.record_reparse(2.0)
+        self.timings.record_reparse(0.1)
+        self.assertEqual(self.timings.should_reparse(), True)
+        for i in range(ParseTimings.NUM_OF_SAMPLES):
+            self.timings.record_reparse(3.0)
+        self.assertEqual(self.timings.should_reparse(), False)
+
+    def test_if_slower_one_is_chosen_every_once_in_a_while(self):
+        self.timings.record_parse(1.0)
+        self.timings.record_reparse(2.0)
+        self.timings.record_reparse(0.1)
+        choices = [self.timings.should_reparse() for i in range(ParseTimings.RETRY_EVERY)]
+        self.assertEqual(choices.count(False), 1)
+
+    def test_if_reparse_is_not_chosen_after_it_has_failed_a_couple_of_times_in_a_row(self):
+        for i in range(ParseTimings.MAX_REPARSE_FAILURES):
+            self.assertEqual(self.timings.should_reparse(), True)
+            self.timings.record_reparse_failure()
+        choices = [self.timings.should_reparse() for i in range(ParseTimings.RETRY_EVERY)]
+        self.assertEqual(choices.count(True), 1)
+
+    def test_if_reparse_failures_are_reset_on_reparse(self):
+        self.timings.record_reparse_failure()
+        self.timings.record_reparse(0.1)
+        self.assertEqual(self.timings.reparse_failures, 0)
+
+    def test_if_median_of_timings_is_used(self):
+        for duration in [0.1, 5.0, 0.2]:
+            self.timings.record_parse(duration)
+        self.assertEqual(self.timings.get_parse_duration(), 0.2)
+
+class TranslationUnitFingerprintTest(unittest.TestCase):
+    def setUp(self):
+        self.contents_file = tempfile.NamedTemporaryFile(suffix='.cpp', mode='w')
+        self.contents_file.write('int main() { return 0; }\n')
+        self.contents_file.flush()
+        self.header = tempfile.NamedTemporaryFile(suffix='.h', mode='w')
+        self.fingerprint = (
+            parser.clang_parser.get_contents_hash(self.contents_file.name),
+            ((self.header.name, parser.clang_parser.get_file_state(self.header.name)),)
+        )
+
+    def tearDown(self):
+        self.contents_file.close()
+        self.header.close()
+
+    def test_if_tunit_is_up_to_date_when_nothing_has_changed(self):
+        self.assertEqual(parser.clang_parser.is_tunit_up_to_date(self.fingerprint, self.contents_file.name), True)
+
+    def test_if_tunit_is_out_of_date_without_fingerprint(self):
+        self.assertEqual(parser.clang_parser.is_tunit_up_to_date(None, self.contents_file.name), False)
+
+    def test_if_tunit_is_out_of_date_when_contents_change(self):
+        self.contents_file.write('int foo;\n')
+        self.contents_file.flush()
+        self.assertEqual(parser.clang_parser.is_tunit_up_to_date(self.fingerprint, self.contents_file.name), False)
+
+    def test_if_tunit_is_out_of_date_when_included_file_changes(self):
+        self.header.write('int foo;\n')
+        self.header.flush()
+        self.assertEqual(parser.clang_parser.is_tunit_up_to_date(self.fingerprint, self.contents_file.name), False)
+
+    def test_if_tunit_is_out_of_date_when_included_file_is_removed(self):
+        self.header.close()
+        self.assertEqual(parser.clang_parser.is_tunit_up_to_date(self.fingerprint, self.contents_file.name), False)
+
+class ClangParserReparseTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.txt_compilation_database = FileGenerator.gen_txt_compilation_database()
+
+    @classmethod
+    def tearDownClass(cls):
+        FileGenerator.close_gen_file(cls.txt_compilation_database)
+
+    def setUp(self):
+        self.original_file = tempfile.NamedTemporaryFile(suffix='.cpp', mode='w')
+        self.edited_file = tempfile.NamedTemporaryFile(suffix='.cpp', mode='w')
+        self.timestamp = 1000
+        self.parser = parser.clang_parser.ClangParser(
+            self.txt_compilation_database.name,
+            parser.tunit_cache.TranslationUnitCache(parser.tunit_cache.UnlimitedCache())
+        )
+
+    def tearDown(self):
+        self.original_file.close()
+        self.edited_file.close()
+
+    def edit(self, contents):
+        with open(self.edited_file.name, 'w') as f:
+            f.write(contents)
+        self.timestamp += 1
+        os.utime(self.edited_file.name, (self.timestamp, self.timestamp))
+
+    def get_errors(self, tunit):
+        return [diag.spelling for diag in tunit.diagnostics if diag.severity >= 3]
+
+    def test_if_modified_file_is_reparsed_in_place(self):
+        self.edit('int main() { return 0; }\n')
+        tunit = self.parser.parse(self.edited_file.name, self.original_file.name)
+        self.assertEqual(self.get_errors(tunit), [])
+        self.edit('int main() { return undeclared; }\n')
+        reparsed_tunit = self.parser.parse(self.edited_file.name, self.original_file.name)
+        self.assertIs(reparsed_tunit, tunit)
+        self.assertEqual(len(self.get_errors(reparsed_tunit)), 1)
+        self.assertEqual(self.parser.parse_timings[self.original_file.name].reparse_failures, 0)
+
+    def test_if_file_is_parsed_from_scratch_when_reparse_results_with_fatal_errors(self):
+        self.edit('int main() { return 0; }\n')
+        tunit = self.parser.parse(self.edited_file.name, self.original_file.name)
+        self.edit('#include "this_header_does_not_exist.h"\nint main() { return 0; }\n')
+        parsed_tunit = self.parser.parse(self.edited_file.name, self.original_file.name)
+        self.assertIsNot(parsed_tunit, tunit)
+        self.assertEqual(self.parser.parse_timings[self.original_file.name].reparse_failures, 1)
+
+    def test_if_tunit_is_not_reparsed_when_unmodified_contents_are_written_once_again(self):
+        self.edit('int main() { return 0; }\n')
+        tunit = self.parser.parse(self.edited_file.name, self.original_file.name)
+        self.edit('int main() { return 0; }\n')
+        self.assertIs(self.parser.parse(self.edited_file.name, self.original_file.name), tunit)
+        self.assertEqual(self.parser.parse_timings[self.original_file.name].num_of_choices, 0)
+
+    def test_if_tunit_is_not_reparsed_when_unmodified_contents_are_written_into_another_file(self):
+        self.edit('int main() { return 0; }\n')
+        tunit = self.parser.parse(self.edited_file.name, self.original_file.name)
+        with tempfile.NamedTemporaryFile(suffix='.cpp', mode='w') as another_edited_file:
+            another_edited_file.write('int main() { return 0; }\n')
+            another_edited_file.flush()
+            self.assertIs(self.parser.parse(another_edited_file.name, self.original_file.name), tunit)
+        self.assertEqual(self.parser.parse_timings[self.original_file.name].num_of_choices, 0)
+
+    def test_if_tunit_is_reparsed_when_included_header_is_modified(self):
+        with tempfile.NamedTemporaryFile(suffix='.h', mode='w') as header:
+            header.write('int declared;\n')
+            header.flush()
+            self.edit('#include "{0}"\nint main() {{ return declared; }}\n'.format(header.name))
+            tunit = self.parser.parse(self.edited_file.name, self.original_file.name)
+            self.assertEqual(self.get_errors(tunit), [])
+            with open(header.name, 'w') as f:
+                f.write('int renamed;\n')
+            os.utime(header.name, (self.timestamp, self.timestamp))
+            tunit = self.parser.parse(self.edited_file.name, self.original_file.name)
+            self.assertEqual(len(self.get_errors(tunit)), 1)
+        self.assertEqual(self.parser.parse_timings[self.original_file.name].num_of_choices, 1)
+
+    def test_if_parse_timings_are_dropped_along_with_the_tunit(self):
+        self.edit('int main() { return 0; }\n')
+        self.parser.parse(self.edited_file.name, self.original_file.name)
+        self.parser.drop_tunit(self.original_file.name)
+        self.assertNotIn(self.original_file.name, self.parser.parse_timings)
+
+if __name__ == '__main__':
+    unittest.main()
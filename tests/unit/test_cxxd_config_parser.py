@@ -99,6 +99,37 @@ class CxxdConfigParserWithEmptyConfigFileTest(unittest.TestCase):
     def test_if_cxxd_config_parser_returns_empty_extra_file_extensions_list(self):
         self.assertEqual(self.parser_with_empty_config_file.get_extra_file_extensions(), [])
 
+    def test_if_cxxd_config_parser_returns_cursor_visitor_indexer_backend(self):
+        self.assertEqual(self.parser_with_empty_config_file.get_indexer_backend(), 'cursor-visitor')
+
+    def test_if_cxxd_config_parser_returns_indexer_stream_results_disabled(self):
+        self.assertEqual(self.parser_with_empty_config_file.get_indexer_stream_results(), False)
+
+    def test_if_cxxd_config_parser_returns_indexer_watch_files_disabled(self):
+        self.assertEqual(self.parser_with_empty_config_file.get_indexer_watch_files(), False)
+
+    def test_if_cxxd_config_parser_returns_no_indexer_shards(self):
+        self.assertEqual(self.parser_with_empty_config_file.get_indexer_shards(), 0)
+
+    def test_if_cxxd_config_parser_returns_default_indexer_file_timeout(self):
+        self.assertEqual(self.parser_with_empty_config_file.get_indexer_file_timeout(), 120.0)
+
+    def test_if_cxxd_config_parser_returns_default_clang_tunit_cache_size(self):
+        self.assertEqual(self.parser_with_empty_config_file.get_clang_tunit_cache_size(), 2048)
+
+    def test_if_cxxd_config_parser_returns_default_clang_parse_host(self):
+        self.assertEqual(self.parser_with_empty_config_file.get_clang_parse_host(), False)
+
+    def test_if_cxxd_config_parser_returns_default_clang_ast_cache_size(self):
+        self.assertEqual(self.parser_with_empty_config_file.get_clang_ast_cache_size(), 0)
+
+    def test_if_cxxd_config_parser_returns_default_indexer_resource_limits(self):
+        self.assertEqual(self.parser_with_empty_config_file.get_indexer_max_workers(), 0)
+        self.assertEqual(self.parser_with_empty_config_file.get_indexer_min_free_memory(), 1024)
+        self.assertEqual(self.parser_with_empty_config_file.get_indexer_max_load(), 1.0)
+        self.assertEqual(self.parser_with_empty_config_file.get_indexer_nice(), 10)
+        self.assertEqual(self.parser_with_empty_config_file.get_indexer_pause_on_interactive(), True)
+
     def test_if_cxxd_config_parser_returns_clang_tidy_binary(self):
         self.assertNotEqual(self.parser_with_empty_config_file.get_clang_tidy_binary_path(), None)
 
@@ -191,6 +222,188 @@ class CxxdConfigParserWithCornerCaseConfigEntriesTest(unittest.TestCase):
         self.assertEqual(self.cxxd_config_parser.get_configuration_type(), 'compile-flags')
         FileGenerator.close_gen_file(self.cxxd_config)
 
+    def test_if_cxxd_config_parser_returns_index_action_indexer_backend(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "indexer" : {                               \n\
+        "backend": "index-action"               \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_backend(), 'index-action')
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_cursor_visitor_indexer_backend_when_backend_is_not_one_of_valid_values(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "indexer" : {                               \n\
+        "backend": "something-unsupported"      \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_backend(), 'cursor-visitor')
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_indexer_stream_results_enabled(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "indexer" : {                               \n\
+        "stream-results": true                  \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_stream_results(), True)
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_indexer_watch_files_enabled(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "indexer" : {                               \n\
+        "watch": true                           \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_watch_files(), True)
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_indexer_shards(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "indexer" : {                               \n\
+        "shards": 16                            \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_shards(), 16)
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_no_indexer_shards_for_invalid_value(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "indexer" : {                               \n\
+        "shards": "many"                        \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_shards(), 0)
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_indexer_file_timeout(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "indexer" : {                               \n\
+        "file-timeout": 30                      \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_file_timeout(), 30.0)
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_default_indexer_file_timeout_for_invalid_value(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "indexer" : {                               \n\
+        "file-timeout": 0                       \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_file_timeout(), 120.0)
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_indexer_resource_limits(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "indexer" : {                               \n\
+        "max-workers": 4,                       \n\
+        "min-free-memory": 2048,                \n\
+        "max-load": 0.5,                        \n\
+        "nice": 0,                              \n\
+        "pause-on-interactive": false           \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_max_workers(), 4)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_min_free_memory(), 2048)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_max_load(), 0.5)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_nice(), 0)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_pause_on_interactive(), False)
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_default_indexer_resource_limits_for_invalid_values(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "indexer" : {                               \n\
+        "max-workers": -1,                      \n\
+        "min-free-memory": "1G",                \n\
+        "max-load": 0,                          \n\
+        "nice": 20                              \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_max_workers(), 0)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_min_free_memory(), 1024)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_max_load(), 1.0)
+        self.assertEqual(self.cxxd_config_parser.get_indexer_nice(), 10)
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_clang_tunit_cache_size(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "clang" : {                                 \n\
+        "tunit-cache-size": 512                 \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_clang_tunit_cache_size(), 512)
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_default_clang_tunit_cache_size_for_invalid_value(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "clang" : {                                 \n\
+        "tunit-cache-size": -1                  \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_clang_tunit_cache_size(), 2048)
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_clang_ast_cache_size(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "clang" : {                                 \n\
+        "ast-cache-size": 4096                  \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_clang_ast_cache_size(), 4096)
+        FileGenerator.close_gen_file(self.cxxd_config)
+
+    def test_if_cxxd_config_parser_returns_disabled_clang_ast_cache_for_invalid_value(self):
+        self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
+{                                               \n\
+    "clang" : {                                 \n\
+        "ast-cache-size": "4096"                \n\
+    }                                           \n\
+}                                               \n\
+        '])
+        self.cxxd_config_parser = CxxdConfigParser(self.cxxd_config.name, self.project_root_directory)
+        self.assertEqual(self.cxxd_config_parser.get_clang_ast_cache_size(), 0)
+        FileGenerator.close_gen_file(self.cxxd_config)
+
     def test_if_cxxd_config_parser_returns_auto_discovery_for_type(self):
         self.cxxd_config = FileGenerator.gen_cxxd_config_filename_with_invalid_section(['\
 {                                               \n\
@@ -0,0 +1,67 @@
+import os
+import queue
+import shutil
+import tempfile
+import time
+import unittest
+
+from services.source_code_model.indexer.file_watcher import FileWatcher
+
+class FileWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.root_directory = tempfile.mkdtemp()
+        self.batches = queue.Queue()
+        self.accept = True
+        self.watcher = FileWatcher(
+            self.root_directory,
+            lambda path, is_directory: is_directory or path.endswith('.cpp'),
+            self.callback,
+            debounce=0.2,
+            max_delay=5.0
+        )
+        self.watcher.start()
+
+    def tearDown(self):
+        self.watcher.stop()
+        shutil.rmtree(self.root_directory)
+
+    def callback(self, paths):
+        self.batches.put(paths)
+        return self.accept
+
+    def write_file(self, filename, contents='int main() {}'):
+        with open(os.path.join(self.root_directory, filename), 'w') as f:
+            f.write(contents)
+        return os.path.join(self.root_directory, filename)
+
+    def test_if_burst_of_modifications_is_reported_as_a_single_batch(self):
+        filenames = [self.write_file('file{0}.cpp'.format(i)) for i in range(20)]
+        batch = self.batches.get(timeout=5.0)
+        self.assertEqual(sorted(set(batch)), sorted(filenames))
+        self.assertTrue(self.batches.empty())
+
+    def test_if_paths_rejected_by_the_filter_are_not_reported(self):
+        self.write_file('notes.txt')
+        filename = self.write_file('main.cpp')
+        self.assertEqual(self.batches.get(timeout=5.0), [filename])
+
+    def test_if_directories_are_reported_with_trailing_separator(self):
+        directory = os.path.join(self.root_directory, 'lib')
+        os.mkdir(directory)
+        self.assertEqual(self.batches.get(timeout=5.0), [directory + os.sep])
+
+    def test_if_batch_is_reported_again_when_callback_does_not_accept_it(self):
+        self.accept = False
+        filename = self.write_file('main.cpp')
+        self.assertEqual(self.batches.get(timeout=5.0), [filename])
+        self.accept = True
+        self.assertEqual(self.batches.get(timeout=5.0), [filename])
+
+    def test_if_nothing_is_reported_after_watcher_is_stopped(self):
+        self.watcher.stop()
+        self.write_file('main.cpp')
+        time.sleep(0.5)
+        self.assertTrue(self.batches.empty())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from services.source_code_model.indexer.git_repository import GitRepository
+
+class GitRepositoryTest(unittest.TestCase):
+    def setUp(self):
+        self.repository_directory = tempfile.mkdtemp()
+        self.root_directory = os.path.join(self.repository_directory, 'project')
+        os.mkdir(self.root_directory)
+        self.git('init', '-q')
+        self.write_file('main.cpp')
+        self.write_file('foo.cpp')
+        self.write_file('outside.cpp', self.repository_directory)
+        self.commit()
+        self.repository = GitRepository(self.root_directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.repository_directory)
+
+    def git(self, *args):
+        return subprocess.check_output(
+            ['git', '-C', self.repository_directory, '-c', 'user.name=cxxd', '-c', 'user.email=cxxd@localhost'] + list(args)
+        ).decode('utf-8').strip()
+
+    def commit(self):
+        self.git('add', '-A')
+        self.git('commit', '-q', '-m', 'commit')
+        return self.git('rev-parse', 'HEAD')
+
+    def write_file(self, filename, directory=None, contents='int main() {}'):
+        with open(os.path.join(directory or self.root_directory, filename), 'w') as f:
+            f.write(contents)
+        return os.path.join(directory or self.root_directory, filename)
+
+    def test_if_head_is_returned(self):
+        self.assertEqual(self.repository.get_head(), self.git('rev-parse', 'HEAD'))
+
+    def test_if_head_is_none_when_directory_is_not_a_git_repository(self):
+        directory = tempfile.mkdtemp()
+        try:
+            self.assertIsNone(GitRepository(directory).get_head())
+            self.assertIsNone(GitRepository(directory).get_dirty_files())
+        finally:
+            shutil.rmtree(directory)
+
+    def test_if_changed_files_contain_added_modified_deleted_and_renamed_files(self):
+        indexed_commit = self.repository.get_head()
+        self.write_file('main.cpp', contents='int main() { return 1; }')
+        self.write_file('bar.cpp', contents='int bar() { return 2; }')
+        os.rename(os.path.join(self.root_directory, 'foo.cpp'), os.path.join(self.root_directory, 'baz.cpp'))
+        self.commit()
+        self.assertEqual(self.repository.get_changed_files(indexed_commit), sorted([
+            os.path.join(self.root_directory, 'bar.cpp'),
+            os.path.join(self.root_directory, 'baz.cpp'),
+            os.path.join(self.root_directory, 'foo.cpp'),
+            os.path.join(self.root_directory, 'main.cpp'),
+        ]))
+
+    def test_if_changed_files_outside_of_the_directory_are_not_returned(self):
+        indexed_commit = self.repository.get_head()
+        self.write_file('outside.cpp', self.repository_directory, 'int outside() {}')
+        self.commit()
+        self.assertEqual(self.repository.get_changed_files(indexed_commit), [])
+
+    def test_if_changed_files_are_none_when_commit_is_unknown(self):
+        self.assertIsNone(self.repository.get_changed_files('0' * 40))
+
+    def test_if_dirty_files_contain_modified_staged_and_untracked_files(self):
+        self.write_file('main.cpp', contents='int main() { return 1; }')
+        self.write_file('foo.cpp', contents='int foo() { return 1; }')
+        self.git('add', os.path.join(self.root_directory, 'foo.cpp'))
+        os.mkdir(os.path.join(self.root_directory, 'lib'))
+        self.write_file(os.path.join('lib', 'lib.cpp'))
+        self.assertEqual(self.repository.get_dirty_files(), sorted([
+            os.path.join(self.root_directory, 'foo.cpp'),
+            os.path.join(self.root_directory, 'lib', 'lib.cpp'),
+            os.path.join(self.root_directory, 'main.cpp'),
+        ]))
+
+    def test_if_dirty_files_contain_both_paths_of_staged_rename(self):
+        self.git('mv', os.path.join(self.root_directory, 'foo.cpp'), os.path.join(self.root_directory, 'baz.cpp'))
+        self.assertEqual(self.repository.get_dirty_files(), sorted([
+            os.path.join(self.root_directory, 'baz.cpp'),
+            os.path.join(self.root_directory, 'foo.cpp'),
+        ]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from services.source_code_model.indexer.index_snapshot import export_snapshot, import_snapshot, read_snapshot_header
+from services.source_code_model.indexer.symbol_database import SymbolDatabase
+
+class IndexSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.symbol_db_filename = os.path.join(self.directory, 'index.db')
+        self.snapshot_filename = os.path.join(self.directory, 'index.snapshot')
+        self.symbol_db = SymbolDatabase(self.symbol_db_filename)
+        self.symbol_db.create_data_model()
+        self.symbol_db.insert_symbol_entry('src/main.cpp', 1, 5, 'c:@F@main#', 'int main() {}', 8, True)
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.symbol_db.flush()
+
+    def tearDown(self):
+        self.symbol_db.close()
+        shutil.rmtree(self.directory)
+
+    def test_if_snapshot_header_is_read_back(self):
+        self.assertTrue(export_snapshot(self.symbol_db, self.snapshot_filename, {'git_commit' : 'abc'}))
+        header = read_snapshot_header(self.snapshot_filename)
+        self.assertEqual(header['git_commit'], 'abc')
+        self.assertEqual(header['format'], 1)
+
+    def test_if_snapshot_header_is_none_for_file_which_is_not_a_snapshot(self):
+        with open(self.snapshot_filename, 'w') as f:
+            f.write('int main() {}\n')
+        self.assertIsNone(read_snapshot_header(self.snapshot_filename))
+
+    def test_if_snapshot_header_is_none_for_non_existing_file(self):
+        self.assertIsNone(read_snapshot_header(self.snapshot_filename))
+
+    def test_if_imported_snapshot_has_the_same_contents_as_exported_symbol_db(self):
+        self.assertTrue(export_snapshot(self.symbol_db, self.snapshot_filename, {}))
+        imported_db_filename = os.path.join(self.directory, 'imported.db')
+        self.assertTrue(import_snapshot(self.snapshot_filename, imported_db_filename))
+        imported_db = SymbolDatabase(imported_db_filename)
+        self.assertEqual(imported_db.fetch_all_symbols(), self.symbol_db.fetch_all_symbols())
+        self.assertEqual(imported_db.fetch_all_files(), self.symbol_db.fetch_all_files())
+        imported_db.close()
+
+    def test_if_snapshot_leaves_no_temporary_files_behind(self):
+        self.assertTrue(export_snapshot(self.symbol_db, self.snapshot_filename, {}))
+        self.assertTrue(import_snapshot(self.snapshot_filename, os.path.join(self.directory, 'imported.db')))
+        self.assertEqual([filename for filename in os.listdir(self.directory) if filename.startswith('cxxd_snapshot_')], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import mock
+import multiprocessing
+import os
+import unittest
+
+import services.source_code_model.indexer.resource_governor as resource_governor
+from services.source_code_model.indexer.resource_governor import InteractiveRequest, ResourceGovernor, new_interactive_request_counter
+
+MB = 1024 * 1024
+
+class ResourceGovernorTest(unittest.TestCase):
+    def setUp(self):
+        self.num_of_cores = multiprocessing.cpu_count()
+        self.available_memory = 64 * 1024 * MB
+        self.process_memory = {}
+        self.runnable_tasks = 1
+        self.patches = [
+            mock.patch.object(resource_governor, 'get_available_memory', lambda: self.available_memory),
+            mock.patch.object(resource_governor, 'get_process_memory', lambda pid: self.process_memory.get(pid)),
+            mock.patch.object(resource_governor, 'get_runnable_tasks', lambda: self.runnable_tasks),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_if_pool_is_sized_by_the_number_of_cores_when_there_is_enough_memory(self):
+        self.assertEqual(ResourceGovernor().get_num_of_workers(), self.num_of_cores)
+
+    def test_if_pool_is_sized_by_the_max_workers_when_given(self):
+        self.assertEqual(ResourceGovernor(max_workers=self.num_of_cores + 3).get_num_of_workers(), self.num_of_cores + 3)
+
+    def test_if_pool_is_sized_by_the_available_memory(self):
+        self.available_memory = 1024 * MB + 2 * resource_governor.DEFAULT_WORKER_MEMORY
+        self.assertEqual(ResourceGovernor(max_workers=8, min_free_memory=1024).get_num_of_workers(), 2)
+
+    def test_if_pool_has_at_least_one_worker_no_matter_how_short_on_memory(self):
+        self.available_memory = 0
+        self.assertEqual(ResourceGovernor(max_workers=8).get_num_of_workers(), 1)
+
+    def test_if_memory_is_not_taken_into_account_when_unknown(self):
+        self.available_memory = None
+        self.assertEqual(ResourceGovernor(max_workers=8).get_num_of_workers(), 8)
+
+    def test_if_worker_limit_is_lowered_once_the_workers_are_seen_taking_more_memory(self):
+        governor = ResourceGovernor(max_workers=8, min_free_memory=0, max_load=8.0)
+        self.available_memory = 4 * 1024 * MB
+        self.process_memory = {1 : 1024 * MB, 2 : 512 * MB}
+        # 2 busy workers, one of which may still grow by 512 MB, out of 4 GB leaves room for 3 more 1 GB ones
+        self.assertEqual(governor.get_worker_limit([1, 2]), 5)
+        self.assertEqual(governor.worker_memory, 1024 * MB)
+
+    def test_if_worker_limit_is_lowered_by_the_load_of_the_other_work(self):
+        governor = ResourceGovernor(max_workers=self.num_of_cores * 4, max_load=2.0)
+        self.runnable_tasks = 1 + 2
+        self.assertEqual(governor.get_worker_limit([10, 11]), self.num_of_cores * 2)
+        self.runnable_tasks = 1 + 2 + 4
+        self.assertEqual(governor.get_worker_limit([10, 11]), max(1, self.num_of_cores * 2 - 2))
+        self.assertEqual(governor.get_worker_limit([10, 11]), max(1, self.num_of_cores * 2 - 3))
+
+    def test_if_worker_limit_is_at_least_one_no_matter_how_short_on_resources(self):
+        self.available_memory, self.runnable_tasks = 0, 1000
+        self.assertEqual(ResourceGovernor().get_worker_limit([]), 1)
+
+    def test_if_no_work_is_handed_over_while_interactive_request_is_in_progress(self):
+        governor = ResourceGovernor()
+        with governor.interactive_request():
+            self.assertTrue(governor.is_paused())
+            self.assertEqual(governor.get_worker_limit([]), 0)
+        self.assertFalse(governor.is_paused())
+        self.assertGreater(governor.get_worker_limit([]), 0)
+
+    def test_if_work_is_handed_over_while_interactive_request_is_in_progress_when_not_paused_on_interactive(self):
+        governor = ResourceGovernor(pause_on_interactive=False)
+        with governor.interactive_request():
+            self.assertFalse(governor.is_paused())
+
+    def test_if_interactive_request_is_finished_on_exception(self):
+        governor = ResourceGovernor()
+        with self.assertRaises(ValueError):
+            with governor.interactive_request():
+                raise ValueError()
+        self.assertFalse(governor.is_paused())
+
+    def test_if_no_work_is_handed_over_while_interactive_request_shared_with_the_other_service_is_in_progress(self):
+        interactive_requests = new_interactive_request_counter()
+        governor = ResourceGovernor(interactive_requests=interactive_requests)
+        with InteractiveRequest(interactive_requests):
+            self.assertTrue(governor.is_paused())
+        self.assertFalse(governor.is_paused())
+
+    def test_if_no_work_is_handed_over_while_interactive_request_is_in_progress_in_the_other_process(self):
+        interactive_requests = new_interactive_request_counter()
+        governor = ResourceGovernor(interactive_requests=interactive_requests)
+        started, finish = multiprocessing.Event(), multiprocessing.Event()
+        process = multiprocessing.Process(target=serve_interactive_request, args=(interactive_requests, started, finish))
+        process.start()
+        self.assertTrue(started.wait(10))
+        self.assertTrue(governor.is_paused())
+        finish.set()
+        process.join()
+        self.assertFalse(governor.is_paused())
+
+    def test_if_interactive_request_is_not_counted_in_when_there_is_no_counter(self):
+        with InteractiveRequest(None):
+            pass
+
+def serve_interactive_request(interactive_requests, started, finish):
+    with InteractiveRequest(interactive_requests):
+        started.set()
+        finish.wait(10)
+
+class ProcessResourcesTest(unittest.TestCase):
+    def test_if_available_memory_is_read(self):
+        self.assertGreater(resource_governor.get_available_memory(), 0)
+
+    def test_if_process_memory_is_read(self):
+        self.assertGreater(resource_governor.get_process_memory(os.getpid()), 0)
+
+    def test_if_process_memory_is_none_for_non_existing_process(self):
+        self.assertIsNone(resource_governor.get_process_memory(2**31 - 1))
+
+    def test_if_runnable_tasks_include_the_calling_one(self):
+        self.assertGreaterEqual(resource_governor.get_runnable_tasks(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
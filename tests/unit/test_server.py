@@ -214,5 +214,51 @@ class ServiceHandlerTest(unittest.TestCase):
                 self.service_handler.request(self.payload)
         mock_send_request.assert_called_once_with(self.payload)
 
+class HostedServiceHandlerTest(unittest.TestCase):
+    def setUp(self):
+        import service
+        self.payload = [0x1, 0x2, 0x3]
+        self.host_handler = server.Server.ServiceHostHandler(service.ServiceHost())
+        self.service_handler_1 = server.Server.HostedServiceHandler(cxxd_mocks.ServiceMock(), self.host_handler)
+        self.service_handler_2 = server.Server.HostedServiceHandler(cxxd_mocks.ServiceMock(), self.host_handler)
+
+    def test_if_hosted_service_handler_instance_does_not_implicitly_start_service_host_main_loop(self):
+        self.assertEqual(self.service_handler_1.is_started(), False)
+        self.assertEqual(self.host_handler.is_started(), False)
+
+    def test_if_start_listening_starts_service_host_main_loop_only_once(self):
+        with mock.patch('multiprocessing.Process.start') as mock_start_service_host_main_loop:
+            self.service_handler_1.start_listening()
+            self.service_handler_2.start_listening()
+        mock_start_service_host_main_loop.assert_called_once()
+        self.assertEqual(self.service_handler_1.is_started(), True)
+        self.assertEqual(self.service_handler_2.is_started(), True)
+
+    def test_if_stop_listening_stops_service_host_main_loop_only_once_all_hosted_services_are_stopped(self):
+        with mock.patch('multiprocessing.Process.start') as mock_start_service_host_main_loop:
+            self.service_handler_1.start_listening()
+            self.service_handler_2.start_listening()
+        with mock.patch('multiprocessing.Process.join') as mock_stop_service_host_main_loop:
+            self.service_handler_1.stop_listening()
+            mock_stop_service_host_main_loop.assert_not_called()
+            self.service_handler_2.stop_listening()
+        mock_stop_service_host_main_loop.assert_called_once()
+        self.assertEqual(self.host_handler.is_started(), False)
+
+    def test_if_stop_listening_does_not_stop_service_host_if_hosted_service_is_already_stopped(self):
+        with mock.patch('multiprocessing.Process.start') as mock_start_service_host_main_loop:
+            self.service_handler_1.start_listening()
+        with mock.patch('multiprocessing.Process.join') as mock_stop_service_host_main_loop:
+            self.service_handler_2.stop_listening()
+        mock_stop_service_host_main_loop.assert_not_called()
+        self.assertEqual(self.host_handler.is_started(), True)
+
+    def test_if_request_sends_request_if_hosted_service_is_started(self):
+        with mock.patch('multiprocessing.Process.start') as mock_start_service_host_main_loop:
+            self.service_handler_1.start_listening()
+        with mock.patch.object(self.service_handler_1.service, 'send_request') as mock_send_request:
+            self.service_handler_1.request(self.payload)
+        mock_send_request.assert_called_once_with(self.payload)
+
 if __name__ == '__main__':
     unittest.main()
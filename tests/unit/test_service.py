@@ -232,5 +232,68 @@ class ServiceTest(unittest.TestCase):
         self.service.process_request()
         self.assertEqual(self.service.is_started_up(), True)
 
+class ServiceHostTest(unittest.TestCase):
+    def setUp(self):
+        from . import cxxd_mocks
+        import service
+        self.payload = [0x1, 0x2, 0x3]
+        self.service_host = service.ServiceHost()
+        self.service_1 = service.Service(cxxd_mocks.ServicePluginMock())
+        self.service_2 = service.Service(cxxd_mocks.ServicePluginMock())
+        for service_id, hosted_service in [(0x1, self.service_1), (0x2, self.service_2)]:
+            hosted_service.startup_callback = mock.Mock(return_value=(True, []))
+            hosted_service.shutdown_callback = mock.Mock(return_value=(True, []))
+            self.service_host.host(service_id, hosted_service)
+
+    def test_if_hosted_service_requests_are_enqueued_to_the_host_queue_tagged_with_service_id(self):
+        with mock.patch.object(self.service_host.queue, 'put') as mock_queue_put:
+            self.service_2.send_request(self.payload)
+        mock_queue_put.assert_called_once_with([0x2, [0x2, self.payload]])
+
+    def test_if_request_is_dispatched_to_the_service_it_is_sent_to(self):
+        self.service_2.send_startup_request(self.payload)
+        self.service_host.process_request()
+        self.assertEqual(self.service_1.is_started_up(), False)
+        self.assertEqual(self.service_2.is_started_up(), True)
+
+    def test_if_host_keeps_on_listening_while_any_of_the_services_is_started(self):
+        self.service_1.send_startup_request(self.payload)
+        self.assertEqual(self.service_host.process_request(), True)
+        self.service_2.send_startup_request(self.payload)
+        self.assertEqual(self.service_host.process_request(), True)
+        self.service_1.send_shutdown_request(self.payload)
+        self.assertEqual(self.service_host.process_request(), True)
+        self.service_2.send_shutdown_request(self.payload)
+        self.assertEqual(self.service_host.process_request(), False)
+
+    def test_if_requests_to_priority_service_are_served_ahead_of_the_ones_waiting(self):
+        import queue
+        import service
+        from . import cxxd_mocks
+        self.service_host = service.ServiceHost()
+        self.service_host.queue = queue.Queue() # Takes no time for the request to be seen in the queue
+        self.service_3 = service.Service(cxxd_mocks.ServicePluginMock())
+        self.service_3.startup_callback = mock.Mock(return_value=(True, []))
+        self.service_host.host(0x1, self.service_1)
+        self.service_host.host(0x3, self.service_3, priority=True)
+        self.service_1.send_startup_request(self.payload)
+        self.service_3.send_startup_request(self.payload)
+        self.service_host.process_request()
+        self.assertEqual(self.service_1.is_started_up(), False)
+        self.assertEqual(self.service_3.is_started_up(), True)
+        self.service_host.process_request()
+        self.assertEqual(self.service_1.is_started_up(), True)
+
+    def test_if_requests_to_the_same_service_are_served_in_order(self):
+        import queue
+        self.service_host.queue = queue.Queue()
+        self.service_host.host(0x2, self.service_2, priority=True)
+        self.service_2.send_startup_request(self.payload)
+        self.service_2.send_shutdown_request(self.payload)
+        self.service_host.process_request()
+        self.assertEqual(self.service_2.is_started_up(), True)
+        self.service_host.process_request()
+        self.assertEqual(self.service_2.is_started_up(), False)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from services.source_code_model.indexer.source_context import get_line_offsets, encode_line_offsets, decode_line_offsets, read_source_lines
+
+class SourceContextTest(unittest.TestCase):
+    def setUp(self):
+        self.file_handle, self.filename = tempfile.mkstemp(suffix='.cpp')
+        self.write(b'#include <vector>\nint foo();\r\n\nint main() {\n    return foo();\n}')
+
+    def tearDown(self):
+        os.close(self.file_handle)
+        os.remove(self.filename)
+
+    def write(self, content):
+        with open(self.filename, 'wb') as f:
+            f.write(content)
+        self.content = content
+
+    def test_if_line_offsets_point_to_the_beginning_of_each_line_but_the_first_one(self):
+        self.assertEqual(list(get_line_offsets(self.content)), [18, 30, 31, 44, 62])
+
+    def test_if_line_offsets_are_decoded_back_the_same(self):
+        line_offsets = get_line_offsets(self.content * 1000)
+        self.assertEqual(decode_line_offsets(encode_line_offsets(line_offsets)), line_offsets)
+
+    def test_if_line_offsets_of_empty_file_are_decoded_back_the_same(self):
+        self.assertEqual(list(decode_line_offsets(encode_line_offsets(get_line_offsets(b'')))), [])
+
+    def test_if_source_lines_are_read_by_their_number(self):
+        self.assertEqual(read_source_lines(self.filename, [5, 1, 2]), {
+            1 : '#include <vector>\n',
+            2 : 'int foo();\n',
+            5 : '    return foo();\n',
+        })
+
+    def test_if_source_lines_read_through_line_offsets_are_the_same(self):
+        lines = range(0, 10)
+        self.assertEqual(read_source_lines(self.filename, lines, get_line_offsets(self.content)), read_source_lines(self.filename, lines))
+
+    def test_if_last_line_is_read_without_the_line_ending(self):
+        self.assertEqual(read_source_lines(self.filename, [6]), {6 : '}'})
+        self.assertEqual(read_source_lines(self.filename, [6], get_line_offsets(self.content)), {6 : '}'})
+
+    def test_if_lines_beyond_the_end_of_file_are_left_out(self):
+        self.write(self.content + b'\n')
+        self.assertEqual(read_source_lines(self.filename, [3, 7, 8]), {3 : '\n'})
+        self.assertEqual(read_source_lines(self.filename, [3, 7, 8], get_line_offsets(self.content)), {3 : '\n'})
+
+    def test_if_no_lines_are_read_from_empty_file(self):
+        self.write(b'')
+        self.assertEqual(read_source_lines(self.filename, [1]), {})
+
+    def test_if_no_lines_are_read_from_missing_file(self):
+        self.assertEqual(read_source_lines(self.filename + '.missing', [1]), {})
+
+if __name__ == '__main__':
+    unittest.main()
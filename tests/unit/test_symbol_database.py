@@ -1 +1,787 @@
-# TODO placeholder to not to forget to write unit tests
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from services.source_code_model.indexer.symbol_database import SymbolDatabase, ShardedSymbolDatabase, DiagnosticsSortingStrategyId, SymbolReferenceRole, get_shard_index, get_shard_filename
+
+class SymbolDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.symbol_db_handle, self.symbol_db_filename = tempfile.mkstemp(suffix='.db')
+        self.symbol_db = SymbolDatabase(self.symbol_db_filename)
+        self.symbol_db.create_data_model()
+
+    def tearDown(self):
+        self.symbol_db.close()
+        os.close(self.symbol_db_handle)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.symbol_db_filename + suffix):
+                os.remove(self.symbol_db_filename + suffix)
+
+    def test_if_file_entry_is_inserted(self):
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        rows = self.symbol_db.fetch_all_files()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(self.symbol_db.get_file_filename(rows[0]), 'src/main.cpp')
+        self.assertEqual(self.symbol_db.get_file_mtime(rows[0]), 1.5)
+        self.assertEqual(self.symbol_db.get_file_size(rows[0]), 100)
+        self.assertEqual(self.symbol_db.get_file_hash(rows[0]), 'content_hash')
+        self.assertEqual(self.symbol_db.get_file_compiler_args_hash(rows[0]), 'compiler_args_hash')
+
+    def test_if_file_entry_is_inserted_with_indexing_cost(self):
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash', 0.25, 42)
+        rows = self.symbol_db.fetch_all_files()
+        self.assertEqual(self.symbol_db.get_file_duration(rows[0]), 0.25)
+        self.assertEqual(self.symbol_db.get_file_symbol_count(rows[0]), 42)
+
+    def test_if_file_entry_is_inserted_without_indexing_cost(self):
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        rows = self.symbol_db.fetch_all_files()
+        self.assertIsNone(self.symbol_db.get_file_duration(rows[0]))
+        self.assertIsNone(self.symbol_db.get_file_symbol_count(rows[0]))
+
+    def test_if_file_entry_is_replaced_when_inserted_again(self):
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.symbol_db.insert_file_entry('src/main.cpp', 2.5, 200, 'new_content_hash', 'compiler_args_hash')
+        rows = self.symbol_db.fetch_all_files()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(self.symbol_db.get_file_mtime(rows[0]), 2.5)
+        self.assertEqual(self.symbol_db.get_file_hash(rows[0]), 'new_content_hash')
+
+    def test_if_delete_entry_removes_symbols_diagnostics_and_file_entry(self):
+        self.symbol_db.insert_symbol_entry('src/main.cpp', 1, 5, 'c:@F@main#', 'int main() {}', 8, True)
+        diagnostics_id = self.symbol_db.insert_diagnostics_entry('src/main.cpp', 1, 1, 'some error', 3)
+        self.symbol_db.insert_diagnostics_details_entry(diagnostics_id, 'src/main.cpp', 1, 1, 'some note', 1)
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.symbol_db.insert_file_entry('src/foo.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.symbol_db.delete_entry('src/main.cpp')
+        self.assertEqual(len(self.symbol_db.fetch_all_symbols()), 0)
+        self.assertEqual(len(self.symbol_db.fetch_all_diagnostics(0)), 0)
+        self.assertEqual(len(self.symbol_db.fetch_all_diagnostics_details()), 0)
+        self.assertEqual([self.symbol_db.get_file_filename(row) for row in self.symbol_db.fetch_all_files()], ['src/foo.cpp'])
+
+    def test_if_line_offsets_are_fetched_together_with_the_file_fingerprint(self):
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash', 0.25, 42, b'offsets')
+        self.symbol_db.insert_file_entry('src/foo.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        rows = self.symbol_db.fetch_line_offsets(['src/main.cpp', 'src/foo.cpp', 'src/bar.cpp'])
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(self.symbol_db.get_file_filename(rows[0]), 'src/main.cpp')
+        self.assertEqual(self.symbol_db.get_file_mtime(rows[0]), 1.5)
+        self.assertEqual(self.symbol_db.get_file_size(rows[0]), 100)
+        self.assertEqual(self.symbol_db.get_file_line_offsets(rows[0]), b'offsets')
+
+    def test_if_line_offsets_are_kept_when_file_entry_is_inserted_without_them(self):
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash', 0.25, 42, b'offsets')
+        self.symbol_db.insert_file_entry('src/main.cpp', 2.5, 100, 'content_hash', 'compiler_args_hash', 0.25, 42)
+        rows = self.symbol_db.fetch_line_offsets(['src/main.cpp'])
+        self.assertEqual(self.symbol_db.get_file_mtime(rows[0]), 2.5)
+        self.assertEqual(self.symbol_db.get_file_line_offsets(rows[0]), b'offsets')
+
+    def test_if_line_offsets_are_deleted_together_with_the_file_entry(self):
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash', 0.25, 42, b'offsets')
+        self.symbol_db.insert_file_entry('src/foo.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash', 0.25, 42, b'offsets')
+        self.symbol_db.delete_entry('src/main.cpp')
+        self.assertEqual([self.symbol_db.get_file_filename(row) for row in self.symbol_db.fetch_line_offsets(['src/main.cpp', 'src/foo.cpp'])], ['src/foo.cpp'])
+        self.symbol_db.delete_all_entries()
+        self.assertEqual(self.symbol_db.db_connection.cursor().execute('SELECT COUNT(*) FROM file_line_offsets').fetchone()[0], 0)
+
+    def test_if_delete_all_entries_removes_file_entries(self):
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.symbol_db.delete_all_entries()
+        self.assertEqual(len(self.symbol_db.fetch_all_files()), 0)
+
+    def test_if_delete_all_entries_removes_metadata_entries(self):
+        self.symbol_db.insert_metadata_entry('git_commit', 'abc')
+        self.symbol_db.delete_all_entries()
+        self.assertIsNone(self.symbol_db.fetch_metadata('git_commit'))
+
+    def test_if_copy_into_creates_a_copy_of_the_database(self):
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.symbol_db.insert_metadata_entry('git_commit', 'abc')
+        copy_db_filename = self.symbol_db_filename + '.copy'
+        self.assertTrue(self.symbol_db.copy_into(copy_db_filename))
+        copy_db = SymbolDatabase(copy_db_filename)
+        self.assertEqual(copy_db.fetch_all_files(), self.symbol_db.fetch_all_files())
+        self.assertEqual(copy_db.fetch_metadata('git_commit'), 'abc')
+        copy_db.close()
+        os.remove(copy_db_filename)
+
+    def test_if_metadata_entry_is_inserted_and_replaced(self):
+        self.assertIsNone(self.symbol_db.fetch_metadata('git_commit'))
+        self.symbol_db.insert_metadata_entry('git_commit', 'abc')
+        self.assertEqual(self.symbol_db.fetch_metadata('git_commit'), 'abc')
+        self.symbol_db.insert_metadata_entry('git_commit', 'def')
+        self.assertEqual(self.symbol_db.fetch_metadata('git_commit'), 'def')
+
+    def test_if_metadata_entry_is_deleted(self):
+        self.symbol_db.insert_metadata_entry('git_commit', 'abc')
+        self.symbol_db.delete_metadata_entry('git_commit')
+        self.assertIsNone(self.symbol_db.fetch_metadata('git_commit'))
+
+    def test_if_quarantine_entry_is_inserted_and_replaced(self):
+        self.symbol_db.insert_quarantine_entry('src/main.cpp', 'content_hash', 'compiler_args_hash', 'crashed')
+        self.symbol_db.insert_quarantine_entry('src/main.cpp', 'new_content_hash', 'compiler_args_hash', 'timed out')
+        rows = self.symbol_db.fetch_all_quarantined_files()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(self.symbol_db.get_quarantine_filename(rows[0]), 'src/main.cpp')
+        self.assertEqual(self.symbol_db.get_quarantine_hash(rows[0]), 'new_content_hash')
+        self.assertEqual(self.symbol_db.get_quarantine_compiler_args_hash(rows[0]), 'compiler_args_hash')
+        self.assertEqual(self.symbol_db.get_quarantine_reason(rows[0]), 'timed out')
+
+    def test_if_quarantine_entry_is_deleted(self):
+        self.symbol_db.insert_quarantine_entry('src/main.cpp', 'content_hash', 'compiler_args_hash', 'crashed')
+        self.symbol_db.insert_quarantine_entry('src/foo.cpp', 'content_hash', 'compiler_args_hash', 'crashed')
+        self.symbol_db.delete_quarantine_entry('src/main.cpp')
+        self.assertEqual([self.symbol_db.get_quarantine_filename(row) for row in self.symbol_db.fetch_all_quarantined_files()], ['src/foo.cpp'])
+        self.symbol_db.delete_all_entries()
+        self.assertEqual(self.symbol_db.fetch_all_quarantined_files(), [])
+
+    def test_if_copy_all_entries_from_copies_file_entries(self):
+        other_db_handle, other_db_filename = tempfile.mkstemp(suffix='.db')
+        other_db = SymbolDatabase(other_db_filename)
+        other_db.create_data_model()
+        other_db.insert_file_entry('src/foo.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        other_db.flush()
+        other_db.close()
+        self.symbol_db.copy_all_entries_from([other_db_filename])
+        os.close(other_db_handle)
+        os.remove(other_db_filename)
+        rows = self.symbol_db.fetch_all_files()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(self.symbol_db.get_file_filename(rows[0]), 'src/foo.cpp')
+
+    def test_if_copy_all_entries_from_copies_line_offsets(self):
+        other_db_handle, other_db_filename = tempfile.mkstemp(suffix='.db')
+        other_db = SymbolDatabase(other_db_filename)
+        other_db.create_data_model()
+        other_db.insert_file_entry('src/foo.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash', 0.25, 42, b'offsets')
+        other_db.flush()
+        other_db.close()
+        self.symbol_db.copy_all_entries_from([other_db_filename])
+        os.close(other_db_handle)
+        os.remove(other_db_filename)
+        rows = self.symbol_db.fetch_line_offsets(['src/foo.cpp'])
+        self.assertEqual([self.symbol_db.get_file_line_offsets(row) for row in rows], [b'offsets'])
+
+    def test_if_copy_all_entries_from_remaps_diagnostics_details_to_merged_diagnostics(self):
+        other_db_list = []
+        for filename in ['src/foo.cpp', 'src/bar.cpp']:
+            other_db_handle, other_db_filename = tempfile.mkstemp(suffix='.db')
+            os.close(other_db_handle)
+            other_db = SymbolDatabase(other_db_filename)
+            other_db.create_data_model()
+            other_db.insert_symbol_entry(filename, 1, 5, 'c:@F@fun_' + filename, 'void fun();', 8, False)
+            diagnostics_id = other_db.insert_diagnostics_entry(filename, 1, 1, 'some error', 3) # both get the same id
+            other_db.insert_diagnostics_details_entry(diagnostics_id, filename, 2, 1, 'some note', 1)
+            other_db.flush()
+            other_db.close()
+            other_db_list.append(other_db_filename)
+        self.symbol_db.copy_all_entries_from(other_db_list, rebuild_indexes=True)
+        for other_db_filename in other_db_list:
+            os.remove(other_db_filename)
+        self.assertEqual(len(self.symbol_db.fetch_all_symbols()), 2)
+        diagnostics = self.symbol_db.fetch_all_diagnostics(0)
+        self.assertEqual(len(diagnostics), 2)
+        for diag in diagnostics:
+            details = self.symbol_db.fetch_diagnostics_details(self.symbol_db.get_diagnostics_id(diag))
+            self.assertEqual(len(details), 1)
+            self.assertEqual(self.symbol_db.get_diagnostics_details_filename(details[0]), self.symbol_db.get_diagnostics_filename(diag))
+
+    def test_if_copy_all_entries_from_rebuilds_the_indexes(self):
+        self.symbol_db.copy_all_entries_from([], rebuild_indexes=True)
+        indexes = self.symbol_db.db_connection.cursor().execute('SELECT name FROM sqlite_master WHERE type=\'index\'').fetchall()
+        self.assertIn(('idx_symbol_definitions',), indexes)
+        self.assertIn(('idx_symbol_usr',), indexes)
+
+    def test_if_symbols_are_looked_up_by_usr_through_the_index(self):
+        for query in ['SELECT * FROM symbol_view WHERE usr=?', 'SELECT * FROM symbol_view WHERE usr=? AND is_definition=1']:
+            plan = self.symbol_db.db_connection.cursor().execute('EXPLAIN QUERY PLAN ' + query, ('c:@F@main#',)).fetchall()
+            self.assertIn('USING INDEX idx_symbol_usr', ' '.join(str(row[-1]) for row in plan))
+
+    def test_if_symbols_are_fetched_by_usr(self):
+        self.symbol_db.insert_symbol_entry('src/main.cpp', 1, 5, 'c:@F@main#', 'int main() {}', 8, True)
+        self.symbol_db.insert_symbol_entry('src/foo.cpp', 3, 5, 'c:@F@main#', 'int main();', 8, False)
+        self.symbol_db.insert_symbol_entry('src/foo.cpp', 4, 5, 'c:@F@foo#', 'int foo();', 8, False)
+        self.assertEqual(len(self.symbol_db.fetch_symbols_by_usr('c:@F@main#')), 2)
+        definition = self.symbol_db.fetch_symbol_definition_by_usr('c:@F@main#')
+        self.assertEqual(len(definition), 1)
+        self.assertEqual(self.symbol_db.get_symbol_filename(definition[0]), 'src/main.cpp')
+
+    def test_if_symbol_entry_is_read_back_in_the_same_shape(self):
+        self.symbol_db.insert_symbol_entry('src/main.cpp', 1, 5, 'c:@F@main#', 'int main() {}', 8, True)
+        rows = self.symbol_db.fetch_all_symbols()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(self.symbol_db.get_symbol_filename(rows[0]), 'src/main.cpp')
+        self.assertEqual(self.symbol_db.get_symbol_line(rows[0]), 1)
+        self.assertEqual(self.symbol_db.get_symbol_column(rows[0]), 5)
+        self.assertEqual(self.symbol_db.get_symbol_usr(rows[0]), 'c:@F@main#')
+        self.assertIsNone(self.symbol_db.get_symbol_context(rows[0])) # read from the file when asked for
+        self.assertEqual(self.symbol_db.get_symbol_kind(rows[0]), 8)
+        self.assertEqual(self.symbol_db.get_symbol_is_definition(rows[0]), True)
+
+    def test_if_symbol_entry_with_empty_usr_is_not_inserted(self):
+        self.symbol_db.insert_symbol_entries_batch([('src/main.cpp', 1, 5, '', 'int main() {}', 8, True)])
+        self.assertEqual(len(self.symbol_db.fetch_all_symbols()), 0)
+
+    def test_if_filenames_and_usrs_are_interned(self):
+        self.symbol_db.insert_symbol_entries_batch([
+            ('src/main.cpp', 1, 5,  'c:@F@foo#', 'foo(); foo();', 8, False),
+            ('src/main.cpp', 1, 12, 'c:@F@bar#', 'foo(); foo();', 8, False),
+            ('src/main.cpp', 2, 1,  'c:@F@foo#', 'foo();', 8, False),
+        ])
+        cursor = self.symbol_db.db_connection.cursor()
+        self.assertEqual(cursor.execute('SELECT COUNT(*) FROM symbol_filename').fetchone()[0], 1)
+        self.assertEqual(cursor.execute('SELECT COUNT(*) FROM symbol_usr').fetchone()[0], 2)
+        self.assertEqual(len(self.symbol_db.fetch_all_symbols()), 3)
+
+    def test_if_orphaned_filenames_and_usrs_are_deleted(self):
+        self.symbol_db.insert_symbol_entry('src/main.cpp', 1, 5, 'c:@F@main#', 'int main() {}', 8, True)
+        self.symbol_db.insert_symbol_entry('src/foo.cpp', 1, 5, 'c:@F@foo#', 'int foo() {}', 8, True)
+        self.symbol_db.delete_entry('src/main.cpp')
+        self.symbol_db.delete_orphaned_entries()
+        cursor = self.symbol_db.db_connection.cursor()
+        self.assertEqual(cursor.execute('SELECT filename FROM symbol_filename').fetchall(), [('src/foo.cpp',)])
+        self.assertEqual(cursor.execute('SELECT usr FROM symbol_usr').fetchall(), [('c:@F@foo#',)])
+
+    def insert_symbol_with_name(self, symbol_db, filename, line, usr, name, qualified_name, is_definition=True):
+        symbol_db.insert_symbol_entries_batch([(filename, line, 5, usr, 'context', 8, is_definition)])
+        symbol_db.insert_symbol_names_batch([(filename, line, usr, name, qualified_name)])
+
+    def test_if_symbols_are_found_by_name_and_ranked_by_how_well_they_match(self):
+        for line, name in enumerate(['get_file_name', 'file_name', 'FileName', 'profile', 'unrelated']):
+            self.insert_symbol_with_name(self.symbol_db, 'src/main.cpp', line + 1, 'c:@F@' + name, name, name)
+        symbols = self.symbol_db.fetch_symbols_by_name('file_name', 10)
+        self.assertEqual([self.symbol_db.get_symbol_name(row) for row in symbols], ['file_name', 'get_file_name', 'FileName'])
+        self.assertEqual(self.symbol_db.get_symbol_usr(symbols[0]), 'c:@F@file_name')
+        self.assertEqual(self.symbol_db.get_symbol_line(symbols[0]), 2)
+        self.assertEqual(self.symbol_db.get_symbol_kind(symbols[0]), 8)
+
+    def test_if_symbols_are_found_by_name_with_typos(self):
+        self.insert_symbol_with_name(self.symbol_db, 'src/main.cpp', 1, 'c:@F@get_file_name', 'get_file_name', 'get_file_name')
+        symbols = self.symbol_db.fetch_symbols_by_name('get_flie_name', 10)
+        self.assertEqual([self.symbol_db.get_symbol_name(row) for row in symbols], ['get_file_name'])
+
+    def test_if_symbols_are_found_by_the_prefix_shorter_than_trigram(self):
+        for line, name in enumerate(['file_name', 'FileName', 'profile']):
+            self.insert_symbol_with_name(self.symbol_db, 'src/main.cpp', line + 1, 'c:@F@' + name, name, name)
+        symbols = self.symbol_db.fetch_symbols_by_name('fi', 10)
+        self.assertEqual([self.symbol_db.get_symbol_name(row) for row in symbols], ['FileName', 'file_name'])
+
+    def test_if_symbols_found_by_name_are_limited(self):
+        for line in range(10):
+            self.insert_symbol_with_name(self.symbol_db, 'src/main.cpp', line + 1, 'c:@F@foo{0}'.format(line), 'foo{0}'.format(line), 'foo{0}'.format(line))
+        self.assertEqual(len(self.symbol_db.fetch_symbols_by_name('foo', 3)), 3)
+
+    def test_if_query_with_scope_is_matched_against_qualified_names(self):
+        self.insert_symbol_with_name(self.symbol_db, 'src/main.cpp', 1, 'c:@N@ns@S@Foo@F@bar#', 'bar', 'ns::Foo::bar')
+        self.insert_symbol_with_name(self.symbol_db, 'src/main.cpp', 2, 'c:@N@other@F@bar#', 'bar', 'other::bar')
+        symbols = self.symbol_db.fetch_symbols_by_name('Foo::bar', 10)
+        self.assertEqual(self.symbol_db.get_symbol_qualified_name(symbols[0]), 'ns::Foo::bar')
+        symbols = self.symbol_db.fetch_symbols_by_name('other::', 10)
+        self.assertEqual([self.symbol_db.get_symbol_qualified_name(row) for row in symbols], ['other::bar'])
+
+    def test_if_definition_is_preferred_as_location_of_symbol_found_by_name(self):
+        self.insert_symbol_with_name(self.symbol_db, 'src/foo.h', 3, 'c:@F@foo#', 'foo', 'foo', False)
+        self.insert_symbol_with_name(self.symbol_db, 'src/foo.cpp', 7, 'c:@F@foo#', 'foo', 'foo', True)
+        self.insert_symbol_with_name(self.symbol_db, 'src/foo.h', 1, 'c:@F@foo#', 'foo', 'foo', False)
+        symbols = self.symbol_db.fetch_symbols_by_name('foo', 10)
+        self.assertEqual(len(symbols), 1)
+        self.assertEqual(self.symbol_db.get_symbol_filename(symbols[0]), 'src/foo.cpp')
+        self.assertEqual(self.symbol_db.get_symbol_line(symbols[0]), 7)
+
+    def test_if_declaration_is_location_of_symbol_found_by_name_without_definition(self):
+        self.symbol_db.insert_symbol_entry('src/foo.h', 2, 5, 'c:@S@Foo@FI@member', 'int get() { return member; }', 6, False)
+        self.insert_symbol_with_name(self.symbol_db, 'src/foo.h', 10, 'c:@S@Foo@FI@member', 'member', 'Foo::member', False)
+        symbols = self.symbol_db.fetch_symbols_by_name('member', 10)
+        self.assertEqual(self.symbol_db.get_symbol_line(symbols[0]), 10)
+
+    def test_if_names_of_orphaned_usrs_are_deleted(self):
+        self.insert_symbol_with_name(self.symbol_db, 'src/main.cpp', 1, 'c:@F@foo#', 'foo', 'foo')
+        self.symbol_db.delete_entry('src/main.cpp')
+        self.symbol_db.delete_orphaned_entries()
+        self.assertEqual(self.symbol_db.fetch_symbols_by_name('foo', 10), [])
+        self.assertEqual(self.symbol_db.db_connection.cursor().execute('SELECT COUNT(*) FROM symbol_name_fts').fetchone()[0], 0)
+
+    def test_if_copy_all_entries_from_copies_symbol_names(self):
+        other_db_handle, other_db_filename = tempfile.mkstemp(suffix='.db')
+        os.close(other_db_handle)
+        other_db = SymbolDatabase(other_db_filename)
+        other_db.create_data_model()
+        self.insert_symbol_with_name(other_db, 'src/foo.cpp', 1, 'c:@N@ns@F@foo#', 'foo', 'ns::foo')
+        other_db.flush()
+        other_db.close()
+        self.symbol_db.copy_all_entries_from([other_db_filename], rebuild_indexes=True)
+        os.remove(other_db_filename)
+        symbols = self.symbol_db.fetch_symbols_by_name('foo', 10)
+        self.assertEqual([(self.symbol_db.get_symbol_filename(row), self.symbol_db.get_symbol_qualified_name(row)) for row in symbols], [('src/foo.cpp', 'ns::foo')])
+
+    def insert_call_graph(self, symbol_db):
+        symbol_db.insert_symbol_references_batch([
+            ('src/main.cpp', 3, 5, 'c:@F@foo#', 'c:@F@main#', SymbolReferenceRole.CALL),
+            ('src/main.cpp', 4, 5, 'c:@F@bar#', 'c:@F@main#', SymbolReferenceRole.CALL),
+            ('src/foo.cpp', 2, 5, 'c:@F@bar#', 'c:@F@foo#', SymbolReferenceRole.CALL),
+            ('src/foo.cpp', 3, 5, 'c:@S@Foo@FI@x', 'c:@F@foo#', SymbolReferenceRole.READ),
+        ])
+
+    def test_if_symbol_references_are_fetched_by_the_referenced_symbol(self):
+        self.insert_call_graph(self.symbol_db)
+        rows = self.symbol_db.fetch_symbol_references('c:@F@bar#', SymbolReferenceRole.CALL)
+        self.assertEqual(sorted((self.symbol_db.get_symbol_filename(row), self.symbol_db.get_symbol_line(row)) for row in rows), [('src/foo.cpp', 2), ('src/main.cpp', 4)])
+        self.assertEqual(sorted(self.symbol_db.get_symbol_reference_container_usr(row) for row in rows), ['c:@F@foo#', 'c:@F@main#'])
+        self.assertEqual([self.symbol_db.get_symbol_reference_role(row) for row in rows], [SymbolReferenceRole.CALL] * 2)
+
+    def test_if_symbol_references_are_fetched_by_the_container(self):
+        self.insert_call_graph(self.symbol_db)
+        rows = self.symbol_db.fetch_symbol_references_by_container('c:@F@foo#', SymbolReferenceRole.CALL)
+        self.assertEqual([self.symbol_db.get_symbol_usr(row) for row in rows], ['c:@F@bar#'])
+        rows = self.symbol_db.fetch_symbol_references_by_container('c:@F@foo#', SymbolReferenceRole.READ | SymbolReferenceRole.WRITE)
+        self.assertEqual([self.symbol_db.get_symbol_usr(row) for row in rows], ['c:@S@Foo@FI@x'])
+
+    def test_if_symbol_reference_roles_are_combined_when_inserted_again(self):
+        self.symbol_db.insert_symbol_references_batch([('src/foo.cpp', 3, 5, 'c:@S@Foo@FI@x', 'c:@F@foo#', SymbolReferenceRole.READ)])
+        self.symbol_db.insert_symbol_references_batch([('src/foo.cpp', 3, 5, 'c:@S@Foo@FI@x', 'c:@F@foo#', SymbolReferenceRole.WRITE)])
+        rows = self.symbol_db.fetch_symbol_references('c:@S@Foo@FI@x', SymbolReferenceRole.WRITE)
+        self.assertEqual([self.symbol_db.get_symbol_reference_role(row) for row in rows], [SymbolReferenceRole.READ | SymbolReferenceRole.WRITE])
+
+    def test_if_symbol_references_are_looked_up_through_the_indexes(self):
+        for column, index in (('usr_id', 'idx_symbol_reference_usr'), ('container_usr_id', 'idx_symbol_reference_container')):
+            plan = self.symbol_db.db_connection.cursor().execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM symbol_reference WHERE {0} = ? AND role & ? != 0'.format(column), (1, 1,)
+            ).fetchall()
+            self.assertIn(index, ' '.join(str(row[-1]) for row in plan))
+
+    def test_if_delete_entry_removes_symbol_references(self):
+        self.insert_call_graph(self.symbol_db)
+        self.symbol_db.delete_entry('src/main.cpp')
+        self.assertEqual(self.symbol_db.fetch_symbol_references_by_container('c:@F@main#', SymbolReferenceRole.CALL), [])
+        self.assertEqual(len(self.symbol_db.fetch_symbol_references('c:@F@bar#', SymbolReferenceRole.CALL)), 1)
+
+    def test_if_usrs_of_symbol_references_are_not_deleted_as_orphaned(self):
+        self.insert_call_graph(self.symbol_db)
+        self.symbol_db.delete_orphaned_entries()
+        self.assertEqual(len(self.symbol_db.fetch_symbol_references('c:@F@bar#', SymbolReferenceRole.CALL)), 2)
+        self.symbol_db.delete_entry('src/main.cpp')
+        self.symbol_db.delete_entry('src/foo.cpp')
+        self.symbol_db.delete_orphaned_entries()
+        cursor = self.symbol_db.db_connection.cursor()
+        self.assertEqual(cursor.execute('SELECT COUNT(*) FROM symbol_usr').fetchone()[0], 0)
+        self.assertEqual(cursor.execute('SELECT COUNT(*) FROM symbol_filename').fetchone()[0], 0)
+
+    def test_if_declarations_prefer_the_definition_and_fall_back_to_the_declaration_or_any_reference(self):
+        self.insert_symbol_with_name(self.symbol_db, 'src/foo.h', 1, 'c:@F@foo#', 'foo', 'foo', False)
+        self.insert_symbol_with_name(self.symbol_db, 'src/foo.cpp', 7, 'c:@F@foo#', 'foo', 'foo', True)
+        self.insert_symbol_with_name(self.symbol_db, 'src/bar.h', 2, 'c:@N@ns@F@bar#', 'bar', 'ns::bar', False)
+        self.symbol_db.insert_symbol_entry('src/main.cpp', 3, 5, 'c:@F@bar#', 'bar();', 8, False)
+        self.symbol_db.insert_symbol_entry('src/main.cpp', 4, 5, 'c:@F@printf#', 'printf("");', 8, False)
+        rows = self.symbol_db.fetch_symbol_declarations(['c:@F@foo#', 'c:@N@ns@F@bar#', 'c:@F@printf#', 'c:@F@unknown#'])
+        declarations = dict((self.symbol_db.get_symbol_usr(row), row) for row in rows)
+        self.assertEqual(sorted(declarations.keys()), ['c:@F@foo#', 'c:@F@printf#', 'c:@N@ns@F@bar#'])
+        self.assertEqual(self.symbol_db.get_symbol_filename(declarations['c:@F@foo#']), 'src/foo.cpp')
+        self.assertEqual(self.symbol_db.get_symbol_line(declarations['c:@F@foo#']), 7)
+        self.assertEqual(self.symbol_db.get_symbol_qualified_name(declarations['c:@N@ns@F@bar#']), 'ns::bar')
+        self.assertEqual(self.symbol_db.get_symbol_filename(declarations['c:@F@printf#']), 'src/main.cpp')
+        self.assertIsNone(self.symbol_db.get_symbol_name(declarations['c:@F@printf#']))
+
+    def test_if_copy_all_entries_from_copies_symbol_references(self):
+        other_db_handle, other_db_filename = tempfile.mkstemp(suffix='.db')
+        os.close(other_db_handle)
+        other_db = SymbolDatabase(other_db_filename)
+        other_db.create_data_model()
+        self.insert_call_graph(other_db)
+        other_db.flush()
+        other_db.close()
+        self.symbol_db.copy_all_entries_from([other_db_filename], rebuild_indexes=True)
+        os.remove(other_db_filename)
+        rows = self.symbol_db.fetch_symbol_references('c:@F@bar#', SymbolReferenceRole.CALL)
+        self.assertEqual(sorted(self.symbol_db.get_symbol_reference_container_usr(row) for row in rows), ['c:@F@foo#', 'c:@F@main#'])
+
+    def insert_include_graph(self, symbol_db):
+        symbol_db.insert_file_includes_batch([
+            ('src/main.cpp', 'src/main.cpp', 1, 'inc/a.h'),
+            ('src/main.cpp', 'inc/a.h', 2, 'inc/b.h'),
+            ('src/main.cpp', 'inc/b.h', 2, 'inc/a.h'), # include cycle
+            ('src/other.cpp', 'src/other.cpp', 1, 'inc/c.h'),
+            ('src/other.cpp', 'src/other.cpp', 2, 'inc/b.h'),
+            ('inc/a.h', 'inc/a.h', 2, 'inc/b.h'),
+        ])
+
+    def test_if_includers_are_fetched_by_the_included_file(self):
+        self.insert_include_graph(self.symbol_db)
+        rows = self.symbol_db.fetch_includers('inc/b.h')
+        self.assertEqual([(self.symbol_db.get_include_filename(row), self.symbol_db.get_include_line(row)) for row in rows], [('inc/a.h', 2), ('src/other.cpp', 2)])
+        self.assertEqual(self.symbol_db.fetch_includers('src/main.cpp'), [])
+
+    def test_if_transitive_includers_are_fetched_through_the_include_cycles(self):
+        self.insert_include_graph(self.symbol_db)
+        self.assertEqual(self.symbol_db.fetch_transitive_includers(['inc/b.h']), ['inc/a.h', 'src/main.cpp', 'src/other.cpp'])
+        self.assertEqual(self.symbol_db.fetch_transitive_includers(['inc/c.h', 'src/main.cpp']), ['src/other.cpp'])
+        self.assertEqual(self.symbol_db.fetch_transitive_includers(['inc/unknown.h']), [])
+
+    def test_if_includers_are_looked_up_through_the_index(self):
+        plan = self.symbol_db.db_connection.cursor().execute(
+            'EXPLAIN QUERY PLAN SELECT filename_id FROM file_include WHERE included_filename_id = ?', (1,)
+        ).fetchall()
+        self.assertIn('idx_file_include_included', ' '.join(str(row[-1]) for row in plan))
+
+    def test_if_delete_entry_removes_the_include_graph_of_the_translation_unit(self):
+        self.insert_include_graph(self.symbol_db)
+        self.symbol_db.delete_entry('src/main.cpp')
+        self.symbol_db.delete_orphaned_entries()
+        self.assertEqual(self.symbol_db.fetch_transitive_includers(['inc/b.h']), ['inc/a.h', 'src/other.cpp'])
+        self.symbol_db.delete_entry('src/other.cpp')
+        self.symbol_db.delete_entry('inc/a.h')
+        self.symbol_db.delete_orphaned_entries()
+        self.assertEqual(self.symbol_db.db_connection.cursor().execute('SELECT COUNT(*) FROM symbol_filename').fetchone()[0], 0)
+
+    def test_if_copy_all_entries_from_copies_the_include_graph(self):
+        other_db_handle, other_db_filename = tempfile.mkstemp(suffix='.db')
+        os.close(other_db_handle)
+        other_db = SymbolDatabase(other_db_filename)
+        other_db.create_data_model()
+        self.insert_include_graph(other_db)
+        other_db.flush()
+        other_db.close()
+        self.symbol_db.copy_all_entries_from([other_db_filename], rebuild_indexes=True)
+        os.remove(other_db_filename)
+        self.assertEqual(self.symbol_db.fetch_transitive_includers(['inc/b.h']), ['inc/a.h', 'src/main.cpp', 'src/other.cpp'])
+
+    def fetch_all_pages(self, fetch_page, page_size):
+        rows, cursor = [], ''
+        while cursor is not None:
+            page, cursor = fetch_page(cursor, page_size)
+            self.assertTrue(0 < len(page) <= page_size)
+            rows.extend(page)
+        return rows
+
+    def test_if_definitions_are_fetched_page_by_page(self):
+        for filename in ['src/b.cpp', 'src/a.cpp']:
+            for line in range(1, 4):
+                self.insert_symbol_with_name(self.symbol_db, filename, line, 'c:@F@f{0}#{1}'.format(line, filename), 'f{0}'.format(line), 'f{0}'.format(line))
+            self.symbol_db.insert_symbol_entry(filename, 10, 5, 'c:@F@f1#' + filename, 'f1();', 8, False)
+        definitions = self.fetch_all_pages(lambda cursor, page_size: self.symbol_db.fetch_definitions_page(cursor, page_size), 3)
+        self.assertEqual([(self.symbol_db.get_symbol_filename(row), self.symbol_db.get_symbol_line(row)) for row in definitions], [
+            ('src/b.cpp', 1), ('src/b.cpp', 2), ('src/b.cpp', 3), ('src/a.cpp', 1), ('src/a.cpp', 2), ('src/a.cpp', 3),
+        ])
+        self.assertEqual(self.symbol_db.get_symbol_name(definitions[0]), 'f1')
+
+    def test_if_definitions_are_filtered_by_filename_prefix_kind_and_name(self):
+        self.insert_symbol_with_name(self.symbol_db, 'src/lib/foo.cpp', 1, 'c:@F@foo_bar#', 'foo_bar', 'foo_bar')
+        self.insert_symbol_with_name(self.symbol_db, 'src/lib/foo.cpp', 2, 'c:@F@baz#', 'baz', 'baz')
+        self.insert_symbol_with_name(self.symbol_db, 'src/main.cpp', 1, 'c:@F@foo_main#', 'foo_main', 'foo_main')
+        self.symbol_db.insert_symbol_entry('src/main.cpp', 3, 5, 'c:@S@Foo', 'struct Foo {};', 2, True)
+        def fetch(**filters):
+            definitions, cursor = self.symbol_db.fetch_definitions_page('', 10, **filters)
+            self.assertIsNone(cursor)
+            return sorted(self.symbol_db.get_symbol_usr(row) for row in definitions)
+        self.assertEqual(fetch(filename_prefix='src/lib/'), ['c:@F@baz#', 'c:@F@foo_bar#'])
+        self.assertEqual(fetch(kinds=[2]), ['c:@S@Foo'])
+        self.assertEqual(fetch(name='foo_'), ['c:@F@foo_bar#', 'c:@F@foo_main#'])
+        self.assertEqual(fetch(name='az'), ['c:@F@baz#'])
+        self.assertEqual(fetch(filename_prefix='src/main', name='foo', kinds=[8]), ['c:@F@foo_main#'])
+
+    def test_if_definitions_are_paged_through_the_index(self):
+        plan = self.symbol_db.db_connection.cursor().execute(
+            'EXPLAIN QUERY PLAN SELECT * FROM symbol AS sym WHERE sym.is_definition = 1 AND (sym.filename_id, sym.line, sym.usr_id) > (?, ?, ?) \
+             ORDER BY sym.filename_id, sym.line, sym.usr_id LIMIT 10', (0, 0, 0,)
+        ).fetchall()
+        self.assertIn('idx_symbol_definitions', ' '.join(str(row[-1]) for row in plan))
+        self.assertNotIn('TEMP B-TREE', ' '.join(str(row[-1]) for row in plan))
+
+    def test_if_diagnostics_are_fetched_together_with_their_details(self):
+        first = self.symbol_db.insert_diagnostics_entry('src/b.cpp', 1, 1, 'some error', 3)
+        self.symbol_db.insert_diagnostics_details_entry(first, 'src/b.h', 2, 1, 'first note', 1)
+        self.symbol_db.insert_diagnostics_details_entry(first, 'src/b.h', 3, 1, 'second note', 1)
+        self.symbol_db.insert_diagnostics_entry('src/a.cpp', 1, 1, 'some warning', 2)
+        diagnostics = self.symbol_db.fetch_all_diagnostics_with_details(DiagnosticsSortingStrategyId.BY_FILENAME)
+        self.assertEqual([(self.symbol_db.get_diagnostics_filename(diag), [self.symbol_db.get_diagnostics_details_description(detail) for detail in details]) for diag, details in diagnostics], [
+            ('src/a.cpp', []), ('src/b.cpp', ['first note', 'second note']),
+        ])
+
+    def test_if_diagnostics_are_fetched_page_by_page_with_their_details(self):
+        for i in range(5):
+            diagnostics_id = self.symbol_db.insert_diagnostics_entry('src/main.cpp', i + 1, 1, 'error {0}'.format(i), 3)
+            for j in range(i):
+                self.symbol_db.insert_diagnostics_details_entry(diagnostics_id, 'src/main.h', 10 * i + j, 1, 'note', 1)
+        diagnostics = self.fetch_all_pages(lambda cursor, page_size: self.symbol_db.fetch_diagnostics_page(cursor, page_size), 2)
+        self.assertEqual([(self.symbol_db.get_diagnostics_line(diag), len(details)) for diag, details in diagnostics], [(1, 0), (2, 1), (3, 2), (4, 3), (5, 4)])
+
+    def test_if_diagnostics_are_filtered_by_filename_prefix_severity_and_description(self):
+        self.symbol_db.insert_diagnostics_entry('src/lib/foo.cpp', 1, 1, 'unused variable', 2)
+        self.symbol_db.insert_diagnostics_entry('src/lib/foo.cpp', 2, 1, 'undeclared identifier', 3)
+        self.symbol_db.insert_diagnostics_entry('src/main.cpp', 1, 1, 'unused parameter', 2)
+        def fetch(**filters):
+            diagnostics, cursor = self.symbol_db.fetch_diagnostics_page('', 10, **filters)
+            self.assertIsNone(cursor)
+            return [self.symbol_db.get_diagnostics_description(diag) for diag, details in diagnostics]
+        self.assertEqual(fetch(filename_prefix='src/lib/'), ['unused variable', 'undeclared identifier'])
+        self.assertEqual(fetch(min_severity=3), ['undeclared identifier'])
+        self.assertEqual(fetch(description='unused'), ['unused variable', 'unused parameter'])
+        self.assertEqual(fetch(filename_prefix='src/main', description='unused'), ['unused parameter'])
+
+    def test_if_data_model_is_migrated_from_previous_schema(self):
+        old_db_handle, old_db_filename = tempfile.mkstemp(suffix='.db')
+        os.close(old_db_handle)
+        old_db = sqlite3.connect(old_db_filename)
+        old_db.execute('CREATE TABLE symbol (filename text, line integer, column integer, usr text, context text, kind integer, is_definition boolean, PRIMARY KEY(filename, usr, line))')
+        old_db.execute('CREATE INDEX idx_symbol_usr ON symbol (usr, is_definition)')
+        old_db.execute('CREATE TABLE diagnostics (id integer, filename text, line integer, column integer, description text, severity integer, PRIMARY KEY(id), UNIQUE(filename, line, column, description))')
+        old_db.execute('CREATE TABLE version (major integer, minor integer, PRIMARY KEY(major, minor))')
+        old_db.execute('INSERT INTO version VALUES (0, 5)')
+        old_db.execute('INSERT INTO symbol VALUES (\'src/main.cpp\', 1, 5, \'c:@F@main#\', \'int main() {}\', 8, 1)')
+        old_db.execute('INSERT INTO symbol VALUES (\'src/foo.cpp\', 3, 5, \'c:@F@main#\', \'int main();\', 8, 0)')
+        old_db.execute('INSERT INTO diagnostics VALUES (1, \'src/main.cpp\', 1, 1, \'some error\', 3)')
+        old_db.commit()
+        old_db.close()
+        symbol_db = SymbolDatabase(old_db_filename)
+        self.assertTrue(symbol_db.migrate_data_model())
+        self.assertEqual(symbol_db.fetch_schema_version(), (SymbolDatabase.VERSION_MAJOR, SymbolDatabase.VERSION_MINOR))
+        self.assertEqual(sorted(symbol_db.fetch_symbols_by_usr('c:@F@main#')), [
+            ('src/foo.cpp', 3, 5, 'c:@F@main#', None, 8, 0),
+            ('src/main.cpp', 1, 5, 'c:@F@main#', None, 8, 1),
+        ])
+        self.assertEqual(len(symbol_db.fetch_all_diagnostics(0)), 1)
+        symbol_db.close()
+        os.remove(old_db_filename)
+
+    def test_if_data_model_is_migrated_from_schema_without_indexing_cost(self):
+        cursor = self.symbol_db.db_connection.cursor()
+        cursor.execute('DROP TABLE files')
+        cursor.execute('CREATE TABLE files (filename text, mtime real, size integer, hash text, compiler_args_hash text, PRIMARY KEY(filename))')
+        cursor.execute('INSERT INTO files VALUES (\'src/main.cpp\', 1.5, 100, \'content_hash\', \'compiler_args_hash\')')
+        cursor.execute('UPDATE version SET major=1, minor=0')
+        self.symbol_db.insert_symbol_entry('src/main.cpp', 1, 5, 'c:@F@main#', 'int main() {}', 8, True)
+        self.assertTrue(self.symbol_db.migrate_data_model())
+        self.assertEqual(self.symbol_db.fetch_schema_version(), (SymbolDatabase.VERSION_MAJOR, SymbolDatabase.VERSION_MINOR))
+        self.assertEqual(self.symbol_db.fetch_all_files(), [('src/main.cpp', 1.5, 100, 'content_hash', None, None, None)]) # symbol names are missing
+        self.assertEqual(len(self.symbol_db.fetch_symbols_by_usr('c:@F@main#')), 1)
+
+    def test_if_data_model_is_migrated_from_schema_without_metadata(self):
+        cursor = self.symbol_db.db_connection.cursor()
+        cursor.execute('DROP TABLE metadata')
+        cursor.execute('UPDATE version SET major=1, minor=1')
+        self.assertTrue(self.symbol_db.migrate_data_model())
+        self.assertEqual(self.symbol_db.fetch_schema_version(), (SymbolDatabase.VERSION_MAJOR, SymbolDatabase.VERSION_MINOR))
+        self.symbol_db.insert_metadata_entry('git_commit', 'abc')
+        self.assertEqual(self.symbol_db.fetch_metadata('git_commit'), 'abc')
+
+    def test_if_data_model_is_migrated_from_schema_without_symbol_names(self):
+        cursor = self.symbol_db.db_connection.cursor()
+        cursor.execute('DROP TABLE symbol_name_fts')
+        cursor.execute('DROP TABLE symbol_name')
+        cursor.execute('UPDATE version SET major=1, minor=2')
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.symbol_db.insert_metadata_entry('git_commit', 'abc')
+        self.assertTrue(self.symbol_db.migrate_data_model())
+        self.assertEqual(self.symbol_db.fetch_schema_version(), (SymbolDatabase.VERSION_MAJOR, SymbolDatabase.VERSION_MINOR))
+        self.assertIsNone(self.symbol_db.get_file_compiler_args_hash(self.symbol_db.fetch_all_files()[0])) # to be indexed once again
+        self.assertIsNone(self.symbol_db.fetch_metadata('git_commit'))
+        self.insert_symbol_with_name(self.symbol_db, 'src/main.cpp', 1, 'c:@F@foo#', 'foo', 'foo')
+        self.assertEqual(len(self.symbol_db.fetch_symbols_by_name('foo', 10)), 1)
+
+    def test_if_data_model_is_migrated_from_schema_without_diagnostics_details_index(self):
+        self.symbol_db.db_connection.cursor().execute('DROP INDEX idx_diagnostics_details')
+        self.symbol_db.db_connection.cursor().execute('UPDATE version SET major=1, minor=3')
+        self.assertTrue(self.symbol_db.migrate_data_model())
+        indexes = self.symbol_db.db_connection.cursor().execute('SELECT name FROM sqlite_master WHERE type=\'index\'').fetchall()
+        self.assertIn(('idx_diagnostics_details',), indexes)
+
+    def test_if_data_model_is_migrated_from_schema_without_symbol_references(self):
+        cursor = self.symbol_db.db_connection.cursor()
+        cursor.execute('DROP TABLE symbol_reference')
+        cursor.execute('UPDATE version SET major=1, minor=4')
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.assertTrue(self.symbol_db.migrate_data_model())
+        self.assertEqual(self.symbol_db.fetch_schema_version(), (SymbolDatabase.VERSION_MAJOR, SymbolDatabase.VERSION_MINOR))
+        self.assertIsNone(self.symbol_db.get_file_compiler_args_hash(self.symbol_db.fetch_all_files()[0])) # to be indexed once again
+        self.insert_call_graph(self.symbol_db)
+        self.assertEqual(len(self.symbol_db.fetch_symbol_references('c:@F@bar#', SymbolReferenceRole.CALL)), 2)
+
+    def test_if_data_model_is_migrated_from_schema_without_include_graph(self):
+        cursor = self.symbol_db.db_connection.cursor()
+        cursor.execute('DROP TABLE file_include')
+        cursor.execute('UPDATE version SET major=1, minor=5')
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.assertTrue(self.symbol_db.migrate_data_model())
+        self.assertEqual(self.symbol_db.fetch_schema_version(), (SymbolDatabase.VERSION_MAJOR, SymbolDatabase.VERSION_MINOR))
+        self.assertIsNone(self.symbol_db.get_file_compiler_args_hash(self.symbol_db.fetch_all_files()[0])) # to be indexed once again
+        self.insert_include_graph(self.symbol_db)
+        self.assertEqual(self.symbol_db.fetch_transitive_includers(['inc/a.h']), ['inc/b.h', 'src/main.cpp', 'src/other.cpp'])
+
+    def test_if_data_model_is_migrated_from_schema_with_symbol_contexts(self):
+        cursor = self.symbol_db.db_connection.cursor()
+        self.symbol_db.insert_symbol_entry('src/main.cpp', 1, 5, 'c:@F@main#', 'int main() {}', 8, True)
+        cursor.execute('DROP TABLE file_line_offsets')
+        cursor.execute('DROP VIEW symbol_view')
+        cursor.execute('CREATE TABLE symbol_context (filename_id integer, line integer, context text, PRIMARY KEY(filename_id, line)) WITHOUT ROWID')
+        cursor.execute('INSERT INTO symbol_context VALUES (1, 1, \'int main() {}\')')
+        cursor.execute(
+            'CREATE VIEW symbol_view AS SELECT file.filename, sym.line, sym.column, usr.usr, ctx.context, sym.kind, sym.is_definition \
+             FROM symbol AS sym JOIN symbol_filename AS file ON file.id = sym.filename_id JOIN symbol_usr AS usr ON usr.id = sym.usr_id \
+             LEFT JOIN symbol_context AS ctx ON ctx.filename_id = sym.filename_id AND ctx.line = sym.line'
+        )
+        cursor.execute('UPDATE version SET major=1, minor=6')
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.assertTrue(self.symbol_db.migrate_data_model())
+        self.assertEqual(self.symbol_db.fetch_schema_version(), (SymbolDatabase.VERSION_MAJOR, SymbolDatabase.VERSION_MINOR))
+        self.assertEqual(self.symbol_db.get_file_compiler_args_hash(self.symbol_db.fetch_all_files()[0]), 'compiler_args_hash') # no need to be indexed once again
+        self.assertEqual(cursor.execute('SELECT COUNT(*) FROM sqlite_master WHERE name=\'symbol_context\'').fetchone()[0], 0)
+        self.assertEqual(self.symbol_db.fetch_all_symbols(), [('src/main.cpp', 1, 5, 'c:@F@main#', None, 8, 1)])
+        self.symbol_db.insert_symbol_entry('src/main.cpp', 2, 5, 'c:@F@foo#', 'int foo() {}', 8, True)
+        self.assertEqual(len(self.symbol_db.fetch_all_symbols()), 2)
+        self.assertEqual(self.symbol_db.fetch_line_offsets(['src/main.cpp']), []) # recorded the next time file is indexed
+
+    def test_if_data_model_is_migrated_from_schema_without_quarantine(self):
+        cursor = self.symbol_db.db_connection.cursor()
+        cursor.execute('DROP TABLE quarantine')
+        cursor.execute('UPDATE version SET major=1, minor=7')
+        self.symbol_db.insert_file_entry('src/main.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.assertTrue(self.symbol_db.migrate_data_model())
+        self.assertEqual(self.symbol_db.fetch_schema_version(), (SymbolDatabase.VERSION_MAJOR, SymbolDatabase.VERSION_MINOR))
+        self.assertEqual(self.symbol_db.get_file_compiler_args_hash(self.symbol_db.fetch_all_files()[0]), 'compiler_args_hash') # no need to be indexed once again
+        self.symbol_db.insert_quarantine_entry('src/foo.cpp', 'content_hash', 'compiler_args_hash', 'crashed')
+        self.assertEqual(len(self.symbol_db.fetch_all_quarantined_files()), 1)
+
+    def test_if_data_model_is_not_migrated_from_unsupported_schema(self):
+        self.symbol_db.db_connection.cursor().execute('UPDATE version SET major=0, minor=3')
+        self.assertFalse(self.symbol_db.migrate_data_model())
+
+class ShardedSymbolDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.symbol_db_handle, self.symbol_db_filename = tempfile.mkstemp(suffix='.db')
+        self.symbol_db = ShardedSymbolDatabase(self.symbol_db_filename, 4)
+        self.symbol_db.create_data_model()
+        self.filenames = ['src/file{0}.cpp'.format(i) for i in range(8)]
+        for filename in self.filenames:
+            shard = self.symbol_db.get_shard(filename)
+            shard.insert_symbol_entry(filename, 1, 5, 'c:@F@{0}#'.format(filename), 'int f() {}', 8, True)
+            shard.insert_symbol_entry(filename, 2, 5, 'c:@F@main#', 'int main();', 8, False)
+            shard.insert_file_entry(filename, 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.symbol_db.flush()
+
+    def tearDown(self):
+        self.symbol_db.close()
+        os.close(self.symbol_db_handle)
+        for filename in [self.symbol_db_filename] + [get_shard_filename(self.symbol_db_filename, shard) for shard in range(4)]:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(filename + suffix):
+                    os.remove(filename + suffix)
+
+    def test_if_entries_are_stored_into_the_shard_selected_by_the_filename(self):
+        for filename in self.filenames:
+            shard = SymbolDatabase(get_shard_filename(self.symbol_db_filename, get_shard_index(filename, 4)))
+            self.assertIn(filename, [shard.get_file_filename(row) for row in shard.fetch_all_files()])
+            shard.close()
+        self.assertGreater(len(set(get_shard_index(filename, 4) for filename in self.filenames)), 1)
+
+    def test_if_queries_are_run_against_all_of_the_shards(self):
+        self.assertEqual(sorted(self.symbol_db.get_file_filename(row) for row in self.symbol_db.fetch_all_files()), self.filenames)
+        self.assertEqual(len(self.symbol_db.fetch_all_symbols()), 16)
+        self.assertEqual(sorted(self.symbol_db.get_symbol_filename(row) for row in self.symbol_db.fetch_symbols_by_usr('c:@F@main#')), self.filenames)
+        self.assertEqual(len(self.symbol_db.fetch_symbol_definition_by_usr('c:@F@src/file3.cpp#')), 1)
+        self.assertEqual(sorted(row[0] for row in self.symbol_db.fetch_all_definitions_raw()), self.filenames)
+
+    def test_if_diagnostics_from_all_of_the_shards_are_merged_in_order(self):
+        for severity, filename in enumerate(self.filenames):
+            shard = self.symbol_db.get_shard(filename)
+            diagnostics_id = shard.insert_diagnostics_entry(filename, 1, 1, 'some error', severity)
+            shard.insert_diagnostics_details_entry(diagnostics_id, filename, 1, 1, 'some note for {0}'.format(filename), 1)
+        diagnostics = self.symbol_db.fetch_all_diagnostics(DiagnosticsSortingStrategyId.BY_SEVERITY_DESC)
+        self.assertEqual([self.symbol_db.get_diagnostics_filename(row) for row in diagnostics], list(reversed(self.filenames)))
+        diagnostics = self.symbol_db.fetch_all_diagnostics(DiagnosticsSortingStrategyId.BY_FILENAME)
+        self.assertEqual([self.symbol_db.get_diagnostics_filename(row) for row in diagnostics], self.filenames)
+        self.assertEqual(len(set(self.symbol_db.get_diagnostics_id(row) for row in diagnostics)), len(self.filenames))
+        for row in diagnostics:
+            details = self.symbol_db.fetch_diagnostics_details(self.symbol_db.get_diagnostics_id(row))
+            self.assertEqual([self.symbol_db.get_diagnostics_details_description(detail) for detail in details], ['some note for {0}'.format(self.symbol_db.get_diagnostics_filename(row))])
+
+    def test_if_delete_entry_removes_the_entries_from_the_shard(self):
+        self.symbol_db.delete_entry('src/file3.cpp')
+        self.assertNotIn('src/file3.cpp', [self.symbol_db.get_file_filename(row) for row in self.symbol_db.fetch_all_files()])
+        self.assertEqual(len(self.symbol_db.fetch_symbols_by_usr('c:@F@main#')), 7)
+
+    def test_if_drop_shard_removes_only_the_entries_from_that_shard(self):
+        shard_index = get_shard_index('src/file3.cpp', 4)
+        self.symbol_db.drop_shard(shard_index)
+        self.assertEqual(
+            sorted(self.symbol_db.get_file_filename(row) for row in self.symbol_db.fetch_all_files()),
+            [filename for filename in self.filenames if get_shard_index(filename, 4) != shard_index]
+        )
+        self.symbol_db.get_shard('src/file3.cpp').insert_file_entry('src/file3.cpp', 1.5, 100, 'content_hash', 'compiler_args_hash')
+        self.assertIn('src/file3.cpp', [self.symbol_db.get_file_filename(row) for row in self.symbol_db.fetch_all_files()])
+
+    def test_if_number_of_shards_is_kept_in_metadata(self):
+        self.assertEqual(self.symbol_db.fetch_metadata('shards'), '4')
+        self.symbol_db.delete_all_entries()
+        self.assertEqual(self.symbol_db.fetch_all_files(), [])
+        self.assertEqual(self.symbol_db.fetch_metadata('shards'), '4')
+
+    def test_if_symbols_are_found_by_name_across_all_of_the_shards(self):
+        for filename in self.filenames:
+            self.symbol_db.get_shard(filename).insert_symbol_names_batch([(filename, 1, 'c:@F@{0}#'.format(filename), 'f_' + filename[4:-4], 'f_' + filename[4:-4])])
+            self.symbol_db.get_shard(filename).insert_symbol_names_batch([(filename, 2, 'c:@F@main#', 'main', 'main')])
+        symbols = self.symbol_db.fetch_symbols_by_name('f_file', 5)
+        self.assertEqual([self.symbol_db.get_symbol_name(row) for row in symbols], ['f_file0', 'f_file1', 'f_file2', 'f_file3', 'f_file4'])
+        symbols = self.symbol_db.fetch_symbols_by_name('main', 5)
+        self.assertEqual([self.symbol_db.get_symbol_usr(row) for row in symbols], ['c:@F@main#'])
+
+    def test_if_pages_are_filled_from_all_of_the_shards(self):
+        definitions, cursor = [], ''
+        while cursor is not None:
+            page, cursor = self.symbol_db.fetch_definitions_page(cursor, 3)
+            self.assertTrue(page)
+            definitions.extend(page)
+        self.assertEqual(sorted(self.symbol_db.get_symbol_filename(row) for row in definitions), self.filenames)
+        for severity, filename in enumerate(self.filenames):
+            shard = self.symbol_db.get_shard(filename)
+            diagnostics_id = shard.insert_diagnostics_entry(filename, 1, 1, 'some error', severity)
+            shard.insert_diagnostics_details_entry(diagnostics_id, filename, 1, 1, 'some note', 1)
+        diagnostics, cursor = self.symbol_db.fetch_diagnostics_page('', 5, min_severity=2)
+        self.assertEqual(len(diagnostics), 5)
+        page, cursor = self.symbol_db.fetch_diagnostics_page(cursor, 5, min_severity=2)
+        diagnostics.extend(page)
+        self.assertIsNone(cursor)
+        self.assertEqual(sorted(self.symbol_db.get_diagnostics_filename(diag) for diag, details in diagnostics), self.filenames[2:])
+        self.assertTrue(all(len(details) == 1 for diag, details in diagnostics))
+
+    def test_if_diagnostics_with_details_from_all_of_the_shards_are_merged_in_order(self):
+        for severity, filename in enumerate(self.filenames):
+            shard = self.symbol_db.get_shard(filename)
+            diagnostics_id = shard.insert_diagnostics_entry(filename, 1, 1, 'some error', severity)
+            shard.insert_diagnostics_details_entry(diagnostics_id, filename, 1, 1, 'some note for {0}'.format(filename), 1)
+        diagnostics = self.symbol_db.fetch_all_diagnostics_with_details(DiagnosticsSortingStrategyId.BY_SEVERITY_DESC)
+        self.assertEqual([self.symbol_db.get_diagnostics_filename(diag) for diag, details in diagnostics], list(reversed(self.filenames)))
+        for diag, details in diagnostics:
+            self.assertEqual([self.symbol_db.get_diagnostics_details_id(detail) for detail in details], [self.symbol_db.get_diagnostics_id(diag)])
+
+    def test_if_symbol_references_and_declarations_are_fetched_from_all_of_the_shards(self):
+        for filename in self.filenames:
+            self.symbol_db.get_shard(filename).insert_symbol_references_batch([(filename, 3, 5, 'c:@F@main#', 'c:@F@{0}#'.format(filename), SymbolReferenceRole.CALL)])
+        rows = self.symbol_db.fetch_symbol_references('c:@F@main#', SymbolReferenceRole.CALL)
+        self.assertEqual(sorted(self.symbol_db.get_symbol_reference_container_usr(row) for row in rows), ['c:@F@{0}#'.format(filename) for filename in self.filenames])
+        self.assertEqual(len(self.symbol_db.fetch_symbol_references_by_container('c:@F@src/file5.cpp#', SymbolReferenceRole.CALL)), 1)
+        self.symbol_db.get_shard('src/main.cpp').insert_symbol_entry('src/main.cpp', 1, 5, 'c:@F@main#', 'int main() {}', 8, True)
+        rows = self.symbol_db.fetch_symbol_declarations(['c:@F@main#', 'c:@F@src/file5.cpp#'])
+        declarations = dict((self.symbol_db.get_symbol_usr(row), row) for row in rows)
+        self.assertEqual(self.symbol_db.get_symbol_filename(declarations['c:@F@main#']), 'src/main.cpp') # definition rather than any of the declarations
+        self.assertEqual(self.symbol_db.get_symbol_filename(declarations['c:@F@src/file5.cpp#']), 'src/file5.cpp')
+
+    def test_if_includers_are_fetched_from_all_of_the_shards(self):
+        for filename in self.filenames:
+            self.symbol_db.get_shard(filename).insert_file_includes_batch([
+                (filename, filename, 1, 'inc/a.h'), (filename, 'inc/a.h', 1, 'inc/b.h'),
+            ])
+        self.assertEqual(self.symbol_db.fetch_includers('inc/b.h'), [('inc/a.h', 1)])
+        self.assertEqual(self.symbol_db.fetch_transitive_includers(['inc/b.h']), ['inc/a.h'] + self.filenames)
+
+    def test_if_copy_into_merges_all_of_the_shards_into_a_single_database(self):
+        copy_db_filename = self.symbol_db_filename + '.copy'
+        self.assertTrue(self.symbol_db.copy_into(copy_db_filename))
+        copy_db = SymbolDatabase(copy_db_filename)
+        self.assertEqual(sorted(copy_db.get_file_filename(row) for row in copy_db.fetch_all_files()), self.filenames)
+        self.assertEqual(len(copy_db.fetch_symbols_by_usr('c:@F@main#')), 8)
+        self.assertIsNone(copy_db.fetch_metadata('shards'))
+        copy_db.close()
+        os.remove(copy_db_filename)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1 +1,154 @@
-# TODO placeholder to not to forget to write unit tests
+import clang.cindex
+import mock
+import unittest
+
+import parser.clang_parser
+import parser.tunit_cache
+from parser.tunit_cache import CostAwareCache, TranslationUnitCache
+from file_generator import FileGenerator
+
+def weigh(value):
+    # Values are (size, cost) tuples themselves
+    return value
+
+class CostAwareCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = CostAwareCache(100, weigh)
+
+    def test_if_cache_is_bounded_by_the_total_size_of_its_entries(self):
+        self.cache['a'] = (40, 1.0)
+        self.cache['b'] = (40, 1.0)
+        self.assertEqual(len(self.cache), 2)
+        self.cache['c'] = (40, 1.0)
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.size, 80)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_if_least_frequently_accessed_entry_is_evicted_first(self):
+        self.cache['a'] = (40, 1.0)
+        self.cache['b'] = (40, 1.0)
+        self.cache['a']
+        self.cache['c'] = (40, 1.0)
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+
+    def test_if_entry_more_costly_to_re_create_is_evicted_last(self):
+        self.cache['a'] = (40, 10.0)
+        self.cache['b'] = (40, 1.0)
+        self.cache['c'] = (40, 1.0)
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+
+    def test_if_larger_entry_is_evicted_first(self):
+        self.cache['a'] = (20, 1.0)
+        self.cache['b'] = (60, 1.0)
+        self.cache['c'] = (40, 1.0)
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+
+    def test_if_entries_not_accessed_for_a_while_age(self):
+        self.cache['a'] = (40, 1.0)
+        for i in range(3):
+            self.cache['a']
+        # Clock advances with each eviction so the entries inserted later on outweigh the once frequently accessed one
+        for key in 'bcdefghijklm':
+            self.cache[key] = (40, 1.0)
+        self.assertNotIn('a', self.cache)
+        self.assertGreater(self.cache.clock, 0.0)
+
+    def test_if_entry_just_inserted_is_not_evicted_even_if_exceeding_the_size(self):
+        self.cache['a'] = (40, 1.0)
+        self.cache['b'] = (200, 0.1)
+        self.assertEqual(list(self.cache.iterkeys()), ['b'])
+        self.assertEqual(self.cache.size, 200)
+
+    def test_if_entry_is_re_weighed_on_access(self):
+        self.cache['a'] = [40, 1.0]
+        self.cache['b'] = (40, 1.0)
+        self.cache.store['a'][0][0] = 80
+        self.cache['a']
+        self.assertEqual(self.cache.size, 80)
+        self.assertEqual(list(self.cache.iterkeys()), ['a'])
+
+    def test_if_entry_replaced_keeps_the_number_of_accesses(self):
+        self.cache['a'] = (40, 1.0)
+        self.cache['a']
+        self.cache['a'] = (40, 1.0)
+        self.assertEqual(self.cache.store['a'][3], 3)
+        self.assertEqual(self.cache.size, 40)
+
+    def test_if_entry_deleted_gives_its_size_back(self):
+        self.cache['a'] = (40, 1.0)
+        del self.cache['a']
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.size, 0)
+
+class TranslationUnitCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tunit_cache = TranslationUnitCache(CostAwareCache(100, lambda value: (40, value[3])))
+
+    def test_if_fetch_returns_tunit_build_flags_and_mtime(self):
+        self.tunit_cache.insert('a.cpp', 'tunit', ['-Wall'], 1.0, 0.5)
+        self.assertEqual(self.tunit_cache.fetch('a.cpp'), ('tunit', ['-Wall'], 1.0,))
+
+    def test_if_fetch_returns_nones_for_tunit_not_in_cache(self):
+        self.assertEqual(self.tunit_cache.fetch('a.cpp'), (None, None, None,))
+
+    def test_if_hits_misses_and_evictions_are_counted(self):
+        self.tunit_cache.insert('a.cpp', 'tunit', [], 1.0, 0.5)
+        self.tunit_cache.fetch('a.cpp')
+        self.tunit_cache.fetch('b.cpp')
+        self.tunit_cache.insert('b.cpp', 'tunit', [], 1.0, 0.5)
+        self.tunit_cache.insert('c.cpp', 'tunit', [], 1.0, 0.5)
+        stats = self.tunit_cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['size'], 80)
+
+    def test_if_update_replaces_the_tunit(self):
+        self.tunit_cache.insert('a.cpp', 'tunit', [], 1.0, 0.5)
+        self.tunit_cache.update('a.cpp', 'new_tunit', [], 2.0, 0.5)
+        self.assertEqual(self.tunit_cache.fetch('a.cpp'), ('new_tunit', [], 2.0,))
+        self.assertEqual(len(self.tunit_cache), 1)
+
+    def test_if_drop_removes_the_tunit(self):
+        self.tunit_cache.insert('a.cpp', 'tunit', [], 1.0, 0.5)
+        self.tunit_cache.drop('a.cpp')
+        self.assertEqual(self.tunit_cache.fetch('a.cpp'), (None, None, None,))
+
+class TranslationUnitMemoryUsageTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.test_file                = FileGenerator.gen_simple_cpp_file()
+        cls.txt_compilation_database = FileGenerator.gen_txt_compilation_database()
+
+    @classmethod
+    def tearDownClass(cls):
+        FileGenerator.close_gen_file(cls.test_file)
+        FileGenerator.close_gen_file(cls.txt_compilation_database)
+
+    def test_if_memory_usage_of_parsed_tunit_is_reported(self):
+        clang_parser = parser.clang_parser.ClangParser(
+            self.txt_compilation_database.name,
+            TranslationUnitCache(CostAwareCache(2048 * 1024 * 1024))
+        )
+        tunit = clang_parser.parse(self.test_file.name, self.test_file.name)
+        self.assertGreater(parser.tunit_cache.get_tunit_memory_usage(tunit), 0)
+        self.assertEqual(clang_parser.tunit_cache.get_stats()['entries'], 1)
+        self.assertGreater(clang_parser.tunit_cache.get_stats()['size'], 1)
+
+    def test_if_libclang_prototypes_are_registered_only_once(self):
+        clang_parser = parser.clang_parser.ClangParser(
+            self.txt_compilation_database.name,
+            TranslationUnitCache(CostAwareCache(2048 * 1024 * 1024))
+        )
+        tunit = clang_parser.parse(self.test_file.name, self.test_file.name)
+        parser.tunit_cache.get_tunit_memory_usage(tunit)
+        with mock.patch('parser.tunit_cache._register_tunit_resource_usage') as mock_register_tunit_resource_usage:
+            self.assertGreater(parser.tunit_cache.get_tunit_memory_usage(tunit), 0)
+        mock_register_tunit_resource_usage.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
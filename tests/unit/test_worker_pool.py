@@ -0,0 +1,129 @@
+import os
+import unittest
+
+from services.source_code_model.indexer.worker_pool import WorkerPool, wait_for_any, report_progress
+
+def handle_with_progress(request):
+    for _ in range(request):
+        report_progress()
+    return request
+
+class WorkerPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(2, lambda: (lambda request: (os.getpid(), request * 2)))
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_if_start_forks_given_number_of_workers(self):
+        workers = self.pool.start()
+        self.assertEqual(len(workers), 2)
+        self.assertTrue(all(worker.is_alive() for worker in workers))
+        self.assertEqual(len(set(worker.process.pid for worker in workers)), 2)
+
+    def test_if_worker_serves_requests_with_the_handler_constructed_on_the_worker_side(self):
+        worker = self.pool.start()[0]
+        pid, response = worker.request(21)
+        self.assertEqual(response, 42)
+        self.assertEqual(pid, worker.process.pid)
+        self.assertNotEqual(pid, os.getpid())
+
+    def test_if_workers_are_reused_when_started_again(self):
+        pids = [worker.process.pid for worker in self.pool.start()]
+        self.assertEqual([worker.process.pid for worker in self.pool.start()], pids)
+
+    def test_if_dead_worker_is_replaced_when_started_again(self):
+        workers = self.pool.start()
+        killed_pid = workers[0].process.pid
+        workers[0].kill()
+        self.assertEqual(len(self.pool.get_workers()), 1)
+        workers = self.pool.start()
+        self.assertEqual(len(workers), 2)
+        self.assertNotIn(killed_pid, [worker.process.pid for worker in workers])
+        self.assertTrue(all(worker.request(1)[1] == 2 for worker in workers))
+
+    def test_if_pool_is_resized_when_started_with_the_number_of_workers(self):
+        workers = list(self.pool.start())
+        self.assertEqual(self.pool.start(1), [workers[0]])
+        self.assertFalse(workers[1].is_alive())
+        self.assertEqual(len(self.pool.start(3)), 3)
+        self.assertEqual(self.pool.start(3)[0], workers[0])
+
+    def test_if_request_returns_none_when_worker_is_dead(self):
+        worker = self.pool.start()[0]
+        worker.kill()
+        self.assertIsNone(worker.request(1))
+
+    def test_if_wait_for_any_returns_the_workers_which_have_responded(self):
+        workers = self.pool.start()
+        self.assertEqual(wait_for_any(workers, 0), [])
+        workers[1].send(1)
+        self.assertEqual(wait_for_any(workers, 5.0), [workers[1]])
+        self.assertEqual(workers[1].recv()[1], 2)
+
+    def test_if_shutdown_terminates_all_workers(self):
+        workers = self.pool.start()
+        self.pool.shutdown()
+        self.assertFalse(any(worker.is_alive() for worker in workers))
+        self.assertEqual(self.pool.get_workers(), [])
+
+    def test_if_spare_workers_are_forked_together_with_the_others(self):
+        pool = WorkerPool(2, lambda: (lambda request: request), 1)
+        try:
+            self.assertEqual(len(pool.start()), 2)
+            self.assertEqual(len(pool.spare_workers), 1)
+            self.assertTrue(pool.spare_workers[0].is_alive())
+        finally:
+            pool.shutdown()
+        self.assertEqual(pool.spare_workers, [])
+
+    def test_if_replaced_worker_is_killed_and_taken_over_by_the_spare_one(self):
+        pool = WorkerPool(2, lambda: (lambda request: request * 2), 1)
+        try:
+            workers = list(pool.start())
+            spare_worker, replaced_worker = pool.spare_workers[0], workers[0]
+            self.assertIs(pool.replace(replaced_worker), spare_worker)
+            self.assertFalse(replaced_worker.is_alive())
+            self.assertEqual(pool.get_workers(), [workers[1], spare_worker])
+            self.assertEqual(spare_worker.request(21), 42)
+        finally:
+            pool.shutdown()
+
+    def test_if_replace_returns_none_when_there_are_no_spare_workers_left(self):
+        workers = self.pool.start()
+        self.assertIsNone(self.pool.replace(workers[0]))
+        self.assertEqual(len(self.pool.get_workers()), 1)
+        self.assertEqual(len(self.pool.start()), 2)
+
+    def test_if_spare_workers_replace_the_dead_ones_when_started_again(self):
+        pool = WorkerPool(2, lambda: (lambda request: request), 1)
+        try:
+            workers = pool.start()
+            spare_worker = pool.spare_workers[0]
+            workers[0].kill()
+            workers = pool.start()
+            self.assertIn(spare_worker, workers)
+            self.assertEqual(len(pool.spare_workers), 1)
+            self.assertNotIn(pool.spare_workers[0], workers)
+        finally:
+            pool.shutdown()
+
+    def test_if_progress_reported_by_the_handler_is_seen_by_the_pool(self):
+        pool = WorkerPool(1, lambda: handle_with_progress)
+        try:
+            worker = pool.start()[0]
+            self.assertEqual(worker.request(3), 3)
+            completed, started = worker.get_progress()
+            self.assertEqual(completed, 3)
+            self.assertGreater(started, 0)
+            worker.send(0)
+            self.assertEqual(worker.get_progress()[0], 0)
+            worker.recv()
+        finally:
+            pool.shutdown()
+
+    def test_if_report_progress_is_no_op_outside_of_the_workers(self):
+        report_progress()
+
+if __name__ == '__main__':
+    unittest.main()